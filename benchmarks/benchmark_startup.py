@@ -0,0 +1,73 @@
+"""
+benchmark_startup.py
+====================================
+Benchmark of the start-up cost of GaiaXPy.
+
+It measures the time needed to import the package in a fresh interpreter and the time needed to create the photometric
+systems, both lazily (as done on import) and forcing the parsing of every filter file (as done before the systems were
+loaded lazily).
+
+Usage:
+    python benchmarks/benchmark_startup.py [n_runs]
+
+GaiaXPy needs to be installed or its location added to PYTHONPATH.
+"""
+
+import subprocess
+import sys
+from statistics import median
+from timeit import default_timer as timer
+
+IMPORT_SCRIPT = 'from timeit import default_timer as timer; start = timer(); import gaiaxpy; print(timer() - start)'
+
+
+def time_import(n_runs):
+    """
+    Time the import of the package in fresh interpreters.
+
+    Args:
+        n_runs (int): Number of interpreters to launch.
+
+    Returns:
+        float: Median import time in seconds.
+    """
+    return median(float(subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], capture_output=True, text=True,
+                                       check=True).stdout.split()[-1]) for _ in range(n_runs))
+
+
+def time_systems(n_runs):
+    """
+    Time the creation of all the available photometric systems.
+
+    Args:
+        n_runs (int): Number of repetitions.
+
+    Returns:
+        tuple: Median time in seconds to create the systems lazily and to create them parsing all the filter files.
+    """
+    from gaiaxpy.generator.photometric_system import _get_system_tuples
+
+    def create_lazily():
+        _get_system_tuples()
+
+    def create_eagerly():
+        for _, system in _get_system_tuples():
+            system.get_zero_points(), system.get_offsets()
+
+    def measure(function):
+        times = []
+        for _ in range(n_runs):
+            start = timer()
+            function()
+            times.append(timer() - start)
+        return median(times)
+
+    return measure(create_lazily), measure(create_eagerly)
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f'Import time: {time_import(runs):.3f} s')
+    lazy_time, eager_time = time_systems(runs)
+    print(f'Photometric systems created lazily: {lazy_time * 1e3:.1f} ms')
+    print(f'Photometric systems created parsing all filter files: {eager_time * 1e3:.1f} ms')
@@ -5,6 +5,7 @@ Module for the calibrator functionality.
 """
 
 from configparser import ConfigParser
+from functools import partial
 from os.path import join
 from pathlib import Path
 from typing import Union
@@ -18,10 +19,14 @@ from gaiaxpy.core.config import load_xpmerge_from_xml, load_xpsampling_from_xml
 from gaiaxpy.core.generic_functions import cast_output, get_spectra_type, validate_arguments, validate_wl_sampling, \
     parse_band
 from gaiaxpy.core.generic_variables import pbar_colour, pbar_units, pbar_message
+from gaiaxpy.core.parallel import _concat_partitions, _get_shared_arrays, _run_in_pool, _use_pool
 from gaiaxpy.core.satellite import BANDS, BP_WL, RP_WL
 from gaiaxpy.input_reader.input_reader import InputReader
+from gaiaxpy.output.output_data import _save_in_chunks
 from gaiaxpy.output.sampled_spectra_data import SampledSpectraData
 from gaiaxpy.spectrum.absolute_sampled_spectrum import AbsoluteSampledSpectrum
+from gaiaxpy.spectrum.batched_spectra import _iterate_blocks, _sample_absolute_block
+from gaiaxpy.spectrum.design_matrix_cache import design_matrix_cache, hash_sampling
 from gaiaxpy.spectrum.sampled_basis_functions import SampledBasisFunctions
 from gaiaxpy.spectrum.utils import get_covariance_matrix
 from gaiaxpy.spectrum.xp_continuous_spectrum import XpContinuousSpectrum
@@ -30,10 +35,10 @@ from .external_instrument_model import ExternalInstrumentModel
 __FUNCTION_KEY = 'calibrator'
 
 
-def calibrate(input_object: Union[list, Path, str], sampling: np.ndarray = None, truncation: bool = False,
+def calibrate(input_object: Union[list, Path, str, tuple], sampling: np.ndarray = None, truncation: bool = False,
               output_path: Union[Path, str] = '.', output_file: str = 'output_spectra', output_format: str = None,
-              save_file: bool = True, with_correlation: bool = False, username: str = None, password: str = None) ->\
-        (pd.DataFrame, np.ndarray):
+              save_file: bool = True, with_correlation: bool = False, username: str = None, password: str = None,
+              batch: bool = False, chunk_size: int = None, n_workers: int = None) -> (pd.DataFrame, np.ndarray):
     """
     Calibration utility: calibrates the input internally-calibrated continuously-represented mean spectra to the
     absolute system. An absolute spectrum sampled on a user-defined or default wavelength grid is created for each set
@@ -41,8 +46,9 @@ def calibrate(input_object: Union[list, Path, str], sampling: np.ndarray = None,
     available data.
 
     Args:
-        input_object (list/Path/str): Path to the file containing the mean spectra as downloaded from the archive in
-            their continuous representation, a list of sources ids (string or long), or a pandas DataFrame.
+        input_object (list/Path/str/tuple): Path to the file containing the mean spectra as downloaded from the
+            archive in their continuous representation, a list of sources ids (string or long), a pandas DataFrame, or a
+            tuple containing the path to a local file and a list of the sources ids to read from it.
         sampling (ndarray): 1D array containing the desired sampling in absolute wavelengths [nm].
         truncation (bool): Toggle truncation of the set of bases. The level of truncation to be applied is defined by
             the recommended value in the input files.
@@ -54,6 +60,14 @@ def calibrate(input_object: Union[list, Path, str], sampling: np.ndarray = None,
         with_correlation (bool): Whether correlation information should be generated.
         username (str): Cosmos username, only suggested when input_object is a list or ADQL query.
         password (str): Cosmos password, only suggested when input_object is a list or ADQL query.
+        batch (bool): Whether to calibrate blocks of sources with stacked matrix operations instead of creating one
+            spectrum object per source. Recommended for large inputs.
+        chunk_size (int): Maximum number of sources to read and process at once. If given, the input file is read in
+            blocks and the output is written to the output file block by block (for the AVRO, CSV, ECSV and FITS
+            formats), keeping the memory usage proportional to the size of the blocks. In that case, if save_file is
+            True the output is not returned.
+        n_workers (int): Number of processes to distribute the sources across. The design matrices are shared with
+            the processes through shared memory. By default, the sources are processed in the current process.
 
     Returns:
         (tuple): tuple containing:
@@ -62,14 +76,15 @@ def calibrate(input_object: Union[list, Path, str], sampling: np.ndarray = None,
             ndarray: The sampling used to calibrate the input spectra (user-provided or default).
     """
     return _calibrate(input_object, sampling, truncation, output_path, output_file, output_format, save_file,
-                      with_correlation=with_correlation, username=username, password=password)
+                      with_correlation=with_correlation, username=username, password=password, batch=batch,
+                      chunk_size=chunk_size, n_workers=n_workers)
 
 
-def _calibrate(input_object: Union[list, Path, str], sampling: np.ndarray = None, truncation: bool = False,
+def _calibrate(input_object: Union[list, Path, str, tuple], sampling: np.ndarray = None, truncation: bool = False,
                output_path: Union[Path, str] = '.', output_file: str = 'output_spectra', output_format: str = None,
                save_file: bool = True, with_correlation: bool = False, username: str = None, password: str = None,
-               bp_model: str = 'v375wi', rp_model: str = 'v142r', disable_info: bool = False) ->\
-        (pd.DataFrame, np.ndarray):
+               bp_model: str = 'v375wi', rp_model: str = 'v142r', disable_info: bool = False, batch: bool = False,
+               chunk_size: int = None, n_workers: int = None) -> (pd.DataFrame, np.ndarray):
     """
     Internal method of the calibration utility. Refer to "calibrate".
 
@@ -86,15 +101,30 @@ def _calibrate(input_object: Union[list, Path, str], sampling: np.ndarray = None
     """
     validate_wl_sampling(sampling)
     validate_arguments(_calibrate.__defaults__[3], output_file, save_file)
-    parsed_input_data, extension = InputReader(input_object, _calibrate, disable_info=disable_info, user=username,
-                                               password=password).read()
+    input_reader = InputReader(input_object, _calibrate, disable_info=disable_info, user=username, password=password)
+    create_spectra = __create_spectra_batch if batch else __create_spectra
+    if _use_pool(n_workers):
+        create_spectra = partial(__create_spectra_parallel, n_workers=n_workers, batch=batch)
+    if chunk_size:
+        xp_design_matrices, xp_merge = __generate_xp_matrices_and_merge(__FUNCTION_KEY, sampling, bp_model, rp_model)
+
+        def calibrate_chunk(_parsed_input_data):
+            _spectra, _ = create_spectra(_parsed_input_data, truncation, xp_design_matrices, xp_merge,
+                                         with_correlation=with_correlation, disable_info=disable_info)
+            return SampledSpectraData(cast_output(_spectra), xp_design_matrices[BANDS.bp].get_sampling_grid(),
+                                      attrs={'data_type': AbsoluteSampledSpectrum})
+
+        output_chunks = ((calibrate_chunk(chunk), extension) for chunk, extension in
+                         input_reader.read_chunks(chunk_size))
+        spectra_df = _save_in_chunks(output_chunks, save_file, output_path, output_file, output_format)
+        return spectra_df, xp_design_matrices[BANDS.bp].get_sampling_grid()
+    parsed_input_data, extension = input_reader.read()
     xp_design_matrices, xp_merge = __generate_xp_matrices_and_merge(__FUNCTION_KEY, sampling, bp_model, rp_model)
-    spectra_df, positions = __create_spectra(parsed_input_data, truncation, xp_design_matrices, xp_merge,
-                                             with_correlation=with_correlation, disable_info=disable_info)
-    spectra_df = cast_output(spectra_df)
-    output_data = SampledSpectraData(spectra_df, positions)
+    spectra, positions = create_spectra(parsed_input_data, truncation, xp_design_matrices, xp_merge,
+                                        with_correlation=with_correlation, disable_info=disable_info)
+    output_data = SampledSpectraData(cast_output(spectra), positions, attrs={'data_type': AbsoluteSampledSpectrum})
     output_data.save(save_file, output_path, output_file, output_format, extension)
-    return spectra_df, positions
+    return output_data.data, positions
 
 
 def __create_merge(xp: str, sampling: np.ndarray) -> np.ndarray:
@@ -155,17 +185,38 @@ def __generate_xp_matrices_and_merge(label: str, sampling: np.ndarray, bp_model:
         model = _bp_model if xp == BANDS.bp else _rp_model
         return join(config_path, f"{file_name.replace('xp', xp).replace('model', model)}")
 
-    if sampling is None:
-        xp_sampling_grid, xp_merge = load_xpmerge_from_xml(bp_model=bp_model)
-        xp_design_matrices = load_xpsampling_from_xml(bp_model=bp_model)
-        xp_design_matrices = {xp: SampledBasisFunctions.from_design_matrix(xp_sampling_grid, xp_design_matrices[xp])
-                              for xp in BANDS}
-    else:
-        xp_merge = {xp: __create_merge(xp, sampling) for xp in BANDS}
-        xp_design_matrices = {xp: SampledBasisFunctions.from_external_instrument_model(
-            sampling, xp_merge[xp], ExternalInstrumentModel.from_config_csv(
-                __get_file_for_xp(xp, 'dispersion'), __get_file_for_xp(xp, 'response'), __get_file_for_xp(xp, 'bases')))
-            for xp in BANDS}
+    def compute_xp_matrices_and_merge():
+        """
+        Compute the design matrices and merge arrays.
+
+        Returns:
+            dict: Dictionary containing the sampling grid and the design matrix and merge array of each band.
+        """
+        if sampling is None:
+            xp_sampling_grid, _xp_merge = load_xpmerge_from_xml(bp_model=bp_model)
+            _xp_design_matrices = load_xpsampling_from_xml(bp_model=bp_model)
+        else:
+            xp_sampling_grid = sampling
+            _xp_merge = {xp: __create_merge(xp, sampling) for xp in BANDS}
+            _xp_design_matrices = {xp: SampledBasisFunctions.from_external_instrument_model(
+                sampling, _xp_merge[xp], ExternalInstrumentModel.from_config_csv(
+                    __get_file_for_xp(xp, 'dispersion'), __get_file_for_xp(xp, 'response'),
+                    __get_file_for_xp(xp, 'bases'))).get_design_matrix() for xp in BANDS}
+        arrays = {'sampling_grid': xp_sampling_grid}
+        for xp in BANDS:
+            arrays[f'{xp}_design_matrix'] = _xp_design_matrices[xp]
+            arrays[f'{xp}_merge'] = _xp_merge[xp]
+        return arrays
+
+    # Design matrices previously computed for the same models and sampling grid are taken from the cache
+    cached_arrays = design_matrix_cache.get((label, bp_model, rp_model, hash_sampling(sampling)),
+                                            compute_xp_matrices_and_merge)
+    # The sampling grid is returned to the user, only the design matrices are shared
+    sampling_grid = cached_arrays['sampling_grid'].copy()
+    xp_design_matrices = {xp: SampledBasisFunctions.from_design_matrix(sampling_grid,
+                                                                       cached_arrays[f'{xp}_design_matrix'])
+                          for xp in BANDS}
+    xp_merge = {xp: cached_arrays[f'{xp}_merge'] for xp in BANDS}
     return xp_design_matrices, xp_merge
 
 
@@ -204,6 +255,103 @@ def __create_spectra(parsed_input_data: pd.DataFrame, truncation: bool, design_m
     return spectra_df, positions
 
 
+def __create_spectra_batch(parsed_input_data: pd.DataFrame, truncation: bool, design_matrices: dict, merge: dict,
+                           with_correlation: bool = False, disable_info: bool = False):
+    """
+    Create the absolute sampled spectra processing blocks of sources with stacked matrix operations. The output is
+        equivalent to the one of __create_spectra, but it is kept in stacked columns instead of a DataFrame.
+
+    Args:
+        parsed_input_data (DataFrame): DataFrame containing information for each source in the mean spectra file.
+        truncation (bool): If True, the set of bases is truncated.
+        design_matrices (dict): Dictionary containing the sampled basis functions for both bands.
+        merge (dict): Dictionary containing arrays of weights for both bands.
+        with_correlation (bool, optional): If True, the correlation information is included in the output.
+
+    Returns:
+        tuple:
+            spectra (dict): Dictionary containing the columns of the absolute sampled spectra: source_id, plus flux,
+                flux_error and (if with_correlation is True) correlation as 2D arrays with one row per source.
+            positions (ndarray): 1D array of the sample positions.
+    """
+    positions = design_matrices[BANDS.bp].get_sampling_grid()
+    n_sources = len(parsed_input_data)
+    flux, error = np.empty((n_sources, len(positions))), np.empty((n_sources, len(positions)))
+    correlation = np.empty((n_sources, len(positions) * (len(positions) - 1) // 2)) if with_correlation else None
+    with tqdm(total=n_sources, desc=pbar_message[__FUNCTION_KEY], unit=pbar_units[__FUNCTION_KEY], leave=False,
+              colour=pbar_colour, disable=disable_info) as pbar:
+        for rows in _iterate_blocks(n_sources):
+            block = _sample_absolute_block(parsed_input_data.iloc[rows], design_matrices, merge, truncation=truncation,
+                                           with_correlation=with_correlation)
+            flux[rows], error[rows] = block['flux'], block['error']
+            if with_correlation:
+                correlation[rows] = block['correlation']
+            pbar.update(rows.stop - rows.start)
+    spectra = {'source_id': parsed_input_data['source_id'].to_numpy(), 'flux': flux, 'flux_error': error}
+    if with_correlation:
+        spectra['correlation'] = correlation
+    return spectra, positions
+
+
+def __create_spectra_parallel(parsed_input_data: pd.DataFrame, truncation: bool, design_matrices: dict, merge: dict,
+                              with_correlation: bool = False, disable_info: bool = False, n_workers: int = None,
+                              batch: bool = False):
+    """
+    Create the absolute sampled spectra distributing the sources across a pool of processes. The output is equivalent
+        to the one of __create_spectra, or of __create_spectra_batch if batch is True.
+
+    Args:
+        parsed_input_data (DataFrame): DataFrame containing information for each source in the mean spectra file.
+        truncation (bool): If True, the set of bases is truncated.
+        design_matrices (dict): Dictionary containing the sampled basis functions for both bands.
+        merge (dict): Dictionary containing arrays of weights for both bands.
+        with_correlation (bool, optional): If True, the correlation information is included in the output.
+        n_workers (int): Number of processes.
+        batch (bool): Whether each process uses stacked matrix operations.
+
+    Returns:
+        tuple:
+            spectra (DataFrame/dict): Absolute sampled spectra, as a DataFrame or as a dictionary of columns if batch is
+                True.
+            positions (ndarray): 1D array of the sample positions.
+    """
+    positions = design_matrices[BANDS.bp].get_sampling_grid()
+    shared_arrays = {'sampling_grid': positions}
+    for band in BANDS:
+        shared_arrays[f'{band}_design_matrix'] = design_matrices[band].get_design_matrix()
+        shared_arrays[f'{band}_merge'] = merge[band]
+    partitions = _run_in_pool(_create_spectra_partition, parsed_input_data, n_workers, shared_arrays=shared_arrays,
+                              desc=pbar_message[__FUNCTION_KEY], unit=pbar_units[__FUNCTION_KEY],
+                              disable_info=disable_info, truncation=truncation, with_correlation=with_correlation,
+                              batch=batch)
+    return _concat_partitions(partitions), positions
+
+
+def _create_spectra_partition(parsed_input_data, truncation, with_correlation, batch):
+    """
+    Create the absolute sampled spectra of a partition of the sources in a worker process, using the design matrices
+        and merge arrays shared by the main process.
+
+    Args:
+        parsed_input_data (DataFrame): Partition of the parsed input data.
+        truncation (bool): If True, the set of bases is truncated.
+        with_correlation (bool): If True, the correlation information is included in the output.
+        batch (bool): Whether to use stacked matrix operations.
+
+    Returns:
+        DataFrame/dict: Absolute sampled spectra, as a DataFrame or as a dictionary of columns if batch is True.
+    """
+    shared_arrays = _get_shared_arrays()
+    design_matrices = {band: SampledBasisFunctions.from_design_matrix(shared_arrays['sampling_grid'],
+                                                                      shared_arrays[f'{band}_design_matrix'])
+                       for band in BANDS}
+    merge = {band: shared_arrays[f'{band}_merge'] for band in BANDS}
+    create_spectra = __create_spectra_batch if batch else __create_spectra
+    spectra, _ = create_spectra(parsed_input_data, truncation, design_matrices, merge,
+                                with_correlation=with_correlation, disable_info=True)
+    return spectra
+
+
 def _create_spectrum(row, truncation, design_matrix, merge, with_correlation=False):
     """
     Create a single sampled absolute spectrum from the input continuously-represented mean spectrum and design matrix.
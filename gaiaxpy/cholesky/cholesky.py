@@ -3,34 +3,137 @@ cholesky.py
 ====================================
 Module that implements the Cholesky functionality.
 """
+from itertools import chain
 from pathlib import Path
 from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
-from numpy import diag, dot, identity
-from scipy.linalg import cholesky, solve_triangular
+from numpy import dot
+from numpy.linalg import LinAlgError
 
-from gaiaxpy.core.generic_functions import parse_band
+from gaiaxpy.core.generic_functions import arrays_to_symmetric_matrices, parse_band
+from gaiaxpy.core.parallel import _run_in_pool, _use_pool
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.input_reader.input_reader import InputReader
 
 
-def __get_dot_product(_L_inv: np.ndarray) -> Optional[np.ndarray]:
+# Number of sources decomposed together
+CHOLESKY_BLOCK_SIZE = 1000
+
+
+def _invert_lower_triangular(_L: np.ndarray) -> np.ndarray:
     """
-    Calculate the dot product of the transpose of L_inv with itself.
+    Invert a stack of lower triangular matrices by splitting them into blocks:
+        inv([[A, 0], [C, D]]) = [[inv(A), 0], [-inv(D) C inv(A), inv(D)]]
+    The upper triangle of the output is exactly zero.
 
     Args:
-        _L_inv (ndarray): A 2D numpy array.
+        _L (ndarray): Lower triangular matrices of shape (N, n, n).
 
     Returns:
-        ndarray: The dot product of the transpose of L_inv with itself. None: If L_inv does not have the attribute `T`
-            (transpose).
+        ndarray: Inverse matrices of shape (N, n, n).
     """
+    size = _L.shape[-1]
+    if size == 1:
+        return 1.0 / _L
+    half = size // 2
+    _A_inv = _invert_lower_triangular(_L[:, :half, :half])
+    _D_inv = _invert_lower_triangular(_L[:, half:, half:])
+    _L_inv = np.zeros_like(_L)
+    _L_inv[:, :half, :half] = _A_inv
+    _L_inv[:, half:, half:] = _D_inv
+    _L_inv[:, half:, :half] = -np.matmul(np.matmul(_D_inv, _L[:, half:, :half]), _A_inv)
+    return _L_inv
+
+
+def _get_inverse_square_root_covariance_matrices(xp_errors: np.ndarray, xp_correlation_matrices: np.ndarray) -> \
+        tuple:
+    """
+    Calculate the inverse square root of the covariance matrices of a block of sources with the same number of
+        coefficients.
+
+    Args:
+        xp_errors (ndarray): Measurement errors of shape (N, n).
+        xp_correlation_matrices (ndarray): Correlation matrices of shape (N, n, n).
+
+    Returns:
+        ndarray: Inverse square root of the covariance matrices, of shape (N, n, n). The matrices of the sources whose
+            input is not finite or whose correlation matrix is not positive-definite are filled with NaN.
+        ndarray: Boolean array which is False for those sources.
+    """
+    valid = np.isfinite(xp_errors).all(axis=1) & np.isfinite(xp_correlation_matrices).all(axis=(1, 2))
     try:
-        return dot(_L_inv.T, _L_inv)
-    except AttributeError:
-        return None
+        _L = np.linalg.cholesky(xp_correlation_matrices if valid.all() else
+                                _replace_matrices(xp_correlation_matrices, valid))
+    except LinAlgError:
+        # Find the matrices that are not positive-definite
+        for index in np.flatnonzero(valid):
+            try:
+                np.linalg.cholesky(xp_correlation_matrices[index])
+            except LinAlgError:
+                valid[index] = False
+        _L = np.linalg.cholesky(_replace_matrices(xp_correlation_matrices, valid))
+    # Multiplying by the matrix of inverse errors scales the columns
+    output = _invert_lower_triangular(_L) / np.where(valid[:, np.newaxis], xp_errors, 1.0)[:, np.newaxis, :]
+    output[~valid] = np.nan
+    return output, valid
+
+
+def _replace_matrices(matrices: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Replace the invalid matrices by the identity, so that the whole stack can be decomposed.
+
+    Args:
+        matrices (ndarray): Matrices of shape (N, n, n).
+        valid (ndarray): Boolean array which is False for the matrices to replace.
+
+    Returns:
+        ndarray: A copy of the matrices with the invalid ones replaced.
+    """
+    matrices = matrices.copy()
+    matrices[~valid] = np.identity(matrices.shape[-1])
+    return matrices
+
+
+def _get_band_matrices(xp_errors: pd.Series, xp_correlation_matrices: pd.Series, inverse_covariance: bool,
+                       output_array: bool) -> Union[list, np.ndarray]:
+    """
+    Compute the inverse square root covariance matrices or the inverse covariance matrices of the sources in one band,
+        stacking the sources in blocks of CHOLESKY_BLOCK_SIZE.
+
+    Args:
+        xp_errors (Series): Measurement errors scaled by the inverse standard deviation, NaN if the band is missing.
+        xp_correlation_matrices (Series): Correlation matrices, NaN if the band is missing.
+        inverse_covariance (bool): Whether to compute the inverse covariance matrices instead of the inverse square
+            root covariance matrices.
+        output_array (bool): Whether to return a single array instead of a list of matrices.
+
+    Returns:
+        list or ndarray: List of matrices (None for the sources whose band is missing or whose correlation matrix is
+            not positive-definite), or array of shape (N, n, n) filled with NaN for those sources. Sources with fewer
+            coefficients than the largest ones are padded with NaN.
+    """
+    xp_errors, xp_correlation_matrices = list(xp_errors), list(xp_correlation_matrices)
+    sizes = np.array([len(errors) if isinstance(errors, np.ndarray) and isinstance(correlations, np.ndarray) else 0
+                      for errors, correlations in zip(xp_errors, xp_correlation_matrices)], dtype=int)
+    max_size = sizes.max(initial=0)
+    output = np.full((len(sizes), max_size, max_size), np.nan)
+    valid = np.zeros(len(sizes), dtype=bool)
+    for size in np.unique(sizes[sizes > 0]):
+        indices = np.flatnonzero(sizes == size)
+        for start in range(0, len(indices), CHOLESKY_BLOCK_SIZE):
+            block = indices[start:start + CHOLESKY_BLOCK_SIZE]
+            matrices, valid[block] = _get_inverse_square_root_covariance_matrices(
+                np.stack([xp_errors[index] for index in block]),
+                np.stack([xp_correlation_matrices[index] for index in block]))
+            if inverse_covariance:
+                matrices = np.matmul(matrices.transpose(0, 2, 1), matrices)
+            output[block, :size, :size] = matrices
+    if output_array:
+        return output
+    return [output[index, :size, :size] if is_valid else None for index, (size, is_valid) in
+            enumerate(zip(sizes, valid))]
 
 
 def __output_list_to_df(parsed_input_data: pd.DataFrame, bands_output: list, output_columns: list) -> pd.DataFrame:
@@ -51,27 +154,119 @@ def __output_list_to_df(parsed_input_data: pd.DataFrame, bands_output: list, out
     return pd.DataFrame(zip(*output_list), columns=output_columns)
 
 
-def get_inverse_square_root_covariance_matrix(input_object: Union[list, Path, str],
-                                              band: Optional[Union[list, str]] = None):
+def __output_arrays_to_dict(parsed_input_data: pd.DataFrame, bands_output: list, output_columns: list) -> dict:
+    """
+    Collect the output arrays in a dictionary.
+
+    Args:
+        parsed_input_data (pd.Dataframe): Parsed initial data.
+        bands_output (list): A list of output data, where each element is the array of matrices of a specific band.
+        output_columns (list): A list of strings representing the keys of the output dictionary.
+
+    Returns:
+        dict: A dictionary containing the source IDs and the array of matrices for each band.
+    """
+    return dict(zip(output_columns, [parsed_input_data['source_id'].to_numpy()] + list(bands_output)))
+
+
+def _get_bands_output(parsed_input_data: pd.DataFrame, bands_to_process: list, inverse_covariance: bool,
+                      output_array: bool = False) -> list:
+    """
+    Compute the inverse square root covariance matrices or the inverse covariance matrices of the input sources.
+
+    Args:
+        parsed_input_data (pd.Dataframe): Parsed initial data.
+        bands_to_process (list): Bands to process.
+        inverse_covariance (bool): Whether to compute the inverse covariance matrices instead of the inverse square
+            root covariance matrices.
+        output_array (bool): Whether to compute one array of matrices per band instead of a list of matrices.
+
+    Returns:
+        list: A list containing one list (or array) of matrices per band.
+    """
+    bands_output = []
+    for b in bands_to_process:
+        # The formal errors need to be scaled by the inverse standard deviation.
+        xp_errors = parsed_input_data[f'{b}_coefficient_errors'] / parsed_input_data[f'{b}_standard_deviation']
+        # Spectrum stores keep the correlations packed
+        xp_correlation_matrix = arrays_to_symmetric_matrices(parsed_input_data[f'{b}_coefficient_correlations'],
+                                                             parsed_input_data[f'{b}_n_parameters'])
+        bands_output.append(_get_band_matrices(xp_errors, xp_correlation_matrix, inverse_covariance, output_array))
+    return bands_output
+
+
+def __concatenate_arrays(arrays: list) -> np.ndarray:
+    """
+    Concatenate arrays of matrices, padding the smaller matrices with NaN.
+
+    Args:
+        arrays (list): Arrays of shape (N, n, n).
+
+    Returns:
+        ndarray: Array of shape (sum(N), max(n), max(n)).
+    """
+    max_size = max(array.shape[-1] for array in arrays)
+    return np.concatenate([np.pad(array, ((0, 0), (0, max_size - array.shape[-1]), (0, max_size - array.shape[-1])),
+                                  constant_values=np.nan) for array in arrays])
+
+
+def __get_bands_output_parallel(parsed_input_data: pd.DataFrame, bands_to_process: list, inverse_covariance: bool,
+                                n_workers: int, output_array: bool = False) -> list:
+    """
+    Compute the output matrices of the input sources distributing them across a pool of processes. The output is
+        equivalent to the one of _get_bands_output.
+
+    Args:
+        parsed_input_data (pd.Dataframe): Parsed initial data.
+        bands_to_process (list): Bands to process.
+        inverse_covariance (bool): Whether to compute the inverse covariance matrices instead of the inverse square
+            root covariance matrices.
+        n_workers (int): Number of processes.
+        output_array (bool): Whether to compute one array of matrices per band instead of a list of matrices.
+
+    Returns:
+        list: A list containing one list (or array) of matrices per band.
+    """
+    partitions = _run_in_pool(_get_bands_output, parsed_input_data, n_workers, desc='Computing matrices', unit='spec',
+                              bands_to_process=bands_to_process, inverse_covariance=inverse_covariance,
+                              output_array=output_array)
+    if output_array:
+        return [__concatenate_arrays([partition[index] for partition in partitions])
+                for index, _ in enumerate(bands_to_process)]
+    return [list(chain.from_iterable(partition[index] for partition in partitions))
+            for index, _ in enumerate(bands_to_process)]
+
+
+def get_inverse_square_root_covariance_matrix(input_object: Union[list, Path, str, tuple],
+                                              band: Optional[Union[list, str]] = None, n_workers: int = None,
+                                              output_array: bool = False):
     """
     Compute the inverse square root covariance matrix.
 
     Args:
-        input_object (list/Path/str): Path to the file containing the mean spectra as downloaded from the archive in
-            their continuous representation, a pandas DataFrame, a list of sources ids (string or long), or an ADQL
-            query.
+        input_object (list/Path/str/tuple): Path to the file containing the mean spectra as downloaded from the
+            archive in their continuous representation, a pandas DataFrame, a list of sources ids (string or long), an
+            ADQL query, or a tuple containing the path to a local file and a list of the sources ids to read from it.
         band (str): Chosen band: 'bp' or 'rp'. If no band is passed, the function will compute the inverse square root
             covariance for both 'bp' and 'rp'.
+        n_workers (int): Number of processes to distribute the sources across. By default, the sources are processed in
+            the current process.
+        output_array (bool): Return the matrices of each band in a single array of shape (N, 55, 55) instead of a
+            DataFrame.
 
     Returns:
         DataFrame or ndarray: DataFrame containing the source IDs and the output inverse square root covariance matrices
             for the sources in the input object if it contains more than one source or no band is passed to the
             function.
             The function will return a ndarray (of shape (55, 55)) if there is only one source ID in the input data
-            and a single band is selected.
+            and a single band is selected. The matrix of a source is None if its band is missing or its correlation
+            matrix is not positive-definite.
+        dict: If output_array is True, dictionary with the same keys as the columns of the DataFrame containing an
+            array of source IDs and one array of matrices per band, filled with NaN for the sources with no matrix.
     """
     if band is not None:
         band = parse_band(band)
+    use_pool = _use_pool(n_workers)
     parsed_input_data, extension = InputReader(input_object, get_inverse_square_root_covariance_matrix).read()
     if band is None:
         bands_to_process = BANDS
@@ -80,12 +275,10 @@ def get_inverse_square_root_covariance_matrix(input_object: Union[list, Path, st
     else:
         bands_to_process = [band]
         output_columns = ['source_id', f'{band}_inverse_square_root_covariance_matrix']
-    bands_output = []
-    for b in bands_to_process:
-        xp_errors = parsed_input_data[f'{b}_coefficient_errors'] / parsed_input_data[f'{b}_standard_deviation']
-        xp_correlation_matrix = parsed_input_data[f'{b}_coefficient_correlations']
-        band_inv_iterable = map(_get_inverse_square_root_covariance_matrix_aux, xp_errors, xp_correlation_matrix)
-        bands_output.append(band_inv_iterable)
+    bands_output = __get_bands_output_parallel(parsed_input_data, bands_to_process, False, n_workers, output_array) \
+        if use_pool else _get_bands_output(parsed_input_data, bands_to_process, False, output_array)
+    if output_array:
+        return __output_arrays_to_dict(parsed_input_data, bands_output, output_columns)
     output_df = __output_list_to_df(parsed_input_data, bands_output, output_columns)
     if len(bands_to_process) == 1 and len(output_df) == 1:
         return output_df[f'{band}_inverse_square_root_covariance_matrix'].iloc[0]
@@ -93,62 +286,44 @@ def get_inverse_square_root_covariance_matrix(input_object: Union[list, Path, st
         return output_df
 
 
-def _get_inverse_square_root_covariance_matrix_aux(xp_errors: np.ndarray, xp_correlation_matrix: np.ndarray) -> \
-        Optional[np.ndarray]:
-    """
-    Calculate the inverse square root of the covariance matrix.
-
-    Args:
-        xp_errors (ndarray): A numpy array representing the measurement errors.
-        xp_correlation_matrix (ndarray): A numpy array representing the correlation matrix.
-
-    Returns:
-        ndarray: The inverse square root of the covariance matrix. None: If the Cholesky decomposition of the
-            correlation matrix fails.
-    """
-    try:
-        _L = cholesky(xp_correlation_matrix, lower=True)
-        # Invert lower triangular matrix
-        _L_inv = solve_triangular(_L, identity(len(_L)), lower=True)
-        # Matrix of inverse errors
-        _E_inv = diag(1.0 / xp_errors)
-        return dot(_L_inv, _E_inv)
-    except ValueError:
-        return None
-
-
-def get_inverse_covariance_matrix(input_object: Union[list, Path, str], band: str = None):
+def get_inverse_covariance_matrix(input_object: Union[list, Path, str, tuple], band: str = None, n_workers: int = None,
+                                  output_array: bool = False):
     """
     Compute the inverse covariance matrix.
 
     Args:
         input_object (object): Path to the file containing the mean spectra as downloaded from the archive in their
-            continuous representation, a pandas DataFrame, a list of sources ids (string or long), or an ADQL query.
+            continuous representation, a pandas DataFrame, a list of sources ids (string or long), an ADQL query, or a
+            tuple containing the path to a local file and a list of the sources ids to read from it.
         band (str): Chosen band: 'bp' or 'rp'. If no band is passed, the function will compute the inverse covariance
             for both 'bp' and 'rp'.
+        n_workers (int): Number of processes to distribute the sources across. By default, the sources are processed in
+            the current process.
+        output_array (bool): Return the matrices of each band in a single array of shape (N, 55, 55) instead of a
+            DataFrame.
 
     Returns:
         DataFrame or ndarray: DataFrame containing the source IDs and the output inverse covariance matrices for the
             sources in the input object if it contains more than one source or no band is passed to the function.
             The function will return a ndarray (of shape (55, 55)) if there is only one source ID in the input data
-            and a single band is selected.
+            and a single band is selected. The matrix of a source is None if its band is missing or its correlation
+            matrix is not positive-definite.
+        dict: If output_array is True, dictionary with the same keys as the columns of the DataFrame containing an
+            array of source IDs and one array of matrices per band, filled with NaN for the sources with no matrix.
     """
     band = band if band is None else parse_band(band)
+    use_pool = _use_pool(n_workers)
     parsed_input_data, extension = InputReader(input_object, get_inverse_covariance_matrix).read()
-    bands_output = []
     if band is None:
         bands_to_process = BANDS
         output_columns = ['source_id', 'bp_inverse_covariance', 'rp_inverse_covariance']
     else:
         bands_to_process = [band]
         output_columns = ['source_id', f'{band}_inverse_covariance']
-    for b in bands_to_process:
-        # The formal errors need to be scaled by the inverse standard deviation.
-        xp_errors = parsed_input_data[f'{b}_coefficient_errors'] / parsed_input_data[f'{b}_standard_deviation']
-        xp_correlation_matrix = parsed_input_data[f'{b}_coefficient_correlations']
-        _L_inv_iterable = map(_get_inverse_square_root_covariance_matrix_aux, xp_errors, xp_correlation_matrix)
-        band_output = map(__get_dot_product, _L_inv_iterable)
-        bands_output.append(band_output)
+    bands_output = __get_bands_output_parallel(parsed_input_data, bands_to_process, True, n_workers, output_array) \
+        if use_pool else _get_bands_output(parsed_input_data, bands_to_process, True, output_array)
+    if output_array:
+        return __output_arrays_to_dict(parsed_input_data, bands_output, output_columns)
     output_df = __output_list_to_df(parsed_input_data, bands_output, output_columns)
     if len(bands_to_process) == 1 and len(output_df) == 1:
         return output_df[f'{band}_inverse_covariance'].iloc[0]
@@ -177,3 +352,76 @@ def get_chi2(_L_inv: np.ndarray, residuals: np.ndarray) -> np.ndarray:
         raise ValueError('Residuals shape must be (55,).')
     x = dot(_L_inv, residuals)
     return dot(x.T, x)
+
+
+def _relevant_bases_to_array(n_relevant_bases: Union[int, list, np.ndarray, pd.Series]) -> np.ndarray:
+    """
+    Convert the numbers of relevant bases to a float array, with NaN for the missing values.
+
+    Args:
+        n_relevant_bases (int/list/ndarray/Series): Number of relevant bases, for all the sources or for each source.
+
+    Returns:
+        ndarray: The numbers of relevant bases as floats.
+    """
+    if np.ndim(n_relevant_bases) == 0:
+        return np.array(np.nan if pd.isna(n_relevant_bases) else n_relevant_bases, dtype=float)
+    return pd.array(n_relevant_bases, dtype='Float64').to_numpy(dtype=float, na_value=np.nan)
+
+
+def get_chi2_batch(_L_inv: np.ndarray, residuals: np.ndarray,
+                   n_relevant_bases: Optional[Union[int, list, np.ndarray, pd.Series]] = None) -> np.ndarray:
+    """
+    Compute chi-squared (chi2) for many sources and model predictions at once. For each source, chi2 = |L^-1 * r|^2 for
+    each residual vector r of the source, as in get_chi2.
+
+    As L^-1 is lower triangular, the first k components of L^-1 * r only depend on the first k coefficients, so
+    truncating the chi2 to the n_relevant_bases first components is equivalent to computing it from the covariance of
+    the relevant coefficients.
+
+    Args:
+        _L_inv (ndarray): Inverse square root of the covariance of each source, of shape (N, 55, 55), as computed from
+            the function get_inverse_square_root_covariance_matrix with output_array=True. A single matrix of shape
+            (55, 55) is also accepted.
+        residuals (ndarray): Difference between the observed coefficient vectors and the model predictions, of shape
+            (N, M, 55) for M models per source or (N, 55) for one model per source. If a single matrix is passed, the
+            residuals must be of shape (M, 55) or (55,).
+        n_relevant_bases (int/list/ndarray/Series): Number of relevant bases used to truncate the chi2, for all the
+            sources or for each of them. By default, all the coefficients are used.
+
+    Returns:
+        ndarray: Chi-squared values, of shape (N, M) or (N,) (or (M,) or a float for a single matrix). The values are
+            NaN for sources whose matrix is filled with NaN (e.g.: missing bands) or whose number of relevant bases is
+            missing.
+    """
+    if _L_inv is None or residuals is None:
+        raise ValueError('Input parameters cannot be None.')
+    _L_inv, residuals = np.asarray(_L_inv, dtype=float), np.asarray(residuals, dtype=float)
+    if _L_inv.ndim not in [2, 3] or _L_inv.shape[-1] != _L_inv.shape[-2]:
+        raise ValueError('Inverse covariance matrices shape must be (N, 55, 55) or (55, 55).')
+    size = _L_inv.shape[-1]
+    if residuals.shape[-1:] != (size,) or residuals.ndim not in [_L_inv.ndim - 1, _L_inv.ndim] or \
+            (_L_inv.ndim == 3 and residuals.shape[0] != _L_inv.shape[0]):
+        raise ValueError(f'Residuals shape must be (N, M, {size}) or (N, {size}) for N matrices.')
+    output_shape = residuals.shape[:-1]
+    # Residuals of shape (N, M, 55)
+    if _L_inv.ndim == 2:
+        _L_inv, residuals = _L_inv[np.newaxis], residuals.reshape(1, -1, size)
+    elif residuals.ndim == 2:
+        residuals = residuals[:, np.newaxis, :]
+    if n_relevant_bases is None:
+        x = np.matmul(residuals, _L_inv.transpose(0, 2, 1))
+        return np.einsum('...i,...i->...', x, x).reshape(output_shape)[()]
+    n_relevant_bases = _relevant_bases_to_array(n_relevant_bases)
+    if n_relevant_bases.ndim == 0 and not np.isnan(n_relevant_bases):
+        # Only the first rows of the matrices are needed
+        n_bases = int(n_relevant_bases)
+        x = np.matmul(residuals[:, :, :n_bases], _L_inv[:, :n_bases, :n_bases].transpose(0, 2, 1))
+        return np.einsum('...i,...i->...', x, x).reshape(output_shape)[()]
+    if n_relevant_bases.ndim == 1 and len(n_relevant_bases) != len(_L_inv):
+        raise ValueError('The number of relevant bases must be given for all the sources or for each of them.')
+    n_relevant_bases = n_relevant_bases.reshape(-1, 1, 1)
+    x = np.matmul(residuals, _L_inv.transpose(0, 2, 1))
+    x = np.where(np.arange(size) < n_relevant_bases, x, 0.0)
+    chi2 = np.where(np.isnan(n_relevant_bases[:, :, 0]), np.nan, np.einsum('...i,...i->...', x, x))
+    return chi2.reshape(output_shape)[()]
@@ -7,6 +7,7 @@ Module that implements the colour equation functionality.
 import math
 from ast import literal_eval
 from configparser import ConfigParser
+from functools import lru_cache
 from os import listdir
 from pathlib import Path
 from typing import Union, Optional
@@ -44,14 +45,43 @@ def __compute_mag_error(data, band, system_label):
     Compute magnitude error based on flux error.
 
     Args:
-        data (dict): A dictionary containing the input data.
+        data (dict/DataFrame): The input data.
         band (str): The band to use.
         system_label (str): The system being used.
 
     Returns:
-        float: The magnitude error.
+        ndarray: The magnitude error of each source.
     """
-    return 2.5 * data[f'{system_label}_flux_error_{band}'] / (data[f'{system_label}_flux_{band}'] * math.log(10))
+    return 2.5 * np.asarray(data[f'{system_label}_flux_error_{band}'], dtype=np.float64) / \
+        (np.asarray(data[f'{system_label}_flux_{band}'], dtype=np.float64) * math.log(10))
+
+
+@lru_cache(maxsize=None)
+def _load_colour_equation(label):
+    """
+    Load the colour equation of a system. The result is cached, so each configuration file is only read once.
+
+    Args:
+        label (str): Label of the photometric system.
+
+    Returns:
+        dict: A dictionary containing the filter to be corrected, the colour index, the colour equation and its
+            derivative and the colour range of the system.
+    """
+    config_parser = ConfigParser()
+    config_parser.read(Path(colour_eq_dir, f'{label}_colour_eq.ini'))
+    details = dict()
+    details['filter'] = config_parser.get(label, 'FILTER')  # The filter to be corrected (string)
+    details['colour_index'] = config_parser.get(label, 'COLOUR_INDEX')  # The colour index (string)
+    # The colour equation (PolynomialFunction)
+    # Reverse, coefficients were originally defined for the Java polyfunction
+    coefficients = list(literal_eval(config_parser.get(label, 'POLY_COEFFICIENTS')))[::-1]
+    polyfunc = poly1d(coefficients)
+    details['polyfunc'] = polyfunc
+    details['derivative'] = polyfunc.deriv()  # Colour equation derivative (UnivariateFunction)
+    colour_range = config_parser.get(label, 'COLOUR_RANGE')  # Colour range for the correction (double[])
+    details['colour_range'] = literal_eval(colour_range)
+    return details
 
 
 def __fill_systems_details(systems_to_correct):
@@ -67,34 +97,12 @@ def __fill_systems_details(systems_to_correct):
     systems_details = dict()
     for system in systems_to_correct:
         label = system.get_system_label()
-        systems_details[label] = dict()
+        systems_details[label] = dict(_load_colour_equation(label))
         # Get bands and zero points
         systems_details[label]['bands_zp'] = dict(zip(system.get_bands(), system.get_zero_points()))
-        # Load ini file
-        config_parser = ConfigParser()
-        config_parser.read(Path(colour_eq_dir, f'{label}_colour_eq.ini'))
-        systems_details[label]['filter'] = config_parser.get(label, 'FILTER')  # The filter to be corrected (string)
-        systems_details[label]['colour_index'] = config_parser.get(label, 'COLOUR_INDEX')  # The colour index (string)
-        # The colour equation (PolynomialFunction)
-        # Reverse, coefficients were originally defined for the Java polyfunction
-        coefficients = list(literal_eval(config_parser.get(label, 'POLY_COEFFICIENTS')))[::-1]
-        polyfunc = poly1d(coefficients)
-        systems_details[label]['polyfunc'] = polyfunc
-        systems_details[label]['derivative'] = polyfunc.deriv()  # Colour equation derivative (UnivariateFunction)
-        colour_range = config_parser.get(label, 'COLOUR_RANGE')  # Colour range for the correction (double[])
-        systems_details[label]['colour_range'] = literal_eval(colour_range)
     return systems_details
 
 
-def __create_rows(single_system_df, system, colour_band_0, colour_band_1, systems_details):
-    """
-    Create output rows for a systems.
-    """
-    new_system_rows = [__generate_output_row(row, system, colour_band_0, colour_band_1, systems_details) for row in
-                       single_system_df.to_dict('records')]
-    return pd.DataFrame(new_system_rows)
-
-
 def _generate_output_df(input_synthetic_photometry, systems_details, disable_info=False):
     synth_phot_df = input_synthetic_photometry.copy()
     column_names = synth_phot_df.columns
@@ -108,36 +116,48 @@ def _generate_output_df(input_synthetic_photometry, systems_details, disable_inf
                                       column.endswith((f'_{filter_to_correct}', f'_{colour_band_0}',
                                                        f'_{colour_band_1}'))]
         single_system_df = synth_phot_df[system_columns_with_colour]
-        corrected_system_df = __create_rows(single_system_df, label, colour_band_0, colour_band_1, systems_details)
-        columns_to_correct = corrected_system_df.columns
-        synth_phot_df[columns_to_correct] = corrected_system_df[columns_to_correct]
+        corrected_columns = __correct_system(single_system_df, label, colour_band_0, colour_band_1, systems_details)
+        for column, values in corrected_columns.items():
+            synth_phot_df[column] = values
     return synth_phot_df
 
 
-def __generate_output_row(row, system_label, colour_band_0, colour_band_1, systems_details):
+def __correct_system(single_system_df, system_label, colour_band_0, colour_band_1, systems_details):
+    """
+    Apply the colour equation of a system to all the sources at once.
+
+    Args:
+        single_system_df (DataFrame): Photometry of the system, containing the filter to be corrected and the bands of
+            the colour index.
+        system_label (str): Label of the photometric system.
+        colour_band_0 (str): First band of the colour index.
+        colour_band_1 (str): Second band of the colour index.
+        systems_details (dict): Details of the systems to be corrected.
+
+    Returns:
+        dict: The corrected magnitude, flux and flux error columns of the filter.
+    """
     filter_to_correct = systems_details[system_label]['filter']
-    mag = row[f'{system_label}_mag_{filter_to_correct}']
-    mag_err = __compute_mag_error(row, filter_to_correct, system_label)
-    mag_colour_0 = row[f'{system_label}_mag_{colour_band_0}']
-    mag_colour_1 = row[f'{system_label}_mag_{colour_band_1}']
+    mag = np.asarray(single_system_df[f'{system_label}_mag_{filter_to_correct}'], dtype=np.float64)
+    mag_err = __compute_mag_error(single_system_df, filter_to_correct, system_label)
+    mag_colour_0 = np.asarray(single_system_df[f'{system_label}_mag_{colour_band_0}'], dtype=np.float64)
+    mag_colour_1 = np.asarray(single_system_df[f'{system_label}_mag_{colour_band_1}'], dtype=np.float64)
     colour = mag_colour_0 - mag_colour_1
     # Output corrected magnitude
     corrected_magnitude = mag + _get_correction(systems_details, colour, system_label)
     # Propagated colour error
-    mag_err_1 = __compute_mag_error(row, colour_band_0, system_label)
-    mag_err_2 = __compute_mag_error(row, colour_band_1, system_label)
-    colour_err = math.sqrt(mag_err_1 ** 2 + mag_err_2 ** 2)
-    correction_err = colour_err * abs(systems_details[system_label]['derivative'](colour))
+    mag_err_1 = __compute_mag_error(single_system_df, colour_band_0, system_label)
+    mag_err_2 = __compute_mag_error(single_system_df, colour_band_1, system_label)
+    colour_err = np.sqrt(mag_err_1 ** 2 + mag_err_2 ** 2)
+    correction_err = colour_err * np.abs(systems_details[system_label]['derivative'](colour))
     # Total error on corrected magnitude
-    out_err = math.sqrt(mag_err ** 2 + correction_err ** 2)
-    new_row = dict()
-    new_row[f'{system_label}_mag_{filter_to_correct}'] = corrected_magnitude
+    out_err = np.sqrt(mag_err ** 2 + correction_err ** 2)
     zp = systems_details[system_label]['bands_zp'][filter_to_correct]
     out_flux = 10 ** (-0.4 * (corrected_magnitude - zp))
     out_flux_err = out_err * out_flux * math.log(10) / 2.5
-    new_row[f'{system_label}_flux_{filter_to_correct}'] = out_flux
-    new_row[f'{system_label}_flux_error_{filter_to_correct}'] = out_flux_err
-    return new_row
+    return {f'{system_label}_mag_{filter_to_correct}': corrected_magnitude,
+            f'{system_label}_flux_{filter_to_correct}': out_flux,
+            f'{system_label}_flux_error_{filter_to_correct}': out_flux_err}
 
 
 def _get_colour_bands(colour_index):
@@ -156,54 +176,54 @@ def _get_colour_bands(colour_index):
 
 def _set_colour_limit(colour, colour_range):
     """
-    Set the colour limit to either the minimum or maximum value in the given colour range.
+    Clip the colours to the given colour range.
 
     Args:
-        colour (float): The colour value.
+        colour (ndarray): The colour values.
         colour_range (list): A list of two values representing the minimum and maximum allowed values for the colour.
 
     Returns:
-        float: The minimum or maximum value in the colour range, whichever is closest to the input `colour` value.
-
-    Raises:
-        ValueError: If the input `colour` value is not within the specified `colour_range`.
+        ndarray: The minimum or maximum value in the colour range for the colours outside it, the colour otherwise.
     """
-    if colour < min(colour_range):
-        colour_limit = min(colour_range)
-    elif colour > max(colour_range):
-        colour_limit = max(colour_range)
-    else:
-        raise ValueError(
-            'The condition for one of the previous statements must be True. Error in colour or colour_range.')
-    return colour_limit
+    return np.clip(colour, min(colour_range), max(colour_range))
 
 
-def _generate_polynomial(colour, colour_limit, system_polyfunc):
+def _generate_polynomial(colour, colour_limit, system_polyfunc, system_derivative):
     v = system_polyfunc(colour_limit)
-    m = system_polyfunc.deriv()(colour_limit)
+    m = system_derivative(colour_limit)
     return v + m * (colour - colour_limit)
 
 
 # Replaces Java 'contains'
-def _is_in_range(colour: float, colour_range: list):
-    return min(colour_range) <= colour <= max(colour_range)
+def _is_in_range(colour, colour_range: list):
+    return (min(colour_range) <= colour) & (colour <= max(colour_range))
 
 
-def _get_correction(systems_details: dict, colour: float, system_label: str):
+def _get_correction(systems_details: dict, colour, system_label: str):
+    """
+    Compute the colour correction. Inside the colour range the colour equation is used, outside it the equation is
+        extrapolated linearly from the closest limit of the range.
+
+    Args:
+        systems_details (dict): Details of the systems to be corrected.
+        colour (float/ndarray): The colour of each source.
+        system_label (str): Label of the photometric system.
+
+    Returns:
+        ndarray: The correction for each source, NaN where the colour is NaN.
+    """
     colour_range = systems_details[system_label]['colour_range']
     polyfunc = systems_details[system_label]['polyfunc']
-    # Check whether colour is nan
-    if math.isnan(colour):
-        return np.nan
-    # Check if in range after being sure that colour is not nan
+    colour = np.asarray(colour, dtype=np.float64)
+    correction = np.full(colour.shape, np.nan)
     in_range = _is_in_range(colour, colour_range)
-    if in_range:
-        return polyfunc(colour)
-    elif not in_range:
-        colour_limit = _set_colour_limit(colour, colour_range)
-        return _generate_polynomial(colour, colour_limit, polyfunc)
-    else:
-        raise ValueError('At least one variable does not comply with any of the previous statements.')
+    correction[in_range] = polyfunc(colour[in_range])
+    out_of_range = ~in_range & ~np.isnan(colour)
+    if out_of_range.any():
+        colour_out = colour[out_of_range]
+        correction[out_of_range] = _generate_polynomial(colour_out, _set_colour_limit(colour_out, colour_range),
+                                                        polyfunc, systems_details[system_label]['derivative'])
+    return correction
 
 
 def __get_systems_to_correct(systems: Union[list, PhotometricSystem]) -> list:
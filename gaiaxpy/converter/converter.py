@@ -4,6 +4,7 @@ converter.py
 Module for the converter functionality.
 """
 
+from functools import partial
 from numbers import Number
 from pathlib import Path
 from typing import Union, Optional
@@ -14,9 +15,13 @@ from tqdm import tqdm
 
 from gaiaxpy.core.generic_functions import cast_output, get_spectra_type, validate_arguments, validate_pwl_sampling
 from gaiaxpy.core.generic_variables import pbar_colour, pbar_units, pbar_message
+from gaiaxpy.core.parallel import _concat_partitions, _get_shared_arrays, _run_in_pool, _use_pool
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.input_reader.input_reader import InputReader
+from gaiaxpy.output.output_data import _save_in_chunks
 from gaiaxpy.output.sampled_spectra_data import SampledSpectraData
+from gaiaxpy.spectrum.batched_spectra import _sample_xp_band
+from gaiaxpy.spectrum.design_matrix_cache import design_matrix_cache, hash_sampling
 from gaiaxpy.spectrum.sampled_basis_functions import SampledBasisFunctions
 from gaiaxpy.spectrum.xp_continuous_spectrum import XpContinuousSpectrum
 from gaiaxpy.spectrum.xp_sampled_spectrum import XpSampledSpectrum
@@ -26,10 +31,11 @@ from ..config.paths import optimised_bases_file
 __FUNCTION_KEY = 'converter'
 
 
-def convert(input_object: Union[list, Path, str], sampling: Optional[np.ndarray] = np.linspace(0, 60, 600),
+def convert(input_object: Union[list, Path, str, tuple], sampling: Optional[np.ndarray] = np.linspace(0, 60, 600),
             truncation: bool = False, with_correlation: bool = False, output_path: Union[Path, str] = '.',
             output_file: str = 'output_spectra', output_format: str = None, save_file: bool = True,
-            username: str = None, password: str = None) -> (pd.DataFrame, np.ndarray):
+            username: str = None, password: str = None, batch: bool = False, chunk_size: int = None,
+            n_workers: int = None) -> (pd.DataFrame, np.ndarray):
     """
     Conversion utility: converts the input internally calibrated mean spectra from the continuous representation to a
         sampled form. The sampling grid can be defined by the user, alternatively a default will be adopted. Optionally,
@@ -37,8 +43,9 @@ def convert(input_object: Union[list, Path, str], sampling: Optional[np.ndarray]
         that were considered not to be significant considering the errors on the reconstructed mean spectra.
 
     Args:
-        input_object (list/Path/str): Path to the file containing the mean spectra as downloaded from the archive in
-            their continuous representation, a list of sources ids (string or long), or a pandas DataFrame.
+        input_object (list/Path/str/tuple): Path to the file containing the mean spectra as downloaded from the
+            archive in their continuous representation, a list of sources ids (string or long), a pandas DataFrame, or a
+            tuple containing the path to a local file and a list of the sources ids to read from it.
         sampling (ndarray): 1D array containing the desired sampling in pseudo-wavelengths.
         truncation (bool): Toggle truncation of the set of bases. The level of truncation to be applied is defined by
             the recommended value in the input files.
@@ -50,6 +57,14 @@ def convert(input_object: Union[list, Path, str], sampling: Optional[np.ndarray]
         save_file (bool): Whether to save the output in a file. If false, output_format and output_file will be ignored.
         username (str): Cosmos username, only suggested when input_object is a list or ADQL query.
         password (str): Cosmos password, only suggested when input_object is a list or ADQL query.
+        batch (bool): Whether to convert groups of sources sharing the same set of bases with stacked matrix
+            operations instead of creating one spectrum object per source and band. Recommended for large inputs.
+        chunk_size (int): Maximum number of sources to read and process at once. If given, the input file is read in
+            blocks and the output is written to the output file block by block (for the AVRO, CSV, ECSV and FITS
+            formats), keeping the memory usage proportional to the size of the blocks. In that case, if save_file is
+            True the output is not returned.
+        n_workers (int): Number of processes to distribute the sources across. The design matrices are shared with
+            the processes through shared memory. By default, the sources are processed in the current process.
 
     Returns:
         (tuple): tuple containing:
@@ -61,13 +76,15 @@ def convert(input_object: Union[list, Path, str], sampling: Optional[np.ndarray]
     """
     return _convert(input_object=input_object, sampling=sampling, truncation=truncation,
                     with_correlation=with_correlation, output_path=output_path, output_file=output_file,
-                    output_format=output_format, save_file=save_file, username=username, password=password)
+                    output_format=output_format, save_file=save_file, username=username, password=password,
+                    batch=batch, chunk_size=chunk_size, n_workers=n_workers)
 
 
-def _convert(input_object: Union[list, Path, str], sampling: np.ndarray = np.linspace(0, 60, 600),
+def _convert(input_object: Union[list, Path, str, tuple], sampling: np.ndarray = np.linspace(0, 60, 600),
              truncation: bool = False, with_correlation: bool = False, output_path: Union[Path, str] = '.',
              output_file: str = 'output_spectra', output_format: str = None, save_file: bool = True,
-             username: str = None, password: str = None, disable_info: bool = False) -> (pd.DataFrame, np.ndarray):
+             username: str = None, password: str = None, disable_info: bool = False, batch: bool = False,
+             chunk_size: int = None, n_workers: int = None) -> (pd.DataFrame, np.ndarray):
     """
     Internal method of the calibration utility. Refer to "convert".
 
@@ -84,18 +101,35 @@ def _convert(input_object: Union[list, Path, str], sampling: np.ndarray = np.lin
     # Check sampling
     validate_pwl_sampling(sampling)
     validate_arguments(convert.__defaults__[4], output_file, save_file)
-    parsed_input_data, extension = InputReader(input_object, convert, disable_info=disable_info, user=username,
-                                               password=password).read()
+    input_reader = InputReader(input_object, convert, disable_info=disable_info, user=username, password=password)
+    create_spectra = _create_spectra_batch if batch else _create_spectra
+    if _use_pool(n_workers):
+        create_spectra = partial(_create_spectra_parallel, n_workers=n_workers, batch=batch)
+    if chunk_size:
+        config_df = load_config(optimised_bases_file)
+        design_matrices = dict()
+
+        def convert_chunk(_parsed_input_data):
+            # Design matrices are only computed the first time a set of bases is found
+            missing_bases_ids = get_unique_basis_ids(_parsed_input_data) - design_matrices.keys()
+            design_matrices.update(get_design_matrices(missing_bases_ids, sampling, config_df))
+            _spectra, _ = create_spectra(_parsed_input_data, truncation, design_matrices,
+                                         with_correlation=with_correlation, disable_info=disable_info)
+            return SampledSpectraData(cast_output(_spectra), sampling, attrs={'data_type': XpSampledSpectrum})
+
+        output_chunks = ((convert_chunk(chunk), extension) for chunk, extension in input_reader.read_chunks(chunk_size))
+        spectra_df = _save_in_chunks(output_chunks, save_file, output_path, output_file, output_format)
+        return spectra_df, sampling
+    parsed_input_data, extension = input_reader.read()
     config_df = load_config(optimised_bases_file)
     # Union of unique ids as sets
     unique_bases_ids = get_unique_basis_ids(parsed_input_data)
     # Get design matrices
     design_matrices = get_design_matrices(unique_bases_ids, sampling, config_df)
-    spectra_df, positions = _create_spectra(parsed_input_data, truncation, design_matrices,
-                                            with_correlation=with_correlation, disable_info=disable_info)
+    spectra, positions = create_spectra(parsed_input_data, truncation, design_matrices,
+                                        with_correlation=with_correlation, disable_info=disable_info)
     # Save output
-    output_data = SampledSpectraData(spectra_df, positions)
-    output_data.data = cast_output(output_data)
+    output_data = SampledSpectraData(cast_output(spectra), positions, attrs={'data_type': XpSampledSpectrum})
     output_data.save(save_file, output_path, output_file, output_format, extension)
     return output_data.data, positions
 
@@ -178,6 +212,111 @@ def _create_spectra(parsed_input_data: pd.DataFrame, truncation: bool, design_ma
     return spectra_df, positions
 
 
+def _create_spectra_batch(parsed_input_data: pd.DataFrame, truncation: bool, design_matrices: dict,
+                          with_correlation: bool = False, disable_info=False) -> tuple:
+    """
+    Creates the spectra from parsed input data sampling together the sources that share the same set of bases and
+        truncation level. The output is equivalent to the one of _create_spectra, but it is kept in stacked columns
+        instead of a DataFrame.
+
+    Args:
+        parsed_input_data (pd.DataFrame): The parsed input data to create the spectra from.
+        truncation (bool): Toggle truncation of the set of bases. The level of truncation to be applied is defined by
+            the recommended value in the input files.
+        design_matrices (dict): The design matrices for the input list of bases.
+        with_correlation (bool): Whether to include the covariance matrix in the spectra. Default is False.
+
+    Returns:
+        (tuple): tuple containing:
+            dict: The columns of the output spectra: source_id and xp, flux and flux_error as 2D arrays with one row
+                per spectrum and, if with_correlation is True, correlation (2D) and standard_deviation.
+            ndarray: The sampling used to convert the input spectra (user-provided or default).
+    """
+    source_ids = parsed_input_data['source_id'].to_numpy()
+    band_spectra = dict()
+    for band in tqdm(BANDS, desc=pbar_message[__FUNCTION_KEY], unit='band', leave=False, colour=pbar_colour,
+                     disable=disable_info):
+        spectra = _sample_xp_band(parsed_input_data, band, design_matrices, truncation=truncation,
+                                  with_correlation=with_correlation)
+        if spectra is not None:
+            band_spectra[band] = spectra
+    # Sort the spectra by source (as in the input) and then by band
+    order_keys = np.concatenate([np.flatnonzero(spectra['available']) * len(BANDS) + BANDS.index(band)
+                                 for band, spectra in band_spectra.items()])
+    order = np.argsort(order_keys, kind='stable')
+
+    def concatenate(key):
+        return np.concatenate([spectra[key] for spectra in band_spectra.values()])[order]
+
+    spectra_columns = {'source_id': np.concatenate([source_ids[spectra['available']]
+                                                    for spectra in band_spectra.values()])[order],
+                       'xp': np.concatenate([np.full(spectra['available'].sum(), band.upper(), dtype=object)
+                                             for band, spectra in band_spectra.items()])[order],
+                       'flux': concatenate('flux'), 'flux_error': concatenate('error')}
+    if with_correlation:
+        spectra_columns['correlation'] = concatenate('correlation')
+        spectra_columns['standard_deviation'] = concatenate('standard_deviation')
+    positions = next(iter(design_matrices.values())).get_sampling_grid()
+    return spectra_columns, positions
+
+
+def _create_spectra_parallel(parsed_input_data: pd.DataFrame, truncation: bool, design_matrices: dict,
+                             with_correlation: bool = False, disable_info=False, n_workers: int = None,
+                             batch: bool = False) -> tuple:
+    """
+    Creates the spectra from parsed input data distributing the sources across a pool of processes. The output is
+        equivalent to the one of _create_spectra, or of _create_spectra_batch if batch is True.
+
+    Args:
+        parsed_input_data (pd.DataFrame): The parsed input data to create the spectra from.
+        truncation (bool): Toggle truncation of the set of bases. The level of truncation to be applied is defined by
+            the recommended value in the input files.
+        design_matrices (dict): The design matrices for the input list of bases.
+        with_correlation (bool): Whether to include the covariance matrix in the spectra. Default is False.
+        n_workers (int): Number of processes.
+        batch (bool): Whether each process uses stacked matrix operations.
+
+    Returns:
+        (tuple): tuple containing:
+            DataFrame/dict: The output spectra, as a DataFrame or as a dictionary of columns if batch is True.
+            ndarray: The sampling used to convert the input spectra (user-provided or default).
+    """
+    positions = next(iter(design_matrices.values())).get_sampling_grid()
+    shared_arrays = {'sampling_grid': positions}
+    shared_arrays.update({basis_id: design_matrix.get_design_matrix() for basis_id, design_matrix in
+                          design_matrices.items()})
+    partitions = _run_in_pool(_create_spectra_partition, parsed_input_data, n_workers, shared_arrays=shared_arrays,
+                              desc=pbar_message[__FUNCTION_KEY], unit=pbar_units[__FUNCTION_KEY],
+                              disable_info=disable_info, truncation=truncation, with_correlation=with_correlation,
+                              batch=batch)
+    return _concat_partitions(partitions), positions
+
+
+def _create_spectra_partition(parsed_input_data: pd.DataFrame, truncation: bool, with_correlation: bool,
+                              batch: bool) -> Union[pd.DataFrame, dict]:
+    """
+    Creates the spectra of a partition of the sources in a worker process, using the design matrices shared by the main
+        process.
+
+    Args:
+        parsed_input_data (pd.DataFrame): Partition of the parsed input data.
+        truncation (bool): Toggle truncation of the set of bases.
+        with_correlation (bool): Whether to include the covariance matrix in the spectra.
+        batch (bool): Whether to use stacked matrix operations.
+
+    Returns:
+        DataFrame/dict: The output spectra, as a DataFrame or as a dictionary of columns if batch is True.
+    """
+    shared_arrays = _get_shared_arrays()
+    sampling_grid = shared_arrays['sampling_grid']
+    design_matrices = {basis_id: SampledBasisFunctions.from_design_matrix(sampling_grid, design_matrix)
+                       for basis_id, design_matrix in shared_arrays.items() if basis_id != 'sampling_grid'}
+    create_spectra = _create_spectra_batch if batch else _create_spectra
+    spectra, _ = create_spectra(parsed_input_data, truncation, design_matrices, with_correlation=with_correlation,
+                                disable_info=True)
+    return spectra
+
+
 def get_unique_basis_ids(parsed_input_data: pd.DataFrame) -> set:
     """
     Get the IDs of the unique basis required to sample all spectra in the input files.
@@ -201,7 +340,8 @@ def get_unique_basis_ids(parsed_input_data: pd.DataFrame) -> set:
 
 def get_design_matrices(unique_bases_ids: set, sampling: np.ndarray, config_df: pd.DataFrame) -> dict:
     """
-    Get the design matrices corresponding to the input bases.
+    Get the design matrices corresponding to the input bases. Design matrices previously computed for the same bases and
+        sampling grid are taken from the design matrix cache.
 
     Args:
         unique_bases_ids (set): A set containing the basis function IDs for which the design matrix is required.
@@ -211,4 +351,16 @@ def get_design_matrices(unique_bases_ids: set, sampling: np.ndarray, config_df:
     Returns:
         dict: The design matrices for the input list of bases.
     """
-    return {_id: SampledBasisFunctions.from_config(sampling, get_config(config_df, _id)) for _id in unique_bases_ids}
+    sampling_hash = hash_sampling(sampling)
+
+    def compute_design_matrix(_id):
+        sampled_bases = SampledBasisFunctions.from_config(sampling, get_config(config_df, _id))
+        return {'sampling_grid': sampled_bases.get_sampling_grid(), 'design_matrix': sampled_bases.get_design_matrix()}
+
+    design_matrices = dict()
+    for _id in unique_bases_ids:
+        arrays = design_matrix_cache.get((__FUNCTION_KEY, int(_id), sampling_hash), lambda: compute_design_matrix(_id))
+        # The sampling grid is returned to the user, only the design matrix is shared
+        design_matrices[_id] = SampledBasisFunctions.from_design_matrix(arrays['sampling_grid'].copy(),
+                                                                        arrays['design_matrix'])
+    return design_matrices
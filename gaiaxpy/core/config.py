@@ -9,7 +9,7 @@ from os.path import join
 
 from gaiaxpy.config.paths import config_path, filters_path, config_ini_file
 from gaiaxpy.core.satellite import BANDS
-from gaiaxpy.core.xml_utils import get_file_root, get_array_text, get_xp_merge, get_xp_sampling_matrix
+from gaiaxpy.core.filter_cache import load_filter_arrays
 
 ADDITIONAL_SYSTEM_PREFIX = 'USER'
 
@@ -85,8 +85,7 @@ def load_xpmerge_from_xml(system=None, bp_model=None, rp_model='v142r', config_f
     bp_model = bp_model if bp_model else 'v375wi'
     label = key = 'filter'
     file_path = get_file(label, key, system, bp_model, rp_model, config_file=config_file)
-    x_root = get_file_root(file_path)
-    sampling_grid, bp_merge, rp_merge = get_xp_merge(x_root)
+    sampling_grid, bp_merge, rp_merge = load_filter_arrays(file_path, 'sampling_grid', 'bp_merge', 'rp_merge')
     return sampling_grid, dict(zip(BANDS, [bp_merge, rp_merge]))
 
 
@@ -104,11 +103,6 @@ def load_xpsampling_from_xml(system=None, bp_model=None, rp_model='v142r', confi
     """
     bp_model = bp_model if bp_model else 'v375wi'
     xml_file = get_file('filter', 'filter', system, bp_model, rp_model, config_file=config_file)
-    x_root = get_file_root(xml_file)
-    _, n_bands = get_array_text(x_root, 'bands')
-
-    bp_sampling = get_xp_sampling_matrix(x_root, 'bp', n_bands)
-    rp_sampling = get_xp_sampling_matrix(x_root, 'rp', n_bands)
-
+    bp_sampling, rp_sampling = load_filter_arrays(xml_file, 'bp_sampling', 'rp_sampling')
     xp_sampling = dict(zip(BANDS, [bp_sampling, rp_sampling]))
     return xp_sampling
@@ -0,0 +1,191 @@
+"""
+filter_cache.py
+====================================
+Module to cache the content of the filter XML files.
+
+Each filter file is parsed only once. Its content is kept in memory for the rest of the session and stored as a binary
+NumPy file (.npz) in the cache directory, so that later sessions do not need to parse the XML again. The cached
+content is invalidated when the modification time of the filter file changes and its content hash does not match the
+one stored in the cache.
+"""
+
+import json
+from glob import glob
+from hashlib import sha256
+from os import environ, makedirs, remove, replace, stat
+from os.path import abspath, expanduser, join
+from tempfile import NamedTemporaryFile
+from zipfile import BadZipFile
+
+import numpy as np
+
+from gaiaxpy.core.xml_utils import get_array_text, get_file_root, get_xp_merge, get_xp_sampling_matrix
+
+# Version of the cache format, cached files with a different version are ignored
+CACHE_VERSION = 1
+# Directory where the cached filters are stored. If None, the content is only cached in memory.
+filter_cache_dir = environ.get('GAIAXPY_CACHE_DIR', join(expanduser('~'), '.cache', 'gaiaxpy'))
+
+_memory_cache = dict()
+
+
+def _parse_filter_file(xml_file):
+    """
+    Parse all the tables of a filter XML file.
+
+    Args:
+        xml_file (str): Path to the filter file.
+
+    Returns:
+        dict: Dictionary of arrays containing the bands, zero-points, offsets, XpSampling and XpMerge tables available
+            in the file.
+    """
+    x_root = get_file_root(xml_file)
+    content = dict()
+    bands, n_bands = get_array_text(x_root, 'bands')
+    if bands is not None:
+        content['bands'] = np.array(bands, dtype=str)
+    for tag, key in [('zeropoints', 'zero_points'), ('fluxBias', 'offsets')]:
+        values, _ = get_array_text(x_root, tag)
+        if values is not None:
+            content[key] = np.array([float(value) for value in values])
+    content['bp_sampling'] = get_xp_sampling_matrix(x_root, 'bp', n_bands)
+    content['rp_sampling'] = get_xp_sampling_matrix(x_root, 'rp', n_bands)
+    content['sampling_grid'], content['bp_merge'], content['rp_merge'] = get_xp_merge(x_root)
+    return content
+
+
+def _get_content_hash(xml_file):
+    with open(xml_file, 'rb') as f:
+        return sha256(f.read()).hexdigest()
+
+
+def _get_cache_file(xml_file):
+    return join(filter_cache_dir, 'filters', f'{sha256(xml_file.encode()).hexdigest()}.npz')
+
+
+def _read_cache_file(cache_file):
+    """
+    Read a cached filter.
+
+    Args:
+        cache_file (str): Path to the cached filter.
+
+    Returns:
+        tuple: Dictionary containing the metadata and dictionary of arrays of the filter. None if the file does not
+            exist, cannot be read or was written by a different version of the cache.
+    """
+    try:
+        with np.load(cache_file, allow_pickle=False) as cached:
+            metadata = json.loads(str(cached['metadata']))
+            data = cached['data']
+    except (OSError, ValueError, KeyError, BadZipFile):
+        return None
+    if metadata.get('cache_version') != CACHE_VERSION:
+        return None
+    content = {key: data[start:start + int(np.prod(shape))].reshape(shape) for key, (start, shape) in
+               metadata['arrays'].items()}
+    if metadata['bands'] is not None:
+        content['bands'] = np.array(metadata['bands'], dtype=str)
+    return metadata, content
+
+
+def _write_cache_file(cache_file, xml_file, mtime_ns, content_hash, content):
+    """
+    Write the content of a filter to the cache. All the numeric tables are stored in a single buffer to keep reading
+        fast. The file is written atomically and any errors are ignored, in which case the content will be parsed again
+        next time.
+
+    Args:
+        cache_file (str): Path to the cached filter.
+        xml_file (str): Path to the filter file.
+        mtime_ns (int): Modification time of the filter file in nanoseconds.
+        content_hash (str): Hash of the content of the filter file.
+        content (dict): Dictionary of arrays.
+    """
+    arrays, start = dict(), 0
+    for key, array in content.items():
+        if key != 'bands':
+            arrays[key] = (start, array.shape)
+            start += array.size
+    data = np.concatenate([content[key].ravel() for key in arrays]) if arrays else np.empty(0)
+    bands = content['bands'].tolist() if 'bands' in content else None
+    metadata = {'cache_version': CACHE_VERSION, 'xml_file': xml_file, 'mtime_ns': mtime_ns,
+                'content_hash': content_hash, 'bands': bands, 'arrays': arrays}
+    cache_path = join(filter_cache_dir, 'filters')
+    try:
+        makedirs(cache_path, exist_ok=True)
+        with NamedTemporaryFile(dir=cache_path, suffix='.npz', delete=False) as temp_file:
+            np.savez(temp_file, metadata=json.dumps(metadata), data=data)
+        replace(temp_file.name, cache_file)
+    except OSError:
+        pass
+
+
+def _load_filter_content(xml_file, mtime_ns):
+    """
+    Load the content of a filter file from the disk cache, parsing it and updating the cache if needed.
+
+    Args:
+        xml_file (str): Absolute path to the filter file.
+        mtime_ns (int): Modification time of the filter file in nanoseconds.
+
+    Returns:
+        dict: Dictionary of arrays.
+    """
+    if filter_cache_dir is None:
+        return _parse_filter_file(xml_file)
+    cache_file = _get_cache_file(xml_file)
+    cached = _read_cache_file(cache_file)
+    if cached is not None and cached[0]['xml_file'] == xml_file:
+        metadata, content = cached
+        if metadata['mtime_ns'] == mtime_ns:
+            return content
+        # The file has been touched, it only needs to be parsed again if the content has changed
+        content_hash = _get_content_hash(xml_file)
+        if metadata['content_hash'] == content_hash:
+            _write_cache_file(cache_file, xml_file, mtime_ns, content_hash, content)
+            return content
+    else:
+        content_hash = _get_content_hash(xml_file)
+    content = _parse_filter_file(xml_file)
+    _write_cache_file(cache_file, xml_file, mtime_ns, content_hash, content)
+    return content
+
+
+def load_filter_arrays(xml_file, *keys):
+    """
+    Get arrays of a filter file, parsing it only if it is not found in the cache.
+
+    Args:
+        xml_file (str): Path to the filter file.
+        *keys (str): Arrays to get. The available keys are 'bands', 'zero_points', 'offsets', 'bp_sampling',
+            'rp_sampling', 'sampling_grid', 'bp_merge' and 'rp_merge'.
+
+    Returns:
+        tuple: Copies of the requested arrays. None for the tables not present in the file.
+    """
+    xml_file = abspath(xml_file)
+    file_stat = stat(xml_file)
+    file_version = (file_stat.st_mtime_ns, file_stat.st_size)
+    cached_version, content = _memory_cache.get(xml_file, (None, None))
+    if cached_version != file_version:
+        content = _load_filter_content(xml_file, file_stat.st_mtime_ns)
+        _memory_cache[xml_file] = (file_version, content)
+    return tuple(content[key].copy() if key in content else None for key in keys)
+
+
+def clear_filter_cache(disk=False):
+    """
+    Clear the cached filters.
+
+    Args:
+        disk (bool): Whether to also remove the filters cached in the cache directory.
+    """
+    if disk and filter_cache_dir is not None:
+        for cache_file in glob(join(filter_cache_dir, 'filters', '*.npz')):
+            try:
+                remove(cache_file)
+            except OSError:
+                pass
+    _memory_cache.clear()
@@ -6,6 +6,7 @@ Module to hold some functions used by different subpackages.
 
 import sys
 from ast import literal_eval
+from functools import lru_cache
 from os.path import join
 from string import capwords
 
@@ -17,12 +18,18 @@ from gaiaxpy.config.paths import filters_path, config_path
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.core.custom_errors import InvalidBandError
 from gaiaxpy.generator.config import get_additional_filters_path
+from gaiaxpy.spectrum.packed_covariance import _get_tril_indices
 from gaiaxpy.spectrum.utils import _correlation_to_covariance_dr3int5
 
 
+@lru_cache(maxsize=None)
+def __read_built_in_systems() -> tuple:
+    with open(join(config_path, 'available_systems.txt'), 'r') as av_sys:
+        return tuple(av_sys.read().splitlines())
+
+
 def _get_built_in_systems() -> list:
-    av_sys = open(join(config_path, 'available_systems.txt'), 'r')
-    return av_sys.read().splitlines()
+    return list(__read_built_in_systems())
 
 
 def _is_built_in_system(system):
@@ -31,6 +38,10 @@ def _is_built_in_system(system):
 
 def cast_output(output):
     cast_dict = {'source_id': 'int64', 'solution_id': 'int64'}
+    if isinstance(output, dict):  # Columns of the output data
+        for column in cast_dict.keys() & output.keys():
+            output[column] = output[column].astype(cast_dict[column])
+        return output
     df = output if isinstance(output, pd.DataFrame) else output.data
     for column in df.columns:
         try:
@@ -204,6 +215,49 @@ def array_to_symmetric_matrix(array, array_size):
     raise TypeError('Wrong argument types. Must be np.ndarray and integer or float.')
 
 
+def arrays_to_symmetric_matrices(arrays, array_sizes):
+    """
+    Convert a column of 1D arrays into 2D symmetric matrices. This is equivalent to calling array_to_symmetric_matrix on
+        each element, but the matrices with the same size are built together in a single 3D array. Each matrix returned
+        is a view of that array.
+
+    Args:
+        arrays (Series/list): Column of 1D arrays, storing the unique elements of each matrix as in
+            array_to_symmetric_matrix.
+        array_sizes (Series/list): Number of rows/columns of each output matrix.
+
+    Returns:
+        list: List of full 2D matrices. Elements that cannot be converted (e.g. NaN for missing bands or matrices
+            already) are returned as in array_to_symmetric_matrix.
+
+    Raises:
+        TypeError: If an element is neither a NaN nor an np.ndarray.
+    """
+    arrays, array_sizes = list(arrays), list(array_sizes)
+    matrices = [None] * len(arrays)
+    groups = dict()
+    for index, (array, array_size) in enumerate(zip(arrays, array_sizes)):
+        if isinstance(array, np.ndarray) and array.ndim == 1 and array.size > 0 and not pd.isna(array_size):
+            array_size = int(array_size)
+            # Diagonal offset, AVRO files include the values in the diagonal whereas others don't
+            k = -1 if len(array) == array_size * (array_size - 1) // 2 else 0
+            groups.setdefault((array_size, k, len(array)), []).append(index)
+        else:
+            matrices[index] = array_to_symmetric_matrix(array, array_size)
+    for (array_size, k, _), indices in groups.items():
+        packed = np.stack([arrays[index] for index in indices])
+        stacked_matrices = np.zeros((len(indices), array_size, array_size))
+        if k < 0:
+            diagonal = np.arange(array_size)
+            stacked_matrices[:, diagonal, diagonal] = 1.0
+        rows, columns = _get_tril_indices(array_size, k)
+        stacked_matrices[:, rows, columns] = packed
+        stacked_matrices[:, columns, rows] = packed
+        for index, matrix in zip(indices, stacked_matrices):
+            matrices[index] = matrix
+    return matrices
+
+
 def _extract_systems_from_data(data_columns, photometric_system=None):
     if isinstance(photometric_system, list):
         return [system.get_system_label() for system in photometric_system]
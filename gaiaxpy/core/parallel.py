@@ -0,0 +1,197 @@
+"""
+parallel.py
+====================================
+Module to distribute the processing of sets of sources across a pool of processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import ceil
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from gaiaxpy.core.generic_variables import pbar_colour
+
+# Number of partitions assigned to each worker. Smaller partitions balance the load better and give a smoother progress
+# bar at the cost of some communication overhead.
+PARTITIONS_PER_WORKER = 4
+
+# Arrays shared by the main process, attached by each worker when it starts
+_shared_arrays = dict()
+_shared_blocks = list()
+
+
+def validate_n_workers(n_workers):
+    """
+    Check that the number of workers is valid.
+
+    Args:
+        n_workers (int): Number of worker processes. None means that the sources are processed in the current process.
+
+    Raises:
+        ValueError: If the number of workers is not a positive integer.
+    """
+    if n_workers is not None and (not isinstance(n_workers, (int, np.integer)) or isinstance(n_workers, bool) or
+                                  n_workers <= 0):
+        raise ValueError('The number of workers must be a positive integer.')
+
+
+def _use_pool(n_workers):
+    """
+    Check whether the sources should be processed in a pool of processes.
+
+    Args:
+        n_workers (int): Number of worker processes.
+
+    Returns:
+        bool: True if more than one worker was requested.
+    """
+    validate_n_workers(n_workers)
+    return n_workers is not None and n_workers > 1
+
+
+class _SharedArrays(object):
+    """
+    Context manager that copies a dictionary of arrays to blocks of shared memory, released on exit.
+    """
+
+    def __init__(self, arrays):
+        """
+        Initialise the shared arrays.
+
+        Args:
+            arrays (dict): Dictionary of ndarrays to share.
+        """
+        self.arrays = arrays if arrays else dict()
+        self.blocks = list()
+
+    def __enter__(self):
+        """
+        Copy the arrays to shared memory.
+
+        Returns:
+            dict: Dictionary containing the name of the memory block, the shape and the data type of each array.
+        """
+        descriptors = dict()
+        for key, array in self.arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            descriptors[key] = (block.name, array.shape, array.dtype.str)
+        return descriptors
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = list()
+
+
+def _attach_shared_arrays(descriptors):
+    """
+    Attach a worker process to the arrays shared by the main process. The arrays are read-only.
+
+    Args:
+        descriptors (dict): Dictionary containing the name of the memory block, the shape and the data type of each
+            array.
+    """
+    _shared_arrays.clear()
+    for key, (name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=name)
+        # Keep a reference to the block, the array is only valid while it is open
+        _shared_blocks.append(block)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        _shared_arrays[key] = array
+
+
+def _get_shared_arrays():
+    """
+    Get the arrays shared with the current worker process.
+
+    Returns:
+        dict: Dictionary of read-only ndarrays.
+    """
+    return _shared_arrays
+
+
+def _run_partition(function, partition, kwargs):
+    return function(partition, **kwargs)
+
+
+def _get_partitions(n_rows, n_workers, block_size=None):
+    """
+    Split a number of rows into contiguous partitions.
+
+    Args:
+        n_rows (int): Total number of rows.
+        n_workers (int): Number of worker processes.
+        block_size (int): If given, the partitions start at multiples of it, so that the blocks of rows processed by
+            each worker are the same as if all the rows were processed in blocks of this size.
+
+    Returns:
+        list: List of slices covering all the rows in order.
+    """
+    partition_size = max(1, ceil(n_rows / (n_workers * PARTITIONS_PER_WORKER)))
+    if block_size is not None:
+        partition_size = ceil(partition_size / block_size) * block_size
+    return [slice(start, min(start + partition_size, n_rows)) for start in range(0, n_rows, partition_size)]
+
+
+def _run_in_pool(function, parsed_input_data, n_workers, shared_arrays=None, desc=None, unit=None, disable_info=False,
+                 block_size=None, **kwargs):
+    """
+    Apply a function to contiguous partitions of the input data in a pool of processes. The shared arrays are copied to
+        shared memory once and attached by each worker, instead of being sent with every partition. The progress of all
+        the workers is aggregated in a single progress bar.
+
+    Args:
+        function (function): Module-level function receiving a partition of the input data and the keyword arguments.
+            It can access the shared arrays through _get_shared_arrays.
+        parsed_input_data (DataFrame): Parsed input data.
+        n_workers (int): Number of worker processes.
+        shared_arrays (dict): Dictionary of ndarrays to share with the workers.
+        desc (str): Description of the progress bar.
+        unit (str): Unit of the progress bar.
+        disable_info (bool): Whether to disable the progress bar.
+        block_size (int): If given, the partitions start at multiples of it (see _get_partitions).
+        **kwargs: Keyword arguments passed to the function.
+
+    Returns:
+        list: Results of the function for each partition, in the order of the input data.
+    """
+    partitions = _get_partitions(len(parsed_input_data), n_workers, block_size)
+    results = [None] * len(partitions)
+    # The pool is shut down before the shared memory is released
+    with _SharedArrays(shared_arrays) as descriptors, \
+            ProcessPoolExecutor(max_workers=n_workers, initializer=_attach_shared_arrays,
+                                initargs=(descriptors,)) as executor, \
+            tqdm(total=len(parsed_input_data), desc=desc, unit=unit, leave=False, colour=pbar_colour,
+                 disable=disable_info) as pbar:
+        futures = {executor.submit(_run_partition, function, parsed_input_data.iloc[rows], kwargs): (index, rows)
+                   for index, rows in enumerate(partitions)}
+        for future in as_completed(futures):
+            index, rows = futures[future]
+            results[index] = future.result()
+            pbar.update(rows.stop - rows.start)
+    return results
+
+
+def _concat_partitions(partitions):
+    """
+    Concatenate the DataFrames computed for each partition, keeping their attributes.
+
+    Args:
+        partitions (list): List of DataFrames, or of dictionaries mapping the name of each column to its array.
+
+    Returns:
+        DataFrame/dict: The concatenated DataFrame, or dictionary of concatenated columns.
+    """
+    if isinstance(partitions[0], dict):
+        return {column: np.concatenate([partition[column] for partition in partitions]) for column in partitions[0]}
+    output_df = pd.concat(partitions, ignore_index=True)
+    output_df.attrs = dict(partitions[0].attrs)
+    return output_df
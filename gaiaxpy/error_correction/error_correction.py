@@ -10,7 +10,6 @@ from os.path import join
 
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
 from tqdm import tqdm
 
 from gaiaxpy.config.paths import correction_tables_path
@@ -37,49 +36,72 @@ def _read_system_table(system):
     return correction_table
 
 
-def _get_correction_array(_mag_G_values, system):
+@lru_cache(maxsize=None)
+def _load_correction_table(system):
+    """
+    Load the correction table of a system into arrays. The arrays are cached, so each table is only read once.
+
+    Args:
+        system (str): Name of the photometric system.
+
+    Returns:
+        ndarray: Lower edges of the magnitude bins.
+        ndarray: Upper edges of the magnitude bins.
+        ndarray: Centres of the magnitude bins.
+        ndarray: 2D array containing the correction factors of each bin.
+        ndarray: Index of the next bin (the one starting at the upper edge of each bin), or -1 if there is none.
+    """
     correction_table = _read_system_table(system)
-    min_value, max_value = correction_table['min_Gmag_bin'].iloc[0], correction_table['max_Gmag_bin'].iloc[-1]
-    floor_mag_dict = correction_table.set_index('min_Gmag_bin').T.to_dict()
-    factor_columns = [col for col in correction_table.columns if 'factor_' in col]
-    _mag_G_values = _mag_G_values.to_frame(name='mag_G')
-    _mag_G_values['row'] = _mag_G_values['mag_G'].map(lambda x: floor_mag_dict.get(float(np.floor(x))))
-    return _mag_G_values.apply(_get_correction_factor, args=(correction_table, factor_columns,
-                                                             min_value, max_value,), axis=1)
-
-
-def _get_correction_factor(mag_row, correction_table, factor_columns, min_value, max_value):
-    mag = mag_row['mag_G']
-    row = mag_row['row']
-    if (mag > max_value) or pd.isna(mag):
-        return correction_table[factor_columns].iloc[-1].values
-    elif mag < min_value:
-        return correction_table[factor_columns].iloc[0].values
-    bin_centre = row['bin_centre']
-    factors = np.array([row[factor] for factor in factor_columns])
-    if mag <= bin_centre:
-        return factors
-    range_row_max_Gmag_bin = row['max_Gmag_bin']
-    if bin_centre < mag < range_row_max_Gmag_bin:
-        try:
-            next_range_row = correction_table[correction_table['min_Gmag_bin'] == range_row_max_Gmag_bin].iloc[0]
-            next_factors = next_range_row[factor_columns]
-        except IndexError:
-            return factors
-        return interp1d(np.array([bin_centre, range_row_max_Gmag_bin]), np.vstack([factors, next_factors]), axis=0)(mag)
-    # Raise an exception if none of the conditions match
-    raise ValueError('Check the variables being used. The program should never fall in this case.')
+    min_edges = correction_table['min_Gmag_bin'].to_numpy()
+    max_edges = correction_table['max_Gmag_bin'].to_numpy()
+    factors = correction_table[[col for col in correction_table.columns if 'factor_' in col]].to_numpy()
+    next_bins = np.array([np.flatnonzero(min_edges == max_edge)[0] if (min_edges == max_edge).any() else -1
+                          for max_edge in max_edges])
+    arrays = (min_edges, max_edges, correction_table['bin_centre'].to_numpy(), factors, next_bins)
+    for array in arrays:
+        array.flags.writeable = False  # Shared by all the calls
+    return arrays
+
+
+def _get_correction_array(_mag_G_values, system):
+    """
+    Get the correction factors of a system for a set of sources. The factor of each source is the one of its magnitude
+        bin if the magnitude is not above the centre of the bin. Otherwise, it is linearly interpolated between the
+        factor of the bin at its centre and the factor of the next bin at its lower edge. Sources with magnitudes
+        outside the range of the table (or NaN) get the factors of the first or last bin.
+
+    Args:
+        _mag_G_values (Series/ndarray): G magnitude of each source.
+        system (str): Name of the photometric system.
+
+    Returns:
+        ndarray: 2D array containing the correction factors of each source.
+    """
+    min_edges, max_edges, bin_centres, factors, next_bins = _load_correction_table(system)
+    mag = np.asarray(_mag_G_values, dtype=np.float64)
+    in_range = (mag >= min_edges[0]) & (mag <= max_edges[-1])
+    # Sources below the range get the first bin, and those above the range (or NaN) the last one
+    out_of_range_bins = np.where(mag < min_edges[0], 0, len(min_edges) - 1)
+    bins = np.where(in_range, np.searchsorted(min_edges, mag, side='right') - 1, out_of_range_bins)
+    correction_array = factors[bins]
+    bin_centre, bin_max, next_bin = bin_centres[bins], max_edges[bins], next_bins[bins]
+    interpolate = in_range & (mag > bin_centre) & (mag < bin_max) & (next_bin >= 0)
+    if interpolate.any():
+        x_lo, x_hi, y_lo = bin_centre[interpolate], bin_max[interpolate], correction_array[interpolate]
+        y_hi = factors[next_bin[interpolate]]
+        # Same operations as the linear interpolation of scipy
+        slope = (y_hi - y_lo) / (x_hi - x_lo)[:, np.newaxis]
+        correction_array[interpolate] = slope * (mag[interpolate] - x_lo)[:, np.newaxis] + y_lo
+    return correction_array
 
 
 def _correct_system(system_df, correction_array):
     # Extract error columns
     error_df = system_df[[column for column in system_df.columns if '_error' in column]]
     error_df_columns = error_df.columns
-    if len(error_df_columns) != len(correction_array[0]):
+    if len(error_df_columns) != correction_array.shape[1]:
         raise ValueError('DataFrames should have the same number of columns.')
-    error_df = np.array(error_df)
-    correction_array = np.array([x for x in correction_array])
-    product_array = error_df * correction_array
+    product_array = error_df.to_numpy() * correction_array
     return pd.DataFrame(product_array, columns=error_df_columns)
 
 
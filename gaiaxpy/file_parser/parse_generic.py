@@ -3,15 +3,22 @@ parse_generic.py
 ====================================
 Module to parse input files containing spectra.
 """
-from os.path import splitext
+from io import StringIO
+from itertools import islice
+from os.path import normpath, splitext
 
+import numpy as np
 import pandas as pd
 from astropy.table import Table
 
-from gaiaxpy.core.generic_functions import array_to_symmetric_matrix, str_to_array
+from gaiaxpy.core.generic_functions import arrays_to_symmetric_matrices
 from .cast import _cast
+from .parse_string_arrays import parse_string_array_column, parse_string_array_columns
+from .source_index import SourceIndex, _read_csv_rows
+from .spectrum_store import STORE_EXTENSION
+from .utils import _import_pyarrow
 
-valid_extensions = ['avro', 'csv', 'ecsv', 'fits', 'xml']
+valid_extensions = ['avro', 'csv', 'ecsv', 'fits', 'parquet', 'xml', STORE_EXTENSION]
 
 
 def _raise_key_error(column):
@@ -53,8 +60,12 @@ class GenericParser(object):
             return self._parse_csv
         elif extension == 'fits':
             return self._parse_fits
+        elif extension == 'parquet':
+            return self._parse_parquet
         elif extension == 'xml':
             return self._parse_xml
+        elif extension == STORE_EXTENSION:
+            return self._parse_store
         else:
             raise InvalidExtensionError()
 
@@ -67,23 +78,117 @@ class GenericParser(object):
 
         Returns:
             DataFrame: Pandas DataFrame representing the file.
-            str: File extension ('.csv', '.fits', or '.xml').
+            str: File extension ('.csv', '.fits', '.parquet' or '.xml'). For spectrum stores, the extension of the file
+                from which the store was created.
         """
         print('Reading input file...', end='\r')
         extension = _get_file_extension(file_path)
         parser = self.get_parser(extension)
+        if extension == STORE_EXTENSION:
+            return parser(file_path)  # Stores are written from parsed data, no casting is needed
         parsed_data = _cast(parser(file_path))
         return parsed_data, extension
 
+    def _parse_chunks(self, file_path, chunk_size):
+        """
+        Parse the input file according to its extension in blocks of rows.
+
+        Args:
+            file_path (str): Path to a file.
+            chunk_size (int): Maximum number of rows per block.
+
+        Returns:
+            generator: Tuples containing a Pandas DataFrame representing a block of the file and the file extension.
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError('The chunk size must be a positive integer.')
+        print('Reading input file...', end='\r')
+        extension = _get_file_extension(file_path)
+        parser = self.get_parser(extension)
+        if extension == 'avro':
+            chunks = self._parse_avro_chunks(file_path, chunk_size)
+        elif extension in ['csv', 'ecsv']:
+            chunks = (parser(buffer) for buffer in _get_csv_chunks(file_path, chunk_size))
+        elif extension == 'parquet':
+            chunks = self._parse_parquet_chunks(file_path, chunk_size)
+        elif extension == STORE_EXTENSION:
+            yield from self._parse_store_chunks(file_path, chunk_size)
+            return
+        else:
+            # FITS files are memory mapped, XML files need to be read in full by Astropy
+            table = Table.read(file_path, format='fits', memmap=True) if extension == 'fits' else Table.read(file_path)
+            chunks = (parser(table[start:start + chunk_size]) for start in range(0, len(table), chunk_size))
+        for chunk in chunks:
+            yield _cast(chunk), extension
+
+    def _parse_sources(self, file_path, source_ids):
+        """
+        Parse some sources of the input file. The rows of the sources are found in the index of the file (which is
+            built and saved beside it the first time), and only those rows are read.
+
+        Args:
+            file_path (str): Path to an AVRO, CSV, ECSV or FITS file, or to a spectrum store.
+            source_ids (list): Source IDs (string or long) to read.
+
+        Returns:
+            DataFrame: Pandas DataFrame representing the sources, in the same order as the source IDs.
+            str: File extension. For spectrum stores, the extension of the file from which the store was created.
+
+        Raises:
+            ValueError: If the file cannot be indexed or some of the sources are not in the file.
+        """
+        print('Reading input file...', end='\r')
+        extension = _get_file_extension(file_path)
+        self.get_parser(extension)  # Check the extension
+        index = SourceIndex.load(file_path, extension)
+        # Rows are read once and in the order of the file
+        rows, order = np.unique(index.get_rows(source_ids), return_inverse=True)
+        if extension == 'avro':
+            parsed_data = _cast(self._parse_avro_rows(file_path, rows, index))
+        elif extension in ['csv', 'ecsv']:
+            parsed_data = _cast(self._parse_csv(StringIO(_read_csv_rows(file_path, rows, index))))
+        elif extension == 'fits':
+            parsed_data = _cast(self._parse_fits(Table.read(file_path, format='fits', memmap=True)[rows]))
+        else:
+            parsed_data, extension = self._parse_store(file_path, rows)
+        return parsed_data.iloc[order].reset_index(drop=True), extension
+
     def _parse_avro(self, avro_file):
         raise NotImplementedError('Method not implemented for base class.')
 
+    def _parse_avro_rows(self, avro_file, rows, index):
+        raise NotImplementedError('Method not implemented for base class.')
+
+    def _parse_avro_chunks(self, avro_file, chunk_size):
+        raise NotImplementedError('Method not implemented for base class.')
+
+    def _parse_store(self, store_path, rows=slice(None)):
+        raise NotImplementedError('Method not implemented for base class.')
+
+    def _parse_store_chunks(self, store_path, chunk_size):
+        raise NotImplementedError('Method not implemented for base class.')
+
+    def _parse_parquet_chunks(self, parquet_file, chunk_size, _usecols=None):
+        """
+        Parse the input Parquet file in blocks of rows. The file is read one row group at a time.
+
+        Args:
+            parquet_file (str): Path to a Parquet file.
+            chunk_size (int): Maximum number of rows per block.
+            _usecols (list): Columns to read. The rest of the columns are not read from the file.
+
+        Returns:
+            generator: Pandas DataFrames representing the blocks of the file.
+        """
+        for table in _get_parquet_chunks(parquet_file, chunk_size, _usecols):
+            yield self._parse_parquet(table)
+
     def _parse_csv(self, csv_file, _array_columns=None, _matrix_columns=None, _usecols=None):
         """
         Parse the input CSV file and store the result in a pandas DataFrame.
 
         Args:
-            csv_file (str): Path to a CSV file.
+            csv_file (str/StringIO): Path to a CSV file or buffer containing a block of it.
             _array_columns (list): List of columns in the file that contain arrays as strings.
             _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
                 square matrix which values are those contained in the second element of the tuple.
@@ -93,14 +198,12 @@ class GenericParser(object):
             DataFrame: A pandas DataFrame representing the CSV file.
         """
         df = pd.read_csv(csv_file, comment='#', float_precision='high', usecols=_usecols)
-        if _array_columns:  # Pandas converters seemed slower
-            for column in _array_columns:
-                if column in df.columns:
-                    df[column] = df[column].apply(lambda x: str_to_array(x))
+        if _array_columns:  # Whole columns are tokenised at once, much faster than converting each string
+            parse_string_array_columns(df, _array_columns)
         if _matrix_columns:
             for size_column, values_column in _matrix_columns:
-                df[values_column] = df.apply(lambda row: array_to_symmetric_matrix(str_to_array(row[values_column]),
-                                                                                   row[size_column]), axis=1)
+                df[values_column] = pd.Series(arrays_to_symmetric_matrices(parse_string_array_column(
+                    df[values_column]), df[size_column]), index=df.index, dtype=object)
         return df
 
     def _parse_fits(self, fits_file, _array_columns=None, _matrix_columns=None, _usecols=None):
@@ -108,7 +211,7 @@ class GenericParser(object):
         Parse the input FITS file and store the result in a pandas DataFrame.
 
         Args:
-            fits_file (str): Path to a FITS file.
+            fits_file (str/Table): Path to a FITS file or table containing a block of it.
             _array_columns (list): List of columns in the file that contain arrays as strings.
             _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
                 square matrix which values are those contained in the second element of the tuple.
@@ -117,12 +220,35 @@ class GenericParser(object):
         Returns:
             DataFrame: A pandas DataFrame representing the FITS file.
         """
-        table = Table.read(fits_file, format='fits')
+        table = fits_file if isinstance(fits_file, Table) else Table.read(fits_file, format='fits')
         df = table.to_pandas()[_usecols] if _usecols else table.to_pandas()
         if _matrix_columns:
             for size_column, values_column in _matrix_columns:
-                df[values_column] = df.apply(lambda row: array_to_symmetric_matrix(row[values_column],
-                                                                                   row[size_column]), axis=1)
+                df[values_column] = pd.Series(arrays_to_symmetric_matrices(df[values_column], df[size_column]),
+                                              index=df.index, dtype=object)
+        return df
+
+    def _parse_parquet(self, parquet_file, _array_columns=None, _matrix_columns=None, _usecols=None):
+        """
+        Parse the input Parquet file and store the result in a pandas DataFrame. Arrays are stored in list or
+            fixed-size list columns.
+
+        Args:
+            parquet_file (str/pyarrow.Table): Path to a Parquet file or table containing a block of it.
+            _array_columns (list): Parameter required in the parser hierarchy. Not used in this function.
+            _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
+                square matrix which values are those contained in the second element of the tuple.
+            _usecols (list): Columns to read. The rest of the columns are not read from the file.
+
+        Returns:
+            DataFrame: A pandas DataFrame representing the Parquet file.
+        """
+        table = _read_parquet(parquet_file, _usecols) if isinstance(parquet_file, str) else parquet_file
+        df = _arrow_table_to_pandas(table.select(_usecols) if _usecols else table)
+        if _matrix_columns:
+            for size_column, values_column in _matrix_columns:
+                df[values_column] = pd.Series(arrays_to_symmetric_matrices(df[values_column], df[size_column]),
+                                              index=df.index, dtype=object)
         return df
 
     def _parse_xml(self, xml_file, _array_columns=None, _matrix_columns=None, _usecols=None):
@@ -130,7 +256,7 @@ class GenericParser(object):
         Parse the input XML file and store the result in a pandas DataFrame.
 
         Args:
-            xml_file (str): Path to an XML file.
+            xml_file (str/Table): Path to an XML file or table containing a block of it.
             _array_columns (list): List of columns in the file that contain arrays as strings.
             _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
                 square matrix which values are those contained in the second element of the tuple.
@@ -140,16 +266,111 @@ class GenericParser(object):
             DataFrame: A pandas DataFrame representing the XML file.
         """
         # Astropy won't automatically remove the columns that are not in _usecols but it speeds up the process a bit
-        table = Table.read(xml_file, columns=_usecols)
+        table = xml_file if isinstance(xml_file, Table) else Table.read(xml_file, columns=_usecols)
         # Parsing only the required columns would be ideal, but not necessarily issue due to some type issues
         df = table.to_pandas()[_usecols]
         if _matrix_columns:
             for size_column, values_column in _matrix_columns:
-                df[values_column] = df.apply(lambda row: array_to_symmetric_matrix(row[values_column],
-                                                                                   row[size_column]), axis=1)
+                df[values_column] = pd.Series(arrays_to_symmetric_matrices(df[values_column], df[size_column]),
+                                              index=df.index, dtype=object)
         return df
 
 
+def _get_csv_chunks(csv_file, chunk_size):
+    """
+    Read a CSV file in blocks of rows. Every block is preceded by the line containing the column names, so that it can
+        be parsed as an independent file. Comment lines before the column names (e.g. ECSV headers) are skipped.
+
+    Args:
+        csv_file (str): Path to a CSV file.
+        chunk_size (int): Maximum number of rows per block.
+
+    Returns:
+        generator: Buffers containing the blocks of the file.
+    """
+    with open(csv_file) as f:
+        column_names = next((line for line in f if line.strip() and not line.startswith('#')), None)
+        if column_names is None:
+            return
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            yield StringIO(column_names + ''.join(lines))
+
+
+def _check_parquet_columns(schema, columns):
+    """
+    Check that a Parquet file contains the columns to read.
+
+    Args:
+        schema (pyarrow.Schema): Schema of the file.
+        columns (list): Columns to read, or None to read all of them.
+
+    Raises:
+        KeyError: If a column is missing from the file.
+    """
+    for column in columns or []:
+        if column not in schema.names:
+            _raise_key_error(column)
+
+
+def _read_parquet(parquet_file, columns=None):
+    """
+    Read a Parquet file, or only some of its columns.
+
+    Args:
+        parquet_file (str): Path to a Parquet file.
+        columns (list): Columns to read. If None, all the columns are read.
+
+    Returns:
+        pyarrow.Table: The contents of the file.
+    """
+    _, pq = _import_pyarrow()
+    _check_parquet_columns(pq.read_schema(parquet_file), columns)
+    return pq.read_table(parquet_file, columns=columns)
+
+
+def _get_parquet_chunks(parquet_file, chunk_size, columns=None):
+    """
+    Read a Parquet file in blocks of rows. Row groups are read as they are needed, so only one block of the file is kept
+        in memory at a time.
+
+    Args:
+        parquet_file (str): Path to a Parquet file.
+        chunk_size (int): Maximum number of rows per block.
+        columns (list): Columns to read. If None, all the columns are read.
+
+    Returns:
+        generator: Tables (pyarrow.Table) containing the blocks of the file.
+    """
+    pa, pq = _import_pyarrow()
+    with pq.ParquetFile(parquet_file) as f:
+        _check_parquet_columns(f.schema_arrow, columns)
+        for batch in f.iter_batches(batch_size=chunk_size, columns=columns):
+            yield pa.Table.from_batches([batch])
+
+
+def _arrow_table_to_pandas(table):
+    """
+    Convert an Arrow table to a pandas DataFrame. List columns are converted to columns of NumPy arrays, with NaN in the
+        null rows (e.g.: missing bands) as in the rest of the formats.
+
+    Args:
+        table (pyarrow.Table): Table to convert.
+
+    Returns:
+        DataFrame: A pandas DataFrame representing the table.
+    """
+    df = table.to_pandas()
+    for column in df.columns:
+        if df[column].dtype == object:
+            # Arrays converted by Arrow are read-only views of its buffers
+            df[column] = pd.Series([value.copy() if isinstance(value, np.ndarray) else np.nan if value is None else
+                                    value for value in df[column]], index=df.index, dtype=object)
+    return df
+
+
 def _get_file_extension(file_path):
     """
     Get the extension of a file.
@@ -160,5 +381,5 @@ def _get_file_extension(file_path):
     Returns:
         str: File extension (e.g.: '.csv')
     """
-    _, file_extension = splitext(file_path)
+    _, file_extension = splitext(normpath(file_path))  # Spectrum stores are directories, their path may end with '/'
     return file_extension[1:]
@@ -4,22 +4,28 @@ parse_internal_continuous.py
 Module to parse input files containing internally calibrated continuous spectra.
 """
 
+from itertools import islice
+
 import numpy as np
 import pandas as pd
 from fastavro import __version__ as fa_version
 from packaging import version
 
-from gaiaxpy.core.generic_functions import array_to_symmetric_matrix
+from gaiaxpy.core.generic_functions import arrays_to_symmetric_matrices, str_to_array
 from gaiaxpy.core.generic_variables import INTERNAL_CONT_COLS
 from .cast import _cast
 from .parse_generic import GenericParser
+from .source_index import _read_avro_records
+from .spectrum_store import get_store_length, read_spectrum_store
 from .utils import _csv_to_avro_map, _get_from_dict
 from ..core.satellite import BANDS
-from ..spectrum.utils import get_covariance_matrix
+from ..spectrum.utils import get_covariance_matrices
 
-# Columns that contain arrays (as strings)
-array_columns = ['bp_coefficients', 'bp_coefficient_errors', 'rp_coefficients', 'rp_coefficient_errors']
-# Pairs of the form (matrix_size (N), values_to_put_in_matrix) for columns that contain matrices as strings
+# Columns that contain arrays (as strings). The correlations are kept as the lower triangle provided by the Archive, the
+# covariance matrices are built from it in packed form (see PackedCovariance)
+array_columns = ['bp_coefficients', 'bp_coefficient_errors', 'bp_coefficient_correlations', 'rp_coefficients',
+                 'rp_coefficient_errors', 'rp_coefficient_correlations']
+# Pairs of the form (matrix_size (N), values_to_put_in_matrix) for columns that contain matrices in AVRO files
 matrix_columns = [('bp_n_parameters', 'bp_coefficient_correlations'),
                   ('rp_n_parameters', 'rp_coefficient_correlations')]
 
@@ -35,24 +41,23 @@ class InternalContinuousParser(GenericParser):
             continuous spectra.
 
         Args:
-            csv_file (str): Path to a CSV file.
+            csv_file (str/StringIO): Path to a CSV file or buffer containing a block of it.
             _array_columns (list): List of columns in the file that contain arrays as strings.
             _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
-                square matrix which values are those contained in the second element of the tuple.
+                square matrix which values are those contained in the second element of the tuple. By default, no
+                column is converted to matrices.
             _usecols (list): Columns to read.
 
         Returns:
             DataFrame: Pandas DataFrame representing the CSV file.
         """
-        if _matrix_columns is None:
-            _matrix_columns = matrix_columns
         if _array_columns is None:
             _array_columns = array_columns
         _usecols = _usecols if _usecols else INTERNAL_CONT_COLS
         df = super()._parse_csv(csv_file, _array_columns=_array_columns, _matrix_columns=_matrix_columns,
                                 _usecols=_usecols)
         for band in BANDS:
-            df[f'{band}_covariance_matrix'] = df.apply(get_covariance_matrix, axis=1, args=(band,))
+            df[f'{band}_covariance_matrix'] = get_covariance_matrices(df, band)
         return df
 
     def _parse_fits(self, fits_file, _array_columns=None, _matrix_columns=None, _usecols=None):
@@ -61,57 +66,139 @@ class InternalContinuousParser(GenericParser):
             continuous spectra.
 
         Args:
-            fits_file (str): Path to a FITS file.
+            fits_file (str/Table): Path to a FITS file or table containing a block of it.
             _array_columns (list): List of columns in the file that contain arrays as strings.
             _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
-                square matrix which values are those contained in the second element of the tuple.
+                square matrix which values are those contained in the second element of the tuple. By default, no
+                column is converted to matrices.
             _usecols (list): Columns to read.
 
         Returns:
             DataFrame: Pandas DataFrame representing the FITS file.
         """
-        if _matrix_columns is None:
-            _matrix_columns = matrix_columns
         if _array_columns is None:
             _array_columns = array_columns
         _usecols = _usecols if _usecols else INTERNAL_CONT_COLS
         df = super()._parse_fits(fits_file, _array_columns=_array_columns, _matrix_columns=_matrix_columns,
                                  _usecols=_usecols)
         for band in BANDS:
-            df[f'{band}_covariance_matrix'] = df.apply(get_covariance_matrix, axis=1, args=(band,))
+            df[f'{band}_covariance_matrix'] = get_covariance_matrices(df, band)
         return df
 
+    def _parse_parquet(self, parquet_file, _array_columns=None, _matrix_columns=None, _usecols=None):
+        """
+        Parse the input Parquet file and store the result in a pandas DataFrame if it contains internally calibrated
+            continuous spectra.
+
+        Args:
+            parquet_file (str/pyarrow.Table): Path to a Parquet file or table containing a block of it.
+            _array_columns (list): Parameter required in the parser hierarchy. Not used in this function.
+            _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
+                square matrix which values are those contained in the second element of the tuple. By default, no
+                column is converted to matrices.
+            _usecols (list): Columns to read.
+
+        Returns:
+            DataFrame: Pandas DataFrame representing the Parquet file.
+        """
+        _usecols = _usecols if _usecols else INTERNAL_CONT_COLS
+        df = super()._parse_parquet(parquet_file, _matrix_columns=_matrix_columns, _usecols=_usecols)
+        for band in BANDS:
+            df[f'{band}_covariance_matrix'] = get_covariance_matrices(df, band)
+        return df
+
+    def _parse_parquet_chunks(self, parquet_file, chunk_size, _usecols=None):
+        """
+        Parse the input Parquet file in blocks of rows, reading only the columns required.
+
+        Args:
+            parquet_file (str): Path to a Parquet file.
+            chunk_size (int): Maximum number of rows per block.
+            _usecols (list): Columns to read.
+
+        Returns:
+            generator: Pandas DataFrames representing the blocks of the file.
+        """
+        return super()._parse_parquet_chunks(parquet_file, chunk_size, _usecols=_usecols if _usecols else
+                                             INTERNAL_CONT_COLS)
+
+    def _parse_store(self, store_path, rows=slice(None)):
+        """
+        Read the spectra in a spectrum store. The arrays of each source are views of the files of the store mapped in
+            memory, no parsing is needed.
+
+        Args:
+            store_path (str): Path to the directory of the store.
+            rows (slice/ndarray): Rows of the store to read, all of them by default.
+
+        Returns:
+            DataFrame: Pandas DataFrame representing the store.
+            str: Extension of the file from which the store was created.
+        """
+        return read_spectrum_store(store_path, rows)
+
+    def _parse_store_chunks(self, store_path, chunk_size):
+        """
+        Read the spectra in a spectrum store in blocks of sources.
+
+        Args:
+            store_path (str): Path to the directory of the store.
+            chunk_size (int): Maximum number of sources per block.
+
+        Returns:
+            generator: Tuples containing a Pandas DataFrame representing a block of the store and the extension of the
+                file from which the store was created.
+        """
+        for start in range(0, get_store_length(store_path), chunk_size):
+            yield read_spectrum_store(store_path, slice(start, start + chunk_size))
+
     def _parse_xml(self, xml_file, _array_columns=None, _matrix_columns=None, _usecols=None):
         """
         Parse the input XML file and store the result in a pandas DataFrame.
 
         Args:
-            xml_file (str): Path to an XML file.
+            xml_file (str/Table): Path to an XML file or table containing a block of it.
             _array_columns (list): List of columns in the file that contain arrays as strings.
             _matrix_columns (list of tuples): List of tuples where the first element is the number of rows/columns of a
-                square matrix which values are those contained in the second element of the tuple.
+                square matrix which values are those contained in the second element of the tuple. By default, no
+                column is converted to matrices.
             _usecols (list): Columns to read.
 
         Returns:
             DataFrame: A pandas DataFrame representing the XML file.
         """
-        if _matrix_columns is None:
-            _matrix_columns = matrix_columns
         if _array_columns is None:
             _array_columns = array_columns
         _usecols = _usecols if _usecols else INTERNAL_CONT_COLS
         df = super()._parse_xml(xml_file, _array_columns=_array_columns, _matrix_columns=_matrix_columns,
                                 _usecols=_usecols)
         for band in BANDS:
-            df[f'{band}_covariance_matrix'] = df.apply(get_covariance_matrix, axis=1, args=(band,))
+            df[f'{band}_covariance_matrix'] = get_covariance_matrices(df, band)
         return df
 
     @staticmethod
     def __process_avro_record(record):
+        if 'sourceId' not in record:
+            return InternalContinuousParser.__process_flat_avro_record(record)
         return {key: np.array(_get_from_dict(record, _csv_to_avro_map[key])) if
         isinstance(_get_from_dict(record, _csv_to_avro_map[key]), list) else
         _get_from_dict(record, _csv_to_avro_map[key]) for key in _csv_to_avro_map.keys()}
 
+    @staticmethod
+    def __process_flat_avro_record(record):
+        """
+        Process a record written by GaiaXPy (see ContinuousSpectraData), whose fields are named after the columns.
+            Arrays can be stored either as AVRO arrays or as strings of the form '(a, b, c)'. Missing bands are null.
+
+        Args:
+            record (dict): AVRO record.
+
+        Returns:
+            dict: The processed record.
+        """
+        return {key: np.array(value) if isinstance(value, list) else str_to_array(value) if isinstance(value, str) else
+                np.nan if value is None else value for key, value in record.items()}
+
     @staticmethod
     def __get_records_up_to_1_4_7(avro_file):
         from fastavro import reader
@@ -143,6 +230,14 @@ class InternalContinuousParser(GenericParser):
         for record in records:
             yield InternalContinuousParser.__process_avro_record(record)
 
+    @staticmethod
+    def __get_records(avro_file):
+        if version.parse(fa_version) <= version.parse("1.4.7"):
+            return InternalContinuousParser.__get_records_up_to_1_4_7(avro_file)
+        elif version.parse(fa_version) > version.parse("1.4.7"):
+            return InternalContinuousParser.__get_records_later_than_1_4_7(avro_file)
+        raise ValueError(f'Fastavro version {fa_version} may not have been parsed properly.')
+
     def _parse_avro(self, avro_file):
         """
         Parse the input AVRO file and return the result as a Pandas DataFrame.
@@ -153,22 +248,64 @@ class InternalContinuousParser(GenericParser):
         Returns:
             DataFrame: Pandas DataFrame representing the AVRO file.
         """
-        if version.parse(fa_version) <= version.parse("1.4.7"):
-            __get_records = InternalContinuousParser.__get_records_up_to_1_4_7
-        elif version.parse(fa_version) > version.parse("1.4.7"):
-            __get_records = InternalContinuousParser.__get_records_later_than_1_4_7
-        else:
-            raise ValueError(f'Fastavro version {fa_version} may not have been parsed properly.')
-        df = pd.DataFrame(__get_records(avro_file))
+        return self.__records_to_df(InternalContinuousParser.__get_records(avro_file))
+
+    def _parse_avro_rows(self, avro_file, rows, index):
+        """
+        Parse some records of the input AVRO file. Only the blocks of the file containing them are decoded.
+
+        Args:
+            avro_file (str): Path to an AVRO file.
+            rows (ndarray): Rows to read, sorted.
+            index (SourceIndex): Index of the file.
+
+        Returns:
+            DataFrame: Pandas DataFrame representing the records.
+        """
+        return self.__records_to_df(InternalContinuousParser.__process_avro_record(record) for record in
+                                    _read_avro_records(avro_file, rows, index))
+
+    def _parse_avro_chunks(self, avro_file, chunk_size):
+        """
+        Parse the input AVRO file in blocks of records.
+
+        Args:
+            avro_file (str): Path to an AVRO file.
+            chunk_size (int): Maximum number of records per block.
+
+        Returns:
+            generator: Pandas DataFrames representing the blocks of the AVRO file.
+        """
+        records = InternalContinuousParser.__get_records(avro_file)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            yield self.__records_to_df(chunk)
+
+    @staticmethod
+    def __records_to_df(records):
+        """
+        Build a Pandas DataFrame from processed AVRO records.
+
+        Args:
+            records (iterable): Processed AVRO records.
+
+        Returns:
+            DataFrame: Pandas DataFrame representing the records.
+        """
+        df = pd.DataFrame(records)
         # Pairs of the form (matrix_size (N), values_to_put_in_matrix)
         to_matrix_columns = [('bp_n_parameters', 'bp_coefficient_covariances'),
-                             ('rp_n_parameters', 'rp_coefficient_covariances')]
+                             ('rp_n_parameters', 'rp_coefficient_covariances')] + matrix_columns
         for size_column, values_column in to_matrix_columns:
+            if values_column not in df.columns:
+                continue  # Internal files contain covariances, files written by GaiaXPy contain correlations
             try:
-                df[values_column] = df.apply(lambda row: array_to_symmetric_matrix(row[values_column],
-                                                                                   row[size_column]), axis=1)
+                df[values_column] = pd.Series(arrays_to_symmetric_matrices(df[values_column], df[size_column]),
+                                              index=df.index, dtype=object)
             except TypeError:
                 continue  # Value can be NaN when a band is not present
         for band in BANDS:
-            df[f'{band}_covariance_matrix'] = df.apply(get_covariance_matrix, axis=1, args=(band,))
+            df[f'{band}_covariance_matrix'] = get_covariance_matrices(df, band)
         return _cast(df)
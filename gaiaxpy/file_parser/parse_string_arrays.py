@@ -0,0 +1,153 @@
+"""
+parse_string_arrays.py
+====================================
+Module to parse whole columns of arrays and matrices stored as strings, such as those in the CSV files downloaded from
+the Gaia Archive.
+
+Arrays are stored as '(a,b,c)' and matrices as '((a,b),(c,d))'. Instead of converting every string separately, all the
+strings in a column are tokenised in a single pass into a preallocated buffer. The array of each row is a view of that
+buffer.
+"""
+
+import numpy as np
+import pandas as pd
+
+from gaiaxpy.core.generic_functions import str_to_array
+
+
+def _parse_values(text):
+    """
+    Convert a string of comma-separated values to an array. Empty values are converted to NaN.
+
+    Args:
+        text (str): String of the form 'a,b,c'.
+
+    Returns:
+        ndarray: 1D array of floats.
+
+    Raises:
+        ValueError: If a value cannot be converted to float.
+    """
+    if not text.strip():
+        return np.empty(0)
+    try:
+        return np.array([float(value) if value.strip() else np.nan for value in text.split(',')])
+    except ValueError:
+        raise ValueError('Input cannot be converted to array.')
+
+
+def _tokenise(texts):
+    """
+    Convert a list of strings of comma-separated values to a single array. Strings with the same number of values are
+        parsed together by the C reader of NumPy, which fills a 2D array directly.
+
+    Args:
+        texts (list): List of strings of the form 'a,b,c'.
+
+    Returns:
+        tuple: 1D array containing the values of all the strings (in order) and 1D array containing the number of
+            values in each string.
+    """
+    if texts and texts[0].strip():
+        try:
+            # Usually all the strings have the same number of values, the reader fails otherwise
+            values = np.loadtxt(texts, delimiter=',', comments=None, ndmin=2, dtype=np.float64)
+            # Empty strings are skipped by the reader
+            if values.shape[0] == len(texts):
+                return values.ravel(), np.full(len(texts), values.shape[1], dtype=np.int64)
+        except ValueError:
+            pass
+    lengths = np.array([text.count(',') + 1 if text.strip() else 0 for text in texts], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(lengths) else lengths
+    values = np.empty(lengths.sum())
+    try:
+        for length in np.unique(lengths[lengths > 0]):
+            rows = np.flatnonzero(lengths == length)
+            parsed = np.loadtxt([texts[row] for row in rows], delimiter=',', comments=None, ndmin=2,
+                                dtype=np.float64)
+            values[offsets[rows][:, None] + np.arange(length)] = parsed
+    except ValueError:
+        # Some strings contain empty or invalid values
+        values = np.concatenate([_parse_values(text) for text in texts] + [np.empty(0)])
+    return values, lengths
+
+
+def _split(values, lengths, shapes=None):
+    """
+    Split a buffer into the arrays of each row.
+
+    Args:
+        values (ndarray): 1D array containing the values of all the rows.
+        lengths (ndarray): Number of values in each row.
+        shapes (list): Shape of the matrix in each row. If None, the rows are 1D arrays.
+
+    Returns:
+        list: List of views of the buffer.
+    """
+    if len(lengths) == 0:
+        return []
+    if shapes is None and np.all(lengths == lengths[0]):
+        return list(values.reshape(len(lengths), lengths[0]))
+    if shapes is not None and all(shape == shapes[0] for shape in shapes):
+        return list(values.reshape((len(lengths),) + shapes[0]))
+    rows = np.split(values, np.cumsum(lengths)[:-1])
+    return rows if shapes is None else [row.reshape(shape) for row, shape in zip(rows, shapes)]
+
+
+def _get_matrix_shape(text, length):
+    n_rows = text.count('(') - 1
+    if n_rows <= 0 or length % n_rows:
+        raise ValueError('Input cannot be converted to matrix.')
+    return n_rows, length // n_rows
+
+
+def parse_string_array_column(column):
+    """
+    Convert a column of arrays or matrices stored as strings into NumPy arrays.
+
+    Args:
+        column (Series/list): Column containing strings of the form '(a,b,c)' or '((a,b),(c,d))'. NaN is used for
+            missing values. Elements that are already arrays are kept.
+
+    Returns:
+        list: List containing an array (or NaN if the value was missing) for each element of the column. Arrays of the
+            same shape are views of a single contiguous 2D or 3D array.
+    """
+    values = column.tolist() if isinstance(column, pd.Series) else list(column)
+    output = [None] * len(values)
+    array_rows, matrix_rows = [], []
+    for index, value in enumerate(values):
+        if not isinstance(value, str):
+            output[index] = str_to_array(value)
+        elif value.startswith('(('):
+            matrix_rows.append(index)
+        else:
+            array_rows.append(index)
+    if array_rows:
+        buffer, lengths = _tokenise([values[index][1:-1] for index in array_rows])
+        for index, array in zip(array_rows, _split(buffer, lengths)):
+            output[index] = array
+    if matrix_rows:
+        texts = [values[index] for index in matrix_rows]
+        buffer, lengths = _tokenise([text.replace('(', '').replace(')', '') for text in texts])
+        shapes = [_get_matrix_shape(text, length) for text, length in zip(texts, lengths)]
+        for index, matrix in zip(matrix_rows, _split(buffer, lengths, shapes)):
+            output[index] = matrix
+    return output
+
+
+def parse_string_array_columns(df, columns):
+    """
+    Convert the columns of a DataFrame containing arrays or matrices stored as strings into NumPy arrays, in place.
+
+    Args:
+        df (DataFrame): DataFrame to modify.
+        columns (list): Names of the columns to convert. Columns not present in the DataFrame are ignored.
+
+    Returns:
+        DataFrame: The modified DataFrame.
+    """
+    for column in columns:
+        if column in df.columns:
+            df[column] = pd.Series(parse_string_array_column(df[column]), index=df.index, dtype=object)
+    return df
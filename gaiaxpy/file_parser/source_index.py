@@ -0,0 +1,260 @@
+"""
+source_index.py
+====================================
+Module to index the sources in input files, so that a few of them can be read without parsing the whole file.
+
+The index of a file contains its source IDs sorted, the row of each of them and the positions needed to read single rows
+(the offset of each line in CSV files, or the offset of each block of records in AVRO files). It is built the first time
+some sources are requested from a file and saved beside it (inside the directory for spectrum stores), and it is built
+again if the file changes.
+"""
+
+from os import stat
+from os.path import isdir, join
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+from fastavro import block_reader
+
+from .spectrum_store import METADATA_FILE, STORE_EXTENSION, _open_array, _read_metadata
+
+# Extension of the files containing an index
+INDEX_EXTENSION = 'xpidx'
+# Version of the layout of the index
+INDEX_VERSION = 1
+# Formats that can be indexed
+INDEXABLE_FORMATS = ['avro', 'csv', 'ecsv', 'fits', STORE_EXTENSION]
+
+
+def _get_index_path(file_path):
+    """
+    Get the path to the index of a file.
+
+    Args:
+        file_path (str): Path to the indexed file or spectrum store.
+
+    Returns:
+        str: Path to the index file.
+    """
+    return join(file_path, f'source_index.{INDEX_EXTENSION}') if isdir(file_path) else \
+        f'{file_path}.{INDEX_EXTENSION}'
+
+
+def _get_file_signature(file_path):
+    """
+    Get the size and modification time of a file, used to check whether its index is up to date.
+
+    Args:
+        file_path (str): Path to the indexed file or spectrum store.
+
+    Returns:
+        ndarray: Size and modification time (in nanoseconds) of the file, or of the metadata of a spectrum store.
+    """
+    file_stat = stat(join(file_path, METADATA_FILE) if isdir(file_path) else file_path)
+    return np.array([file_stat.st_size, file_stat.st_mtime_ns], dtype=np.int64)
+
+
+def _index_csv(csv_file):
+    """
+    Get the source IDs in a CSV file and the offset of each line.
+
+    Args:
+        csv_file (str): Path to a CSV or ECSV file.
+
+    Returns:
+        ndarray: Source IDs in the order of the file.
+        dict: Offsets of the line containing the column names ('header_offset') and of each row ('row_offset').
+    """
+    header_offset, row_offsets = -1, []
+    with open(csv_file, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip() and not line.startswith(b'#'):  # Comment lines (e.g. ECSV headers) are skipped
+                if header_offset < 0:
+                    header_offset = offset
+                else:
+                    row_offsets.append(offset)
+            offset += len(line)
+    source_ids = pd.read_csv(csv_file, comment='#', usecols=['source_id'])['source_id'].to_numpy(dtype=np.int64)
+    if len(source_ids) != len(row_offsets):
+        raise ValueError(f'The rows of file {csv_file} could not be indexed.')
+    return source_ids, {'header_offset': np.array([header_offset], dtype=np.int64),
+                        'row_offset': np.array(row_offsets, dtype=np.int64)}
+
+
+def _index_avro(avro_file):
+    """
+    Get the source IDs in an AVRO file and the position of each block of records.
+
+    Args:
+        avro_file (str): Path to an AVRO file.
+
+    Returns:
+        ndarray: Source IDs in the order of the file.
+        dict: Offsets of the blocks of records in the file ('block_offset') and row of the first record in each block
+            ('block_start').
+    """
+    source_ids, block_offsets, block_starts = [], [], []
+    with open(avro_file, 'rb') as f:
+        for block in block_reader(f):
+            block_offsets.append(block.offset)
+            block_starts.append(len(source_ids))
+            # Records from the Archive or written by GaiaXPy
+            source_ids.extend(record['sourceId'] if 'sourceId' in record else record['source_id'] for record in block)
+    return np.array(source_ids, dtype=np.int64), {'block_offset': np.array(block_offsets, dtype=np.int64),
+                                                  'block_start': np.array(block_starts, dtype=np.int64)}
+
+
+def _index_fits(fits_file):
+    with fits.open(fits_file, memmap=True) as hdul:
+        return np.array(hdul[1].data['source_id'], dtype=np.int64), dict()
+
+
+def _index_store(store_path):
+    return np.array(_open_array(store_path, _read_metadata(store_path), 'source_id'), dtype=np.int64), dict()
+
+
+class SourceIndex(object):
+    """
+    Index of the sources in a file, mapping each source ID to its row.
+    """
+
+    def __init__(self, source_ids, rows, positions=None):
+        """
+        Initialise an index.
+
+        Args:
+            source_ids (ndarray): Sorted source IDs.
+            rows (ndarray): Row of each source ID in the file.
+            positions (dict): Format-specific arrays used to read single rows from the file.
+        """
+        self.source_ids = source_ids
+        self.rows = rows
+        self.positions = positions if positions else dict()
+
+    @classmethod
+    def build(cls, file_path, extension):
+        """
+        Index a file.
+
+        Args:
+            file_path (str): Path to the file or spectrum store.
+            extension (str): Format of the file.
+
+        Returns:
+            SourceIndex: The index of the file.
+
+        Raises:
+            ValueError: If the format of the file cannot be indexed.
+        """
+        if extension == 'avro':
+            source_ids, positions = _index_avro(file_path)
+        elif extension in ['csv', 'ecsv']:
+            source_ids, positions = _index_csv(file_path)
+        elif extension == 'fits':
+            source_ids, positions = _index_fits(file_path)
+        elif extension == STORE_EXTENSION:
+            source_ids, positions = _index_store(file_path)
+        else:
+            raise ValueError(f'Sources can only be selected by ID from files in the formats: '
+                             f'{", ".join(INDEXABLE_FORMATS)}.')
+        rows = np.argsort(source_ids, kind='stable')
+        return cls(source_ids[rows], rows, positions)
+
+    @classmethod
+    def load(cls, file_path, extension):
+        """
+        Load the index of a file, or build it and save it beside the file if it does not exist or is out of date.
+
+        Args:
+            file_path (str): Path to the file or spectrum store.
+            extension (str): Format of the file.
+
+        Returns:
+            SourceIndex: The index of the file.
+        """
+        index_path = _get_index_path(file_path)
+        signature = _get_file_signature(file_path)
+        try:
+            with np.load(index_path) as arrays:
+                if arrays['version'][0] == INDEX_VERSION and np.array_equal(arrays['signature'], signature):
+                    return cls(arrays['source_ids'], arrays['rows'], {key: arrays[key] for key in arrays.files if key
+                                                                      not in ['version', 'signature', 'source_ids',
+                                                                              'rows']})
+        except (OSError, KeyError, ValueError):
+            pass  # The index does not exist or it is not valid
+        index = cls.build(file_path, extension)
+        try:
+            with open(index_path, 'wb') as f:
+                np.savez(f, version=np.array([INDEX_VERSION]), signature=signature, source_ids=index.source_ids,
+                         rows=index.rows, **index.positions)
+        except OSError:
+            pass  # The index is still used if it cannot be saved (e.g.: read-only directories)
+        return index
+
+    def get_rows(self, source_ids):
+        """
+        Get the rows of some sources.
+
+        Args:
+            source_ids (list): Source IDs (string or long).
+
+        Returns:
+            ndarray: Row of each source, in the same order as the source IDs.
+
+        Raises:
+            ValueError: If some of the sources are not in the file.
+        """
+        source_ids = np.array([int(source_id) for source_id in source_ids], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.source_ids, source_ids), max(len(self.source_ids) - 1, 0))
+        found = self.source_ids[positions] == source_ids if len(self.source_ids) else np.zeros(len(source_ids), bool)
+        if not found.all():
+            missing = ', '.join(str(source_id) for source_id in source_ids[~found][:10])
+            raise ValueError(f'Source IDs not found in the input file: {missing}.')
+        return self.rows[positions]
+
+
+def _read_csv_rows(csv_file, rows, index):
+    """
+    Read some rows of a CSV file.
+
+    Args:
+        csv_file (str): Path to a CSV or ECSV file.
+        rows (ndarray): Rows to read.
+        index (SourceIndex): Index of the file.
+
+    Returns:
+        str: The line containing the column names followed by the rows, which can be parsed as a CSV file.
+    """
+    lines = []
+    with open(csv_file, 'rb') as f:
+        for offset in np.concatenate([index.positions['header_offset'], index.positions['row_offset'][rows]]):
+            f.seek(offset)
+            lines.append(f.readline().rstrip(b'\r\n'))
+    return b'\n'.join(lines).decode() + '\n'
+
+
+def _read_avro_records(avro_file, rows, index):
+    """
+    Read some records of an AVRO file. Only the blocks containing the rows are decoded.
+
+    Args:
+        avro_file (str): Path to an AVRO file.
+        rows (ndarray): Rows to read, sorted.
+        index (SourceIndex): Index of the file.
+
+    Returns:
+        generator: The records, in the order of the rows.
+    """
+    block_offsets, block_starts = index.positions['block_offset'], index.positions['block_start']
+    blocks = np.searchsorted(block_starts, rows, side='right') - 1
+    with open(avro_file, 'rb') as f:
+        reader = block_reader(f)
+        for block_number in np.unique(blocks):
+            f.seek(block_offsets[block_number])
+            block = next(reader)
+            block_rows = set((rows[blocks == block_number] - block_starts[block_number]).tolist())
+            for position, record in enumerate(block):
+                if position in block_rows:
+                    yield record
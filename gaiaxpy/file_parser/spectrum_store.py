@@ -0,0 +1,346 @@
+"""
+spectrum_store.py
+====================================
+Module to store internally calibrated continuous spectra in memory-mappable arrays.
+
+A spectrum store is a directory (with the extension .xpstore) containing one raw binary file per array and a JSON file
+describing their types and shapes. The values of each band are stored as contiguous 2D arrays with one row per source:
+coefficients, formal errors and the lower triangle of the correlation matrices (as in the Gaia Archive), next to 1D
+arrays with the standard deviations, numbers of parameters, numbers of relevant bases and basis function ids. The input
+only needs to be parsed once. Reading a store maps the files in memory and hands views of their rows to the pipelines,
+without parsing or copying the data.
+"""
+
+import json
+from os.path import join
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gaiaxpy.core.satellite import BANDS
+from gaiaxpy.spectrum.packed_covariance import PackedCovariance, _get_tril_indices
+from gaiaxpy.spectrum.utils import get_covariance_matrices
+
+# Extension of the directories containing a spectrum store
+STORE_EXTENSION = 'xpstore'
+# Version of the layout of the store
+STORE_VERSION = 1
+METADATA_FILE = 'metadata.json'
+# Value of the integer columns for missing bands
+MISSING_INT = -1
+# Number of sources read from the input at once when a store is created
+DEFAULT_CHUNK_SIZE = 10000
+
+# Columns of each band stored as 2D arrays
+_array_columns = ['coefficients', 'coefficient_errors', 'coefficient_correlations']
+# Columns of each band stored as 1D arrays of integers
+_int_columns = ['n_parameters', 'n_relevant_bases', 'basis_function_id']
+
+
+def _get_array_name(band, column):
+    return f'{band}_{column}'
+
+
+def _split_covariance(covariance, standard_deviation):
+    """
+    Get the formal errors and the lower triangle of the correlation matrix of a covariance matrix.
+
+    Args:
+        covariance (PackedCovariance/ndarray): Covariance matrix, packed or as a 2D array.
+        standard_deviation (float): Standard deviation of the least squares solution.
+
+    Returns:
+        ndarray: 1D array containing the formal errors.
+        ndarray: 1D array containing the lower triangle of the correlation matrix (excluding the diagonal).
+    """
+    if isinstance(covariance, PackedCovariance):
+        return covariance.errors, covariance.correlations
+    # The covariance is the correlation matrix scaled by the formal errors divided by the standard deviation
+    scaled_errors = np.sqrt(np.diagonal(covariance))
+    rows, columns = _get_tril_indices(len(scaled_errors), -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlations = covariance[rows, columns] / (scaled_errors[rows] * scaled_errors[columns])
+    return scaled_errors * standard_deviation, np.nan_to_num(correlations, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _get_band_arrays(df, band):
+    """
+    Get the arrays to store for one band of a block of parsed continuous spectra.
+
+    Args:
+        df (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+
+    Returns:
+        dict: Dictionary mapping the name of each column of the band to a 1D array, or a list containing the array of
+            each source (None for the sources where the band is missing).
+    """
+    standard_deviations = df[f'{band}_standard_deviation'].to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(standard_deviations)
+    arrays = {'standard_deviation': standard_deviations}
+    for column in _int_columns:
+        values = df[f'{band}_{column}'].to_numpy(dtype=np.float64, na_value=np.nan) if f'{band}_{column}' in \
+            df.columns else np.full(len(df), np.nan)
+        arrays[column] = np.where(present & ~np.isnan(values), np.nan_to_num(values), MISSING_INT).astype(np.int64)
+    coefficients, errors, correlations = [None] * len(df), [None] * len(df), [None] * len(df)
+    for index, (row_coefficients, covariance, standard_deviation) in enumerate(zip(
+            df[f'{band}_coefficients'], get_covariance_matrices(df, band), standard_deviations)):
+        if present[index]:
+            coefficients[index] = np.asarray(row_coefficients)
+            errors[index], correlations[index] = _split_covariance(covariance, standard_deviation)
+    arrays.update({'coefficients': coefficients, 'coefficient_errors': errors,
+                   'coefficient_correlations': correlations})
+    return arrays
+
+
+def _stack_rows(rows, width, dtype):
+    """
+    Stack arrays of different lengths into a 2D array, padding them with NaN.
+
+    Args:
+        rows (list): Arrays to stack, or None for the rows with no array.
+        width (int): Number of columns of the output array.
+        dtype (dtype): Type of the output array.
+
+    Returns:
+        ndarray: 2D array of shape (len(rows), width).
+    """
+    output = np.full((len(rows), width), np.nan, dtype=dtype)
+    for index, row in enumerate(rows):
+        if row is not None:
+            output[index, :len(row)] = row
+    return output
+
+
+class SpectrumStoreWriter(object):
+    """
+    Writer of a spectrum store, which can be written in blocks of sources.
+    """
+
+    def __init__(self, path, input_format=None):
+        """
+        Create an empty spectrum store.
+
+        Args:
+            path (str): Path to the directory of the store. It is created if it does not exist, and the arrays of a
+                previous store in it are replaced.
+            input_format (str): Format of the input ingested (e.g.: 'csv'). It is used as the default output format
+                of the pipelines reading from the store.
+        """
+        self.path = path
+        self.input_format = input_format
+        self.n_sources = 0
+        self.files = dict()
+        self.arrays = dict()
+        # Sources written before the shape of the arrays of a band was known (the band was missing in all of them)
+        self.pending_rows = {band: 0 for band in BANDS}
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+    def __write_array(self, name, array):
+        if name not in self.files:
+            self.files[name] = open(join(self.path, f'{name}.bin'), 'wb')
+            self.arrays[name] = {'dtype': array.dtype.str, 'shape': list(array.shape[1:])}
+        elif list(array.shape[1:]) != self.arrays[name]['shape']:
+            raise ValueError(f'The arrays in column {name} must not be longer than in the first block written.')
+        self.files[name].write(np.ascontiguousarray(array, dtype=self.arrays[name]['dtype']).tobytes())
+
+    def __write_band(self, band, band_arrays, n_rows):
+        for column in ['standard_deviation'] + _int_columns:
+            self.__write_array(_get_array_name(band, column), band_arrays[column])
+        for column in _array_columns:
+            name = _get_array_name(band, column)
+            rows = band_arrays[column]
+            present_rows = [row for row in rows if row is not None]
+            if name in self.arrays:
+                width, dtype = self.arrays[name]['shape'][0], np.dtype(self.arrays[name]['dtype'])
+            elif present_rows:
+                width, dtype = max(len(row) for row in present_rows), np.result_type(*present_rows)
+                if self.pending_rows[band]:
+                    self.__write_array(name, np.full((self.pending_rows[band], width), np.nan, dtype=dtype))
+            else:
+                continue
+            if any(len(row) > width for row in present_rows):
+                raise ValueError(f'The arrays in column {name} must not be longer than in the first block written.')
+            self.__write_array(name, _stack_rows(rows, width, dtype))
+        if not all(_get_array_name(band, column) in self.arrays for column in _array_columns):
+            self.pending_rows[band] += n_rows
+
+    def write(self, df):
+        """
+        Write a block of sources at the end of the store.
+
+        Args:
+            df (DataFrame): Parsed internally calibrated continuous spectra.
+        """
+        self.__write_array('source_id', df['source_id'].to_numpy(dtype=np.int64))
+        for band in BANDS:
+            self.__write_band(band, _get_band_arrays(df, band), len(df))
+        self.n_sources += len(df)
+
+    def close(self):
+        """
+        Close the files of the arrays and write the metadata of the store.
+        """
+        for band in BANDS:
+            # The band is missing for all the sources
+            for column in _array_columns:
+                if _get_array_name(band, column) not in self.arrays:
+                    self.__write_array(_get_array_name(band, column), np.empty((self.n_sources, 0)))
+        for file in self.files.values():
+            file.close()
+        metadata = {'version': STORE_VERSION, 'n_sources': self.n_sources, 'input_format': self.input_format,
+                    'arrays': self.arrays}
+        with open(join(self.path, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _read_metadata(store_path):
+    """
+    Read the metadata of a spectrum store.
+
+    Args:
+        store_path (str): Path to the directory of the store.
+
+    Returns:
+        dict: Metadata of the store.
+
+    Raises:
+        ValueError: If the directory does not contain a valid spectrum store.
+    """
+    try:
+        with open(join(store_path, METADATA_FILE)) as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f'The directory {store_path} does not contain a spectrum store.')
+    if metadata.get('version') != STORE_VERSION:
+        raise ValueError(f'Spectrum store version {metadata.get("version")} is not supported.')
+    return metadata
+
+
+def _open_array(store_path, metadata, name):
+    """
+    Map an array of a spectrum store in memory.
+
+    Args:
+        store_path (str): Path to the directory of the store.
+        metadata (dict): Metadata of the store.
+        name (str): Name of the array.
+
+    Returns:
+        ndarray: Read-only array backed by the file of the array.
+    """
+    array_info = metadata['arrays'][name]
+    shape = (metadata['n_sources'], *array_info['shape'])
+    if 0 in shape:
+        return np.empty(shape, dtype=array_info['dtype'])  # Empty files cannot be mapped
+    return np.memmap(join(store_path, f'{name}.bin'), dtype=array_info['dtype'], mode='r', shape=shape).view(
+        np.ndarray)
+
+
+def _to_object_column(values):
+    # Filled element by element, so that arrays are not converted or copied
+    column = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        column[index] = value
+    return column
+
+
+def read_spectrum_store(store_path, rows=slice(None)):
+    """
+    Read the spectra in a spectrum store. The arrays of each source are views of the files of the store mapped in
+        memory, so no data is read until it is used.
+
+    Args:
+        store_path (str): Path to the directory of the store.
+        rows (slice/ndarray): Rows of the store to read, all of them by default.
+
+    Returns:
+        DataFrame: Parsed internally calibrated continuous spectra, equivalent to the output of
+            InternalContinuousParser. The correlations are kept in their packed form.
+        str: Format of the input from which the store was created.
+    """
+    metadata = _read_metadata(store_path)
+    data = {'source_id': _open_array(store_path, metadata, 'source_id')[rows]}
+    for band in BANDS:
+        arrays = {column: _open_array(store_path, metadata, _get_array_name(band, column))[rows] for column in
+                  ['standard_deviation'] + _int_columns + _array_columns}
+        standard_deviations = arrays['standard_deviation']
+        missing = np.isnan(standard_deviations)
+        for column in _int_columns:
+            values = arrays[column]
+            mask = values == MISSING_INT
+            # Missing values are stored in nullable integer columns, as when parsing the input files
+            data[f'{band}_{column}'] = pd.arrays.IntegerArray(np.where(mask, 0, values), mask) if mask.any() else \
+                values
+        data[f'{band}_standard_deviation'] = standard_deviations
+        columns = {column: [None] * len(standard_deviations) for column in _array_columns + ['covariance_matrix']}
+        width = arrays['coefficients'].shape[1]
+        for index in np.flatnonzero(~missing):
+            n_parameters = int(arrays['n_parameters'][index])
+            row_arrays = [arrays[column][index] for column in _array_columns]
+            if n_parameters < width:  # Shorter arrays are padded in the store
+                n_correlations = n_parameters * (n_parameters - 1) // 2
+                row_arrays = [row_arrays[0][:n_parameters], row_arrays[1][:n_parameters],
+                              row_arrays[2][:n_correlations]]
+            for column, row_array in zip(_array_columns, row_arrays):
+                columns[column][index] = row_array
+            columns['covariance_matrix'][index] = PackedCovariance(row_arrays[2], row_arrays[1],
+                                                                   standard_deviations[index])
+        for column, values in columns.items():
+            if column != 'covariance_matrix':
+                values = [np.nan if value is None else value for value in values]
+            data[f'{band}_{column}'] = _to_object_column(values)
+    return pd.DataFrame(data), metadata['input_format']
+
+
+def get_store_length(store_path):
+    """
+    Get the number of sources in a spectrum store.
+
+    Args:
+        store_path (str): Path to the directory of the store.
+
+    Returns:
+        int: Number of sources.
+    """
+    return _read_metadata(store_path)['n_sources']
+
+
+def create_spectrum_store(input_object, store_path, chunk_size=DEFAULT_CHUNK_SIZE, username=None, password=None):
+    """
+    Create a spectrum store from internally calibrated continuous spectra. The input is parsed only once, in blocks of
+        sources, and stored in memory-mappable arrays that the rest of the functions of the package accept as input
+        (e.g.: convert('my_spectra.xpstore')) without parsing it again.
+
+    Args:
+        input_object (list/Path/str): Path to the file containing the mean spectra as downloaded from the archive in
+            their continuous representation, a list of sources ids (string or long), or a pandas DataFrame.
+        store_path (Path/str): Path to the directory of the store. The extension .xpstore is added if it is missing.
+        chunk_size (int): Maximum number of sources to read and write at once.
+        username (str): Cosmos username, only suggested when input_object is a list or ADQL query.
+        password (str): Cosmos password, only suggested when input_object is a list or ADQL query.
+
+    Returns:
+        str: Path to the directory of the store.
+    """
+    from gaiaxpy.input_reader.input_reader import InputReader
+    store_path = str(store_path).rstrip('/\\')
+    if not store_path.endswith(f'.{STORE_EXTENSION}'):
+        store_path = f'{store_path}.{STORE_EXTENSION}'
+    input_reader = InputReader(input_object, create_spectrum_store, disable_info=True, user=username,
+                               password=password)
+    chunks = input_reader.read_chunks(chunk_size)
+    first_chunk, input_format = next(chunks, (None, None))
+    with SpectrumStoreWriter(store_path, input_format=input_format) as writer:
+        if first_chunk is not None:
+            writer.write(first_chunk)
+        for chunk, _ in chunks:
+            writer.write(chunk)
+    return store_path
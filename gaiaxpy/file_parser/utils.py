@@ -17,6 +17,25 @@ def _get_from_dict(dictionary, _map):
         raise KeyError(f'Element {_map} not found in AVRO dictionary. Is it an actual field in the input file?')
 
 
+def _import_pyarrow():
+    """
+    Import pyarrow, which is an optional dependency only required to read and write Parquet files.
+
+    Returns:
+        module: The pyarrow module.
+        module: The pyarrow.parquet module.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Parquet files require pyarrow, which can be installed with: pip install pyarrow') from None
+    return pyarrow, pyarrow.parquet
+
+
 # This dictionary contains the mapping from the usual CSV fields to the AVRO fields.
 _csv_to_avro_map = {'source_id': ['sourceId'],
                     'rp_n_rejected_measurements': ['rpSpec', 'solution', 'numberOfRejectedMeasurements'],
@@ -0,0 +1,315 @@
+"""
+fitter.py
+====================================
+Module to fit grids of templates to the mean spectra in their continuous representation.
+"""
+
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from gaiaxpy.cholesky.cholesky import _get_bands_output, get_chi2_batch
+from gaiaxpy.core.generic_functions import parse_band
+from gaiaxpy.core.parallel import _concat_partitions, _get_shared_arrays, _run_in_pool, _use_pool
+from gaiaxpy.core.satellite import BANDS
+from gaiaxpy.input_reader.input_reader import InputReader
+from gaiaxpy.spectrum.batched_spectra import _get_truncation_mask, _iterate_blocks
+
+# Maximum number of sources fitted together. It bounds the size of the (sources, bases, bases) temporaries.
+FIT_BLOCK_SIZE = 1000
+# Maximum number of (source, template) pairs fitted together. It bounds the size of the (sources, templates)
+# temporaries, so fewer sources are fitted together for large grids of templates.
+FIT_BLOCK_PAIRS = 1000000
+# Relative precision assumed for the chi-squared computed from its expanded terms, which cancel for good fits
+EXPANDED_CHI2_PRECISION = 1e-8
+# Template index of the sources with no available band
+MISSING_TEMPLATE = -1
+
+
+def _validate_templates(templates: dict) -> dict:
+    """
+    Check the grid of templates and convert it to float arrays.
+
+    Args:
+        templates (dict): Dictionary containing, for each band to fit ('bp' and/or 'rp'), a 2D array of shape
+            (n_templates, n_bases) with the coefficients of each template.
+
+    Returns:
+        dict: Dictionary containing the templates of each band in the order of BANDS.
+
+    Raises:
+        ValueError: If no band is given, if the arrays are not 2D or if the bands contain different numbers of
+            templates.
+    """
+    if not isinstance(templates, dict) or not templates:
+        raise ValueError('The templates must be a dictionary containing an array of coefficients for each band.')
+    templates = {parse_band(band): np.asarray(band_templates, dtype=float) for band, band_templates in
+                 templates.items()}
+    if any(band_templates.ndim != 2 for band_templates in templates.values()):
+        raise ValueError('The templates of each band must be a 2D array of shape (n_templates, n_bases).')
+    if len(set(len(band_templates) for band_templates in templates.values())) != 1:
+        raise ValueError('All the bands must contain the same number of templates.')
+    return {band: templates[band] for band in BANDS if band in templates}
+
+
+def _get_template_products(templates: np.ndarray) -> np.ndarray:
+    """
+    Compute the products of the coefficients of each template, T_i * T_j for i <= j, with the off-diagonal products
+        doubled. The product of these arrays with the upper triangle of an inverse covariance matrix gives the quadratic
+        form T^T C^-1 T of every template.
+
+    Args:
+        templates (ndarray): 2D array of shape (n_templates, n_bases).
+
+    Returns:
+        ndarray: 2D array of shape (n_templates, n_bases * (n_bases + 1) / 2).
+    """
+    rows, columns = np.triu_indices(templates.shape[1])
+    products = templates[:, rows] * templates[:, columns]
+    products[:, rows != columns] *= 2
+    return products
+
+
+def _get_band_terms(parsed_input_data: pd.DataFrame, band: str, templates: np.ndarray, products: np.ndarray,
+                    truncation: bool) -> dict:
+    """
+    Compute the terms of the chi-squared of all the templates in one band. For the coefficients c of a source and a
+        template T, chi2(a) = c^T C^-1 c - 2 a T^T C^-1 c + a^2 T^T C^-1 T, where C^-1 = L^-T L^-1 is obtained from the
+        inverse square root covariance matrix.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+        templates (ndarray): 2D array of shape (n_templates, n_bases).
+        products (ndarray): Products of the coefficients of each template, as computed by _get_template_products.
+        truncation (bool): Whether to use only the relevant bases of each source.
+
+    Returns:
+        dict: Dictionary containing c^T C^-1 c for each source ('data'), 2D arrays of shape (n_sources, n_templates)
+            containing T^T C^-1 c ('cross') and T^T C^-1 T ('template'), a boolean array which is True for the sources
+            where the band is available ('available'), and the coefficients ('coefficients') and inverse square root
+            covariance matrices ('inverse_square_root_covariance') used, filled with zeros where the band is missing.
+
+    Raises:
+        ValueError: If the number of bases of the templates and the sources is different.
+    """
+    n_bases = templates.shape[1]
+    _L_inv = _get_bands_output(parsed_input_data, [band], False, output_array=True)[0]
+    available = ~np.isnan(_L_inv).all(axis=(1, 2)) if _L_inv.size else np.zeros(len(parsed_input_data), dtype=bool)
+    if available.any() and _L_inv.shape[-1] != n_bases:
+        raise ValueError(f'The {band.upper()} templates contain {n_bases} bases, but the input spectra contain '
+                         f'{_L_inv.shape[-1]}.')
+    if not available.any():
+        return {'data': np.zeros(len(available)), 'cross': np.zeros((len(available), len(templates))),
+                'template': np.zeros((len(available), len(templates))), 'available': available,
+                'coefficients': np.zeros((len(available), n_bases)),
+                'inverse_square_root_covariance': np.zeros((len(available), n_bases, n_bases))}
+    coefficients = np.stack([coefficients if is_available else np.zeros(n_bases) for coefficients, is_available in
+                             zip(parsed_input_data[f'{band}_coefficients'], available)])
+    if truncation:
+        # As L^-1 is lower triangular, its first rows only depend on the covariance of the relevant bases
+        _L_inv = _L_inv * _get_truncation_mask(parsed_input_data, band, n_bases)[:, :, np.newaxis]
+    _L_inv = np.where(available[:, np.newaxis, np.newaxis], _L_inv, 0.0)
+    whitened_coefficients = np.matmul(_L_inv, coefficients[:, :, np.newaxis])
+    weighted_coefficients = np.matmul(_L_inv.transpose(0, 2, 1), whitened_coefficients)[:, :, 0]
+    inverse_covariances = np.matmul(_L_inv.transpose(0, 2, 1), _L_inv)
+    rows, columns = np.triu_indices(n_bases)
+    return {'data': np.square(whitened_coefficients[:, :, 0]).sum(axis=1), 'cross': weighted_coefficients @ templates.T,
+            'template': inverse_covariances[:, rows, columns] @ products.T, 'available': available,
+            'coefficients': coefficients, 'inverse_square_root_covariance': _L_inv}
+
+
+def _get_fit_block_size(n_templates: int) -> int:
+    """
+    Get the number of sources fitted together.
+
+    Args:
+        n_templates (int): Number of templates in the grid.
+
+    Returns:
+        int: Number of sources, such that the (sources, templates) temporaries contain at most FIT_BLOCK_PAIRS
+            elements, with at least one source and at most FIT_BLOCK_SIZE.
+    """
+    return max(1, min(FIT_BLOCK_SIZE, FIT_BLOCK_PAIRS // max(n_templates, 1)))
+
+
+def _get_candidates(chi2: np.ndarray, chi2_error: np.ndarray, n_best: int) -> np.ndarray:
+    """
+    Select the templates that may be among the best-fitting ones given the precision of their chi-squared. A template
+        is discarded only if its chi-squared is certainly larger than that of n_best other templates.
+
+    Args:
+        chi2 (ndarray): 2D array of shape (n_sources, n_templates) containing the approximate chi-squared values.
+        chi2_error (ndarray): 2D array of the same shape containing their maximum errors.
+        n_best (int): Number of templates to return per source.
+
+    Returns:
+        ndarray: 2D array of shape (n_sources, n_candidates) containing the indices of the candidates. The same number
+            of candidates is returned for every source, enough to include all the candidates of each of them.
+    """
+    n_sources, n_templates = chi2.shape
+    if n_best >= n_templates:
+        return np.tile(np.arange(n_templates), (n_sources, 1))
+    lower_bound = chi2 - chi2_error
+    upper_bound = np.partition(chi2 + chi2_error, n_best - 1, axis=1)[:, n_best - 1]
+    n_candidates = max(n_best, int((lower_bound <= upper_bound[:, np.newaxis]).sum(axis=1).max()))
+    if n_candidates >= n_templates:
+        return np.tile(np.arange(n_templates), (n_sources, 1))
+    # The candidates of each source are those with the smallest lower bounds
+    return np.argpartition(lower_bound, n_candidates - 1, axis=1)[:, :n_candidates]
+
+
+def _fit_block(parsed_input_data: pd.DataFrame, templates: dict, products: dict, n_best: int, truncation: bool,
+               fit_scale: bool) -> dict:
+    """
+    Find the best-fitting templates of a block of sources.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        templates (dict): Templates of each band.
+        products (dict): Products of the coefficients of the templates of each band.
+        n_best (int): Number of templates to return per source.
+        truncation (bool): Whether to use only the relevant bases of each source.
+        fit_scale (bool): Whether to fit a scale factor for each template.
+
+    Returns:
+        dict: Dictionary containing 2D arrays of shape (n_sources, n_best) with the indices of the templates, their
+            scale factors and their chi-squared values, sorted by chi-squared.
+    """
+    bands_terms = {band: _get_band_terms(parsed_input_data, band, band_templates, products[band], truncation)
+                   for band, band_templates in templates.items()}
+    # The same scale factor is shared by both bands
+    data_term = sum(band_terms['data'] for band_terms in bands_terms.values())
+    cross_term = sum(band_terms['cross'] for band_terms in bands_terms.values())
+    template_term = sum(band_terms['template'] for band_terms in bands_terms.values())
+    available = np.logical_or.reduce([band_terms['available'] for band_terms in bands_terms.values()])
+    if fit_scale:
+        scale = np.divide(cross_term, template_term, out=np.zeros_like(cross_term), where=template_term > 0)
+        chi2 = data_term[:, np.newaxis] - scale * cross_term
+        chi2_error = data_term[:, np.newaxis] + np.abs(scale * cross_term)
+    else:
+        scale = np.ones_like(cross_term)
+        chi2 = data_term[:, np.newaxis] - 2 * cross_term + template_term
+        chi2_error = data_term[:, np.newaxis] + 2 * np.abs(cross_term) + template_term
+    chi2_error *= EXPANDED_CHI2_PRECISION
+    # The expanded chi-squared loses precision for good fits, so the templates that cannot be told apart from the best
+    # ones are ranked by the chi-squared of their residuals
+    candidates = _get_candidates(chi2, chi2_error, n_best)
+    candidate_scale = np.take_along_axis(scale, candidates, axis=1)
+    candidate_chi2 = sum(get_chi2_batch(band_terms['inverse_square_root_covariance'],
+                                        band_terms['coefficients'][:, np.newaxis, :] -
+                                        candidate_scale[:, :, np.newaxis] * templates[band][candidates])
+                         for band, band_terms in bands_terms.items())
+    order = np.argsort(candidate_chi2, axis=1, kind='stable')[:, :n_best]
+    output = {'template_index': np.take_along_axis(candidates, order, axis=1),
+              'scale': np.take_along_axis(candidate_scale, order, axis=1),
+              'chi2': np.take_along_axis(candidate_chi2, order, axis=1)}
+    output['template_index'][~available] = MISSING_TEMPLATE
+    output['scale'][~available] = np.nan
+    output['chi2'][~available] = np.nan
+    return output
+
+
+def _fit_partition(parsed_input_data: pd.DataFrame, templates: dict, products: dict, n_best: int, truncation: bool,
+                   fit_scale: bool) -> pd.DataFrame:
+    """
+    Fit the templates to the input sources in blocks (see _get_fit_block_size).
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        templates (dict): Templates of each band.
+        products (dict): Products of the coefficients of the templates of each band.
+        n_best (int): Number of templates to return per source.
+        truncation (bool): Whether to use only the relevant bases of each source.
+        fit_scale (bool): Whether to fit a scale factor for each template.
+
+    Returns:
+        DataFrame: The source IDs and the best-fitting templates. If n_best is larger than one, each cell contains an
+            array of length n_best.
+    """
+    block_size = _get_fit_block_size(len(next(iter(templates.values()))))
+    blocks = [_fit_block(parsed_input_data.iloc[rows], templates, products, n_best, truncation, fit_scale)
+              for rows in _iterate_blocks(len(parsed_input_data), block_size)]
+    output_df = pd.DataFrame({'source_id': parsed_input_data['source_id'].to_numpy()})
+    for column in ['template_index', 'scale', 'chi2']:
+        values = np.concatenate([block[column] for block in blocks]) if blocks else \
+            np.zeros((0, n_best), dtype=int if column == 'template_index' else float)
+        output_df[column] = values[:, 0] if n_best == 1 else list(values)
+    return output_df
+
+
+def _fit_shared_partition(parsed_input_data: pd.DataFrame, n_best: int, truncation: bool,
+                          fit_scale: bool) -> pd.DataFrame:
+    """
+    Fit the templates shared by the main process to a partition of the sources in a worker process.
+
+    Args:
+        parsed_input_data (DataFrame): Partition of the parsed input data.
+        n_best (int): Number of templates to return per source.
+        truncation (bool): Whether to use only the relevant bases of each source.
+        fit_scale (bool): Whether to fit a scale factor for each template.
+
+    Returns:
+        DataFrame: The source IDs and the best-fitting templates.
+    """
+    shared_arrays = _get_shared_arrays()
+    templates = {band: shared_arrays[f'{band}_templates'] for band in BANDS if f'{band}_templates' in shared_arrays}
+    products = {band: shared_arrays[f'{band}_products'] for band in templates.keys()}
+    return _fit_partition(parsed_input_data, templates, products, n_best, truncation, fit_scale)
+
+
+def fit_templates(input_object: Union[list, Path, str, tuple], templates: dict, n_best: int = 1,
+                  truncation: bool = False, fit_scale: bool = True, username: str = None, password: str = None,
+                  chunk_size: int = None, n_workers: int = None) -> pd.DataFrame:
+    """
+    Fit a grid of templates given in the continuous representation (e.g. synthetic SEDs projected onto the bases of
+    the mean spectra) to the coefficients of the input sources, taking into account their full covariance. For each
+    source and template, the scale factor minimising the chi-squared is computed in closed form, with the same scale
+    for both bands. No sampled spectra are generated.
+
+    Args:
+        input_object (list/Path/str/tuple): Path to the file containing the mean spectra as downloaded from the
+            archive in their continuous representation, a list of sources ids (string or long), a pandas DataFrame, or a
+            tuple containing the path to a local file and a list of the sources ids to read from it.
+        templates (dict): Dictionary containing, for each band to fit ('bp' and/or 'rp'), a 2D array of shape
+            (n_templates, 55) with the coefficients of each template. All the bands must contain the same templates in
+            the same order.
+        n_best (int): Number of best-fitting templates to return per source.
+        truncation (bool): Toggle truncation of the set of bases. The level of truncation to be applied is defined by
+            the recommended value in the input files.
+        fit_scale (bool): Whether to fit a scale factor for each template. If False, the templates are compared to the
+            sources as given.
+        username (str): Cosmos username, only suggested when input_object is a list or ADQL query.
+        password (str): Cosmos password, only suggested when input_object is a list or ADQL query.
+        chunk_size (int): Maximum number of sources to read and fit at once.
+        n_workers (int): Number of processes to distribute the sources across. The templates are shared with the
+            processes through shared memory. By default, the sources are processed in the current process.
+
+    Returns:
+        DataFrame: The source IDs, the indices of the best-fitting templates in the grid ('template_index'), their scale
+            factors ('scale') and their chi-squared values ('chi2'). If n_best is larger than one, each cell contains
+            an array sorted by chi-squared. The sources without any of the fitted bands have a template index of -1 and
+            NaN scale and chi-squared.
+    """
+    templates = _validate_templates(templates)
+    n_templates = len(next(iter(templates.values())))
+    if not isinstance(n_best, (int, np.integer)) or isinstance(n_best, bool) or not 1 <= n_best <= n_templates:
+        raise ValueError(f'The number of best-fitting templates must be an integer between 1 and {n_templates}.')
+    use_pool = _use_pool(n_workers)
+    products = {band: _get_template_products(band_templates) for band, band_templates in templates.items()}
+    input_reader = InputReader(input_object, fit_templates, user=username, password=password)
+    chunks = input_reader.read_chunks(chunk_size) if chunk_size else [input_reader.read()]
+    output_partitions = []
+    for parsed_input_data, _ in chunks:
+        if use_pool:
+            shared_arrays = {f'{band}_templates': band_templates for band, band_templates in templates.items()}
+            shared_arrays.update({f'{band}_products': band_products for band, band_products in products.items()})
+            output_partitions.extend(_run_in_pool(_fit_shared_partition, parsed_input_data, n_workers,
+                                                  shared_arrays=shared_arrays, desc='Fitting templates', unit='spec',
+                                                  n_best=n_best, truncation=truncation, fit_scale=fit_scale))
+        else:
+            output_partitions.append(_fit_partition(parsed_input_data, templates, products, n_best, truncation,
+                                                    fit_scale))
+    return _concat_partitions(output_partitions)
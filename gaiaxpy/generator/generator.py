@@ -5,17 +5,20 @@ import pandas as pd
 
 from gaiaxpy.colour_equation.xp_filter_system_colour_equation import _apply_colour_equation
 from gaiaxpy.core.generic_functions import cast_output, validate_arguments
+from gaiaxpy.core.parallel import validate_n_workers
 from gaiaxpy.error_correction.error_correction import _apply_error_correction
 from gaiaxpy.input_reader.input_reader import InputReader
+from gaiaxpy.output.output_data import _save_in_chunks
 from gaiaxpy.output.photometry_data import PhotometryData
 from .multi_synthetic_photometry_generator import MultiSyntheticPhotometryGenerator
 from .photometric_system import PhotometricSystem
 
 
-def generate(input_object: Union[list, Path, str], photometric_system: Union[list, PhotometricSystem],
+def generate(input_object: Union[list, Path, str, tuple], photometric_system: Union[list, PhotometricSystem],
              output_path: Union[Path, str] = '.', output_file: str = 'output_synthetic_photometry',
              output_format: str = None, save_file: bool = True, error_correction: bool = False,
-             username: str = None, password: str = None) -> pd.DataFrame:
+             username: str = None, password: str = None, chunk_size: int = None,
+             n_workers: int = None) -> pd.DataFrame:
     """
     Synthetic photometry utility: generates synthetic photometry in a set of available systems from the input
     internally-calibrated continuously-represented mean spectra.
@@ -23,8 +26,9 @@ def generate(input_object: Union[list, Path, str], photometric_system: Union[lis
     automatically when generating the corresponding synthetic photometry.
 
     Args:
-        input_object (list/Path/str): Path to the file containing the mean spectra as downloaded from the archive in
-            their continuous representation, a list of sources ids (string or long), or a pandas DataFrame.
+        input_object (list/Path/str/tuple): Path to the file containing the mean spectra as downloaded from the
+            archive in their continuous representation, a list of sources ids (string or long), a pandas DataFrame, or a
+            tuple containing the path to a local file and a list of the sources ids to read from it.
         photometric_system (list/PhotometricSystem): Desired photometric system or list of photometric systems.
         output_path (Path/str): Path where to save the output data.
         output_file (str): Name of the output file without extension (e.g. 'my_file').
@@ -36,6 +40,12 @@ def generate(input_object: Union[list, Path, str], photometric_system: Union[lis
             underestimated errors (see Montegriffo et al., 2022, for more details).
         username (str): Cosmos username, only suggested when input_object is a list or ADQL query.
         password (str): Cosmos password, only suggested when input_object is a list or ADQL query.
+        chunk_size (int): Maximum number of sources to read and process at once. If given, the input file is read in
+            blocks and the output is written to the output file block by block (for the AVRO, CSV and ECSV formats),
+            keeping the memory usage proportional to the size of the blocks. In that case, if save_file is True the
+            output is not returned.
+        n_workers (int): Number of processes to distribute the sources across. The design matrices are shared with
+            the processes through shared memory. By default, the sources are processed in the current process.
 
     Returns:
         DataFrame: A DataFrame of all synthetic photometry results.
@@ -60,7 +70,8 @@ def generate(input_object: Union[list, Path, str], photometric_system: Union[lis
     if photometric_system in (None, [], ''):
         raise ValueError('At least one photometric system is required as input.')
     validate_arguments(generate.__defaults__[1], output_file, save_file)
-    parsed_input_data, extension = InputReader(input_object, generate, user=username, password=password).read()
+    validate_n_workers(n_workers)
+    input_reader = InputReader(input_object, generate, user=username, password=password)
     # Prepare systems, keep track of original systems
     internal_photometric_system = photometric_system.copy() if isinstance(photometric_system, list) else \
         [photometric_system].copy()
@@ -70,23 +81,43 @@ def generate(input_object: Union[list, Path, str], photometric_system: Union[lis
     if error_correction and not gaia_initially_in_systems:
         internal_photometric_system.append(gaia_system)
     if isinstance(internal_photometric_system, list):
-        generator = MultiSyntheticPhotometryGenerator(internal_photometric_system, bp_model='v375wi', rp_model='v142r')
+        generator = MultiSyntheticPhotometryGenerator(internal_photometric_system, bp_model='v375wi', rp_model='v142r',
+                                                      n_workers=n_workers)
     else:
         raise ValueError('Photometry generation not implemented for the input type.')
-    photometry_df = generator.generate(parsed_input_data, extension, output_file=None, output_format=None,
-                                       save_file=False)
-    if colour_equation:
-        photometry_df = _apply_colour_equation(photometry_df, photometric_system=internal_photometric_system,
-                                               save_file=False, disable_info=True)
-    if error_correction:
-        photometry_df = _apply_error_correction(photometry_df, photometric_system=photometric_system, save_file=False,
-                                                disable_info=True)
-    if not gaia_initially_in_systems:
-        # Remove Gaia_DR3_Vega system from the final result
-        gaia_label = gaia_system.get_system_label()
-        gaia_columns = [column for column in photometry_df if column.startswith(gaia_label)]
-        photometry_df = photometry_df.drop(columns=gaia_columns)
-    photometry_df = cast_output(photometry_df)
+
+    def generate_photometry(_parsed_input_data, _extension):
+        """
+        Generate the synthetic photometry of a set of sources.
+
+        Args:
+            _parsed_input_data (DataFrame): Parsed input spectra.
+            _extension (str): Format of the input.
+
+        Returns:
+            DataFrame: The synthetic photometry in the requested photometric systems.
+        """
+        _photometry_df = generator.generate(_parsed_input_data, _extension, output_file=None, output_format=None,
+                                            save_file=False)
+        if colour_equation:
+            _photometry_df = _apply_colour_equation(_photometry_df, photometric_system=internal_photometric_system,
+                                                    save_file=False, disable_info=True)
+        if error_correction:
+            _photometry_df = _apply_error_correction(_photometry_df, photometric_system=photometric_system,
+                                                     save_file=False, disable_info=True)
+        if not gaia_initially_in_systems:
+            # Remove Gaia_DR3_Vega system from the final result
+            gaia_label = gaia_system.get_system_label()
+            gaia_columns = [column for column in _photometry_df if column.startswith(gaia_label)]
+            _photometry_df = _photometry_df.drop(columns=gaia_columns)
+        return cast_output(_photometry_df)
+
+    if chunk_size:
+        output_chunks = ((PhotometryData(generate_photometry(chunk, extension)), extension) for chunk, extension in
+                         input_reader.read_chunks(chunk_size))
+        return _save_in_chunks(output_chunks, save_file, output_path, output_file, output_format)
+    parsed_input_data, extension = input_reader.read()
+    photometry_df = generate_photometry(parsed_input_data, extension)
     output_data = PhotometryData(photometry_df)
     output_data.save(save_file, output_path, output_file, output_format, extension)
     return photometry_df
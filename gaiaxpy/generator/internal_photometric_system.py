@@ -11,30 +11,79 @@ from os.path import exists
 from gaiaxpy.config.paths import config_ini_file
 from gaiaxpy.core.config import get_filter_version_from_config, replace_file_name, get_file_path, \
     ADDITIONAL_SYSTEM_PREFIX
+from gaiaxpy.core.filter_cache import load_filter_arrays
 from gaiaxpy.core.generic_functions import _get_system_label
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.core.version import __version__
-from gaiaxpy.core.xml_utils import get_file_root, parse_array, get_array_text, get_xp_sampling_matrix, get_xp_merge
 from .config import _CFG_FILE_PATH
 
 
 class InternalPhotometricSystem(object):
 
     def __init__(self, name: str, config_file: str = None, bp_model: str = 'v375wi', rp_model: str = 'v142r'):
+        """
+        Initialise a photometric system. The filter file is only searched and parsed the first time that the filter
+            file, bands, zero-points or offsets are needed.
+
+        Args:
+            name (str): Name of the photometric system.
+            config_file (str): Path to configuration file.
+            bp_model (str): BP model.
+            rp_model (str): RP model.
+        """
         self.label = _get_system_label(name)
         self.version = None
         self.__set_version(config_file)
         config_file = config_ini_file if not config_file else config_file
         self.config_file = config_file
-        self.filter_file = None
-        self._set_file(bp_model=bp_model, rp_model=rp_model)
-        self.bands = None
-        self.zero_points = None
-        self._load_xpzeropoint_from_xml()
-        self.offsets = None
-        self._load_offset_from_xml()
+        self.bp_model = bp_model
+        self.rp_model = rp_model
+        self._filter_file = None
+        self._bands = None
+        self._zero_points = None
+        self._offsets = None
         self.name = name
 
+    @property
+    def filter_file(self):
+        if self._filter_file is None:
+            self._set_file(bp_model=self.bp_model, rp_model=self.rp_model)
+        return self._filter_file
+
+    @filter_file.setter
+    def filter_file(self, filter_file):
+        self._filter_file = filter_file
+
+    @property
+    def bands(self):
+        if self._bands is None:
+            self._load_xpzeropoint_from_xml()
+        return self._bands
+
+    @bands.setter
+    def bands(self, bands):
+        self._bands = bands
+
+    @property
+    def zero_points(self):
+        if self._zero_points is None:
+            self._load_xpzeropoint_from_xml()
+        return self._zero_points
+
+    @zero_points.setter
+    def zero_points(self, zero_points):
+        self._zero_points = zero_points
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._load_offset_from_xml()
+        return self._offsets
+
+    @offsets.setter
+    def offsets(self, offsets):
+        self._offsets = offsets
+
     def set_bands(self, bands):
         """
         Set the bands of the photometric system.
@@ -134,8 +183,7 @@ class InternalPhotometricSystem(object):
         Returns:
             ndarray: Array of offsets.
         """
-        x_root = get_file_root(self.filter_file)
-        self.offsets = parse_array(x_root, 'fluxBias')
+        self.offsets, = load_filter_arrays(self.filter_file, 'offsets')
 
     def _load_xpzeropoint_from_xml(self):
         """
@@ -144,9 +192,9 @@ class InternalPhotometricSystem(object):
         Returns:
             ndarray: Array of zero-points.
         """
-        x_root = get_file_root(self.filter_file)
-        self.zero_points = parse_array(x_root, 'zeropoints')
-        self.bands, _ = get_array_text(x_root, 'bands')
+        zero_points, bands = load_filter_arrays(self.filter_file, 'zero_points', 'bands')
+        self.zero_points = zero_points
+        self.bands = bands.tolist() if bands is not None else None
 
     def load_xpsampling_from_xml(self):
         """
@@ -155,12 +203,7 @@ class InternalPhotometricSystem(object):
         Returns:
             dict: A dictionary containing the XpSampling table with one entry for BP and one for RP.
         """
-        x_root = get_file_root(self.filter_file)
-        _, n_bands = get_array_text(x_root, 'bands')
-
-        bp_sampling = get_xp_sampling_matrix(x_root, 'bp', n_bands)
-        rp_sampling = get_xp_sampling_matrix(x_root, 'rp', n_bands)
-
+        bp_sampling, rp_sampling = load_filter_arrays(self.filter_file, 'bp_sampling', 'rp_sampling')
         xp_sampling = dict(zip(BANDS, [bp_sampling, rp_sampling]))
         return xp_sampling
 
@@ -172,6 +215,6 @@ class InternalPhotometricSystem(object):
             ndarray: Array containing the sampling grid values.
             dict: A dictionary containing the XpMerge table with one entry for BP and one for RP.
         """
-        x_root = get_file_root(self.filter_file)
-        sampling_grid, bp_merge, rp_merge = get_xp_merge(x_root)
+        sampling_grid, bp_merge, rp_merge = load_filter_arrays(self.filter_file, 'sampling_grid', 'bp_merge',
+                                                               'rp_merge')
         return sampling_grid, dict(zip(BANDS, [bp_merge, rp_merge]))
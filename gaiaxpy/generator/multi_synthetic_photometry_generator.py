@@ -1,13 +1,94 @@
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
 
 from gaiaxpy.core.generic_variables import pbar_colour, pbar_units
-from gaiaxpy.spectrum.multi_synthetic_photometry import MultiSyntheticPhotometry
+from gaiaxpy.core.parallel import _get_shared_arrays, _run_in_pool, _use_pool
+from gaiaxpy.core.satellite import BANDS
+from gaiaxpy.spectrum.batched_spectra import BLOCK_SIZE, _iterate_blocks, _sample_absolute_block
+from gaiaxpy.spectrum.multi_synthetic_photometry import _reorder_columns
+from gaiaxpy.spectrum.sampled_basis_functions import SampledBasisFunctions
 from .synthetic_photometry_generator import SyntheticPhotometryGenerator
 
 
+def _flux_to_mag(flux, zero_points):
+    """
+    Convert fluxes to magnitudes. Non-positive fluxes are converted to NaN.
+
+    Args:
+        flux (ndarray): 2D array of shape (n_sources, n_bands) containing the fluxes.
+        zero_points (ndarray): 1D array containing the zero-point of each band.
+
+    Returns:
+        ndarray: 2D array containing the magnitudes.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(flux > 0, -2.5 * np.log10(flux) + zero_points, np.nan)
+
+
+def _get_system_blocks(internal_systems):
+    """
+    Get the positions of the bands of each system among the bands of all systems.
+
+    Args:
+        internal_systems (list): List of internal photometric systems.
+
+    Returns:
+        list: Slices of the bands of each system.
+    """
+    ends = np.cumsum([len(system.get_bands()) for system in internal_systems])
+    return [slice(end - n_bands, end) for end, n_bands in zip(ends, np.diff(ends, prepend=0))]
+
+
+def _sample_photometry(parsed_input_data, sampled_basis_func, xp_merge, system_blocks, disable_info=False):
+    """
+    Compute the uncorrected fluxes and errors of the bands of all systems, processing the sources in blocks.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed input spectra.
+        sampled_basis_func (dict): Sampled basis functions of the bands of all systems for both BP and RP.
+        xp_merge (dict): Arrays of weights of the bands of all systems for both BP and RP.
+        system_blocks (list): Slices of the bands of each system, which are sampled separately.
+        disable_info (bool): Whether to disable the progress bar.
+
+    Returns:
+        tuple: 2D arrays of shape (n_sources, n_bands) containing the fluxes and the errors.
+    """
+    n_sources = len(parsed_input_data)
+    flux, error = np.empty((n_sources, len(xp_merge[BANDS.bp]))), np.empty((n_sources, len(xp_merge[BANDS.bp])))
+    with tqdm(total=n_sources, desc='Generating photometry', unit=pbar_units['photometry'], leave=False,
+              colour=pbar_colour, disable=disable_info) as pbar:
+        for rows in _iterate_blocks(n_sources):
+            block = _sample_absolute_block(parsed_input_data.iloc[rows], sampled_basis_func, xp_merge,
+                                           packed_errors=False, sample_blocks=system_blocks)
+            flux[rows], error[rows] = block['flux'], block['error']
+            pbar.update(rows.stop - rows.start)
+    return flux, error
+
+
+def _sample_photometry_partition(parsed_input_data, system_blocks):
+    """
+    Compute the uncorrected fluxes and errors of a partition of the sources in a worker process, using the design
+        matrices and merge arrays shared by the main process.
+
+    Args:
+        parsed_input_data (DataFrame): Partition of the parsed input spectra.
+        system_blocks (list): Slices of the bands of each system, which are sampled separately.
+
+    Returns:
+        tuple: 2D arrays of shape (n_sources, n_bands) containing the fluxes and the errors.
+    """
+    shared_arrays = _get_shared_arrays()
+    sampled_basis_func = {band: SampledBasisFunctions.from_design_matrix(shared_arrays['sampling_grid'],
+                                                                         shared_arrays[f'{band}_design_matrix'])
+                          for band in BANDS}
+    xp_merge = {band: shared_arrays[f'{band}_merge'] for band in BANDS}
+    return _sample_photometry(parsed_input_data, sampled_basis_func, xp_merge, system_blocks, disable_info=True)
+
+
 class MultiSyntheticPhotometryGenerator(SyntheticPhotometryGenerator):
 
-    def __init__(self, photometric_system, bp_model, rp_model):
+    def __init__(self, photometric_system, bp_model, rp_model, n_workers=None):
         self.function_label = 'photsystem'
         if not photometric_system:
             raise ValueError('Photometric system list cannot be empty.')
@@ -15,6 +96,7 @@ class MultiSyntheticPhotometryGenerator(SyntheticPhotometryGenerator):
         self.system_label = [phot_system.get_system_label() for phot_system in self.photometric_system]
         self.bp_model = bp_model
         self.rp_model = rp_model
+        self.n_workers = n_workers
 
     def generate(self, parsed_input_data, extension, output_file, output_format, save_file):
         # Recover attributes
@@ -25,18 +107,51 @@ class MultiSyntheticPhotometryGenerator(SyntheticPhotometryGenerator):
         xp_sampling_grid_xp_merge_tuples_list = [system.load_xpmerge_from_xml() for system in internal_systems]
         xp_sampling_grid_list = [element[0] for element in xp_sampling_grid_xp_merge_tuples_list]
         xp_merge_list = [element[1] for element in xp_sampling_grid_xp_merge_tuples_list]
-        # Get basis functions list
-        sampled_basis_func_list = [self._get_sampled_basis_functions(xp_sampling, xp_sampling_grid) for
-                                   xp_sampling, xp_sampling_grid in zip(xp_sampling_list, xp_sampling_grid_list)]
-        # One list per system
-        photometry_list_of_lists = [self._create_photometry_list(parsed_input_data, phot_system, sampled_basis_func,
-                                                                 xp_merge) for phot_system, sampled_basis_func, xp_merge
-                                    in zip(systems, sampled_basis_func_list, xp_merge_list)]
-        # Now the first list contains the photometries in all systems for the first source_id, and so on.
-        rearranged_photometry_list = [sublist for sublist in tqdm(zip(*photometry_list_of_lists),
-                                                                  desc='Generating photometry',
-                                                                  total=len(parsed_input_data),
-                                                                  unit=pbar_units['photometry'], leave=False,
-                                                                  colour=pbar_colour)]
-        multi_photometry_df = MultiSyntheticPhotometry(systems, rearranged_photometry_list)._generate_output_df()
-        return multi_photometry_df
+        # The bands of all systems are sampled together, concatenating the design matrices of every system. Each system
+        # is sampled with its own matrix products, and the workers process the same blocks of sources as a single
+        # process, so that the photometry of a system does not depend on the rest of the systems or on the workers.
+        xp_sampling = {band: np.hstack([sampling[band] for sampling in xp_sampling_list]) for band in BANDS}
+        xp_merge = {band: np.concatenate([merge[band] for merge in xp_merge_list]) for band in BANDS}
+        sampled_basis_func = self._get_sampled_basis_functions(xp_sampling, np.concatenate(xp_sampling_grid_list))
+        system_blocks = _get_system_blocks(internal_systems)
+        if _use_pool(self.n_workers):
+            shared_arrays = {'sampling_grid': sampled_basis_func[BANDS.bp].get_sampling_grid()}
+            for band in BANDS:
+                shared_arrays[f'{band}_design_matrix'] = sampled_basis_func[band].get_design_matrix()
+                shared_arrays[f'{band}_merge'] = xp_merge[band]
+            partitions = _run_in_pool(_sample_photometry_partition, parsed_input_data, self.n_workers,
+                                      shared_arrays=shared_arrays, desc='Generating photometry',
+                                      unit=pbar_units['photometry'], block_size=BLOCK_SIZE, system_blocks=system_blocks)
+            flux, error = (np.vstack(values) for values in zip(*partitions))
+        else:
+            flux, error = _sample_photometry(parsed_input_data, sampled_basis_func, xp_merge, system_blocks)
+        return self._photometry_to_df(parsed_input_data['source_id'].to_numpy(), flux, error, internal_systems)
+
+    def _photometry_to_df(self, source_ids, flux, error, internal_systems):
+        """
+        Apply the corrections and zero-points of each photometric system and build the output DataFrame.
+
+        Args:
+            source_ids (ndarray): 1D array containing the source identifiers.
+            flux (ndarray): 2D array containing the uncorrected fluxes of the bands of all systems.
+            error (ndarray): 2D array containing the uncorrected flux errors of the bands of all systems.
+            internal_systems (list): List of internal photometric systems in the same order as the bands.
+
+        Returns:
+            DataFrame: The synthetic photometry in all the photometric systems.
+        """
+        columns = {'mag': dict(), 'flux': dict(), 'flux_error': dict()}
+        start = 0
+        for system in internal_systems:
+            bands = system.get_bands()
+            system_slice = slice(start, start + len(bands))
+            start += len(bands)
+            system_flux = system._correct_flux(flux[:, system_slice])
+            system_error = system._correct_error(flux[:, system_slice], error[:, system_slice])
+            system_mag = _flux_to_mag(system_flux, system.get_zero_points())
+            for name, values in zip(columns.keys(), [system_mag, system_flux, system_error]):
+                columns[name].update({f'{system.get_system_label()}_{name}_{band}': values[:, index]
+                                      for index, band in enumerate(bands)})
+        photometry_df = pd.DataFrame({'source_id': source_ids, **columns['mag'], **columns['flux'],
+                                      **columns['flux_error']})
+        return _reorder_columns(photometry_df, self.photometric_system)
@@ -127,7 +127,12 @@ def __load_additional_systems(_filters_path=None, config_file=None):
                           yes_args=_filters_path)
     else:
         create_config(_filters_path, config_file)
-    return AutoName('PhotometricSystem', _get_system_tuples())
+    system_tuples = _get_system_tuples()
+    # Systems are created lazily, look for the additional filter files now to report missing or duplicated files
+    for name, system in system_tuples:
+        if not _is_built_in_system(name):
+            system._set_file(bp_model=system.bp_model, rp_model=system.rp_model)
+    return AutoName('PhotometricSystem', system_tuples)
 
 
 def remove_additional_systems():
@@ -0,0 +1,263 @@
+"""
+archive_client.py
+====================================
+Module to retrieve the mean spectra of lists of sources from the Gaia Archive.
+
+The source IDs are split into batches which are requested concurrently through a single (optionally authenticated)
+HTTP session. Idempotent requests failing because of transient errors (lost connections, timeouts or server overload)
+are retried.
+The batches are returned in order as they arrive, so that they can be processed while the rest are downloaded.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from io import BytesIO, StringIO
+from itertools import islice
+from time import monotonic, sleep
+from zipfile import ZipFile
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from gaiaxpy.core.server import data_release, gaia_server
+
+# Maximum number of sources requested at once
+ARCHIVE_BATCH_SIZE = 5000
+# Maximum number of requests running at the same time
+MAX_CONCURRENT_REQUESTS = 4
+# Number of times a request is retried after a transient error, waiting RETRY_DELAY * 2 ** attempt seconds
+MAX_RETRIES = 3
+RETRY_DELAY = 1.0
+# Seconds to wait for the server to respond
+REQUEST_TIMEOUT = 600
+# Seconds between checks of the status of an asynchronous query
+JOB_POLL_INTERVAL = 1.0
+# Seconds to wait for an asynchronous query to finish
+JOB_TIMEOUT = 3600
+# HTTP status codes of errors which may not happen again
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ArchiveClient(object):
+    """
+    Client of the TAP and DataLink services of the Gaia Archive.
+    """
+
+    def __init__(self, user=None, password=None, server=None, _data_release=data_release,
+                 batch_size=ARCHIVE_BATCH_SIZE, max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+                 max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, timeout=REQUEST_TIMEOUT, job_timeout=JOB_TIMEOUT):
+        """
+        Initialise the client.
+
+        Args:
+            user (str): Cosmos username. If no username and password are given, the requests are anonymous.
+            password (str): Cosmos password.
+            server (str): URL of the Archive. By default, the Gaia Archive.
+            _data_release (str): Data release of the spectra.
+            batch_size (int): Maximum number of sources requested at once.
+            max_concurrent_requests (int): Maximum number of requests running at the same time.
+            max_retries (int): Number of times a request is retried after a transient error.
+            retry_delay (float): Seconds to wait before retrying a request for the first time, doubled after every
+                attempt.
+            timeout (float): Seconds to wait for the server to respond.
+            job_timeout (float): Seconds to wait for an asynchronous query to finish.
+
+        Raises:
+            ValueError: If the batch size or the number of concurrent requests is not a positive integer.
+        """
+        for name, value in [('batch size', batch_size), ('number of concurrent requests', max_concurrent_requests)]:
+            if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                raise ValueError(f'The {name} must be a positive integer.')
+        self.user = user
+        self.password = password
+        self.server = (server if server else gaia_server).rstrip('/') + '/'
+        self.data_release = _data_release
+        self.batch_size = batch_size
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.job_timeout = job_timeout
+        self.session = None
+        self.logged_in = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Create the HTTP session shared by all the requests, and log in if a username and password were given.
+        """
+        self.session = requests.Session()
+        # Keep one connection per concurrent request
+        self.session.mount(self.server, HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrent_requests))
+        if self.user and self.password:
+            try:
+                self._request('POST', 'tap-server/login', data={'username': self.user, 'password': self.password},
+                              retry=False)
+            except requests.RequestException:
+                self.close()
+                raise
+            self.logged_in = True
+
+    def close(self):
+        """
+        Log out and close the session.
+        """
+        if self.session is None:
+            return
+        try:
+            if self.logged_in:
+                self._request('POST', 'tap-server/logout', retry=False)
+        except requests.RequestException:
+            pass  # The session is closed anyway
+        finally:
+            self.session.close()
+            self.session = None
+            self.logged_in = False
+
+    def _request(self, method, path, retry=True, **kwargs):
+        """
+        Send a request to the Archive, retrying it if it fails because of a transient error.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path relative to the URL of the Archive, or absolute URL.
+            retry (bool): Whether the request can be retried. Requests which are not idempotent, such as the creation
+                of a job, must not be sent again, as the server may have received them before failing.
+            **kwargs: Keyword arguments passed to the request.
+
+        Returns:
+            Response: The response of the server.
+
+        Raises:
+            RequestException: If the request fails after all the attempts or because of a non-transient error.
+        """
+        if self.session is None:
+            raise ValueError('The client must be opened before sending requests.')
+        url = path if path.startswith(('http://', 'https://')) else self.server + path
+        max_retries = self.max_retries if retry else 0
+        for attempt in range(max_retries + 1):
+            delay = self.retry_delay * 2 ** attempt
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if response.status_code not in TRANSIENT_STATUS_CODES or attempt == max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = max(delay, _get_retry_after(response))
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == max_retries:
+                    raise
+            sleep(delay)
+
+    def query_source_ids(self, query):
+        """
+        Run an ADQL query as an asynchronous job and get the source IDs in its result.
+
+        Args:
+            query (str): ADQL query returning a column 'source_id'.
+
+        Returns:
+            list: The source IDs.
+
+        Raises:
+            TimeoutError: If the job does not finish in job_timeout seconds.
+            ValueError: If the job fails or its result does not contain source IDs.
+        """
+        # Creating the job is not idempotent, so it is sent only once
+        response = self._request('POST', 'tap-server/tap/async', retry=False, allow_redirects=False,
+                                 data={'REQUEST': 'doQuery', 'LANG': 'ADQL', 'FORMAT': 'csv', 'PHASE': 'RUN',
+                                       'QUERY': query})
+        job_url = response.headers['Location']
+        deadline = monotonic() + self.job_timeout
+        phase = self._request('GET', f'{job_url}/phase').text.strip()
+        while phase in ['PENDING', 'QUEUED', 'EXECUTING']:
+            if monotonic() >= deadline:
+                raise TimeoutError(f'The query did not finish in {self.job_timeout} seconds (job: {job_url}).')
+            sleep(JOB_POLL_INTERVAL)
+            phase = self._request('GET', f'{job_url}/phase').text.strip()
+        if phase != 'COMPLETED':
+            raise ValueError(f'The query could not be completed (job phase: {phase}).')
+        result = pd.read_csv(StringIO(self._request('GET', f'{job_url}/results/result').text))
+        if 'source_id' not in result.columns:
+            raise ValueError('The result of the query does not contain a column source_id.')
+        return result['source_id'].tolist()
+
+    def load_batch(self, source_ids):
+        """
+        Download the continuous mean spectra of some sources.
+
+        Args:
+            source_ids (list): Source IDs (string or long).
+
+        Returns:
+            DataFrame: The spectra as provided by the Archive, or None if no spectra were found.
+        """
+        response = self._request('POST', 'data-server/data',
+                                 data={'ID': ','.join(str(source_id) for source_id in source_ids),
+                                       'RELEASE': self.data_release, 'DATA_STRUCTURE': 'RAW', 'FORMAT': 'csv',
+                                       'RETRIEVAL_TYPE': 'XP_CONTINUOUS', 'VALID_DATA': 'false',
+                                       'USE_ZIP_ALWAYS': 'true'})
+        if not response.content:  # No products for the sources
+            return None
+        with ZipFile(BytesIO(response.content)) as zip_file:
+            names = [name for name in zip_file.namelist() if 'continuous' in name.lower()]
+            if not names:
+                return None
+            with zip_file.open(names[0]) as f:
+                return pd.read_csv(f, comment='#')
+
+    def iter_batches(self, source_ids):
+        """
+        Download the continuous mean spectra of a list of sources in batches. Up to max_concurrent_requests batches are
+            downloaded at the same time.
+
+        Args:
+            source_ids (list): Source IDs (string or long).
+
+        Returns:
+            generator: The spectra of each batch as provided by the Archive, in the order of the batches. Batches with
+                no spectra are skipped.
+        """
+        batches = (source_ids[start:start + self.batch_size] for start in range(0, len(source_ids), self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            pending = deque(executor.submit(self.load_batch, batch) for batch in
+                            islice(batches, self.max_concurrent_requests))
+            try:
+                while pending:
+                    data = pending.popleft().result()
+                    pending.extend(executor.submit(self.load_batch, batch) for batch in islice(batches, 1))
+                    if data is not None:
+                        yield data
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def _get_retry_after(response):
+    """
+    Get the number of seconds to wait before retrying a request, as requested by the server in a Retry-After header.
+
+    Args:
+        response (Response): Response of the server.
+
+    Returns:
+        float: Seconds to wait, or zero if the header is missing or invalid.
+    """
+    retry_after = response.headers.get('Retry-After')
+    if not retry_after:
+        return 0.0
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:  # The header can also be an HTTP date
+        try:
+            return max((parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return 0.0
@@ -1,3 +1,10 @@
+import pandas as pd
+
+from gaiaxpy.core.server import data_release
+from .archive_client import ARCHIVE_BATCH_SIZE, ArchiveClient
+from .dataframe_reader import DataFrameReader
+
+
 class ArchiveReader(object):
 
     def __init__(self, function, user, password, disable_info=False):
@@ -6,10 +13,50 @@ class ArchiveReader(object):
         self.password = password
         self.disable_info = disable_info
 
-    def _login(self, gaia):
-        user = self.user
-        password = self.password
-        if user and password:
-            gaia.login(user=user, password=password)
-        else:
-            pass
+    def _get_client(self, _data_release=data_release, batch_size=ARCHIVE_BATCH_SIZE):
+        return ArchiveClient(user=self.user, password=self.password, _data_release=_data_release,
+                             batch_size=batch_size)
+
+    def _check_function(self):
+        raise NotImplementedError()
+
+    def _get_source_ids(self, client):
+        raise NotImplementedError()
+
+    def read(self, _data_release=data_release):
+        """
+        Download the spectra of all the sources.
+
+        Args:
+            _data_release (str): Data release of the spectra.
+
+        Returns:
+            DataFrame: The parsed spectra.
+            str: The extension of the data, None.
+        """
+        self._check_function()
+        with self._get_client(_data_release) as client:
+            data = list(client.iter_batches(self._get_source_ids(client)))
+        if not data:
+            raise ValueError('No continuous raw data found for the given sources.')
+        return DataFrameReader(pd.concat(data, ignore_index=True), disable_info=self.disable_info).read_df()
+
+    def read_batches(self, batch_size=ARCHIVE_BATCH_SIZE, _data_release=data_release):
+        """
+        Download the spectra of the sources in batches, each one parsed as soon as it arrives.
+
+        Args:
+            batch_size (int): Maximum number of sources per batch.
+            _data_release (str): Data release of the spectra.
+
+        Returns:
+            generator: Tuples containing the parsed spectra of a batch and the extension of the data, None.
+        """
+        self._check_function()
+        with self._get_client(_data_release, min(batch_size, ARCHIVE_BATCH_SIZE)) as client:
+            found = False
+            for data in client.iter_batches(self._get_source_ids(client)):
+                found = True
+                yield DataFrameReader(data, disable_info=True).read_df()
+        if not found:
+            raise ValueError('No continuous raw data found for the given sources.')
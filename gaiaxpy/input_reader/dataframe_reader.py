@@ -1,10 +1,9 @@
 import numpy as np
 
-from gaiaxpy.core.generic_functions import array_to_symmetric_matrix
 from .dataframe_numpy_array_reader import DataFrameNumPyArrayReader
 from .dataframe_string_array_reader import DataFrameStringArrayReader
 from ..core.satellite import BANDS
-from ..spectrum.utils import get_covariance_matrix
+from ..spectrum.utils import get_covariance_matrices
 
 matrix_columns = [('bp_n_parameters', 'bp_coefficient_correlations'),
                   ('rp_n_parameters', 'rp_coefficient_correlations')]
@@ -53,10 +52,7 @@ class DataFrameReader(object):
             data = content
             array_columns = []
         if needs_matrix_conversion(array_columns):
-            for size_column, values_column in matrix_columns:
-                data[values_column] = data.apply(lambda row: array_to_symmetric_matrix(row[values_column],
-                                                                                       row[size_column]), axis=1)
-            if matrix_columns:
-                for band in BANDS:
-                    data[f'{band}_covariance_matrix'] = data.apply(get_covariance_matrix, axis=1, args=(band,))
+            # The correlations are kept as given, the covariance matrices are built from them in packed form
+            for band in BANDS:
+                data[f'{band}_covariance_matrix'] = get_covariance_matrices(data, band)
         return data, None  # No extension returned for DataFrames
@@ -1,7 +1,7 @@
 import numpy as np
 import pandas as pd
 
-from gaiaxpy.core.generic_functions import str_to_array
+from gaiaxpy.file_parser.parse_string_arrays import parse_string_array_columns
 
 # Avoid warning, false positive
 pd.options.mode.chained_assignment = None
@@ -14,11 +14,7 @@ class DataFrameStringArrayReader(object):
         self.array_columns = array_columns
 
     def _parse_parenthesis_arrays(self):
-        df = self.content
-        array_columns = self.array_columns
-        for column in array_columns:
-            df[column] = df[column].apply(lambda x: str_to_array(x))
-        return df
+        return parse_string_array_columns(self.content, self.array_columns)
 
     def _parse_brackets_arrays(self):
         df = self.content
@@ -16,8 +16,10 @@ def raise_error():
 
 function_parser_dict = {'apply_colour_equation': raise_error,
                         'convert': internal_continuous,
+                        'create_spectrum_store': internal_continuous,
                         '_calibrate': internal_continuous,
                         'calibrate': internal_continuous,
+                        'fit_templates': internal_continuous,
                         '_generate': internal_continuous,
                         'generate': internal_continuous,
                         'get_inverse_covariance_matrix': internal_continuous,
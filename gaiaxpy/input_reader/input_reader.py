@@ -1,4 +1,4 @@
-from os.path import isabs, isfile
+from os.path import isabs, isdir, isfile
 from pathlib import Path
 
 import pandas as pd
@@ -26,7 +26,7 @@ class InputReader(object):
         user = self.user
         password = self.password
         disable_info = self.disable_info
-        if isfile(content) or isabs(content):  # Check if content is file path
+        if isfile(content) or isdir(content) or isabs(content):  # Check if content is a file path (or a store)
             selector = FileReader(function, disable_info=disable_info)
             parser = selector.select()  # Select type of parser required
             parsed_input_data, extension = parser._parse(content)
@@ -37,6 +37,52 @@ class InputReader(object):
             raise ValueError('Input string does not correspond to an existing file and it is not an ADQL query.')
         return parsed_input_data, extension
 
+    def __sources_reader(self):
+        try:
+            file_path, source_ids = self.content
+        except ValueError:
+            raise ValueError('Input tuples must contain the path to a file and a list of source IDs.')
+        file_path = str(file_path) if isinstance(file_path, Path) else file_path
+        if not isinstance(file_path, str) or not (isfile(file_path) or isdir(file_path)):
+            raise ValueError('The first element of the input tuple does not correspond to an existing file.')
+        if isinstance(source_ids, (str, int)) or not len(source_ids):
+            raise ValueError('The second element of the input tuple must be a non-empty list of source IDs.')
+        parser = FileReader(self.function, disable_info=self.disable_info).select()
+        return parser._parse_sources(file_path, source_ids)
+
+    def read_chunks(self, chunk_size):
+        """
+        Read the input content in blocks of rows. Files are parsed incrementally and the spectra of lists of sources and
+            ADQL queries are downloaded from the Archive in batches of at most chunk_size sources. Other types of input
+            are read in full and then split.
+
+        Args:
+            chunk_size (int): Maximum number of rows per block.
+
+        Returns:
+            generator: Tuples containing the parsed data of a block and the extension of the input.
+        """
+        content = str(self.content) if isinstance(self.content, Path) else self.content
+        if isinstance(content, str) and (isfile(content) or isdir(content) or isabs(content)):
+            parser = FileReader(self.function, disable_info=self.disable_info).select()
+            chunks = parser._parse_chunks(content, chunk_size)
+        elif not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError('The chunk size must be a positive integer.')
+        elif isinstance(content, list):
+            chunks = ListReader(content, self.function, self.user, self.password,
+                                disable_info=self.disable_info).read_batches(chunk_size)
+        elif isinstance(content, str) and content.lower().startswith('select'):
+            chunks = QueryReader(content, self.function, user=self.user, password=self.password,
+                                 disable_info=self.disable_info).read_batches(chunk_size)
+        else:
+            full_data, extension = self.read()
+            chunks = ((full_data.iloc[start:start + chunk_size].reset_index(drop=True), extension)
+                      for start in range(0, len(full_data), chunk_size))
+        for parsed_data, extension in chunks:
+            extension = default_extension if extension is None else extension
+            parsed_data['source_id'] = parsed_data['source_id'].astype('int64')
+            yield parsed_data, extension
+
     def read(self):
         content = self.content
         function = self.function
@@ -53,6 +99,9 @@ class InputReader(object):
         elif isinstance(content, Path):
             self.content = str(content)
             parsed_data, extension = self.__string_reader()
+        # Selection of sources from a local file
+        elif isinstance(content, tuple):
+            parsed_data, extension = self.__sources_reader()
         else:
             raise ValueError('The input provided does not match any of the expected input types.')
         extension = default_extension if extension is None else extension
@@ -13,118 +13,152 @@ import pandas as pd
 from astropy.io import fits
 from astropy.io.votable.tree import Field, Resource, Table, VOTableFile
 from astropy.units import UnitsWarning
-from fastavro import parse_schema, writer
-from fastavro.validation import validate_many
 
 from gaiaxpy.core.satellite import BANDS
-from .output_data import OutputData
-from .utils import _add_ecsv_header, _build_ecsv_header, _generate_fits_header, _load_header_dict
+from .output_data import ColumnarOutputData
+from .parquet_writer import _write_parquet
+from .utils import _add_ecsv_header, _build_ecsv_header, _format_column, _generate_avro_records, \
+    _generate_fits_header, _load_header_dict, _to_avro_arrays, _to_object_array, _write_avro
 
 warnings.filterwarnings('ignore', category=UnitsWarning)
 
 
-class ContinuousSpectraData(OutputData):
+class ContinuousSpectraData(ColumnarOutputData):
+    """
+    Continuous spectra. The coefficients, errors and correlations of each band are stored as 2D arrays when they are
+        available for all the sources.
+    """
 
-    def __init__(self, data):
+    def __init__(self, data, typed_avro=False):
+        """
+        Initialise the continuous spectra.
+
+        Args:
+            data (DataFrame): Continuous spectra.
+            typed_avro (bool): Whether to store the coefficients, errors and correlations of AVRO files as arrays of
+                numbers instead of strings of the form '(a, b, c)'. Typed files can be read back as input data.
+        """
         super().__init__(data, None)
+        self.typed_avro = typed_avro
+
+    def _get_text_data(self):
+        """
+        Get the data with the arrays of each row converted to strings of the form '(a, b, c)'.
+
+        Returns:
+            DataFrame: The converted data.
+        """
+        text_data = pd.DataFrame({column: _format_column(array, lambda row: str(tuple(row)))
+                                  for column, array in self.columns.items()}, index=self.index)
+        text_data.attrs = dict(self.attrs)
+        return text_data
 
-    def _save_avro(self, output_path, output_file):
+    def _save_avro(self, output_path, output_file, append=False):
         """
         Save the output spectra in AVRO format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
 
-        def _generate_avro_schema(_spectra_dicts):
+        def _generate_avro_schema(_columns):
             """
             Generate the AVRO schema required to store the output.
 
             Args:
-                _spectra_dicts (list): A list of dictionaries containing spectra.
+                _columns (dict): Columns of the output spectra.
 
             Returns:
-                dict: A dictionary containing the parsed schema that matches the input.
-                list of dicts: A list of dictionaries with the modified input spectra
-                according to the valid AVRO types.
+                dict: A dictionary containing the schema that matches the input.
+                function: Function converting a block of a column to the values of the AVRO records.
             """
+            if self.typed_avro:
+                # The fields of a band are null when it is missing
+                double_array, float_array = ['null', {'type': 'array', 'items': 'double'}], \
+                                            ['null', {'type': 'array', 'items': 'float'}]
+                int_field = ['null', 'int']
+            else:
+                double_array, float_array, int_field = 'string', 'string', 'int'
             field_to_type = {
                 'source_id': 'long',
                 'bp_standard_deviation': 'float', 'rp_standard_deviation': 'float',
-                'bp_coefficients': 'string', 'rp_coefficients': 'string',
-                'bp_coefficient_correlations': 'string', 'rp_coefficient_correlations': 'string',
-                'bp_coefficient_errors': 'string', 'rp_coefficient_errors': 'string',
-                'bp_n_parameters': 'int', 'rp_n_parameters': 'int',
-                'bp_basis_function_id': 'int', 'rp_basis_function_id': 'int'
+                'bp_coefficients': double_array, 'rp_coefficients': double_array,
+                'bp_coefficient_correlations': double_array, 'rp_coefficient_correlations': double_array,
+                'bp_coefficient_errors': float_array, 'rp_coefficient_errors': float_array,
+                'bp_n_parameters': int_field, 'rp_n_parameters': int_field,
+                'bp_basis_function_id': int_field, 'rp_basis_function_id': int_field
             }
 
             def build_field(keys):
                 return [{'name': key, 'type': field_to_type[key]} for key in keys]
 
+            def format_column(column, array):
+                # Spectrum fields to arrays or strings, the rest to Python types
+                if field_to_type[column] == int_field and self.typed_avro:
+                    return [None if pd.isna(value) else int(value) for value in array.tolist()]
+                if isinstance(field_to_type[column], list):
+                    return _to_avro_arrays(array)
+                if field_to_type[column] == 'string':
+                    return [str(tuple(value)) for value in array]
+                return array.tolist()
+
             schema = {'doc': 'Spectrum output.', 'name': 'Spectra', 'namespace': 'spectrum', 'type': 'record',
-                      'fields': build_field(_spectra_dicts[0].keys())}
-            # Spectrum fields to string
-            for spectrum in _spectra_dicts:
-                for field, _type in field_to_type.items():
-                    if _type == 'string':
-                        spectrum[field] = str(tuple(spectrum[field]))
-            # Validate that records match the schema
-            validate_many(_spectra_dicts, schema)
-            return parse_schema(schema), _spectra_dicts
+                      'fields': build_field(_columns.keys())}
+            return schema, format_column
 
-        data = self.data
-        # List with one dictionary per source
-        spectra_dicts = data.to_dict('records')
-        parsed_schema, spectra_dicts = _generate_avro_schema(spectra_dicts)
+        schema, format_column = _generate_avro_schema(self.columns)
         Path(output_path).mkdir(parents=True, exist_ok=True)
-        output_path = join(output_path, f'{output_file}.avro')
-        with open(output_path, 'wb') as output:
-            writer(output, parsed_schema, spectra_dicts)
+        # One record per source, generated in blocks
+        spectra_records = _generate_avro_records(self.columns, format_column)
+        _write_avro(join(output_path, f'{output_file}.avro'), schema, spectra_records, append=append)
 
-    def _save_csv(self, output_path, output_file):
+    def _save_csv(self, output_path, output_file, append=False):
         """
         Save the output spectra in CSV format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
-        spectra_df = self.data
-        array_columns = [column for column in spectra_df.columns if isinstance(spectra_df[column].iloc[0], np.ndarray)]
-        spectra_df[array_columns] = spectra_df[array_columns].apply(lambda col: col.apply(tuple)).astype('str')
+        spectra_df = self._get_text_data()
         Path(output_path).mkdir(parents=True, exist_ok=True)
         output_path = join(output_path, f'{output_file}.csv')
-        spectra_df.to_csv(output_path, index=False)
+        spectra_df.to_csv(output_path, index=False, mode='a' if append else 'w', header=not append)
 
-    def _save_ecsv(self, output_path, output_file):
+    def _save_ecsv(self, output_path, output_file, append=False):
         """
         Save the output spectra in ECSV format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
-        spectra_df = self.data
-        array_columns = [column for column in spectra_df.columns if isinstance(spectra_df[column].iloc[0], np.ndarray)]
-        header_lines = _build_ecsv_header(spectra_df)
-        spectra_df[array_columns] = spectra_df[array_columns].apply(lambda col: col.apply(tuple)).astype('str')
+        header_lines = _build_ecsv_header(self.data)
+        spectra_df = self._get_text_data()
         Path(output_path).mkdir(parents=True, exist_ok=True)
+        if append:
+            spectra_df.to_csv(join(output_path, f'{output_file}.ecsv'), index=False, mode='a', header=False)
+            return
         spectra_df.to_csv(join(output_path, f'{output_file}.ecsv'), index=False)
         _add_ecsv_header(header_lines, output_path, output_file)
 
-    def _save_fits(self, output_path, output_file):
+    def _save_fits(self, output_path, output_file, append=False):
         """
         Save the output data in FITS format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Not supported for this format.
         """
-        data = self.data
-        coefficients_format = f"{len(data['bp_coefficients'].iloc[0])}D"  # D: double precision float
-        correlations_format = f"{len(data['bp_coefficient_correlations'].iloc[0])}D"
-        errors_format = f"{len(data['bp_coefficient_errors'].iloc[0])}E"  # E: single precision float
+        spectra_columns = self.columns
+        coefficients_format = f"{len(spectra_columns['bp_coefficients'][0])}D"  # D: double precision float
+        correlations_format = f"{len(spectra_columns['bp_coefficient_correlations'][0])}D"
+        errors_format = f"{len(spectra_columns['bp_coefficient_errors'][0])}E"  # E: single precision float
         # Define formats for each type according to FITS
         column_formats = {
             'source_id': 'K',
@@ -140,16 +174,13 @@ class ContinuousSpectraData(OutputData):
         hdr = fits.Header()
         primary_hdu = fits.PrimaryHDU(header=hdr)
         hdu_list.append(primary_hdu)
-        # Create a dictionary to hold all the data
-        output_by_column_dict = data.reset_index().to_dict(orient='list')
-        # Remove index from output dict
-        output_by_column_dict.pop('index', None)
-        spectra_keys = output_by_column_dict.keys()
-        data_type = data.attrs['data_type']
+        data_type = self.attrs['data_type']
         units_dict = data_type.get_units()
-        columns = [fits.Column(name=key, array=np.array(output_by_column_dict[key]), format=column_formats[key],
-                               unit=units_dict.get(key, '')) for key in spectra_keys]
-        header = _generate_fits_header(data, column_formats)
+        # Columns of objects (e.g.: arrays of different lengths) are converted to arrays of their own type
+        columns = [fits.Column(name=key, array=np.array(array.tolist()) if array.dtype == object else array,
+                               format=column_formats[key], unit=units_dict.get(key, ''))
+                   for key, array in spectra_columns.items()]
+        header = _generate_fits_header(spectra_columns.keys(), data_type, column_formats)
         hdu = fits.BinTableHDU.from_columns(columns, header=header)
         hdu_list.append(hdu)
         # Put all HDUs together
@@ -159,6 +190,19 @@ class ContinuousSpectraData(OutputData):
         output_path = join(output_path, f'{output_file}.fits')
         hdul.writeto(output_path, overwrite=True)
 
+    def _save_parquet(self, output_path, output_file):
+        """
+        Save the output spectra in Parquet format. The coefficients, errors and correlations are stored as fixed-size
+            list columns, or as list columns that are null for the missing bands. The values are stored with their full
+            precision, so that these files can be read back as input data.
+
+        Args:
+            output_path (str): Path where to save the file.
+            output_file (str): Name of the output file.
+        """
+        Path(output_path).mkdir(parents=True, exist_ok=True)
+        _write_parquet(join(output_path, f'{output_file}.parquet'), self.columns)
+
     def _save_xml(self, output_path, output_file):
         """
         Save the output spectra in XML/VOTABLE format.
@@ -168,7 +212,7 @@ class ContinuousSpectraData(OutputData):
             output_file (str): Name of the output file.
         """
 
-        def _create_fields(_votable, _spectra_df):
+        def _create_fields(_votable, _columns, data_type):
             fields_datatypes = {'source_id': 'long',
                                 f'{BANDS.bp}_standard_deviation': 'double', f'{BANDS.rp}_standard_deviation': 'double',
                                 f'{BANDS.bp}_coefficients': 'double', f'{BANDS.rp}_coefficients': 'double',
@@ -185,8 +229,6 @@ class ContinuousSpectraData(OutputData):
                                  f'{BANDS.bp}_coefficient_errors': '*', f'{BANDS.rp}_coefficient_errors': '*',
                                  f'{BANDS.bp}_n_parameters': '', f'{BANDS.rp}_n_parameters': '',
                                  f'{BANDS.bp}_basis_function_id': '', f'{BANDS.rp}_basis_function_id': ''}
-            columns = _spectra_df.columns
-            data_type = _spectra_df.attrs['data_type']
             units_dict = data_type.get_units()
             header_dict = _load_header_dict()
             _fields = [Field(_votable, name=column, datatype=fields_datatypes[column],
@@ -194,12 +236,12 @@ class ContinuousSpectraData(OutputData):
                              unit=units_dict.get(column, '')) if fields_array_size[column] != '' else
                        Field(_votable, name=column, datatype=fields_datatypes[column],
                              ucd=header_dict.get(column, dict()).get('meta', ''), unit=units_dict.get(column, ''))
-                       for column in columns]
+                       for column in _columns]
             for _field in _fields:
                 _field.description = header_dict.get(_field.name, dict()).get('description', '')
             return _fields
 
-        spectra_df = self.data
+        spectra_columns = self.columns
         # Create a new VOTable file
         votable = VOTableFile()
         # Add a resource
@@ -209,12 +251,13 @@ class ContinuousSpectraData(OutputData):
         spectra_table = Table(votable)
         resource.tables.append(spectra_table)
         # Add spectrum fields
-        fields = _create_fields(votable, spectra_df)
+        fields = _create_fields(votable, spectra_columns, self.attrs['data_type'])
         spectra_table.fields.extend(fields)
-        # Create the record arrays, with the given number of rows
-        spectra_table.create_arrays(len(spectra_df))
-        for index, row in enumerate(spectra_df.to_dict('records')):
-            spectra_table.array[index] = tuple([row[column] for column in spectra_df.columns])
+        # Create the record arrays, with the given number of rows, and fill them column by column
+        spectra_table.create_arrays(len(self))
+        for column, array in spectra_columns.items():
+            spectra_table.array[column] = array if spectra_table.array.dtype[column] != object else \
+                _to_object_array(array)
         # Write to a file
         Path(output_path).mkdir(parents=True, exist_ok=True)
         output_path = join(output_path, f'{output_file}.xml')
@@ -0,0 +1,168 @@
+"""
+fits_writer.py
+====================================
+Module to write FITS binary tables in blocks of rows.
+
+The rows are converted to the big-endian records of the FITS standard one block at a time and written straight to the
+file, so only one block of the table needs to be converted at once. The number of rows in the header is updated when
+the file is closed, which also allows appending more rows to a file written by a previous call.
+"""
+
+from io import BytesIO
+from os.path import exists
+
+import numpy as np
+from astropy.io import fits
+
+# Size of the blocks of a FITS file in bytes
+FITS_BLOCK_SIZE = 2880
+# Number of rows converted and written at once
+ROW_BLOCK_SIZE = 10000
+
+
+def _pad(size):
+    """
+    Get the number of bytes required to fill the last FITS block.
+
+    Args:
+        size (int): Number of bytes written.
+
+    Returns:
+        int: Number of padding bytes.
+    """
+    return -size % FITS_BLOCK_SIZE
+
+
+def _get_record_dtype(table_hdu):
+    """
+    Get the big-endian record type of the rows of a binary table.
+
+    Args:
+        table_hdu (BinTableHDU): Binary table HDU.
+
+    Returns:
+        dtype: Record type of the rows, as stored in a FITS file.
+    """
+    return np.dtype(table_hdu.data.dtype).newbyteorder('>')
+
+
+def _to_records(columns, dtype):
+    """
+    Convert a block of columns to FITS records.
+
+    Args:
+        columns (dict): Dictionary mapping the name of each column to its array. The first dimension of the arrays runs
+            over the rows.
+        dtype (dtype): Big-endian record type of the rows.
+
+    Returns:
+        ndarray: 1D array of records.
+    """
+    n_rows = len(next(iter(columns.values())))
+    records = np.empty(n_rows, dtype=dtype)
+    for name in dtype.names:
+        values = columns[name]
+        if values.dtype == object and values.ndim == 1 and dtype[name].shape:
+            values = np.stack(values)  # Arrays of a column of objects
+        records[name] = values
+    return records
+
+
+class FitsTableWriter(object):
+    """
+    Writer of a FITS file containing a binary table in its first extension, which can be written in blocks of rows.
+        Other extensions (e.g.: the sampling of the spectra) are written after the table.
+    """
+
+    def __init__(self, path, columns, header=None, extra_hdus=None, append=False):
+        """
+        Create a FITS file or open an existing one to append more rows to its table.
+
+        Args:
+            path (str): Path to the output file.
+            columns (list): List of astropy.io.fits.Column objects (with no data) defining the columns of the table.
+            header (Header): Additional cards for the header of the table.
+            extra_hdus (list): HDUs to write after the table. If None and rows are appended to an existing file, the
+                extensions that follow the table in the file are kept.
+            append (bool): Whether to append rows to a file written by a previous writer.
+
+        Raises:
+            ValueError: If the columns do not match the ones of the existing table.
+        """
+        table_hdu = fits.BinTableHDU.from_columns(columns, header=header, nrows=0)
+        self.dtype = _get_record_dtype(table_hdu)
+        self.path = path
+        self.n_rows = 0
+        if append and exists(path):
+            self.__open_existing(table_hdu, extra_hdus)
+        else:
+            self.__create(table_hdu, extra_hdus)
+
+    def __create(self, table_hdu, extra_hdus):
+        self.file = open(self.path, 'wb')
+        self.file.write(fits.PrimaryHDU().header.tostring().encode('ascii'))
+        self.header_location = self.file.tell()
+        self.header = table_hdu.header
+        self.file.write(self.header.tostring().encode('ascii'))
+        self.data_location = self.file.tell()
+        self.trailing_bytes = b''.join(self.__hdu_to_bytes(hdu) for hdu in extra_hdus or [])
+
+    def __open_existing(self, table_hdu, extra_hdus):
+        with fits.open(self.path) as hdul:
+            header = hdul[1].header
+            if header['NAXIS1'] != table_hdu.header['NAXIS1'] or \
+                    [header.get(f'TFORM{index + 1}') for index in range(header['TFIELDS'])] != \
+                    [column.format for column in table_hdu.columns]:
+                raise ValueError('The columns do not match the ones of the table in the existing file.')
+            self.n_rows = header['NAXIS2']
+            self.header = header.copy()
+            file_info = hdul.fileinfo(1)
+            self.header_location, self.data_location = file_info['hdrLoc'], file_info['datLoc']
+            trailing_location = file_info['datLoc'] + file_info['datSpan']
+        self.file = open(self.path, 'r+b')
+        if extra_hdus is None:
+            self.file.seek(trailing_location)
+            self.trailing_bytes = self.file.read()
+        else:
+            self.trailing_bytes = b''.join(self.__hdu_to_bytes(hdu) for hdu in extra_hdus)
+        self.file.seek(self.data_location + self.n_rows * self.dtype.itemsize)
+        self.file.truncate()
+
+    @staticmethod
+    def __hdu_to_bytes(hdu):
+        # The HDU is serialised by astropy after an empty primary HDU
+        buffer = BytesIO()
+        fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(buffer)
+        return buffer.getvalue()[len(fits.PrimaryHDU().header.tostring()):]
+
+    def write(self, columns):
+        """
+        Write a block of rows at the end of the table.
+
+        Args:
+            columns (dict): Dictionary mapping the name of each column to its array. The first dimension of the arrays
+                runs over the rows.
+        """
+        records = _to_records(columns, self.dtype)
+        self.file.write(records.tobytes())
+        self.n_rows += len(records)
+
+    def close(self):
+        """
+        Complete the table with its padding and number of rows, write the extensions that follow it and close the file.
+        """
+        self.file.write(b'\0' * _pad(self.n_rows * self.dtype.itemsize))
+        self.file.write(self.trailing_bytes)
+        self.header['NAXIS2'] = self.n_rows
+        header_bytes = self.header.tostring().encode('ascii')
+        if len(header_bytes) != self.data_location - self.header_location:
+            raise ValueError('The size of the header of the table cannot change.')
+        self.file.seek(self.header_location)
+        self.file.write(header_bytes)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -6,8 +6,11 @@ Module to represent generic output data.
 from ast import literal_eval
 from os.path import dirname, abspath, join
 
+import pandas as pd
+
 from gaiaxpy.core.generic_functions import standardise_extension
 from gaiaxpy.file_parser.parse_generic import InvalidExtensionError
+from .utils import _columns_to_data_frame, _concat_columns, _data_frame_to_columns
 
 
 def _load_header_dict():
@@ -69,13 +72,19 @@ def _add_header(header, output_path, output_file):
         f.write(header + s)
 
 
+# Formats to which data can be appended without rewriting the file
+APPENDABLE_FORMATS = ['avro', 'csv', 'ecsv']
+
+
 class OutputData(object):
+    # Formats to which this type of data can be appended
+    appendable_formats = APPENDABLE_FORMATS
 
     def __init__(self, data, positions):
         self.data = data.copy()
         self.positions = positions
 
-    def save(self, save_file, output_path, output_file, output_format, extension):
+    def save(self, save_file, output_path, output_file, output_format, extension, append=False):
         """
         Save the output data.
 
@@ -85,6 +94,11 @@ class OutputData(object):
             output_file (str): Name of the output file.
             output_format (str): Format of the output file.
             extension (str): Format of the original input file.
+            append (bool): Whether to append the data to an existing file written by a previous call. Only available
+                for the formats in appendable_formats.
+
+        Raises:
+            ValueError: If append is True and the output format does not support it.
         """
         if save_file:
             if output_file is None:
@@ -93,31 +107,135 @@ class OutputData(object):
                 output_format = extension
             print('Saving file...', end='\r')
             output_format = standardise_extension(output_format)
+            if append and output_format not in self.appendable_formats:
+                raise ValueError(f'Data cannot be appended to an existing {output_format} file.')
             if output_format == 'avro':
-                self._save_avro(output_path, output_file)
+                self._save_avro(output_path, output_file, append=append)
             elif output_format == 'csv':
-                self._save_csv(output_path, output_file)
+                self._save_csv(output_path, output_file, append=append)
             elif output_format == 'ecsv':
-                self._save_ecsv(output_path, output_file)
+                self._save_ecsv(output_path, output_file, append=append)
             elif output_format == 'fits':
-                self._save_fits(output_path, output_file)
+                self._save_fits(output_path, output_file, append=append)
+            elif output_format == 'parquet':
+                self._save_parquet(output_path, output_file)
             elif output_format == 'xml':
                 self._save_xml(output_path, output_file)
             else:
                 raise InvalidExtensionError()
             print(f"Done! Output saved to path: {join(output_path, output_file + '.' + output_format)}", end='\r')
 
-    def _save_avro(self, output_path, output_file):
+    def _save_avro(self, output_path, output_file, append=False):
         raise NotImplementedError()
 
-    def _save_csv(self, output_path, output_file):
+    def _save_csv(self, output_path, output_file, append=False):
         raise NotImplementedError()
 
-    def _save_ecsv(self, output_path, output_file):
+    def _save_ecsv(self, output_path, output_file, append=False):
         raise NotImplementedError()
 
-    def _save_fits(self, output_path, output_file):
+    def _save_fits(self, output_path, output_file, append=False):
+        raise NotImplementedError()
+
+    def _save_parquet(self, output_path, output_file):
         raise NotImplementedError()
 
     def _save_xml(self, output_path, output_file):
         raise NotImplementedError()
+
+
+class ColumnarOutputData(OutputData):
+    """
+    Output data stored by columns. Each column containing an array of the same shape in every row is stored as a single
+        contiguous array (e.g.: a 2D array of shape (n_rows, n_samples) for the flux) instead of one small array per
+        row. A DataFrame view of the data is only built when it is requested.
+    """
+
+    def __init__(self, data, positions, attrs=None):
+        """
+        Initialise the output data.
+
+        Args:
+            data (DataFrame/dict): Output data, either as a DataFrame or as a dictionary mapping the name of each column
+                to its array (stacked if it contains arrays). The arrays in a dictionary are not copied.
+            positions (ndarray): Sampling grid shared by all the rows, if any.
+            attrs (dict): Attributes of the data (e.g.: its data_type), only used if data is a dictionary.
+        """
+        if isinstance(data, dict):
+            self._set_columns(data, attrs=attrs)
+        else:
+            self.data = data
+        self.positions = positions
+
+    @property
+    def data(self):
+        """
+        DataFrame: The output data. The arrays in each row are views of the stacked columns. The DataFrame is built the
+            first time it is requested and then reused, so modifications must be assigned back to this attribute to be
+            kept.
+        """
+        if self._data is None:
+            self._data = _columns_to_data_frame(self.columns, self.index, self.attrs)
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._set_columns(_data_frame_to_columns(data), data.index.copy(), data.attrs)
+
+    def _set_columns(self, columns, index=None, attrs=None):
+        """
+        Replace the output data by a dictionary of columns.
+
+        Args:
+            columns (dict): Dictionary mapping the name of each column to its array.
+            index (Index): Index of the rows. If None, a range index is used.
+            attrs (dict): Attributes of the data.
+        """
+        self.columns = columns
+        self.index = pd.RangeIndex(len(next(iter(columns.values())))) if index is None and columns else index
+        self.attrs = dict(attrs) if attrs else dict()
+        self._data = None
+
+    def __len__(self):
+        return len(self.index) if self.index is not None else 0
+
+
+def _save_in_chunks(output_chunks, save_file, output_path, output_file, output_format):
+    """
+    Save output data produced in blocks. The blocks are appended to the output file as they are produced if the format
+        allows it, so that only one block needs to be kept in memory. Otherwise, all the blocks are gathered and saved
+        together at the end.
+
+    Args:
+        output_chunks (iterable): Tuples containing the output data of a block (OutputData) and the format of the
+            original input file.
+        save_file (bool): Whether to save the file or not.
+        output_path (str): Path where to save the file.
+        output_file (str): Name of the output file.
+        output_format (str): Format of the output file.
+
+    Returns:
+        DataFrame: The output data of all the blocks, or None if the blocks have only been written to the output file.
+    """
+    gathered_data = []
+    output_data, extension = None, None
+    for index, (output_data, extension) in enumerate(output_chunks):
+        chunk_format = standardise_extension(extension if output_format is None else output_format)
+        if save_file and chunk_format in output_data.appendable_formats:
+            output_data.save(save_file, output_path, output_file, chunk_format, extension, append=index > 0)
+        else:
+            gathered_data.append(output_data)
+    if output_data is None:
+        return None if save_file else pd.DataFrame()
+    if not gathered_data:
+        return None
+    if isinstance(output_data, ColumnarOutputData):
+        # The stacked columns are concatenated without building the DataFrame of each block
+        output_data._set_columns(_concat_columns([chunk_data.columns for chunk_data in gathered_data]),
+                                 attrs=gathered_data[0].attrs)
+    else:
+        data = pd.concat([chunk_data.data for chunk_data in gathered_data], ignore_index=True)
+        data.attrs = gathered_data[0].data.attrs
+        output_data.data = data
+    output_data.save(save_file, output_path, output_file, output_format, extension)
+    return None if save_file else output_data.data
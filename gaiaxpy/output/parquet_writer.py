@@ -0,0 +1,84 @@
+"""
+parquet_writer.py
+====================================
+Module to write output data to Parquet files.
+
+Arrays are stored in list columns, or fixed-size list columns when they have the same length in every row, and the
+columns are converted to Arrow one row group at a time. Parquet files require pyarrow, which is an optional dependency.
+"""
+
+import numpy as np
+
+from gaiaxpy.file_parser.utils import _import_pyarrow
+
+# Number of rows per row group
+ROW_GROUP_SIZE = 10000
+
+
+def _is_list_column(array):
+    """
+    Check whether a 1D column contains arrays.
+
+    Args:
+        array (ndarray): Column of the output data.
+
+    Returns:
+        bool: True if the column is a 1D column of objects containing arrays.
+    """
+    return array.ndim == 1 and array.dtype == object and any(isinstance(value, np.ndarray) for value in array)
+
+
+def _to_arrow_array(array, value_dtype=None, list_column=False):
+    """
+    Convert a block of a column to an Arrow array.
+
+    Args:
+        array (ndarray): Block of a stacked column, or 1D column that may contain arrays.
+        value_dtype (dtype): Type of the elements of the arrays in the column. If None, the type of the arrays is kept
+            for stacked columns and float64 is used for columns of arrays.
+        list_column (bool): Whether the (1D) column contains arrays.
+
+    Returns:
+        pyarrow.Array: Fixed-size list array for stacked columns, list array for columns of arrays (where the rows with
+            no array, e.g.: missing bands, are null), or an array of scalars otherwise.
+    """
+    pa, _ = _import_pyarrow()
+    if array.ndim > 1:
+        values = array.reshape(-1) if value_dtype is None else array.reshape(-1).astype(value_dtype)
+        return pa.FixedSizeListArray.from_arrays(pa.array(values), array.shape[1])
+    if list_column:
+        value_dtype = np.float64 if value_dtype is None else value_dtype
+        return pa.array([value.astype(value_dtype) if isinstance(value, np.ndarray) else None for value in array],
+                        type=pa.list_(pa.from_numpy_dtype(value_dtype)))
+    return pa.array(array.tolist() if array.dtype == object else array)
+
+
+def _write_parquet(output_path, columns, value_dtypes=None, metadata=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write output data to a Parquet file.
+
+    Args:
+        output_path (str): Path to the output file.
+        columns (dict): Dictionary mapping the name of each column to its array.
+        value_dtypes (dict): Type of the elements of the arrays of some of the columns (e.g.: float32 for errors).
+        metadata (dict): Key-value pairs (strings) stored in the schema of the file.
+        row_group_size (int): Number of rows per row group.
+    """
+    pa, pq = _import_pyarrow()
+    value_dtypes = value_dtypes if value_dtypes else dict()
+    # The type of each column is decided from all its rows, a row group may only contain missing bands
+    list_columns = {name: _is_list_column(array) for name, array in columns.items()}
+    n_rows = len(next(iter(columns.values())))
+    writer = None
+    try:
+        # An empty file is still written when there are no rows
+        for start in range(0, max(n_rows, 1), row_group_size):
+            table = pa.table({name: _to_arrow_array(array[start:start + row_group_size], value_dtypes.get(name),
+                                                    list_columns[name]) for name, array in columns.items()})
+            if writer is None:
+                schema = table.schema.with_metadata(metadata) if metadata else table.schema
+                writer = pq.ParquetWriter(output_path, schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
@@ -9,11 +9,10 @@ from pathlib import Path
 from astropy.io import fits
 from astropy.io.votable import from_table, writeto
 from astropy.table import Table
-from fastavro import parse_schema, writer
-from fastavro.validation import validate_many
 
 from .output_data import OutputData
-from .utils import _add_ecsv_header, _build_photometry_header
+from .parquet_writer import _write_parquet
+from .utils import _add_ecsv_header, _build_photometry_header, _generate_avro_records, _write_avro
 
 
 class PhotometryData(OutputData):
@@ -21,68 +20,74 @@ class PhotometryData(OutputData):
     def __init__(self, data):
         super().__init__(data, None)
 
-    def _save_avro(self, output_path, output_file):
+    def _save_avro(self, output_path, output_file, append=False):
         """
         Save the output photometry in AVRO format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
 
         def build_field(keys):
             return [{'name': key, 'type': 'long'} if key == 'source_id' else {'name': key, 'type': 'float'} for key in
                     keys]
 
-        phot_list = self.data.to_dict('records')
+        photometry_df = self.data
         schema = {
             'doc': 'Output photometry.',
             'name': 'Photometry',
             'namespace': 'photometry',
             'type': 'record',
-            'fields': build_field(phot_list[0].keys()),
+            'fields': build_field(photometry_df.columns),
         }
-        validate_many(phot_list, schema)
-        parsed_schema = parse_schema(schema)
+        columns = {column: photometry_df[column].to_numpy() for column in photometry_df.columns}
+        # One record per source, generated in blocks
+        phot_records = _generate_avro_records(columns, lambda column, array: array.tolist())
         Path(output_path).mkdir(parents=True, exist_ok=True)
-        output_path = join(output_path, f'{output_file}.avro')
-        with open(output_path, 'wb') as output:
-            writer(output, parsed_schema, phot_list)
+        _write_avro(join(output_path, f'{output_file}.avro'), schema, phot_records, append=append)
 
-    def _save_csv(self, output_path, output_file):
+    def _save_csv(self, output_path, output_file, append=False):
         """
         Save the output photometry in CSV format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
         photometry_df = self.data
         Path(output_path).mkdir(parents=True, exist_ok=True)
         output_path = join(output_path, f'{output_file}.csv')
-        photometry_df.to_csv(output_path, index=False)
+        photometry_df.to_csv(output_path, index=False, mode='a' if append else 'w', header=not append)
 
-    def _save_ecsv(self, output_path, output_file):
+    def _save_ecsv(self, output_path, output_file, append=False):
         """
         Save the output photometry in ECSV format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
         photometry_df = self.data
-        header_lines = _build_photometry_header(photometry_df.columns)
         Path(output_path).mkdir(parents=True, exist_ok=True)
+        if append:
+            photometry_df.to_csv(join(output_path, f'{output_file}.ecsv'), index=False, mode='a', header=False)
+            return
+        header_lines = _build_photometry_header(photometry_df.columns)
         photometry_df.to_csv(join(output_path, f'{output_file}.ecsv'), index=False)
         _add_ecsv_header(header_lines, output_path, output_file)
 
-    def _save_fits(self, output_path, output_file):
+    def _save_fits(self, output_path, output_file, append=False):
         """
         Save the output photometry in FITS format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Not supported for this format.
         """
         photometry_df = self.data
         table = Table.from_pandas(photometry_df)
@@ -98,6 +103,19 @@ class PhotometryData(OutputData):
         output_path = join(output_path, f'{output_file}.fits')
         hdul.writeto(output_path, overwrite=True)
 
+    def _save_parquet(self, output_path, output_file):
+        """
+        Save the output photometry in Parquet format.
+
+        Args:
+            output_path (str): Path where to save the file.
+            output_file (str): Name of the output file.
+        """
+        photometry_df = self.data
+        Path(output_path).mkdir(parents=True, exist_ok=True)
+        _write_parquet(join(output_path, f'{output_file}.parquet'),
+                       {column: photometry_df[column].to_numpy() for column in photometry_df.columns})
+
     def _save_xml(self, output_path, output_file):
         """
         Save the output photometry in XML/VOTABLE format.
@@ -13,29 +13,66 @@ import pandas as pd
 from astropy.io import fits
 from astropy.io.votable.tree import Field, Param, Resource, Table, VOTableFile
 from astropy.units import UnitsWarning
-from fastavro import parse_schema, writer
-from fastavro.validation import validate_many
-from numpy import ndarray
 
-from .output_data import OutputData
-from .utils import _add_ecsv_header, _array_to_standard, _build_ecsv_header, _generate_fits_header, \
-    _get_sampling_dict, _load_header_dict
+from .fits_writer import FitsTableWriter, ROW_BLOCK_SIZE
+from .output_data import APPENDABLE_FORMATS, ColumnarOutputData
+from .parquet_writer import _write_parquet
+from .utils import _add_ecsv_header, _array_to_standard, _build_ecsv_header, _format_column, _generate_avro_records, \
+    _generate_fits_header, _get_sampling_dict, _load_header_dict, _to_avro_arrays, _to_object_array, _write_avro
 
 warnings.filterwarnings('ignore', category=UnitsWarning)
 
 
-class SampledSpectraData(OutputData):
+class SampledSpectraData(ColumnarOutputData):
+    """
+    Sampled spectra. The flux, flux errors and correlations of all the spectra are stored as 2D arrays, next to the 1D
+        columns identifying each spectrum (source_id and xp).
+    """
 
-    def __init__(self, data, positions):
-        super().__init__(data, positions)
+    # Formats to which sampled spectra can be appended
+    appendable_formats = APPENDABLE_FORMATS + ['fits']
 
-    def _save_avro(self, output_path, output_file):
+    def __init__(self, data, positions, sampling_hdu=False, typed_avro=False, attrs=None):
+        """
+        Initialise the sampled spectra.
+
+        Args:
+            data (DataFrame/dict): Sampled spectra, either as a DataFrame or as a dictionary mapping the name of each
+                column to its array (e.g.: a 2D array of shape (n_spectra, n_samples) for the flux).
+            positions (ndarray): Sampling grid shared by all the spectra.
+            sampling_hdu (bool): Whether to write the sampling of FITS files in a separate table extension named
+                SAMPLING instead of a card of the header of the spectra table.
+            typed_avro (bool): Whether to store the flux, flux errors and correlations of AVRO files as arrays of
+                numbers instead of strings of the form '(a, b, c)'.
+            attrs (dict): Attributes of the spectra (e.g.: their data_type), only used if data is a dictionary.
+        """
+        super().__init__(data, positions, attrs=attrs)
+        self.sampling_hdu = sampling_hdu
+        self.typed_avro = typed_avro
+
+    def _get_formatted_data(self, format_array):
+        """
+        Get the data with the arrays of each row formatted for a text output.
+
+        Args:
+            format_array (function): Function to apply to the array of each row.
+
+        Returns:
+            DataFrame: The formatted data.
+        """
+        formatted_data = pd.DataFrame({column: _format_column(array, format_array)
+                                       for column, array in self.columns.items()}, index=self.index)
+        formatted_data.attrs = dict(self.attrs)
+        return formatted_data
+
+    def _save_avro(self, output_path, output_file, append=False):
         """
         Save the output spectra in AVRO format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
 
         def _save_avro_sampling(_positions, _output_path, _output_file):
@@ -53,134 +90,144 @@ class SampledSpectraData(OutputData):
             sampling = [_get_sampling_dict(_positions)]
             # Sampling field to string
             sampling[0]['pos'] = str(sampling[0]['pos'])
-            # Validate that records match the schema
-            validate_many(sampling, schema)
-            _parsed_schema = parse_schema(schema)
-            with open(join(_output_path, f'{_output_file}_sampling.avro'), 'wb') as _output:
-                writer(_output, _parsed_schema, sampling)
+            _write_avro(join(_output_path, f'{_output_file}_sampling.avro'), schema, sampling)
 
-        def _generate_avro_schema(_spectra_dicts):
+        def _generate_avro_schema(_columns):
             """
             Generate the AVRO schema required to store the output.
 
             Args:
-                _spectra_dicts (list): A list of dictionaries containing spectra.
+                _columns (dict): Columns of the output spectra.
 
             Returns:
-                dict: A dictionary containing the parsed schema that matches the input.
-                list: A list of dictionaries with the modified input spectra according to the valid AVRO types.
+                dict: A dictionary containing the schema that matches the input.
+                function: Function converting a block of a column to the values of the AVRO records.
             """
-            field_to_type = {'source_id': 'long', 'xp': 'string', 'flux': 'string', 'flux_error': 'string',
-                             'correlation': 'string', 'standard_deviation': 'float'}
+            if self.typed_avro:
+                field_to_type = {'source_id': 'long', 'xp': 'string', 'flux': {'type': 'array', 'items': 'double'},
+                                 'flux_error': {'type': 'array', 'items': 'float'},
+                                 'correlation': {'type': 'array', 'items': 'double'}, 'standard_deviation': 'float'}
+            else:
+                field_to_type = {'source_id': 'long', 'xp': 'string', 'flux': 'string', 'flux_error': 'string',
+                                 'correlation': 'string', 'standard_deviation': 'float'}
 
             def build_field(keys):
                 return [{'name': key, 'type': field_to_type[key]} for key in keys]
 
+            def format_column(column, array):
+                # Spectrum fields to arrays or strings, the rest to Python types
+                if isinstance(field_to_type[column], dict):
+                    return _to_avro_arrays(array)
+                if field_to_type[column] == 'string' and column != 'xp':
+                    return [str(tuple(value)) for value in array]
+                return array.tolist()
+
             schema = {'doc': 'Spectrum output.', 'name': 'Spectra', 'namespace': 'spectrum', 'type': 'record',
-                      'fields': build_field(_spectra_dicts[0].keys()), }
-            # Spectrum fields to string
-            for spectrum in _spectra_dicts:
-                for field, _type in field_to_type.items():
-                    if _type == 'string' and not field == 'xp':
-                        try:
-                            spectrum[field] = str(tuple(spectrum[field]))
-                        except KeyError:
-                            continue  # Key may not exist (e.g.: 'xp')
-            # Validate that records match the schema
-            validate_many(_spectra_dicts, schema)
-            return parse_schema(schema), _spectra_dicts
-
-        data = self.data
+                      'fields': build_field(_columns.keys()), }
+            return schema, format_column
+
         positions = self.positions
         Path(output_path).mkdir(parents=True, exist_ok=True)
-        _save_avro_sampling(positions, output_path, output_file)
-        # List with one dictionary per source
-        spectra_dicts = data.to_dict('records')
-        parsed_schema, spectra_dicts = _generate_avro_schema(spectra_dicts)
-        output_path = join(output_path, f'{output_file}.avro')
-        with open(output_path, 'wb') as output:
-            writer(output, parsed_schema, spectra_dicts)
+        if not append:
+            _save_avro_sampling(positions, output_path, output_file)
+        schema, format_column = _generate_avro_schema(self.columns)
+        # One record per spectrum, generated in blocks
+        spectra_records = _generate_avro_records(self.columns, format_column)
+        _write_avro(join(output_path, f'{output_file}.avro'), schema, spectra_records, append=append)
 
-    def _save_csv(self, output_path, output_file):
+    def _save_csv(self, output_path, output_file, append=False):
         """
         Save the output spectra in CSV format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
-        data = self.data
         positions = self.positions
-        modified_data = data.applymap(lambda x: _array_to_standard(x) if isinstance(x, ndarray) else x)
+        modified_data = self._get_formatted_data(_array_to_standard)
         Path(output_path).mkdir(parents=True, exist_ok=True)
+        if append:
+            modified_data.to_csv(join(output_path, f'{output_file}.csv'), index=False, mode='a', header=False)
+            return
         modified_data.to_csv(join(output_path, f'{output_file}.csv'), index=False)
         # Assume the sampling is the same for all spectra
         pos = [str(_array_to_standard(positions))]
         sampling_df = pd.DataFrame({'pos': pos})
         sampling_df.to_csv(join(output_path, f'{output_file}_sampling.csv'), index=False)
 
-    def _save_ecsv(self, output_path, output_file):
+    def _save_ecsv(self, output_path, output_file, append=False):
         """
         Save the output spectra in ECSV format.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
-        data = self.data
         positions = self.positions
-        modified_data = data.applymap(lambda x: _array_to_standard(x, 'ecsv') if isinstance(x, ndarray) else x)
+        modified_data = self._get_formatted_data(lambda array: _array_to_standard(array, 'ecsv'))
+        if append:
+            modified_data.to_csv(join(output_path, f'{output_file}.ecsv'), index=False, mode='a', header=False)
+            return
         header_lines = _build_ecsv_header(modified_data, positions)
         Path(output_path).mkdir(parents=True, exist_ok=True)
         modified_data.to_csv(join(output_path, f'{output_file}.ecsv'), index=False)
         _add_ecsv_header(header_lines, output_path, output_file)
 
-    def _save_fits(self, output_path, output_file):
+    def _save_fits(self, output_path, output_file, append=False):
         """
-        Save the output data in FITS format.
+        Save the output data in FITS format. The table is written in blocks of rows, straight from the stacked columns.
 
         Args:
             output_path (str): Path where to save the file.
             output_file (str): Name of the output file.
+            append (bool): Whether to append the data to an existing file written by a previous call.
         """
-        data = self.data
+        spectra_columns = self.columns
         positions = self.positions
         # Get length of flux (should be the same as length of error)
         flux_format = f'{len(positions)}D'  # D: double precision float
         flux_error_format = f'{len(positions)}E'  # E: single precision float
         correlation_format = ''  # Correlation if requested
         try:
-            correlation_format = f"{len(data['correlation'].iloc[0])}D"
+            correlation_format = f"{len(spectra_columns['correlation'][0])}D"
         except KeyError:
             pass
         # Define formats for each type according to FITS
         column_formats = {'source_id': 'K', 'xp': '2A', 'flux': flux_format, 'flux_error': flux_error_format,
                           'correlation': correlation_format, 'standard_deviation': 'E'}
-        # create a list of HDUs
-        hdu_list = list()
-        # create a header to include the sampling
-        hdr = fits.Header()
-        primary_hdu = fits.PrimaryHDU(header=hdr)
-        hdu_list.append(primary_hdu)
-        # Create a dictionary to hold all the data
-        output_by_column_dict = data.reset_index().to_dict(orient='list')
-        # Remove index from output dict
-        output_by_column_dict.pop('index', None)
-        spectra_keys = output_by_column_dict.keys()
-        data_type = data.attrs['data_type']
+        data_type = self.attrs['data_type']
         units_dict = data_type.get_units()
-        columns = [fits.Column(name=key, array=np.array(output_by_column_dict[key]), format=column_formats[key],
-                               unit=units_dict.get(key, '')) for key in spectra_keys]
-        header = _generate_fits_header(data, column_formats)
-        header['Sampling'] = str(tuple(positions))
-        hdu = fits.BinTableHDU.from_columns(columns, header=header)
-        hdu_list.append(hdu)
-        # Put all HDUs together
-        hdul = fits.HDUList(hdu_list)
+        columns = [fits.Column(name=key, format=column_formats[key], unit=units_dict.get(key, ''))
+                   for key in spectra_columns]
+        header = _generate_fits_header(spectra_columns.keys(), data_type, column_formats)
+        if self.sampling_hdu:
+            extra_hdus = [fits.BinTableHDU.from_columns(
+                [fits.Column(name='pos', array=np.asarray(positions), format='D', unit=units_dict.get('pos', ''))],
+                name='SAMPLING')]
+        else:
+            header['Sampling'] = str(tuple(positions))
+            extra_hdus = []
         # Write the file and replace it if it already exists
         Path(output_path).mkdir(parents=True, exist_ok=True)
         output_path = join(output_path, f'{output_file}.fits')
-        hdul.writeto(output_path, overwrite=True)
+        with FitsTableWriter(output_path, columns, header=header, extra_hdus=extra_hdus, append=append) as fits_writer:
+            for start in range(0, len(self), ROW_BLOCK_SIZE):
+                fits_writer.write({key: array[start:start + ROW_BLOCK_SIZE] for key, array in spectra_columns.items()})
+
+    def _save_parquet(self, output_path, output_file):
+        """
+        Save the output spectra in Parquet format. The flux, flux errors and correlations are stored as fixed-size list
+            columns and the sampling as the key 'sampling' of the metadata of the file.
+
+        Args:
+            output_path (str): Path where to save the file.
+            output_file (str): Name of the output file.
+        """
+        Path(output_path).mkdir(parents=True, exist_ok=True)
+        _write_parquet(join(output_path, f'{output_file}.parquet'), self.columns,
+                       value_dtypes={'flux_error': np.float32}, metadata={'sampling': str(tuple(self.positions))})
 
     def _save_xml(self, output_path, output_file):
         """
@@ -197,11 +244,10 @@ class SampledSpectraData(OutputData):
             return [Param(_votable, name=column, ID=f'_{column}', ucd='em.wl', datatype='double', arraysize='*',
                           unit=unit, value=list(sampling))]
 
-        def _create_fields(_votable, _spectra_df):
-            len_flux = str(len(_spectra_df['flux'].iloc[0]))
-            len_error = str(len(_spectra_df['flux_error'].iloc[0]))
-            len_correlation = str(len(_spectra_df['correlation'].iloc[0])) \
-                if 'correlation' in _spectra_df.columns else ''
+        def _create_fields(_votable, _columns, data_type):
+            len_flux = str(len(_columns['flux'][0]))
+            len_error = str(len(_columns['flux_error'][0]))
+            len_correlation = str(len(_columns['correlation'][0])) if 'correlation' in _columns else ''
             fields_datatypes = {'source_id': 'long', 'xp': 'char', 'flux': 'double', 'flux_error': 'float',
                                 'correlation': 'double', 'standard_deviation': 'float'}
             fields_array_size = {'source_id': '', 'xp': '2', 'flux': len_flux, 'flux_error': len_error,
@@ -209,7 +255,6 @@ class SampledSpectraData(OutputData):
             fields_id = {key: f'_{key}' for key in ['source_id', 'xp', 'flux', 'flux_error', 'correlation']}
             fields_id.update({'source_id': None})
             header_dict = _load_header_dict()
-            data_type = _spectra_df.attrs['data_type']
             units_dict = data_type.get_units()
             _fields = [Field(_votable, name=column, ucd=header_dict.get(column, dict()).get('meta', ''),
                              ID=fields_id[column], datatype=fields_datatypes[column],
@@ -218,12 +263,13 @@ class SampledSpectraData(OutputData):
                                                                   datatype=fields_datatypes[column],
                                                                   ucd=header_dict.get(column, dict()).get('meta', ''),
                                                                   unit=units_dict.get(column, None))
-                       for column in _spectra_df.columns]
+                       for column in _columns]
             for _field in _fields:
                 _field.description = header_dict.get(_field.name, dict()).get('description', '')
             return _fields
 
-        spectra_df = self.data
+        spectra_columns = self.columns
+        data_type = self.attrs['data_type']
         positions = list(self.positions)
         # Create a new VOTable file
         votable = VOTableFile()
@@ -234,15 +280,16 @@ class SampledSpectraData(OutputData):
         spectra_table = Table(votable)
         resource.tables.append(spectra_table)
         # Add sampling as param
-        params = _create_params(votable, positions, spectra_df.attrs['data_type'])
+        params = _create_params(votable, positions, data_type)
         spectra_table.params.extend(params)
         # Add spectrum fields
-        fields = _create_fields(votable, spectra_df)
+        fields = _create_fields(votable, spectra_columns, data_type)
         spectra_table.fields.extend(fields)
-        # Create the record arrays, with the given number of rows
-        spectra_table.create_arrays(len(spectra_df))
-        for index, row in enumerate(spectra_df.to_dict('records')):
-            spectra_table.array[index] = tuple([row[column] for column in spectra_df.columns])
+        # Create the record arrays, with the given number of rows, and fill them column by column
+        spectra_table.create_arrays(len(self))
+        for column, array in spectra_columns.items():
+            spectra_table.array[column] = array if spectra_table.array.dtype[column] != object else \
+                _to_object_array(array)
         # Write to a file
         Path(output_path).mkdir(parents=True, exist_ok=True)
         output_path = join(output_path, f'{output_file}.xml')
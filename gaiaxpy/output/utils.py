@@ -1,11 +1,20 @@
 from ast import literal_eval
+from itertools import chain, islice
 from os.path import abspath, dirname, join
 
 import numpy as np
 import pandas as pd
 from astropy.io import fits
+from fastavro import parse_schema, writer
+from fastavro.validation import validate_many
 from numpy import ndarray
 
+# Maximum number of rows and of array elements converted to AVRO records at once
+AVRO_BLOCK_SIZE = 1000
+AVRO_BLOCK_VALUES = 1000000
+# Number of records validated against the schema before writing an AVRO file
+AVRO_VALIDATION_SAMPLE_SIZE = 10
+
 
 def pandas_from_records(lst):
     return pd.DataFrame.from_records([record.to_dict_func for record in lst])
@@ -45,6 +54,165 @@ def _get_array_columns(df):
     return [column for column in df.columns if isinstance(df[column].iloc[0], ndarray)]
 
 
+def _data_frame_to_columns(df):
+    """
+    Convert a DataFrame into a dictionary of columns. The columns containing an array of the same shape and type in
+        every row are stacked into a single contiguous array whose first dimension runs over the rows. The rest of the
+        columns are copied as 1D arrays.
+
+    Args:
+        df (DataFrame): Input data.
+
+    Returns:
+        dict: Dictionary mapping the name of each column to its array.
+    """
+    columns = dict()
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype == object and len(values) > 0 and all(isinstance(value, ndarray) for value in values) and \
+                len({(value.shape, value.dtype) for value in values}) == 1:
+            columns[column] = np.stack(values)
+        else:
+            columns[column] = values.copy()
+    return columns
+
+
+def _columns_to_data_frame(columns, index=None, attrs=None):
+    """
+    Build a DataFrame from a dictionary of columns. The arrays in the rows of a stacked column are views of it.
+
+    Args:
+        columns (dict): Dictionary mapping the name of each column to its array.
+        index (Index): Index of the DataFrame. If None, a range index is used.
+        attrs (dict): Attributes of the DataFrame.
+
+    Returns:
+        DataFrame: The data in the columns.
+    """
+    df = pd.DataFrame({column: pd.Series(list(array) if array.ndim > 1 else array, index=index,
+                                         dtype=object if array.ndim > 1 else None)
+                       for column, array in columns.items()}, index=index)
+    df.attrs = dict(attrs) if attrs else dict()
+    return df
+
+
+def _concat_columns(columns_list):
+    """
+    Concatenate dictionaries of columns with the same names, as returned by _data_frame_to_columns.
+
+    Args:
+        columns_list (list): Dictionaries mapping the name of each column to its array.
+
+    Returns:
+        dict: Dictionary mapping the name of each column to the concatenation of its arrays. A column stacked with
+            different shapes in different dictionaries becomes a 1D array of objects.
+    """
+    columns = dict()
+    for column in columns_list[0]:
+        arrays = [column_arrays[column] for column_arrays in columns_list]
+        if len({array.shape[1:] for array in arrays}) == 1:
+            columns[column] = np.concatenate(arrays)
+        else:
+            columns[column] = _to_object_array([value for array in arrays for value in array])
+    return columns
+
+
+def _format_column(array, format_array):
+    """
+    Format the arrays in a column.
+
+    Args:
+        array (ndarray): Stacked column, or 1D column that may contain arrays.
+        format_array (function): Function to apply to each array.
+
+    Returns:
+        list/ndarray: List containing the formatted values of the column, or the column itself if it contains no
+            arrays.
+    """
+    if array.ndim > 1:
+        return [format_array(row) for row in array]
+    if array.dtype == object:
+        return [format_array(value) if isinstance(value, ndarray) else value for value in array]
+    return array
+
+
+def _to_object_array(values):
+    """
+    Build a 1D array of objects from a list, even if its elements are arrays of the same shape.
+
+    Args:
+        values (list/ndarray): Values of the output array. Stacked arrays are split into their rows.
+
+    Returns:
+        ndarray: 1D array of objects.
+    """
+    output = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        output[index] = value
+    return output
+
+
+def _to_avro_arrays(array):
+    """
+    Convert a block of a column of arrays to the lists stored in AVRO array fields.
+
+    Args:
+        array (ndarray): Block of a stacked column, or 1D column that may contain arrays.
+
+    Returns:
+        list: List containing one list per row, or None for the rows with no array (e.g.: missing bands).
+    """
+    if array.ndim > 1:
+        return array.tolist()
+    return [value.tolist() if isinstance(value, ndarray) else None for value in array]
+
+
+def _generate_avro_records(columns, format_column, block_size=AVRO_BLOCK_SIZE, block_values=AVRO_BLOCK_VALUES):
+    """
+    Generate the AVRO records of the output data. The columns are converted to Python values one block of rows at a
+        time, so the records of the whole output are never held in memory together.
+
+    Args:
+        columns (dict): Dictionary mapping the name of each column to its array.
+        format_column (function): Function receiving the name of a column and a block of its rows and returning the
+            list of values to store in the records.
+        block_size (int): Maximum number of rows converted at once.
+        block_values (int): Maximum number of array elements converted at once. Blocks have fewer rows than block_size
+            when the rows contain long arrays (e.g.: correlations).
+
+    Yields:
+        dict: One record per row.
+    """
+    names = list(columns.keys())
+    n_rows = len(columns[names[0]]) if names else 0
+    if n_rows == 0:
+        return
+    row_size = sum(np.size(columns[name][0]) for name in names)
+    block_size = max(1, min(block_size, block_values // row_size))
+    for start in range(0, n_rows, block_size):
+        values = [format_column(name, columns[name][start:start + block_size]) for name in names]
+        for row in zip(*values):
+            yield dict(zip(names, row))
+
+
+def _write_avro(output_path, schema, records, append=False):
+    """
+    Write records to an AVRO file. Only a sample of the first records is validated against the schema, the rest are
+        checked by the writer as they are serialised.
+
+    Args:
+        output_path (str): Path to the output file.
+        schema (dict): AVRO schema of the records.
+        records (iterable): Records to write, possibly a generator.
+        append (bool): Whether to append the records to an existing file written by a previous call.
+    """
+    records = iter(records)
+    sample = list(islice(records, AVRO_VALIDATION_SAMPLE_SIZE))
+    validate_many(sample, schema)
+    with open(output_path, 'a+b' if append else 'wb') as output:
+        writer(output, parse_schema(schema), chain(sample, records))
+
+
 def _get_sampling_dict(positions):
     return {'pos': _array_to_standard(positions)}
 
@@ -121,12 +289,11 @@ def _add_ecsv_header(header, output_path, output_file):
         f.write(header + s)
 
 
-def _generate_fits_header(_data, _column_formats):
-    data_type = _data.attrs['data_type']
-    units_dict = data_type.get_units()
+def _generate_fits_header(_columns, _data_type, _column_formats):
+    units_dict = _data_type.get_units()
     header_dict = _load_header_dict()
     cards = list()
-    for index, column in enumerate(_data.columns):
+    for index, column in enumerate(_columns):
         cards.append((f'TTYPE{index + 1}', column))
         cards.append((f'TFORM{index + 1}', _column_formats.get(column, '')))
         cards.append((f'TCOMM{index + 1}', header_dict.get(column, dict()).get('description', '')))
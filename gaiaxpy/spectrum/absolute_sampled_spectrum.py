@@ -9,6 +9,7 @@ from numbers import Number
 import numpy as np
 
 from gaiaxpy.core.satellite import BANDS, BP_WL, RP_WL
+from .packed_covariance import truncate_covariance
 from .sampled_spectrum import SampledSpectrum
 from .utils import _list_to_array
 from ..core.generic_functions import correlation_from_covariance
@@ -57,11 +58,12 @@ class AbsoluteSampledSpectrum(SampledSpectrum):
             split_spectrum[band]['xp_spectra'] = xp_spectra[band]
             stdev = split_spectrum[band]['xp_spectra'].get_standard_deviation()
             design_matrix = sampled_bases[band].get_design_matrix()
-            spectra_covariance = split_spectrum[band]['xp_spectra'].get_covariance()
+            # The covariance is only expanded to a full matrix when the spectrum is sampled
+            spectra_covariance = split_spectrum[band]['xp_spectra'].covariance
             coefficients = split_spectrum[band]['xp_spectra'].get_coefficients()
             if isinstance(band_truncation, Number) and band_truncation > 0:
                 design_matrix = design_matrix[:band_truncation][:]
-                spectra_covariance = spectra_covariance[:band_truncation, :band_truncation]
+                spectra_covariance = truncate_covariance(spectra_covariance, band_truncation)
                 coefficients = coefficients[:band_truncation]
             split_spectrum[band]['flux'] = self._sample_flux(coefficients, design_matrix)
             split_spectrum[band]['error'] = self._sample_error(spectra_covariance, design_matrix, stdev)
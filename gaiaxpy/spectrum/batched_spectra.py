@@ -0,0 +1,349 @@
+"""
+batched_spectra.py
+====================================
+Module to sample blocks of continuous spectra with stacked array operations.
+"""
+
+import numpy as np
+import pandas as pd
+
+from gaiaxpy.core.satellite import BANDS, BP_WL, RP_WL
+from .error_propagation import _correlations_from_propagated, _errors_from_propagated, _propagate_covariances
+from .packed_covariance import PackedCovariance, _get_tril_indices, stack_covariance_matrices
+from .utils import get_covariance_matrices
+
+# Number of sources processed together. It bounds the size of the (sources, samples, bases) temporaries.
+BLOCK_SIZE = 256
+
+
+def _get_band_arrays(parsed_input_data, band):
+    """
+    Stack the continuous representation of one band for all the sources in the input data.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+
+    Returns:
+        ndarray: 2D array of shape (n_available, n_bases) containing the coefficients.
+        ndarray: 3D array of shape (n_available, n_bases, n_bases) containing the covariance matrices.
+        ndarray: 1D array containing the standard deviations.
+        ndarray: 1D boolean array of length n_sources, True for the sources where the band is available.
+
+        Only the sources where the band is available are stacked. If the band is not available for any source, None is
+            returned.
+    """
+    covariances = get_covariance_matrices(parsed_input_data, band).to_numpy()
+    available = np.array([isinstance(covariance, PackedCovariance) or
+                          (isinstance(covariance, np.ndarray) and covariance.size > 0) for covariance in covariances],
+                         dtype=bool)
+    if not available.any():
+        return None
+    coefficients = np.stack(parsed_input_data[f'{band}_coefficients'].to_numpy()[available])
+    covariances = stack_covariance_matrices(covariances[available])
+    standard_deviations = parsed_input_data[f'{band}_standard_deviation'].to_numpy(dtype=float)[available]
+    return coefficients, covariances, standard_deviations, available
+
+
+def _get_truncation_mask(parsed_input_data, band, n_bases):
+    """
+    Get the mask selecting the relevant bases of each source.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+        n_bases (int): Number of bases in the continuous representation.
+
+    Returns:
+        ndarray: 2D boolean array of shape (n_sources, n_bases), True for the bases to be used.
+    """
+    n_relevant_bases = pd.to_numeric(parsed_input_data[f'{band}_n_relevant_bases'], errors='coerce').to_numpy(
+        dtype=float, na_value=np.nan)
+    n_relevant_bases = np.where(n_relevant_bases > 0, n_relevant_bases, n_bases)
+    return np.arange(n_bases) < n_relevant_bases[:, np.newaxis]
+
+
+def _sample_flux(coefficients, design_matrix, sample_blocks=None):
+    """
+    Compute the flux of a block of sampled spectra.
+
+    Args:
+        coefficients (ndarray): 2D array of shape (n_sources, n_bases).
+        design_matrix (ndarray): 2D array of shape (n_bases, n_samples).
+        sample_blocks (list): Slices of the samples computed with separate matrix products. The result of a matrix
+            product may change in its last bits with the position of a sample in it, so each block does not depend on
+            the rest of the samples. If None, all the samples are computed together.
+
+    Returns:
+        ndarray: 2D array of shape (n_sources, n_samples) containing the flux values.
+    """
+    if sample_blocks is None:
+        return coefficients @ design_matrix
+    flux = np.empty((len(coefficients), design_matrix.shape[1]))
+    for samples in sample_blocks:
+        flux[:, samples] = coefficients @ np.ascontiguousarray(design_matrix[:, samples])
+    return flux
+
+
+def _sample_error(covariances, design_matrix, standard_deviations, packed=True, sample_blocks=None):
+    """
+    Compute the flux errors of a block of sampled spectra.
+
+    Args:
+        covariances (ndarray): 3D array of shape (n_sources, n_bases, n_bases).
+        design_matrix (ndarray): 2D array of shape (n_bases, n_samples).
+        standard_deviations (ndarray): 1D array containing the standard deviation of each source.
+        packed (bool): Whether to use only the upper triangle of the covariance matrices, which halves the number of
+            operations. Otherwise, the operations of SampledSpectrum._sample_error are reproduced for every source.
+        sample_blocks (list): Slices of the samples computed separately, as in _sample_flux. If None, all the samples
+            are computed together.
+
+    Returns:
+        ndarray: 2D array of shape (n_sources, n_samples) containing the flux errors.
+    """
+    if sample_blocks is not None:
+        error = np.empty((len(covariances), design_matrix.shape[1]))
+        for samples in sample_blocks:
+            error[:, samples] = _sample_error(covariances, np.ascontiguousarray(design_matrix[:, samples]),
+                                              standard_deviations, packed=packed)
+        return error
+    if not packed:
+        design_matrix_t = design_matrix.T
+        return np.sqrt(np.sum(np.matmul(design_matrix_t, covariances) * design_matrix_t, axis=2)) * \
+            standard_deviations[:, np.newaxis]
+    # The variance of each sample is a quadratic form of the (symmetric) covariance matrix. Using only its upper
+    # triangle, the variances of all sources are obtained with a single matrix product.
+    rows, columns = np.triu_indices(covariances.shape[-1])
+    products = design_matrix[rows] * design_matrix[columns]
+    products[rows != columns] *= 2
+    return np.sqrt(covariances[:, rows, columns] @ products) * standard_deviations[:, np.newaxis]
+
+
+def _propagate_truncated_covariances(covariances, design_matrix, mask=None):
+    """
+    Propagate the covariance matrices of a block of continuous spectra to the sampling grid. When the set of bases is
+        truncated, sources using the same number of bases are propagated together, using only their relevant bases.
+
+    Args:
+        covariances (ndarray): 3D array of shape (n_sources, n_bases, n_bases).
+        design_matrix (ndarray): 2D array of shape (n_bases, n_samples).
+        mask (ndarray): 2D boolean array of shape (n_sources, n_bases), True for the bases to be used.
+
+    Returns:
+        ndarray: 3D array of shape (n_sources, n_samples, n_bases), as returned by _propagate_covariances. The columns
+            of the bases not used are zero.
+    """
+    if mask is None:
+        return _propagate_covariances(covariances, design_matrix)
+    n_bases, n_samples = design_matrix.shape
+    propagated = np.zeros((len(covariances), n_samples, n_bases))
+    n_used_bases = mask.sum(axis=1)
+    for n_used in np.unique(n_used_bases):
+        indices = np.flatnonzero(n_used_bases == n_used)
+        propagated[indices, :, :n_used] = _propagate_covariances(covariances[indices][:, :n_used, :n_used],
+                                                                 design_matrix[:n_used])
+    return propagated
+
+
+def _band_missing_mask(positions, band):
+    """
+    Get the positions that cannot be covered when only one band is available.
+
+    Args:
+        positions (ndarray): 1D array of absolute wavelengths.
+        band (str): The band available.
+
+    Returns:
+        ndarray: 1D boolean array, True where the output must be set to NaN.
+    """
+    if band == BANDS.rp:
+        return positions <= RP_WL.low
+    elif band == BANDS.bp:
+        return positions >= BP_WL.high
+    raise ValueError(f'Band {band} is not a valid band.')
+
+
+def _sample_absolute_block(parsed_input_data, design_matrices, merge, truncation=False, with_correlation=False,
+                           packed_errors=True, sample_blocks=None):
+    """
+    Create the absolute sampled spectra for a block of sources. It is equivalent to building one
+        AbsoluteSampledSpectrum per source.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        design_matrices (dict): The set of basis functions (SampledBasisFunctions) for BP and RP.
+        merge (dict): The weighting factors for BP and RP.
+        truncation (bool): Toggle truncation of the set of bases.
+        with_correlation (bool): Whether correlation information should be computed.
+        packed_errors (bool): Whether to compute the errors using only the upper triangle of the covariance matrices.
+            It is ignored if with_correlation is True, as the errors are then obtained from the square root factors of
+            the covariance matrices.
+        sample_blocks (list): Slices of the samples whose flux and errors are computed separately (see _sample_flux). It
+            is ignored for the errors if with_correlation is True.
+
+    Returns:
+        dict: A dictionary containing the 2D arrays 'flux' and 'error' of shape (n_sources, n_samples), plus the lower
+            triangle of the correlation matrices under 'correlation' if with_correlation is True.
+
+    Raises:
+        ValueError: If a source has no band available.
+    """
+    positions = design_matrices[BANDS.bp].get_sampling_grid()
+    n_sources, n_samples = len(parsed_input_data), len(positions)
+    split_spectra = dict()
+    for band in BANDS:
+        band_arrays = _get_band_arrays(parsed_input_data, band)
+        if band_arrays is None:
+            continue
+        coefficients, covariances, standard_deviations, available = band_arrays
+        design_matrix = design_matrices[band].get_design_matrix()
+        mask = None
+        if truncation:
+            mask = _get_truncation_mask(parsed_input_data[available], band, coefficients.shape[1])
+            coefficients = coefficients * mask
+            covariances = covariances * (mask[:, :, np.newaxis] & mask[:, np.newaxis, :])
+        split_spectra[band] = {'available': available, 'flux': np.zeros((n_sources, n_samples)),
+                               'error': np.zeros((n_sources, n_samples))}
+        split_spectra[band]['flux'][available] = _sample_flux(coefficients, design_matrix, sample_blocks)
+        if not with_correlation:
+            split_spectra[band]['error'][available] = _sample_error(
+                covariances, design_matrix, standard_deviations, packed=packed_errors, sample_blocks=sample_blocks)
+            continue
+        # The errors and correlations are obtained from the square root factors of the covariance matrices
+        propagated = _propagate_truncated_covariances(covariances, design_matrix, mask)
+        split_spectra[band]['error'][available] = _errors_from_propagated(propagated, standard_deviations)
+        split_spectra[band]['propagated'] = np.zeros((n_sources, n_samples, design_matrix.shape[0]))
+        split_spectra[band]['propagated'][available] = propagated
+    available = {band: split_spectra[band]['available'] if band in split_spectra else np.zeros(n_sources, dtype=bool)
+                 for band in BANDS}
+    if not (available[BANDS.bp] | available[BANDS.rp]).all():
+        raise ValueError('At least one band must be present.')
+    flux = np.zeros((n_sources, n_samples))
+    error = np.zeros((n_sources, n_samples))
+    correlation = np.empty((n_sources, n_samples * (n_samples - 1) // 2)) if with_correlation else None
+    # Sources with both bands are merged using the weights
+    both = available[BANDS.bp] & available[BANDS.rp]
+    for band in split_spectra:
+        spectrum = split_spectra[band]
+        flux[both] += spectrum['flux'][both] * merge[band]
+        error[both] += spectrum['error'][both] ** 2 * merge[band] ** 2
+    error[both] = np.sqrt(error[both])
+    if with_correlation and both.any():
+        # The merged covariance is the sum of the sampled covariances of both bands with their columns weighted, so its
+        # factors are those of both bands side by side
+        propagated = [split_spectra[band]['propagated'][both] for band in BANDS]
+        weighted = [band_propagated * merge[band][:, np.newaxis] for band, band_propagated in zip(BANDS, propagated)]
+        correlation[both] = _correlations_from_propagated(np.concatenate(propagated, axis=2),
+                                                          right_propagated=np.concatenate(weighted, axis=2))
+    # Sources with a single band only cover the range of that band
+    for band in split_spectra:
+        spectrum = split_spectra[band]
+        single = available[band] & ~both
+        missing_positions = _band_missing_mask(positions, band)
+        flux[single] = np.where(missing_positions, np.nan, spectrum['flux'][single])
+        error[single] = np.where(missing_positions, np.nan, spectrum['error'][single])
+        if with_correlation and single.any():
+            rows, columns = _get_tril_indices(n_samples, -1)
+            correlation[single] = np.where(missing_positions[rows] | missing_positions[columns], np.nan,
+                                           _correlations_from_propagated(spectrum['propagated'][single]))
+    output = {'flux': flux, 'error': error}
+    if with_correlation:
+        output['correlation'] = correlation
+    return output
+
+
+def _iterate_blocks(n_rows, block_size=BLOCK_SIZE):
+    """
+    Yield the slices defining consecutive blocks of rows.
+
+    Args:
+        n_rows (int): Total number of rows.
+        block_size (int): Maximum number of rows per block.
+
+    Returns:
+        generator: Slices covering all rows.
+    """
+    for start in range(0, n_rows, block_size):
+        yield slice(start, min(start + block_size, n_rows))
+
+
+def _get_basis_groups(parsed_input_data, band, design_matrices, truncation=False):
+    """
+    Group the sources of one band by set of bases and number of bases used.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+        design_matrices (dict): The design matrices (SampledBasisFunctions) for each basis function ID.
+        truncation (bool): Toggle truncation of the set of bases.
+
+    Returns:
+        ndarray: 1D boolean array, True for the sources that can be sampled in this band.
+        dict: Dictionary mapping each (basis function ID, number of bases) pair to the positions of its sources among
+            the available ones.
+    """
+    basis_ids = pd.to_numeric(parsed_input_data[f'{band}_basis_function_id'], errors='coerce').to_numpy(
+        dtype=float, na_value=np.nan)
+    available = np.isin(basis_ids, list(design_matrices.keys()))
+    basis_ids = basis_ids[available].astype(int)
+    if truncation:
+        n_relevant_bases = pd.to_numeric(parsed_input_data[f'{band}_n_relevant_bases'], errors='coerce').to_numpy(
+            dtype=float, na_value=np.nan)[available]
+        n_relevant_bases = np.where(n_relevant_bases > 0, n_relevant_bases, -1).astype(int)
+    else:
+        n_relevant_bases = np.full(len(basis_ids), -1)
+    keys = np.stack([basis_ids, n_relevant_bases], axis=1)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    return available, {tuple(key): np.flatnonzero(inverse == index) for index, key in enumerate(unique_keys)}
+
+
+def _sample_xp_band(parsed_input_data, band, design_matrices, truncation=False, with_correlation=False,
+                    block_size=BLOCK_SIZE):
+    """
+    Sample the spectra of one band for all the sources in the input data. It is equivalent to building one
+        XpSampledSpectrum per source, but sources sharing the same set of bases and truncation level are sampled
+        together.
+
+    Args:
+        parsed_input_data (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+        design_matrices (dict): The design matrices (SampledBasisFunctions) for each basis function ID.
+        truncation (bool): Toggle truncation of the set of bases.
+        with_correlation (bool): Whether correlation information should be computed.
+        block_size (int): Maximum number of sources whose correlation matrices are computed at once.
+
+    Returns:
+        dict: A dictionary containing the boolean array 'available' of length n_sources and, for the available sources
+            only, the 2D arrays 'flux' and 'error' and the 1D array 'standard_deviation'. If with_correlation is True,
+            it also contains the lower triangle of the correlation matrices under 'correlation'. None is returned if
+            no source can be sampled in this band.
+    """
+    available, groups = _get_basis_groups(parsed_input_data, band, design_matrices, truncation=truncation)
+    if not available.any():
+        return None
+    band_data = parsed_input_data[available]
+    coefficients = band_data[f'{band}_coefficients'].to_numpy()
+    covariances = band_data[f'{band}_covariance_matrix'].to_numpy()
+    standard_deviations = band_data[f'{band}_standard_deviation'].to_numpy(dtype=float)
+    n_samples = len(next(iter(design_matrices.values())).get_sampling_grid())
+    output = {'available': available, 'flux': np.empty((len(band_data), n_samples)),
+              'error': np.empty((len(band_data), n_samples)), 'standard_deviation': standard_deviations}
+    if with_correlation:
+        output['correlation'] = np.empty((len(band_data), n_samples * (n_samples - 1) // 2))
+    for (basis_id, n_bases), indices in groups.items():
+        design_matrix = design_matrices[basis_id].get_design_matrix()
+        n_bases = n_bases if n_bases > 0 else len(design_matrix)
+        design_matrix = design_matrix[:n_bases]
+        group_coefficients = np.stack(coefficients[indices])[:, :n_bases]
+        group_covariances = stack_covariance_matrices(covariances[indices], n_bases)
+        output['flux'][indices] = _sample_flux(group_coefficients, design_matrix)
+        if not with_correlation:
+            output['error'][indices] = _sample_error(group_covariances, design_matrix, standard_deviations[indices])
+            continue
+        # The errors and correlations are obtained from the square root factors of the covariance matrices
+        for rows in _iterate_blocks(len(indices), block_size):
+            propagated = _propagate_covariances(group_covariances[rows], design_matrix)
+            output['error'][indices[rows]] = _errors_from_propagated(propagated, standard_deviations[indices[rows]])
+            output['correlation'][indices[rows]] = _correlations_from_propagated(propagated)
+    return output
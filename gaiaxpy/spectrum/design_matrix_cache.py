@@ -0,0 +1,171 @@
+"""
+design_matrix_cache.py
+====================================
+Module to cache the design matrices computed for a given sampling grid.
+"""
+
+import json
+from collections import OrderedDict
+from glob import glob
+from hashlib import sha256
+from os import makedirs, remove, replace
+from os.path import join
+from tempfile import NamedTemporaryFile
+from zipfile import BadZipFile
+
+import numpy as np
+
+from gaiaxpy.core.version import __version__
+
+
+def hash_sampling(sampling):
+    """
+    Compute a hash identifying a sampling grid.
+
+    Args:
+        sampling (ndarray): 1D array containing the sampling grid. None stands for the default grid.
+
+    Returns:
+        str: Hexadecimal hash of the values of the grid.
+    """
+    if sampling is None:
+        return 'default'
+    sampling = np.ascontiguousarray(sampling, dtype=np.float64)
+    return sha256(str(sampling.shape).encode() + sampling.tobytes()).hexdigest()
+
+
+class DesignMatrixCache(object):
+    """
+    Least-recently-used cache of sets of arrays (design matrices, sampling grids and merge weights) with an optional
+        tier on disk. Cached arrays are read-only.
+    """
+
+    def __init__(self, max_size=32, cache_dir=None):
+        """
+        Initialise the cache.
+
+        Args:
+            max_size (int): Maximum number of entries kept in memory.
+            cache_dir (str): Directory where entries are also stored. If None, entries are only kept in memory.
+        """
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+
+    def configure(self, max_size=None, cache_dir=None):
+        """
+        Change the size of the cache or the directory of the disk tier. Entries beyond the new size are evicted.
+
+        Args:
+            max_size (int): Maximum number of entries kept in memory.
+            cache_dir (str): Directory where entries are also stored. An empty string disables the disk tier.
+        """
+        if max_size is not None:
+            if not isinstance(max_size, int) or max_size < 0:
+                raise ValueError('The size of the cache must be a non-negative integer.')
+            self.max_size = max_size
+            self.__shrink()
+        if cache_dir is not None:
+            self.cache_dir = cache_dir if cache_dir else None
+
+    def get(self, key, compute):
+        """
+        Get the arrays of an entry, computing them if they are not cached.
+
+        Args:
+            key (tuple): Identifier of the entry. It must be composed of strings and numbers.
+            compute (function): Function without arguments returning a dictionary of ndarrays.
+
+        Returns:
+            dict: Dictionary of read-only ndarrays.
+        """
+        key = self.__versioned_key(key)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        arrays = self.__read(key)
+        if arrays is None:
+            # Private copies, as the computed arrays may belong to the caller (e.g. the sampling grid)
+            arrays = {name: np.array(array, copy=True) for name, array in compute().items()}
+            self.__write(key, arrays)
+        for array in arrays.values():
+            array.flags.writeable = False
+        if self.max_size > 0:
+            self._entries[key] = arrays
+            self.__shrink()
+        return arrays
+
+    def evict(self, key):
+        """
+        Remove an entry from the memory and disk tiers.
+
+        Args:
+            key (tuple): Identifier of the entry.
+        """
+        key = self.__versioned_key(key)
+        self._entries.pop(key, None)
+        if self.cache_dir is not None:
+            try:
+                remove(self.__get_file(key))
+            except OSError:
+                pass
+
+    def clear(self, disk=False):
+        """
+        Remove all the entries in memory.
+
+        Args:
+            disk (bool): Whether to also remove the entries stored on disk.
+        """
+        self._entries.clear()
+        if disk and self.cache_dir is not None:
+            for cache_file in glob(join(self.cache_dir, 'design_matrices', '*.npz')):
+                try:
+                    remove(cache_file)
+                except OSError:
+                    pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.__versioned_key(key) in self._entries
+
+    @staticmethod
+    def __versioned_key(key):
+        # Design matrices depend on the bases and instrument models shipped with each version of the package
+        return (__version__,) + tuple(key)
+
+    def __shrink(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __get_file(self, key):
+        return join(self.cache_dir, 'design_matrices', f'{sha256(json.dumps(key).encode()).hexdigest()}.npz')
+
+    def __read(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with np.load(self.__get_file(key), allow_pickle=False) as cached:
+                if json.loads(str(cached['key'])) != list(key):
+                    return None
+                return {name: cached[name] for name in cached.files if name != 'key'}
+        except (OSError, ValueError, KeyError, BadZipFile):
+            return None
+
+    def __write(self, key, arrays):
+        if self.cache_dir is None:
+            return
+        cache_path = join(self.cache_dir, 'design_matrices')
+        try:
+            makedirs(cache_path, exist_ok=True)
+            with NamedTemporaryFile(dir=cache_path, suffix='.npz', delete=False) as temp_file:
+                np.savez(temp_file, key=json.dumps(key), **arrays)
+            replace(temp_file.name, self.__get_file(key))
+        except OSError:
+            pass
+
+
+# Cache shared by the calibrator and the converter
+design_matrix_cache = DesignMatrixCache()
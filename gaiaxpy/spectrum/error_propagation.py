@@ -0,0 +1,107 @@
+"""
+error_propagation.py
+====================================
+Module to propagate the covariance of the continuous representation of a block of spectra to their sampled form.
+
+If L is a square root of the covariance matrix of the coefficients (C = L @ L.T) and D is the design matrix, the
+covariance matrix of the sampled spectrum is A @ A.T, with A = D.T @ L. The flux errors are the norms of the rows of A
+and the correlation between two samples is the dot product of the corresponding normalised rows, so the (n_samples,
+n_samples) covariance matrices never need to be built.
+"""
+
+import numpy as np
+
+from .packed_covariance import _get_tril_indices
+
+# Number of rows of the correlation matrices computed at once. It bounds the size of the temporary arrays.
+ROW_BLOCK_SIZE = 64
+
+
+def _get_square_root_factors(covariances):
+    """
+    Compute a square root factor of each covariance matrix in a block. The lower Cholesky factor is used when the matrix
+        is positive definite. Otherwise, the factor is obtained from the eigendecomposition of the matrix, where
+        negative eigenvalues (due to rounding errors) are set to zero.
+
+    Args:
+        covariances (ndarray): 3D array of shape (n_sources, n_bases, n_bases).
+
+    Returns:
+        ndarray: 3D array of shape (n_sources, n_bases, n_bases) containing factors L such that L @ L.T is the
+            covariance matrix.
+    """
+    try:
+        return np.linalg.cholesky(covariances)
+    except np.linalg.LinAlgError:
+        pass
+    factors = np.empty_like(covariances, dtype=float)
+    for index, covariance in enumerate(covariances):
+        try:
+            factors[index] = np.linalg.cholesky(covariance)
+        except np.linalg.LinAlgError:
+            eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+            factors[index] = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+    return factors
+
+
+def _propagate_covariances(covariances, design_matrix):
+    """
+    Propagate the covariance matrices of a block of continuous spectra to the sampling grid.
+
+    Args:
+        covariances (ndarray): 3D array of shape (n_sources, n_bases, n_bases).
+        design_matrix (ndarray): 2D array of shape (n_bases, n_samples).
+
+    Returns:
+        ndarray: 3D array of shape (n_sources, n_samples, n_bases) containing the product of the transposed design
+            matrix and a square root factor of each covariance matrix.
+    """
+    return design_matrix.T @ _get_square_root_factors(covariances)
+
+
+def _errors_from_propagated(propagated, standard_deviations):
+    """
+    Compute the flux errors of a block of sampled spectra.
+
+    Args:
+        propagated (ndarray): 3D array of shape (n_sources, n_samples, n_bases), as returned by _propagate_covariances.
+        standard_deviations (ndarray): 1D array containing the standard deviation of each source.
+
+    Returns:
+        ndarray: 2D array of shape (n_sources, n_samples) containing the flux errors.
+    """
+    return np.sqrt(np.einsum('nsi,nsi->ns', propagated, propagated)) * standard_deviations[:, np.newaxis]
+
+
+def _correlations_from_propagated(propagated, row_block_size=ROW_BLOCK_SIZE, right_propagated=None):
+    """
+    Compute the lower triangle (excluding the diagonal) of the correlation matrices of a block of sampled spectra, in
+        the same order as np.tril_indices. Only the lower triangle is computed, a few rows at a time.
+
+    Args:
+        propagated (ndarray): 3D array of shape (n_sources, n_samples, n_factors), as returned by
+            _propagate_covariances.
+        row_block_size (int): Number of rows of the correlation matrices computed at once.
+        right_propagated (ndarray): 3D array of the same shape as propagated. If given, the covariance matrices are
+            propagated @ right_propagated.T instead of propagated @ propagated.T, which allows for the non-symmetric
+            covariances of merged spectra.
+
+    Returns:
+        ndarray: 2D array of shape (n_sources, n_samples * (n_samples - 1) / 2). Samples with zero variance have zero
+            correlation with all the others.
+    """
+    right_propagated = propagated if right_propagated is None else right_propagated
+    n_sources, n_samples, _ = propagated.shape
+    norms = np.sqrt(np.einsum('nsi,nsi->ns', propagated, right_propagated))[:, :, np.newaxis]
+    normalised = np.divide(propagated, norms, out=np.zeros_like(propagated), where=norms > 0)
+    right_normalised = normalised if right_propagated is propagated else \
+        np.divide(right_propagated, norms, out=np.zeros_like(right_propagated), where=norms > 0)
+    rows, columns = _get_tril_indices(n_samples, -1)
+    correlations = np.empty((n_sources, len(rows)))
+    for start in range(1, n_samples, row_block_size):
+        stop = min(start + row_block_size, n_samples)
+        # Rows start to stop - 1 of the lower triangle are contiguous in row-major order
+        positions = slice(start * (start - 1) // 2, stop * (stop - 1) // 2)
+        products = normalised[:, start:stop] @ right_normalised[:, :stop].transpose(0, 2, 1)
+        correlations[:, positions] = products[:, rows[positions] - start, columns[positions]]
+    return correlations
@@ -23,6 +23,25 @@ def _get_source_ids(photometries):
     return [photometry[0].source_id for photometry in photometries]
 
 
+def _reorder_columns(photometries_df, photometric_system):
+    """
+    Group the columns of a photometry DataFrame by photometric system.
+
+    Args:
+        photometries_df (DataFrame): DataFrame containing the source_id and the photometry columns.
+        photometric_system (list): List of photometric systems in the desired order.
+
+    Returns:
+        DataFrame: The DataFrame with the columns reordered.
+    """
+    phot_system_labels = [phot_system.get_system_label() for phot_system in photometric_system]
+    reordered_columns = ['source_id']
+    for label in phot_system_labels:
+        column_sublist = [column for column in photometries_df.columns if column.startswith(f'{label}_')]
+        reordered_columns.extend(column_sublist)
+    return photometries_df[reordered_columns]
+
+
 class MultiSyntheticPhotometry(object):
     """
     Synthetic photometry derived from Gaia spectra in multiple photometric systems.
@@ -40,14 +59,7 @@ class MultiSyntheticPhotometry(object):
 
     def _generate_output_df(self):
         photometries_df = self._photometries_to_dict()
-        # Reorder DataFrame columns
-        phot_system_labels = [phot_system.get_system_label() for phot_system in self.photometric_system]
-        reordered_columns = ['source_id']
-        for label in phot_system_labels:
-            column_sublist = [column for column in photometries_df.columns if column.startswith(f'{label}_')]
-            reordered_columns.extend(column_sublist)
-        photometries_df = photometries_df[reordered_columns]
-        return photometries_df
+        return _reorder_columns(photometries_df, self.photometric_system)
 
     def _photometries_to_dict(self):
         list_of_dicts = []
@@ -0,0 +1,214 @@
+"""
+packed_covariance.py
+====================================
+Module to represent the covariance matrices of continuous spectra in a compact form.
+
+The covariance matrix of a continuous spectrum is fully defined by the lower triangle of its correlation matrix, the
+formal errors of the coefficients and the standard deviation of the least squares solution. Storing these takes about
+half the memory of the full matrix, which is only built when it is needed.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _get_tril_indices(size, k=0):
+    """
+    Get the indices of the lower triangle of a square matrix. The indices are read-only as they are shared by all the
+        calls with the same arguments.
+
+    Args:
+        size (int): Number of rows/columns of the matrix.
+        k (int): Diagonal offset, as in np.tril_indices.
+
+    Returns:
+        tuple: Row and column indices.
+    """
+    rows, columns = np.tril_indices(size, k=k)
+    rows.flags.writeable = False
+    columns.flags.writeable = False
+    return rows, columns
+
+
+def _scale_errors(errors, standard_deviations):
+    """
+    Divide the formal errors by the standard deviation of each solution. The errors keep their own precision, as when
+        they are divided by a scalar.
+
+    Args:
+        errors (ndarray): 2D array of shape (n_sources, n_parameters).
+        standard_deviations (ndarray): 1D array of length n_sources.
+
+    Returns:
+        ndarray: 2D array of shape (n_sources, n_parameters).
+    """
+    return errors / np.asarray(standard_deviations).astype(errors.dtype)[:, np.newaxis]
+
+
+def _expand(correlations, errors, standard_deviations):
+    """
+    Build the full covariance matrices of a set of sources with the same number of parameters.
+
+    Args:
+        correlations (ndarray): 2D array of shape (n_sources, n_parameters * (n_parameters - 1) / 2) containing the
+            lower triangle of the correlation matrices (excluding the diagonal) in row-major order.
+        errors (ndarray): 2D array of shape (n_sources, n_parameters) containing the formal errors.
+        standard_deviations (ndarray): 1D array containing the standard deviation of each source.
+
+    Returns:
+        ndarray: 3D array of shape (n_sources, n_parameters, n_parameters).
+    """
+    n_sources, n_parameters = errors.shape
+    rows, columns = _get_tril_indices(n_parameters, -1)
+    matrices = np.empty((n_sources, n_parameters, n_parameters))
+    matrices[:, rows, columns] = correlations
+    matrices[:, columns, rows] = correlations
+    diagonal = np.arange(n_parameters)
+    matrices[:, diagonal, diagonal] = 1.0
+    # Same operation as the product of the diagonal matrices of errors and the correlation matrix
+    scaled_errors = _scale_errors(errors, standard_deviations)
+    matrices *= scaled_errors[:, :, np.newaxis]
+    matrices *= scaled_errors[:, np.newaxis, :]
+    return matrices
+
+
+class PackedCovariance(object):
+    """
+    Covariance matrix of a continuous spectrum stored as the lower triangle of the correlation matrix, the formal errors
+        of the coefficients and the standard deviation of the least squares solution.
+    """
+
+    def __init__(self, correlations, errors, standard_deviation):
+        """
+        Initialise a packed covariance matrix.
+
+        Args:
+            correlations (ndarray): 1D array containing the lower triangle of the correlation matrix (excluding the
+                diagonal) in row-major order, as in the Gaia Archive.
+            errors (ndarray): 1D array containing the formal errors of the coefficients.
+            standard_deviation (float): Standard deviation of the least squares solution.
+        """
+        self.correlations = correlations
+        self.errors = errors
+        self.standard_deviation = standard_deviation
+
+    @property
+    def shape(self):
+        return len(self.errors), len(self.errors)
+
+    @property
+    def nbytes(self):
+        return self.correlations.nbytes + self.errors.nbytes
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __getitem__(self, key):
+        return self.to_matrix()[key]
+
+    def __iter__(self):
+        return iter(self.to_matrix())
+
+    def __array__(self, dtype=None):
+        matrix = self.to_matrix()
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def truncate(self, n_parameters):
+        """
+        Get the covariance of the first parameters.
+
+        Args:
+            n_parameters (int): Number of parameters to keep.
+
+        Returns:
+            PackedCovariance: The covariance of the first n_parameters parameters. Its arrays are views of the arrays of
+                this object.
+        """
+        n_parameters = min(int(n_parameters), len(self.errors))
+        # The first rows of the lower triangle come first in row-major order
+        return PackedCovariance(self.correlations[:n_parameters * (n_parameters - 1) // 2],
+                                self.errors[:n_parameters], self.standard_deviation)
+
+    def to_matrix(self):
+        """
+        Build the full covariance matrix.
+
+        Returns:
+            ndarray: 2D array containing the covariance matrix.
+        """
+        return _expand(self.correlations[np.newaxis], np.asarray(self.errors)[np.newaxis],
+                       np.array([self.standard_deviation]))[0]
+
+
+def pack_covariances(correlation_matrices, errors, standard_deviations):
+    """
+    Pack the covariance matrices of a set of sources with the same number of parameters.
+
+    Args:
+        correlation_matrices (ndarray): 3D array of shape (n_sources, n_parameters, n_parameters) containing symmetric
+            correlation matrices with ones in the diagonal.
+        errors (ndarray): 2D array of shape (n_sources, n_parameters) containing the formal errors.
+        standard_deviations (ndarray): 1D array containing the standard deviation of each source.
+
+    Returns:
+        list: List of PackedCovariance objects. Their arrays are views of two contiguous 2D arrays.
+    """
+    rows, columns = _get_tril_indices(errors.shape[1], -1)
+    correlations = correlation_matrices[:, rows, columns]
+    return [PackedCovariance(*arguments) for arguments in zip(correlations, errors, standard_deviations)]
+
+
+def as_covariance_matrix(covariance):
+    """
+    Get a covariance matrix as a NumPy array.
+
+    Args:
+        covariance (ndarray/PackedCovariance): Full or packed covariance matrix.
+
+    Returns:
+        ndarray: 2D array containing the covariance matrix.
+    """
+    return covariance.to_matrix() if isinstance(covariance, PackedCovariance) else covariance
+
+
+def truncate_covariance(covariance, n_parameters):
+    """
+    Get the covariance of the first parameters.
+
+    Args:
+        covariance (ndarray/PackedCovariance): Full or packed covariance matrix.
+        n_parameters (int): Number of parameters to keep.
+
+    Returns:
+        ndarray/PackedCovariance: The covariance of the first n_parameters parameters, in the same representation.
+    """
+    if isinstance(covariance, PackedCovariance):
+        return covariance.truncate(n_parameters)
+    return covariance[:n_parameters, :n_parameters]
+
+
+def stack_covariance_matrices(covariances, n_parameters=None):
+    """
+    Build the full covariance matrices of a set of sources. Packed covariances with the same number of parameters are
+        expanded together.
+
+    Args:
+        covariances (iterable): Full or packed covariance matrices, all with at least n_parameters parameters.
+        n_parameters (int): Number of parameters to keep. If None, all the parameters are kept.
+
+    Returns:
+        ndarray: 3D array of shape (n_sources, n_parameters, n_parameters).
+    """
+    covariances = list(covariances)
+    if n_parameters is not None:
+        covariances = [truncate_covariance(covariance, n_parameters) for covariance in covariances]
+    if not covariances:
+        return np.empty((0, 0, 0)) if n_parameters is None else np.empty((0, n_parameters, n_parameters))
+    if all(isinstance(covariance, PackedCovariance) for covariance in covariances) and \
+            len({len(covariance) for covariance in covariances}) == 1:
+        return _expand(np.stack([covariance.correlations for covariance in covariances]),
+                       np.stack([covariance.errors for covariance in covariances]),
+                       np.array([covariance.standard_deviation for covariance in covariances]))
+    return np.stack([as_covariance_matrix(covariance) for covariance in covariances])
@@ -4,11 +4,7 @@ sampled_basis_functions.py
 Module to represent a set of basis functions evaluated on a grid.
 """
 
-import functools
-import math
-
 import numpy as np
-from scipy.special import eval_hermite, gamma
 
 from gaiaxpy.core import nature, satellite
 
@@ -61,25 +57,17 @@ class SampledBasisFunctions(object):
         rescaled_pwl = (sampling_pwl * scale) + offset
 
         bases_transformation = external_instrument_model.bases['transformationMatrix'][0]
-        evaluated_hermite_bases = np.array([_evaluate_hermite_function(n_h, pos, weight) for pos, weight in zip(
-            rescaled_pwl, weights) for n_h in np.arange(int(
-                external_instrument_model.bases['nInverseBasesCoefficients'][0]))]).reshape(
-                n_samples, int(external_instrument_model.bases['nInverseBasesCoefficients'][0]))
-        _design_matrix = external_instrument_model.bases['inverseBasesCoefficients'][0] @ evaluated_hermite_bases.T
+        n_coefficients = int(external_instrument_model.bases['nInverseBasesCoefficients'][0])
+        evaluated_hermite_bases = _evaluate_hermite_functions(n_coefficients, rescaled_pwl, weights)
+        _design_matrix = external_instrument_model.bases['inverseBasesCoefficients'][0] @ evaluated_hermite_bases
         transformed_design_matrix = bases_transformation @ _design_matrix
 
         hc = 1.e9 * nature.C * nature.PLANCK
-
-        def compute_norm(wl):
-            r = external_instrument_model.get_response(wl)
-            if r > 0:
-                return hc / (satellite.TELESCOPE_PUPIL_AREA * r * wl)
-            else:
-                return 0.0
-
-        norm = np.array([compute_norm(wl) for wl in sampling])
-        design_matrix = np.array([transformed_design_matrix[i] * norm for i in
-                                  np.arange(external_instrument_model.bases['nBases'][0])])
+        response = np.asarray(external_instrument_model.get_response(sampling), dtype=float)
+        positive = response > 0
+        norm = np.zeros(n_samples)
+        norm[positive] = hc / (satellite.TELESCOPE_PUPIL_AREA * response[positive] * sampling[positive])
+        design_matrix = transformed_design_matrix[:int(external_instrument_model.bases['nBases'][0])] * norm
 
         return cls(sampling, design_matrix=design_matrix)
 
@@ -131,33 +119,43 @@ def populate_design_matrix(sampling_grid, config):
     Returns:
         ndarray: The resulting design matrix.
     """
-    n_samples = len(sampling_grid)
     scale = (config['normalizedRange'].iloc(0)[0][1] - config['normalizedRange'].iloc(0)[0][0]) /\
             (config['range'].iloc(0)[0][1] - config['range'].iloc(0)[0][0])
     offset = config['normalizedRange'].iloc(0)[0][0] - config['range'].iloc(0)[0][0] * scale
     rescaled_pwl = (sampling_grid * scale) + offset
-
-    def psi(n, x): return 1.0 / np.sqrt(math.pow(2, n) * gamma(n + 1) *
-                                        np.sqrt(np.pi)) * np.exp(-x ** 2 / 2.0) * eval_hermite(n, x)
-
     dimension = int(config['dimension'].iloc[0])
     transformed_set_dimension = int(config['transformedSetDimension'].iloc[0])
     bases_transformation = config['transformationMatrix'].iloc(0)[0].reshape(dimension, transformed_set_dimension)
-    design_matrix = np.array([psi(n_h, pos) for pos in rescaled_pwl for n_h in np.arange(dimension)]).reshape(n_samples,
-                                                                                                              dimension)
-    return bases_transformation @ design_matrix.T
+    return bases_transformation @ _evaluate_hermite_functions(dimension, rescaled_pwl)
 
 
-def _evaluate_hermite_function(n, x, w):
-    return _hermite_function(n, x) if w > 0 else 0
+def _evaluate_hermite_functions(n_functions, positions, weights=None):
+    """
+    Evaluate the first Hermite functions at all positions using the three-term recurrence relation:
+        psi_n(x) = sqrt(2 / n) * x * psi_(n-1)(x) - sqrt((n - 1) / n) * psi_(n-2)(x)
 
+    Args:
+        n_functions (int): Number of Hermite functions to evaluate.
+        positions (ndarray): 1D array of positions where the functions need to be evaluated.
+        weights (ndarray): 1D array containing the weights of each position. Where the weight is not positive, the
+            functions are not evaluated and are set to 0. If None, the functions are evaluated at all positions.
 
-@functools.lru_cache(maxsize=128)
-def _hermite_function(n, x):
-    if n == 0:
-        return sqrt_4_pi * np.exp(-x ** 2. / 2.)
-    elif n == 1:
-        return sqrt_4_pi * np.exp(-x ** 2. / 2.) * np.sqrt(2.) * x
-    c1 = np.sqrt(2. / n) * x
-    c2 = -np.sqrt((n - 1) / n)
-    return c1 * _hermite_function(n - 1, x) + c2 * _hermite_function(n - 2, x)
+    Returns:
+        ndarray: 2D array of shape (n_functions, n_positions) containing the value of each function at each position.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if weights is not None:
+        mask = np.asarray(weights) > 0
+        hermite_functions = np.zeros((n_functions, len(positions)))
+        hermite_functions[:, mask] = _evaluate_hermite_functions(n_functions, positions[mask])
+        return hermite_functions
+    hermite_functions = np.empty((n_functions, len(positions)))
+    if n_functions > 0:
+        hermite_functions[0] = sqrt_4_pi * np.exp(-positions ** 2. / 2.)
+    if n_functions > 1:
+        hermite_functions[1] = hermite_functions[0] * np.sqrt(2.) * positions
+    for n in range(2, n_functions):
+        c1 = np.sqrt(2. / n) * positions
+        c2 = -np.sqrt((n - 1) / n)
+        hermite_functions[n] = c1 * hermite_functions[n - 1] + c2 * hermite_functions[n - 2]
+    return hermite_functions
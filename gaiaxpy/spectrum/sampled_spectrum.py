@@ -8,6 +8,7 @@ import numpy as np
 from numpy import ndarray, nan
 
 from .generic_spectrum import Spectrum
+from .packed_covariance import as_covariance_matrix
 
 
 class SampledSpectrum(Spectrum):
@@ -120,7 +121,8 @@ class SampledSpectrum(Spectrum):
         flux value for each sample.
 
         Args:
-            covariance (ndarray): 2D array containing the elements of the covariance matrix.
+            covariance (ndarray/PackedCovariance): 2D array containing the elements of the covariance matrix, or the
+                covariance matrix in packed form.
             design_matrix (ndarray): 2D array containing the evaluation of the basis functions on the desired sampling
                 grid.
             standard_deviation (float): Standard deviation.
@@ -129,7 +131,8 @@ class SampledSpectrum(Spectrum):
             ndarray: 1D array containing the errors in flux for all samples.
         """
         if len(covariance) == 0:
-            return covariance
+            return as_covariance_matrix(covariance)
+        covariance = as_covariance_matrix(covariance)
         return np.sqrt(np.sum(np.multiply(design_matrix.T @ covariance, design_matrix.T), axis=1)) * standard_deviation
 
     @staticmethod
@@ -139,12 +142,12 @@ class SampledSpectrum(Spectrum):
         positions corresponding to the samples, this method computes the covariance matrix of the sampled spectrum.
 
         Args:
-            covariance (ndarray): 2D array containing the elements of the covariance matrix of the continuous
-                representation.
+            covariance (ndarray/PackedCovariance): 2D array containing the elements of the covariance matrix of the
+                continuous representation, or the covariance matrix in packed form.
             design_matrix (ndarray): 2D array containing the evaluation of the basis functions on the desired sampling
             grid.
 
         Returns:
             ndarray: 2D array containing the covariance matrix of the sampled spectrum.
         """
-        return design_matrix.T @ covariance @ design_matrix
+        return design_matrix.T @ as_covariance_matrix(covariance) @ design_matrix
@@ -7,6 +7,8 @@ Module to hold methods useful for different kinds of spectra.
 import numpy as np
 import pandas as pd
 
+from .packed_covariance import PackedCovariance, _scale_errors, pack_covariances
+
 
 def get_covariance_matrix(row, band):
     columns = row.keys() if isinstance(row, dict) else row.index
@@ -15,12 +17,101 @@ def get_covariance_matrix(row, band):
     elif f'{band}_coefficient_covariances' in columns:
         return row[f'{band}_coefficient_covariances']
     elif f'{band}_coefficient_correlations' in columns:
-        return _correlation_to_covariance_dr3int5(row[f'{band}_coefficient_correlations'],
-                                                  row[f'{band}_coefficient_errors'],
-                                                  row[f'{band}_standard_deviation'])
+        correlations = row[f'{band}_coefficient_correlations']
+        errors = row[f'{band}_coefficient_errors']
+        standard_deviation = row[f'{band}_standard_deviation']
+        if _is_lower_triangle(correlations, errors) and not pd.isna(standard_deviation):
+            return PackedCovariance(correlations, errors, standard_deviation).to_matrix()
+        return _correlation_to_covariance_dr3int5(correlations, errors, standard_deviation)
     raise ValueError(f'None of the expected columns could be found in the input row. Columns are: {columns}.')
 
 
+def get_covariance_matrices(df, band):
+    """
+    Get the covariance matrices of one band for all the sources in a DataFrame. This is equivalent to applying
+        get_covariance_matrix to each row, but the covariances reconstructed from correlations are kept in packed form
+        (see PackedCovariance). Correlations given as the lower triangle of the matrix (as in the Archive) are used as
+        they are, full correlation matrices are processed together for all the sources with the same number of
+        parameters.
+
+    Args:
+        df (DataFrame): Parsed continuous spectra.
+        band (str): Gaia photometer, can be either 'bp' or 'rp'.
+
+    Returns:
+        Series: Covariance matrix of each source, either packed or as a 2D array. None is returned for the sources where
+            the band is missing.
+
+    Raises:
+        ValueError: If none of the columns required to get the covariance matrices is present in the DataFrame.
+    """
+    columns = df.columns
+    if f'{band}_covariance_matrix' in columns:
+        return df[f'{band}_covariance_matrix']
+    elif f'{band}_coefficient_covariances' in columns:
+        return df[f'{band}_coefficient_covariances']
+    elif f'{band}_coefficient_correlations' not in columns:
+        raise ValueError(f'None of the expected columns could be found in the input data. Columns are: {columns}.')
+    correlation_matrices = df[f'{band}_coefficient_correlations'].tolist()
+    formal_errors = df[f'{band}_coefficient_errors'].tolist()
+    standard_deviations = df[f'{band}_standard_deviation'].tolist()
+    covariance_matrices = [None] * len(df)
+    groups = dict()
+    sources = zip(correlation_matrices, formal_errors, standard_deviations)
+    for index, (correlation_matrix, errors, standard_deviation) in enumerate(sources):
+        if pd.isna(standard_deviation):
+            continue  # Missing band
+        if _is_lower_triangle(correlation_matrix, errors):
+            covariance_matrices[index] = PackedCovariance(correlation_matrix, errors, standard_deviation)
+        elif isinstance(correlation_matrix, np.ndarray) and correlation_matrix.ndim == 2 and \
+                isinstance(errors, np.ndarray) and correlation_matrix.shape == (len(errors), len(errors)):
+            groups.setdefault(len(errors), []).append(index)
+        else:
+            covariance_matrices[index] = _correlation_to_covariance_dr3int5(correlation_matrix, errors,
+                                                                            standard_deviation)
+    for indices in groups.values():
+        indices = np.array(indices)
+        errors = np.stack([formal_errors[index] for index in indices])
+        stacked_standard_deviations = np.array([standard_deviations[index] for index in indices])
+        stacked_matrices = np.stack([correlation_matrices[index] for index in indices])
+        # Only symmetric correlation matrices with ones in the diagonal are fully defined by their lower triangle
+        packable = (stacked_matrices == stacked_matrices.transpose(0, 2, 1)).all(axis=(1, 2)) & \
+            (np.diagonal(stacked_matrices, axis1=1, axis2=2) == 1).all(axis=1) & \
+            (stacked_matrices.dtype == np.float64)
+        for index, covariance in zip(indices[packable], pack_covariances(
+                stacked_matrices[packable], errors[packable], stacked_standard_deviations[packable])):
+            covariance_matrices[index] = covariance
+        if not packable.all():
+            # Same operation as the product of the diagonal matrices of errors and the correlation matrix
+            scaled_errors = _scale_errors(errors[~packable], stacked_standard_deviations[~packable])
+            stacked_matrices = stacked_matrices[~packable]
+            stacked_matrices *= scaled_errors[:, :, np.newaxis]
+            stacked_matrices *= scaled_errors[:, np.newaxis, :]
+            for index, matrix in zip(indices[~packable], stacked_matrices):
+                covariance_matrices[index] = matrix
+    # Filled element by element, pandas would otherwise convert the packed covariances in a list to full matrices
+    covariance_column = np.empty(len(covariance_matrices), dtype=object)
+    for index, covariance_matrix in enumerate(covariance_matrices):
+        covariance_column[index] = covariance_matrix
+    return pd.Series(covariance_column, index=df.index, dtype=object)
+
+
+def _is_lower_triangle(correlations, formal_errors):
+    """
+    Check whether some correlations are stored as the lower triangle of the correlation matrix (excluding the diagonal),
+        as in the Gaia Archive.
+
+    Args:
+        correlations (ndarray): Correlations of the parameters.
+        formal_errors (ndarray): Formal errors of the parameters.
+
+    Returns:
+        bool: True if the correlations are a 1D array of the size of the lower triangle.
+    """
+    return isinstance(correlations, np.ndarray) and correlations.ndim == 1 and isinstance(formal_errors, np.ndarray) \
+        and len(correlations) == len(formal_errors) * (len(formal_errors) - 1) // 2
+
+
 def _correlation_to_covariance_dr3int5(correlation_matrix, formal_errors, standard_deviation):
     """
     Compute the covariance matrix from the correlation matrix and the parameter formal errors.
@@ -8,6 +8,7 @@ import numpy as np
 
 from gaiaxpy.core.generic_functions import array_to_symmetric_matrix
 from gaiaxpy.core.satellite import BANDS
+from .packed_covariance import as_covariance_matrix
 from .utils import _list_to_array, get_covariance_matrix
 from .xp_spectrum import XpSpectrum
 
@@ -28,7 +29,8 @@ class XpContinuousSpectrum(XpSpectrum):
             source_id (str): Source identifier.
             xp (str): Gaia photometer, can be either 'bp' or 'rp'.
             coefficients (ndarray): 1D array containing the coefficients multiplying the basis functions.
-            covariance (ndarray): 2D array containing the covariance of the least squares solution.
+            covariance (ndarray/PackedCovariance): 2D array containing the covariance of the least squares solution, or
+                the covariance in packed form. A packed covariance is only expanded when it is needed.
             standard_deviation (float): Standard deviation of the least squares solution.
         """
         XpSpectrum.__init__(self, source_id, xp)
@@ -73,7 +75,7 @@ class XpContinuousSpectrum(XpSpectrum):
         Returns:
             ndarray: The 2D array of the covariance matrix.
         """
-        return self.covariance
+        return as_covariance_matrix(self.covariance)
 
     def get_standard_deviation(self):
         """
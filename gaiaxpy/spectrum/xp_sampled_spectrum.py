@@ -8,6 +8,7 @@ from numbers import Number
 
 import numpy as np
 
+from .packed_covariance import truncate_covariance
 from .sampled_spectrum import SampledSpectrum
 from .utils import _list_to_array
 from .xp_spectrum import XpSpectrum
@@ -77,11 +78,12 @@ class XpSampledSpectrum(XpSpectrum, SampledSpectrum):
             design_matrix = sampled_basis_functions.get_design_matrix()
         else:
             return None
-        covariance = continuous_spectrum.get_covariance()
+        # The covariance is only expanded to a full matrix when the spectrum is sampled
+        covariance = continuous_spectrum.covariance
 
         if isinstance(truncation, Number) and truncation > 0:
             coefficients = coefficients[:truncation]
-            covariance = covariance[:truncation, :truncation]
+            covariance = truncate_covariance(covariance, truncation)
             design_matrix = design_matrix[:truncation][:]
 
         stdev = continuous_spectrum.get_standard_deviation()
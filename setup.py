@@ -33,12 +33,13 @@ INSTALL_REQUIRES = ['aenum',
                     'numpy>1.13',
                     'packaging',
                     'pandas>=1.0.0',
+                    'requests',
                     'scipy',
                     'tqdm>=4.64.0']
 
 SETUP_REQUIRES = INSTALL_REQUIRES + ['setuptools', 'setuptools_scm', 'wheel']
 
-EXTRAS_REQUIRE = {'tests': ['pytest', 'pytest-cov']}
+EXTRAS_REQUIRE = {'parquet': ['pyarrow'], 'tests': ['pytest', 'pytest-cov']}
 
 with open("README.md", "r") as fh:
     LONG_DESCRIPTION = fh.read()
@@ -57,6 +58,7 @@ setup(
     python_requires='>=3.7',
     packages=find_packages(),
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
     include_package_data=True,
     classifiers=CLASSIFIERS
 )
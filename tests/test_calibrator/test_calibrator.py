@@ -12,7 +12,7 @@ from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousPars
 from gaiaxpy.spectrum.absolute_sampled_spectrum import AbsoluteSampledSpectrum
 from gaiaxpy.spectrum.sampled_basis_functions import SampledBasisFunctions
 from tests.files.paths import mean_spectrum_csv_file, mean_spectrum_avro_file, mean_spectrum_fits_file, \
-    mean_spectrum_xml_file, mean_spectrum_xml_plain_file, mean_spectrum_ecsv_file
+    mean_spectrum_xml_file, mean_spectrum_xml_plain_file, mean_spectrum_ecsv_file, with_missing_bp_csv_file
 from tests.test_calibrator.calibrator_solutions import solution_default_df, solution_custom_df, \
     solution_v211w_default_df, solution_v211w_custom_df, sol_custom_sampling_array, sol_v211w_default_sampling_array, \
     sol_default_sampling_array
@@ -94,3 +94,53 @@ class TestCalibratorSamplingRange(unittest.TestCase):
     def test_sampling_both_wrong(self):
         with self.assertRaises(ValueError):
             calibrate(mean_spectrum_avro_file, sampling=np.linspace(200, 2000, 100), save_file=False)
+
+
+class TestCalibratorBatch(unittest.TestCase):
+
+    def test_batch_default_calibration_model(self):
+        for file in cal_input_files:
+            spectra_df, positions = calibrate(file, batch=True, save_file=False)
+            npt.assert_array_equal(positions, sol_default_sampling_array, err_msg=npt_array_err_message(file))
+            pdt.assert_frame_equal(spectra_df, solution_default_df, atol=_atol, rtol=_rtol)
+
+    def test_batch_custom_sampling_v211w_model(self):
+        for file in cal_input_files:
+            spectra_df, positions = _calibrate(file, sampling=np.arange(350, 1050, 200), save_file=False,
+                                               bp_model=bp_model, batch=True)
+            npt.assert_array_equal(positions, sol_custom_sampling_array, err_msg=npt_array_err_message(file))
+            pdt.assert_frame_equal(spectra_df, solution_v211w_custom_df, atol=_atol, rtol=_rtol)
+
+    def test_batch_matches_per_source(self):
+        for file, truncation in [(mean_spectrum_csv_file, False), (mean_spectrum_csv_file, True),
+                                 (with_missing_bp_csv_file, True)]:
+            expected_df, _ = calibrate(file, truncation=truncation, with_correlation=True, save_file=False)
+            batch_df, _ = calibrate(file, truncation=truncation, with_correlation=True, batch=True, save_file=False)
+            for column in expected_df.columns:
+                npt.assert_allclose(np.vstack(batch_df[column]), np.vstack(expected_df[column]), rtol=_rtol,
+                                    atol=_atol)
+
+
+class TestCalibratorChunks(unittest.TestCase):
+
+    def test_chunks_default_calibration_model(self):
+        for file in cal_input_files:
+            for batch in [False, True]:
+                spectra_df, positions = calibrate(file, batch=batch, save_file=False, chunk_size=1)
+                npt.assert_array_equal(positions, sol_default_sampling_array, err_msg=npt_array_err_message(file))
+                pdt.assert_frame_equal(spectra_df, solution_default_df, atol=_atol, rtol=_rtol)
+
+
+class TestCalibratorParallel(unittest.TestCase):
+
+    def test_parallel_default_calibration_model(self):
+        for batch in [False, True]:
+            spectra_df, positions = calibrate(mean_spectrum_csv_file, batch=batch, save_file=False, n_workers=2)
+            npt.assert_array_equal(positions, sol_default_sampling_array)
+            pdt.assert_frame_equal(spectra_df, solution_default_df, atol=_atol, rtol=_rtol)
+
+    def test_parallel_matches_serial(self):
+        expected_df, _ = calibrate(mean_spectrum_csv_file, truncation=True, with_correlation=True, save_file=False)
+        parallel_df, _ = calibrate(mean_spectrum_csv_file, truncation=True, with_correlation=True, save_file=False,
+                                   n_workers=3)
+        pdt.assert_frame_equal(parallel_df, expected_df)
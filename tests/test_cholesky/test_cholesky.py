@@ -5,11 +5,12 @@ import numpy as np
 import numpy.testing as npt
 import pandas as pd
 import pandas.testing as pdt
+from numpy.linalg import LinAlgError
+from scipy.linalg import cholesky, solve_triangular
 
-from gaiaxpy import get_chi2, get_inverse_covariance_matrix
-from gaiaxpy.cholesky.cholesky import _get_inverse_square_root_covariance_matrix_aux, \
-    get_inverse_square_root_covariance_matrix
-from gaiaxpy.core.generic_functions import str_to_array, array_to_symmetric_matrix
+from gaiaxpy import get_chi2, get_chi2_batch, get_inverse_covariance_matrix
+from gaiaxpy.cholesky.cholesky import _get_band_matrices, get_inverse_square_root_covariance_matrix
+from gaiaxpy.core.generic_functions import str_to_array, array_to_symmetric_matrix, arrays_to_symmetric_matrices
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.input_reader.input_reader import InputReader
 from tests.files.paths import with_missing_bp_csv_file, with_missing_bp_ecsv_file, with_missing_bp_xml_file, \
@@ -22,6 +23,19 @@ _rtol = 1e-05
 _atol = 1e-05
 
 
+def _get_inverse_square_root_covariance_matrix_aux(xp_errors, xp_correlation_matrix):
+    """
+    Reference implementation for a single source, computing the inverse square root of the covariance matrix with
+        SciPy. Returns None if the Cholesky decomposition of the correlation matrix fails.
+    """
+    try:
+        _L = cholesky(xp_correlation_matrix, lower=True)
+        _L_inv = solve_triangular(_L, np.identity(len(_L)), lower=True)
+        return np.dot(_L_inv, np.diag(1.0 / xp_errors))
+    except (ValueError, LinAlgError):
+        return None
+
+
 class TestCholesky(unittest.TestCase):
 
     def test_inverse_covariance_matrix_from_file(self):
@@ -70,6 +84,48 @@ class TestCholesky(unittest.TestCase):
         self.assertAlmostEqual(get_chi2(bp_inv_sqrt_cov, mock_residuals), 16655.037182417516, places=7)
 
 
+class TestChi2Batch(unittest.TestCase):
+
+    def setUp(self):
+        output = get_inverse_square_root_covariance_matrix(with_missing_bp_csv_file, output_array=True)
+        self.bp_inv_sqrt_cov = output['bp_inverse_square_root_covariance_matrix']
+        self.rp_inv_sqrt_cov = output['rp_inverse_square_root_covariance_matrix']
+        self.residuals = np.random.default_rng(0).normal(size=(len(self.rp_inv_sqrt_cov), 4, 55))
+
+    def test_same_as_get_chi2(self):
+        chi2 = get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals)
+        self.assertEqual(chi2.shape, (len(self.rp_inv_sqrt_cov), 4))
+        for source_chi2, matrix, source_residuals in zip(chi2, self.rp_inv_sqrt_cov, self.residuals):
+            npt.assert_allclose(source_chi2, [get_chi2(matrix, residuals) for residuals in source_residuals],
+                                rtol=1e-12)
+        npt.assert_allclose(get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals[:, 0]), chi2[:, 0], rtol=1e-12)
+        self.assertAlmostEqual(get_chi2_batch(self.rp_inv_sqrt_cov[0], self.residuals[0, 0]), chi2[0, 0], places=10)
+
+    def test_missing_band(self):
+        chi2 = get_chi2_batch(self.bp_inv_sqrt_cov, self.residuals)
+        self.assertTrue(np.isnan(chi2[1]).all())
+        self.assertFalse(np.isnan(chi2[[0, 2]]).any())
+
+    def test_truncation(self):
+        n_relevant_bases = [20, 55, 40]
+        chi2 = get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals, n_relevant_bases)
+        for source_chi2, matrix, source_residuals, n_bases in zip(chi2, self.rp_inv_sqrt_cov, self.residuals,
+                                                                  n_relevant_bases):
+            x = matrix[:n_bases, :n_bases] @ source_residuals[:, :n_bases].T
+            npt.assert_allclose(source_chi2, (x ** 2).sum(axis=0), rtol=1e-12)
+        npt.assert_allclose(get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals, 20)[0], chi2[0], rtol=1e-12)
+        chi2 = get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals, pd.Series([20, None, 40], dtype='Int64'))
+        self.assertTrue(np.isnan(chi2[1]).all())
+
+    def test_wrong_shapes(self):
+        with self.assertRaises(ValueError):
+            get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals[:2])
+        with self.assertRaises(ValueError):
+            get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals[:, :, :54])
+        with self.assertRaises(ValueError):
+            get_chi2_batch(self.rp_inv_sqrt_cov, self.residuals, [20, 30])
+
+
 class TestInverseSquareRootCovarianceMatrix(unittest.TestCase):
 
     def test_internal_inverse_square_root_covariance_matrix_no_missing_bands(self):
@@ -80,7 +136,8 @@ class TestInverseSquareRootCovarianceMatrix(unittest.TestCase):
         bands_output = []
         for b in BANDS:
             xp_errors = (parsed_input_data[f'{b}_coefficient_errors'] / parsed_input_data[f'{b}_standard_deviation'])
-            xp_correlation_matrix = parsed_input_data[f'{b}_coefficient_correlations']
+            xp_correlation_matrix = arrays_to_symmetric_matrices(parsed_input_data[f'{b}_coefficient_correlations'],
+                                                                 parsed_input_data[f'{b}_n_parameters'])
             band_output = map(_get_inverse_square_root_covariance_matrix_aux, xp_errors, xp_correlation_matrix)
             bands_output.append(band_output)
         output_list = [parsed_input_data['source_id']]
@@ -97,7 +154,8 @@ class TestInverseSquareRootCovarianceMatrix(unittest.TestCase):
         bands_output = []
         for b in BANDS:
             xp_errors = (parsed_input_data[f'{b}_coefficient_errors'] / parsed_input_data[f'{b}_standard_deviation'])
-            xp_correlation_matrix = parsed_input_data[f'{b}_coefficient_correlations']
+            xp_correlation_matrix = arrays_to_symmetric_matrices(parsed_input_data[f'{b}_coefficient_correlations'],
+                                                                 parsed_input_data[f'{b}_n_parameters'])
             band_output = map(_get_inverse_square_root_covariance_matrix_aux, xp_errors, xp_correlation_matrix)
             bands_output.append(band_output)
         output_list = [parsed_input_data['source_id']]
@@ -140,3 +198,65 @@ class TestInverseSquareRootCovarianceMatrix(unittest.TestCase):
         # Almost equal as the solution file contains fewer decimals than the ones returned by the function
         npt.assert_array_almost_equal(
             output, inv_sqrt_cov_matrix_sol_with_missing_df['rp_inverse_square_root_covariance_matrix'].iloc[2])
+
+
+class TestBatchedCholesky(unittest.TestCase):
+
+    def setUp(self):
+        parsed_input_data, _ = InputReader(with_missing_bp_csv_file, get_inverse_covariance_matrix).read()
+        self.xp_errors = parsed_input_data['rp_coefficient_errors'] / parsed_input_data['rp_standard_deviation']
+        self.xp_correlation_matrices = pd.Series(arrays_to_symmetric_matrices(
+            parsed_input_data['rp_coefficient_correlations'], parsed_input_data['rp_n_parameters']),
+            index=parsed_input_data.index, dtype=object)
+
+    def test_same_as_single_source(self):
+        matrices = _get_band_matrices(self.xp_errors, self.xp_correlation_matrices, False, False)
+        for matrix, errors, correlation_matrix in zip(matrices, self.xp_errors, self.xp_correlation_matrices):
+            npt.assert_allclose(matrix, _get_inverse_square_root_covariance_matrix_aux(errors, correlation_matrix),
+                                rtol=1e-12, atol=1e-12)
+            self.assertTrue(np.all(np.triu(matrix, k=1) == 0))
+
+    def test_not_positive_definite(self):
+        xp_correlation_matrices = self.xp_correlation_matrices.copy()
+        xp_correlation_matrices.iloc[1] = -np.identity(55)
+        self.assertIsNone(_get_inverse_square_root_covariance_matrix_aux(self.xp_errors.iloc[1],
+                                                                         xp_correlation_matrices.iloc[1]))
+        matrices = _get_band_matrices(self.xp_errors, xp_correlation_matrices, True, False)
+        self.assertIsNone(matrices[1])
+        expected_matrices = _get_band_matrices(self.xp_errors, self.xp_correlation_matrices, True, False)
+        for index in [0, 2]:
+            npt.assert_array_equal(matrices[index], expected_matrices[index])
+
+    def test_output_array(self):
+        output_df = get_inverse_covariance_matrix(with_missing_bp_csv_file)
+        output = get_inverse_covariance_matrix(with_missing_bp_csv_file, output_array=True)
+        self.assertEqual(list(output.keys()), list(output_df.columns))
+        npt.assert_array_equal(output['source_id'], output_df['source_id'])
+        for band in BANDS:
+            array = output[f'{band}_inverse_covariance']
+            self.assertEqual(array.shape, (len(output_df), 55, 55))
+            self.assertTrue(array.flags.c_contiguous)
+            for matrix, expected_matrix in zip(array, output_df[f'{band}_inverse_covariance']):
+                if expected_matrix is None:
+                    self.assertTrue(np.isnan(matrix).all())
+                else:
+                    npt.assert_array_equal(matrix, expected_matrix)
+        output = get_inverse_square_root_covariance_matrix(with_missing_bp_csv_file, band='rp', output_array=True)
+        self.assertEqual(list(output.keys()), ['source_id', 'rp_inverse_square_root_covariance_matrix'])
+
+
+class TestCholeskyParallel(unittest.TestCase):
+
+    def test_inverse_covariance_matrix_parallel(self):
+        inverse_df = get_inverse_covariance_matrix(with_missing_bp_xml_file, n_workers=2)
+        pdt.assert_frame_equal(inverse_df, cholesky_solution, rtol=_rtol, atol=_atol)
+
+    def test_inverse_square_root_covariance_matrix_parallel(self):
+        output_df = get_inverse_square_root_covariance_matrix(with_missing_bp_csv_file, n_workers=2)
+        pdt.assert_frame_equal(output_df, inv_sqrt_cov_matrix_sol_with_missing_df)
+
+    def test_output_array_parallel(self):
+        output = get_inverse_covariance_matrix(with_missing_bp_csv_file, output_array=True)
+        parallel_output = get_inverse_covariance_matrix(with_missing_bp_csv_file, n_workers=2, output_array=True)
+        for key, array in output.items():
+            npt.assert_array_equal(parallel_output[key], array)
@@ -7,7 +7,8 @@ import pandas as pd
 import pandas.testing as pdt
 
 from gaiaxpy import generate, PhotometricSystem
-from gaiaxpy.colour_equation.xp_filter_system_colour_equation import apply_colour_equation
+from gaiaxpy.colour_equation.xp_filter_system_colour_equation import _get_correction, _load_colour_equation, \
+    apply_colour_equation
 from gaiaxpy.core.generic_functions import cast_output
 from tests.files.paths import colour_eq_csv_file
 from tests.test_colour_equation.colour_equation_paths import col_eq_sol_johnson_path
@@ -201,3 +202,18 @@ class TestSingleColourEquation(unittest.TestCase):
         # Data that should have changed
         for column in columns_that_change:
             self.assertTrue(math.isnan(corrected_data[column].iloc[0]))
+
+
+class TestColourCorrection(unittest.TestCase):
+
+    def test_get_correction(self):
+        details = _load_colour_equation('JkcStd')
+        polyfunc, derivative = details['polyfunc'], details['derivative']
+        colour_min, colour_max = details['colour_range']
+        colours = np.array([0.5, colour_min - 1, colour_max + 1, np.nan])
+        correction = _get_correction({'JkcStd': details}, colours, 'JkcStd')
+        npt.assert_array_equal(correction[0], polyfunc(0.5))
+        # Linear extrapolation outside the colour range
+        npt.assert_allclose(correction[1], polyfunc(colour_min) - derivative(colour_min), rtol=1e-14)
+        npt.assert_allclose(correction[2], polyfunc(colour_max) + derivative(colour_max), rtol=1e-14)
+        self.assertTrue(np.isnan(correction[3]))
@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pandas.testing as pdt
+
+from gaiaxpy import convert
+from gaiaxpy.file_parser.parse_internal_sampled import InternalSampledParser
+from tests.files.paths import mean_spectrum_xml_plain_file, con_ref_sampled_truncated_csv_path, con_converters, \
+    con_sol_csv_0_60_481_path, mean_spectrum_avro_file, mean_spectrum_csv_file, mean_spectrum_ecsv_file, \
+    mean_spectrum_fits_file, mean_spectrum_xml_file
+from tests.utils.utils import get_spectrum_with_source_id_and_xp, npt_array_err_message
+
+con_input_files = [mean_spectrum_avro_file, mean_spectrum_csv_file, mean_spectrum_ecsv_file, mean_spectrum_fits_file,
+                   mean_spectrum_xml_file, mean_spectrum_xml_plain_file]
+
+sampling = np.linspace(0, 60, 481)
+
+# Only the solutions of these tests are loaded, some of the solutions used in converter_paths are not available
+converter_csv_solution_0_60_481_df = pd.read_csv(con_sol_csv_0_60_481_path, float_precision='high',
+                                                 converters=con_converters)
+ref_sampled_truncated, _ = InternalSampledParser()._parse(con_ref_sampled_truncated_csv_path)
+
+TOL = 4
+
+
+class TestConverterBatch(unittest.TestCase):
+
+    def test_converter_batch(self):
+        for file in con_input_files:
+            converted_df, _ = convert(file, sampling=sampling, save_file=False, batch=True)
+            pdt.assert_frame_equal(converted_df, converter_csv_solution_0_60_481_df, rtol=1e-6, atol=1e-6)
+
+    def test_truncation_batch(self):
+        for file in con_input_files:
+            converted_truncated_df, _ = convert(file, sampling=sampling, truncation=True, save_file=False, batch=True)
+            for spectrum in converted_truncated_df.to_dict('records'):
+                ref = get_spectrum_with_source_id_and_xp(spectrum['source_id'], spectrum['xp'], ref_sampled_truncated)
+                npt.assert_almost_equal(ref['flux'], spectrum['flux'], decimal=TOL, err_msg=npt_array_err_message(file))
+                npt.assert_almost_equal(ref['error'], spectrum['flux_error'], decimal=TOL,
+                                        err_msg=npt_array_err_message(file))
@@ -0,0 +1,23 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from gaiaxpy import convert
+from tests.files.paths import con_converters, con_sol_csv_0_60_481_path, mean_spectrum_csv_file
+
+sampling = np.linspace(0, 60, 481)
+
+# Only the solution of these tests is loaded, some of the solutions used in converter_paths are not available
+converter_csv_solution_0_60_481_df = pd.read_csv(con_sol_csv_0_60_481_path, float_precision='high',
+                                                 converters=con_converters)
+
+
+class TestConverterParallel(unittest.TestCase):
+
+    def test_converter_parallel(self):
+        for batch in [False, True]:
+            converted_df, _ = convert(mean_spectrum_csv_file, sampling=sampling, save_file=False, batch=batch,
+                                      n_workers=2)
+            pdt.assert_frame_equal(converted_df, converter_csv_solution_0_60_481_df, rtol=1e-6, atol=1e-6)
@@ -0,0 +1,88 @@
+import re
+import shutil
+import tempfile
+import unittest
+from os import utime
+from os.path import exists, join
+from unittest.mock import patch
+
+import numpy.testing as npt
+
+from gaiaxpy.config.paths import filters_path
+from gaiaxpy.core import filter_cache
+from gaiaxpy.core.filter_cache import clear_filter_cache, load_filter_arrays
+from gaiaxpy.core.xml_utils import get_array_text, get_file_root, get_xp_merge, get_xp_sampling_matrix, parse_array
+
+filter_file_name = 'XpFilter_JkcStd_v375wiv142r.xml'
+
+
+class TestFilterCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.filter_file = join(self.temp_dir, filter_file_name)
+        shutil.copy(join(filters_path, filter_file_name), self.filter_file)
+        self.cache_dir_patch = patch.object(filter_cache, 'filter_cache_dir', join(self.temp_dir, 'cache'))
+        self.cache_dir_patch.start()
+        clear_filter_cache()
+
+    def tearDown(self):
+        clear_filter_cache()
+        self.cache_dir_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_content(self):
+        x_root = get_file_root(self.filter_file)
+        bands, n_bands = get_array_text(x_root, 'bands')
+        for _ in range(2):  # Parsed and cached
+            zero_points, offsets, cached_bands, bp_sampling, rp_sampling, sampling_grid, bp_merge, rp_merge = \
+                load_filter_arrays(self.filter_file, 'zero_points', 'offsets', 'bands', 'bp_sampling', 'rp_sampling',
+                                   'sampling_grid', 'bp_merge', 'rp_merge')
+            npt.assert_array_equal(zero_points, parse_array(x_root, 'zeropoints'))
+            npt.assert_array_equal(offsets, parse_array(x_root, 'fluxBias'))
+            self.assertEqual(cached_bands.tolist(), bands)
+            npt.assert_array_equal(bp_sampling, get_xp_sampling_matrix(x_root, 'bp', n_bands))
+            npt.assert_array_equal(rp_sampling, get_xp_sampling_matrix(x_root, 'rp', n_bands))
+            for array, expected_array in zip([sampling_grid, bp_merge, rp_merge], get_xp_merge(x_root)):
+                npt.assert_array_equal(array, expected_array)
+
+    def test_disk_cache_is_reused(self):
+        zero_points, = load_filter_arrays(self.filter_file, 'zero_points')
+        self.assertTrue(exists(filter_cache._get_cache_file(self.filter_file)))
+        clear_filter_cache()
+        with patch.object(filter_cache, '_parse_filter_file', side_effect=AssertionError('Filter parsed again.')):
+            cached_zero_points, = load_filter_arrays(self.filter_file, 'zero_points')
+        npt.assert_array_equal(cached_zero_points, zero_points)
+
+    def test_returns_copies(self):
+        zero_points, = load_filter_arrays(self.filter_file, 'zero_points')
+        zero_points[:] = 0.
+        self.assertFalse((load_filter_arrays(self.filter_file, 'zero_points')[0] == 0.).any())
+
+    def test_touched_file_is_not_parsed(self):
+        load_filter_arrays(self.filter_file, 'zero_points')
+        utime(self.filter_file, ns=(0, 0))
+        clear_filter_cache()
+        with patch.object(filter_cache, '_parse_filter_file', side_effect=AssertionError('Filter parsed again.')):
+            load_filter_arrays(self.filter_file, 'zero_points')
+
+    def test_modified_file_is_parsed(self):
+        zero_points, = load_filter_arrays(self.filter_file, 'zero_points')
+        with open(self.filter_file) as f:
+            content = f.read()
+        content = re.sub(r'(<zeropoints[^>]*><value>)[^<]*', r'\g<1>0.0', content, count=1)
+        with open(self.filter_file, 'w') as f:
+            f.write(content)
+        utime(self.filter_file, ns=(0, 0))
+        updated_zero_points, = load_filter_arrays(self.filter_file, 'zero_points')
+        self.assertEqual(updated_zero_points[0], 0.)
+        npt.assert_array_equal(updated_zero_points[1:], zero_points[1:])
+        # A new session reads the updated content from disk
+        clear_filter_cache()
+        with patch.object(filter_cache, '_parse_filter_file', side_effect=AssertionError('Filter parsed again.')):
+            self.assertEqual(load_filter_arrays(self.filter_file, 'zero_points')[0][0], 0.)
+
+    def test_clear_disk_cache(self):
+        load_filter_arrays(self.filter_file, 'zero_points')
+        clear_filter_cache(disk=True)
+        self.assertFalse(exists(filter_cache._get_cache_file(self.filter_file)))
@@ -5,7 +5,8 @@ import numpy.testing as npt
 
 from gaiaxpy import generate, PhotometricSystem
 from gaiaxpy.core.generic_functions import _get_system_label, _extract_systems_from_data, validate_pwl_sampling, \
-    array_to_symmetric_matrix, correlation_to_covariance, get_matrix_size_from_lower_triangle
+    array_to_symmetric_matrix, arrays_to_symmetric_matrices, correlation_to_covariance, \
+    get_matrix_size_from_lower_triangle
 from tests.files.paths import mean_spectrum_fits_file
 
 array = np.array([1, 2, 3, 4, 5, 6])
@@ -103,3 +104,19 @@ class TestArrayToSymmetricMatrix(unittest.TestCase):
     def test_array_to_symmetric_matrix_negative_size(self):
         with self.assertRaises(ValueError):
             array_to_symmetric_matrix(array, -1)
+
+    def test_arrays_to_symmetric_matrices(self):
+        arrays = [np.array([4., 5., 6.]), np.nan, array.astype(float), np.array([7.]), np.array([8., 9., 10.])]
+        sizes = [3, np.nan, 3, 2, 3.]
+        matrices = arrays_to_symmetric_matrices(arrays, sizes)
+        for matrix, _array, _size in zip(matrices, arrays, sizes):
+            if isinstance(_array, float):
+                self.assertTrue(np.isnan(matrix))
+            else:
+                npt.assert_array_equal(matrix, array_to_symmetric_matrix(_array, _size))
+        # Matrices of the same size are views of the same array
+        self.assertIs(matrices[0].base, matrices[4].base)
+
+    def test_arrays_to_symmetric_matrices_mismatching(self):
+        with self.assertRaises(ValueError):
+            arrays_to_symmetric_matrices([array], [2])
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+from gaiaxpy.core.parallel import _get_partitions, _get_shared_arrays, _run_in_pool, _use_pool, validate_n_workers
+
+
+def _weighted_sum_partition(partition, offset):
+    weights = _get_shared_arrays()['weights']
+    return np.stack(partition['values'].to_numpy()) @ weights + offset
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_get_partitions(self):
+        for n_rows in [1, 7, 100, 1001]:
+            for n_workers in [1, 2, 3, 8]:
+                partitions = _get_partitions(n_rows, n_workers)
+                self.assertEqual(partitions[0].start, 0)
+                self.assertEqual(partitions[-1].stop, n_rows)
+                for previous, current in zip(partitions[:-1], partitions[1:]):
+                    self.assertEqual(previous.stop, current.start)
+                aligned_partitions = _get_partitions(n_rows, n_workers, block_size=16)
+                self.assertEqual(aligned_partitions[-1].stop, n_rows)
+                self.assertTrue(all(partition.start % 16 == 0 for partition in aligned_partitions))
+
+    def test_validate_n_workers(self):
+        validate_n_workers(None)
+        validate_n_workers(4)
+        for n_workers in [0, -2, 1.5, '2', True]:
+            with self.assertRaises(ValueError):
+                validate_n_workers(n_workers)
+
+    def test_use_pool(self):
+        self.assertFalse(_use_pool(None))
+        self.assertFalse(_use_pool(1))
+        self.assertTrue(_use_pool(2))
+
+    def test_run_in_pool(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(101, 5))
+        weights = rng.normal(size=5)
+        data = pd.DataFrame({'values': list(values)})
+        partitions = _run_in_pool(_weighted_sum_partition, data, 3, shared_arrays={'weights': weights},
+                                  disable_info=True, offset=1.)
+        npt.assert_allclose(np.concatenate(partitions), values @ weights + 1.)
@@ -1,10 +1,13 @@
 import unittest
 from os.path import join
 
+import numpy as np
+import numpy.testing as npt
 import pandas as pd
 import pandas.testing as pdt
 
 from gaiaxpy import generate, apply_error_correction, PhotometricSystem
+from gaiaxpy.error_correction.error_correction import _get_correction_array, _read_system_table
 from tests.files.paths import phot_with_nan_path, mean_spectrum_csv_file
 from tests.test_error_correction.error_correction_paths import corrected_error_solution_path, \
     phot_with_nan_corrected_sol_path
@@ -74,3 +77,18 @@ class TestErrorCorrection(unittest.TestCase):
         solution = pd.read_csv(phot_with_nan_corrected_sol_path)
         pdt.assert_frame_equal(output, solution)
 
+
+class TestCorrectionFactors(unittest.TestCase):
+
+    def test_correction_factors(self):
+        table = _read_system_table('Jkc')
+        factors = table[[column for column in table.columns if 'factor_' in column]].to_numpy()
+        # Below the range, bin centre, halfway between the centre and the next bin, above the range and NaN
+        mags = [1., table['bin_centre'].iloc[2], (table['bin_centre'].iloc[2] + table['max_Gmag_bin'].iloc[2]) / 2,
+                30., np.nan]
+        correction_array = _get_correction_array(pd.Series(mags), 'Jkc')
+        npt.assert_array_equal(correction_array[0], factors[0])
+        npt.assert_array_equal(correction_array[1], factors[2])
+        npt.assert_allclose(correction_array[2], (factors[2] + factors[3]) / 2, rtol=1e-14)
+        npt.assert_array_equal(correction_array[3], factors[-1])
+        npt.assert_array_equal(correction_array[4], factors[-1])
@@ -25,6 +25,9 @@ class TestGetFileExtension(unittest.TestCase):
     def test_get_directory(self):
         self.assertEqual(_get_file_extension('path/file/'), '')
 
+    def test_get_spectrum_store(self):
+        self.assertEqual(_get_file_extension('path/spectra.xpstore/'), 'xpstore')
+
 
 class TestParser(unittest.TestCase):
 
@@ -34,4 +37,5 @@ class TestParser(unittest.TestCase):
     def test_get_parser_extensions(self):
         self.assertEqual(parser.get_parser('csv'), parser._parse_csv)
         self.assertEqual(parser.get_parser('fits'), parser._parse_fits)
+        self.assertEqual(parser.get_parser('parquet'), parser._parse_parquet)
         self.assertEqual(parser.get_parser('xml'), parser._parse_xml)
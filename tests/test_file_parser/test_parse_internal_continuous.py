@@ -7,6 +7,7 @@ from numpy import ndarray, dtype
 
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
+from gaiaxpy.spectrum.packed_covariance import as_covariance_matrix
 from tests.files.paths import mean_spectrum_avro_file, mean_spectrum_csv_file, mean_spectrum_fits_file,\
     mean_spectrum_xml_file
 from tests.utils.utils import get_spectrum_with_source_id
@@ -77,19 +78,19 @@ class TestInternalContinuousParserCSV(unittest.TestCase):
         self.assertIsInstance(parsed_csv_file[f'{BANDS.rp}_coefficient_errors'][0], ndarray)
         self.assertIsInstance(parsed_csv_file[f'{BANDS.rp}_coefficient_correlations'][0], ndarray)
 
-    # The column 'bp_coefficient_correlations' should be a matrix of size
-    # 'bp_num_of_parameters'^2
-    def test_bp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_csv_file[f'{BANDS.bp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_csv_file[f'{BANDS.bp}_coefficient_correlations'][0][0]),
-                         parsed_csv_file[f'{BANDS.bp}_n_parameters'][0])
+    # The column 'bp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_bp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_csv_file[f'{BANDS.bp}_coefficient_correlations'][0]
+        n_parameters = parsed_csv_file[f'{BANDS.bp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
-    # The column 'rp_coefficient_correlations' should be a matrix of size
-    # 'rp_num_of_parameters'^2
-    def test_rp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_csv_file[f'{BANDS.rp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_csv_file[f'{BANDS.rp}_coefficient_correlations'][0][0]),
-                         parsed_csv_file[f'{BANDS.rp}_n_parameters'][0])
+    # The column 'rp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_rp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_csv_file[f'{BANDS.rp}_coefficient_correlations'][0]
+        n_parameters = parsed_csv_file[f'{BANDS.rp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
 
 class TestInternalContinuousParserFITS(unittest.TestCase):
@@ -113,17 +114,19 @@ class TestInternalContinuousParserFITS(unittest.TestCase):
         self.assertIsInstance(parsed_fits_file[f'{BANDS.rp}_coefficient_errors'][0], ndarray)
         self.assertIsInstance(parsed_fits_file[f'{BANDS.rp}_coefficient_correlations'][0], ndarray)
 
-    # The column 'bp_coefficient_correlations' should be a matrix of size 'bp_num_of_parameters'^2
-    def test_bp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_fits_file[f'{BANDS.bp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_fits_file[f'{BANDS.bp}_coefficient_correlations'][0][0]),
-                         parsed_fits_file[f'{BANDS.bp}_n_parameters'][0])
+    # The column 'bp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_bp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_fits_file[f'{BANDS.bp}_coefficient_correlations'][0]
+        n_parameters = parsed_fits_file[f'{BANDS.bp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
-    # The column 'rp_coefficient_correlations' should be a matrix of size 'rp_num_of_parameters'^2
-    def test_rp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_fits_file[f'{BANDS.rp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_fits_file[f'{BANDS.rp}_coefficient_correlations'][0][0]),
-                         parsed_fits_file[f'{BANDS.rp}_n_parameters'][0])
+    # The column 'rp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_rp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_fits_file[f'{BANDS.rp}_coefficient_correlations'][0]
+        n_parameters = parsed_fits_file[f'{BANDS.rp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
 
 class TestInternalContinuousParserXMLPlain(unittest.TestCase):
@@ -147,17 +150,19 @@ class TestInternalContinuousParserXMLPlain(unittest.TestCase):
         self.assertIsInstance(parsed_plain_xml_file[f'{BANDS.rp}_coefficient_errors'][0], ndarray)
         self.assertIsInstance(parsed_plain_xml_file[f'{BANDS.rp}_coefficient_correlations'][0], ndarray)
 
-    # The column 'bp_coefficient_correlations' should be a matrix of size 'bp_num_of_parameters'^2
-    def test_bp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_plain_xml_file[f'{BANDS.bp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_plain_xml_file[f'{BANDS.bp}_coefficient_correlations'][0][0]),
-                         parsed_plain_xml_file[f'{BANDS.bp}_n_parameters'][0])
+    # The column 'bp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_bp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_plain_xml_file[f'{BANDS.bp}_coefficient_correlations'][0]
+        n_parameters = parsed_plain_xml_file[f'{BANDS.bp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
-    # The column 'rp_coefficient_correlations' should be a matrix of size 'rp_num_of_parameters'^2
-    def test_rp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_plain_xml_file[f'{BANDS.rp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_plain_xml_file[f'{BANDS.rp}_coefficient_correlations'][0][0]),
-                         parsed_plain_xml_file[f'{BANDS.rp}_n_parameters'][0])
+    # The column 'rp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_rp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_plain_xml_file[f'{BANDS.rp}_coefficient_correlations'][0]
+        n_parameters = parsed_plain_xml_file[f'{BANDS.rp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
 
 class TestInternalContinuousParserXML(unittest.TestCase):
@@ -181,17 +186,19 @@ class TestInternalContinuousParserXML(unittest.TestCase):
         self.assertIsInstance(parsed_xml_file[f'{BANDS.rp}_coefficient_errors'][0], ndarray)
         self.assertIsInstance(parsed_xml_file[f'{BANDS.rp}_coefficient_correlations'][0], ndarray)
 
-    # The column 'bp_coefficient_correlations' should be a matrix of size 'bp_num_of_parameters'^2
-    def test_bp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_xml_file[f'{BANDS.bp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_xml_file[f'{BANDS.bp}_coefficient_correlations'][0][0]),
-                         parsed_xml_file[f'{BANDS.bp}_n_parameters'][0])
+    # The column 'bp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_bp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_xml_file[f'{BANDS.bp}_coefficient_correlations'][0]
+        n_parameters = parsed_xml_file[f'{BANDS.bp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
-    # The column 'rp_coefficient_correlations' should be a matrix of size 'rp_num_of_parameters'^2
-    def test_rp_coefficient_correlations_is_matrix(self):
-        self.assertIsInstance(parsed_xml_file[f'{BANDS.rp}_coefficient_correlations'][0][0], ndarray)
-        self.assertEqual(len(parsed_xml_file[f'{BANDS.rp}_coefficient_correlations'][0][0]),
-                         parsed_xml_file[f'{BANDS.rp}_n_parameters'][0])
+    # The column 'rp_coefficient_correlations' should be the lower triangle of the correlation matrix, as in the Archive
+    def test_rp_coefficient_correlations_is_lower_triangle(self):
+        correlations = parsed_xml_file[f'{BANDS.rp}_coefficient_correlations'][0]
+        n_parameters = parsed_xml_file[f'{BANDS.rp}_n_parameters'][0]
+        self.assertIsInstance(correlations, ndarray)
+        self.assertEqual(correlations.shape, (n_parameters * (n_parameters - 1) // 2,))
 
 
 class TestInternalContinuousParserAVRO(unittest.TestCase):
@@ -273,6 +280,8 @@ class TestFormatEquality(unittest.TestCase):
             self.assertEqual(plain_xml_data.keys(), xml_data.keys())
             for key in csv_data.keys():
                 decimal = 2 if key in ['bp_covariance_matrix', 'rp_covariance_matrix'] else 4
+                csv_data[key], fits_data[key], plain_xml_data[key], xml_data[key] = [
+                    as_covariance_matrix(data[key]) for data in [csv_data, fits_data, plain_xml_data, xml_data]]
                 npt.assert_almost_equal(csv_data[key], fits_data[key],
                                         decimal=decimal)  # Precision varies across formats
                 npt.assert_almost_equal(fits_data[key], plain_xml_data[key], decimal=decimal)
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+from gaiaxpy.core.generic_functions import str_to_array
+from gaiaxpy.file_parser.parse_string_arrays import parse_string_array_column, parse_string_array_columns
+from tests.files.paths import mean_spectrum_csv_file
+
+
+class TestParseStringArrays(unittest.TestCase):
+
+    def test_arrays(self):
+        parsed = parse_string_array_column(pd.Series(['(1.5,2,-3e-2)', '(nan,4,5)', np.nan]))
+        npt.assert_array_equal(parsed[0], [1.5, 2., -0.03])
+        npt.assert_array_equal(parsed[1], [np.nan, 4., 5.])
+        self.assertTrue(np.isnan(parsed[2]))
+
+    def test_arrays_share_buffer(self):
+        parsed = parse_string_array_column(['(1,2)', '(3,4)', '(5,6)'])
+        self.assertIs(parsed[0].base, parsed[2].base)
+        npt.assert_array_equal(parsed[0].base, [[1., 2.], [3., 4.], [5., 6.]])
+
+    def test_arrays_different_lengths(self):
+        parsed = parse_string_array_column(['(1,2)', '()', '(3,4,5)', '(6)'])
+        for array, expected in zip(parsed, [[1., 2.], [], [3., 4., 5.], [6.]]):
+            npt.assert_array_equal(array, expected)
+
+    def test_empty_values(self):
+        npt.assert_array_equal(parse_string_array_column(['(1,,3)', '(4, 5,6)'])[0], [1., np.nan, 3.])
+
+    def test_invalid_values(self):
+        with self.assertRaises(ValueError):
+            parse_string_array_column(['(1,2)', '(1,a)'])
+
+    def test_matrices(self):
+        parsed = parse_string_array_column(['((1,2),(3,4))', '((5,nan),(7,8))', '((1,2,3))'])
+        npt.assert_array_equal(parsed[0], [[1., 2.], [3., 4.]])
+        npt.assert_array_equal(parsed[1], [[5., np.nan], [7., 8.]])
+        npt.assert_array_equal(parsed[2], [[1., 2., 3.]])
+
+    def test_arrays_are_kept(self):
+        array = np.arange(3.)
+        self.assertIs(parse_string_array_column([array])[0], array)
+
+    def test_archive_file(self):
+        df = pd.read_csv(mean_spectrum_csv_file, float_precision='high')
+        columns = ['bp_coefficients', 'bp_coefficient_correlations', 'rp_coefficients', 'rp_coefficient_errors']
+        parsed_df = parse_string_array_columns(df.copy(), columns + ['missing_column'])
+        for column in columns:
+            for parsed, original in zip(parsed_df[column], df[column]):
+                npt.assert_array_equal(parsed, str_to_array(original))
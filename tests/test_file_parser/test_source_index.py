@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+import unittest
+from os.path import basename, exists, join
+
+import numpy as np
+import numpy.testing as npt
+import pandas.testing as pdt
+
+from gaiaxpy import convert, create_spectrum_store
+from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
+from gaiaxpy.file_parser.source_index import SourceIndex
+from gaiaxpy.input_reader.input_reader import InputReader
+from tests.files.paths import mean_spectrum_avro_file, mean_spectrum_ecsv_file, with_missing_bp_csv_file, \
+    with_missing_bp_fits_file
+
+parser = InternalContinuousParser()
+
+
+class TestSourceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def copy_file(self, file_path):
+        # The index is saved beside the file
+        return shutil.copy(file_path, join(self.temp_dir, basename(file_path)))
+
+    def assert_same_sources(self, file_path, source_ids):
+        parsed_df, extension = parser._parse(file_path)
+        selected_df, selected_extension = parser._parse_sources(file_path, source_ids)
+        self.assertEqual(selected_extension, extension)
+        self.assertEqual(list(selected_df['source_id']), [int(source_id) for source_id in source_ids])
+        expected_df = parsed_df.set_index('source_id').loc[[int(source_id) for source_id in source_ids]]
+        for column in ['bp_coefficients', 'rp_coefficients', 'rp_standard_deviation']:
+            for expected_value, value in zip(expected_df[column], selected_df[column]):
+                npt.assert_array_equal(value, expected_value)
+
+    def test_formats(self):
+        for file_path in [with_missing_bp_csv_file, with_missing_bp_fits_file, mean_spectrum_ecsv_file,
+                          mean_spectrum_avro_file]:
+            file_path = self.copy_file(file_path)
+            source_ids = list(parser._parse(file_path)[0]['source_id'])
+            self.assert_same_sources(file_path, source_ids[::-1])
+            self.assert_same_sources(file_path, [str(source_ids[-1])])
+            self.assertTrue(exists(f'{file_path}.xpidx'))
+
+    def test_spectrum_store(self):
+        store_path = create_spectrum_store(with_missing_bp_csv_file, join(self.temp_dir, 'spectra'))
+        source_ids = list(parser._parse(store_path)[0]['source_id'])
+        self.assert_same_sources(store_path, source_ids[1:])
+        self.assertTrue(exists(join(store_path, 'source_index.xpidx')))
+
+    def test_index_rebuilt(self):
+        file_path = self.copy_file(with_missing_bp_csv_file)
+        source_ids = list(parser._parse(file_path)[0]['source_id'])
+        parser._parse_sources(file_path, source_ids[:1])
+        with open(file_path) as f:
+            lines = f.readlines()
+        with open(file_path, 'w') as f:  # Remove the first source
+            f.writelines(lines[:1] + lines[2:])
+        npt.assert_array_equal(SourceIndex.load(file_path, 'csv').source_ids, np.sort(source_ids[1:]))
+
+    def test_missing_source(self):
+        file_path = self.copy_file(with_missing_bp_csv_file)
+        with self.assertRaises(ValueError):
+            parser._parse_sources(file_path, [1])
+
+    def test_input_reader(self):
+        file_path = self.copy_file(with_missing_bp_csv_file)
+        source_ids = list(parser._parse(file_path)[0]['source_id'])
+        with self.assertRaises(ValueError):
+            InputReader((file_path, []), convert).read()
+        with self.assertRaises(ValueError):
+            InputReader((join(self.temp_dir, 'missing.csv'), source_ids), convert).read()
+        expected_df, _ = convert(file_path, save_file=False)
+        output_df, _ = convert((file_path, source_ids[:1]), save_file=False)
+        pdt.assert_frame_equal(output_df, expected_df[expected_df['source_id'] == source_ids[0]])
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pandas.testing as pdt
+
+from gaiaxpy import calibrate, convert, create_spectrum_store, get_inverse_covariance_matrix
+from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
+from gaiaxpy.file_parser.spectrum_store import SpectrumStoreWriter, read_spectrum_store
+from gaiaxpy.spectrum.packed_covariance import as_covariance_matrix
+from tests.files.paths import mean_spectrum_csv_file, with_missing_bp_csv_file
+
+parser = InternalContinuousParser()
+
+
+class TestSpectrumStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_extension_added(self):
+        store_path = create_spectrum_store(mean_spectrum_csv_file, join(self.temp_dir, 'spectra'))
+        self.assertEqual(store_path, join(self.temp_dir, 'spectra.xpstore'))
+
+    def test_round_trip(self):
+        # Sources written one at a time, the BP band of the second source is missing
+        store_path = create_spectrum_store(with_missing_bp_csv_file, join(self.temp_dir, 'spectra'), chunk_size=1)
+        parsed_df, _ = parser._parse(with_missing_bp_csv_file)
+        store_df, extension = parser._parse(store_path + '/')
+        self.assertEqual(extension, 'csv')
+        self.assertEqual(list(store_df['source_id']), list(parsed_df['source_id']))
+        self.assertTrue(pd.isna(store_df['bp_n_parameters'].iloc[1]))
+        self.assertIsNone(store_df['bp_covariance_matrix'].iloc[1])
+        for band in ['bp', 'rp']:
+            for column in ['coefficients', 'coefficient_errors', 'standard_deviation', 'n_relevant_bases']:
+                for parsed_value, store_value in zip(parsed_df[f'{band}_{column}'], store_df[f'{band}_{column}']):
+                    if isinstance(parsed_value, np.ndarray):
+                        npt.assert_array_equal(store_value, parsed_value)
+                    else:
+                        self.assertTrue(pd.isna(store_value) if pd.isna(parsed_value) else store_value == parsed_value)
+            for parsed_value, store_value in zip(parsed_df[f'{band}_covariance_matrix'],
+                                                 store_df[f'{band}_covariance_matrix']):
+                if parsed_value is not None:
+                    npt.assert_array_equal(as_covariance_matrix(store_value), as_covariance_matrix(parsed_value))
+
+    def test_arrays_are_views(self):
+        store_path = create_spectrum_store(mean_spectrum_csv_file, join(self.temp_dir, 'spectra'))
+        store_df, _ = read_spectrum_store(store_path)
+        coefficients = store_df['bp_coefficients'].iloc[1]
+        self.assertFalse(coefficients.flags.owndata)
+        self.assertFalse(coefficients.flags.writeable)
+
+    def test_read_chunks(self):
+        store_path = create_spectrum_store(mean_spectrum_csv_file, join(self.temp_dir, 'spectra'))
+        parsed_df, _ = parser._parse(mean_spectrum_csv_file)
+        chunks = list(parser._parse_chunks(store_path, 1))
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [1] * len(parsed_df))
+        self.assertEqual([chunk['source_id'].iloc[0] for chunk, _ in chunks], list(parsed_df['source_id']))
+
+    def test_longer_arrays(self):
+        parsed_df, _ = parser._parse(mean_spectrum_csv_file)
+        short_df = parsed_df.iloc[:1].copy()
+        short_df['bp_coefficients'] = [short_df['bp_coefficients'].iloc[0][:50]]
+        with self.assertRaises(ValueError):
+            with SpectrumStoreWriter(join(self.temp_dir, 'spectra.xpstore')) as writer:
+                writer.write(short_df)
+                writer.write(parsed_df.iloc[1:])
+
+    def test_pipelines(self):
+        store_path = create_spectrum_store(mean_spectrum_csv_file, join(self.temp_dir, 'spectra'))
+        for function in [convert, calibrate]:
+            expected_df, expected_sampling = function(mean_spectrum_csv_file, save_file=False)
+            output_df, sampling = function(store_path, save_file=False)
+            pdt.assert_frame_equal(output_df, expected_df)
+            npt.assert_array_equal(sampling, expected_sampling)
+        expected_df = get_inverse_covariance_matrix(mean_spectrum_csv_file)
+        output_df = get_inverse_covariance_matrix(store_path)
+        for column in ['bp_inverse_covariance', 'rp_inverse_covariance']:
+            for expected_matrix, matrix in zip(expected_df[column], output_df[column]):
+                npt.assert_array_equal(matrix, expected_matrix)
@@ -0,0 +1,121 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from gaiaxpy import fit_templates, get_chi2, get_inverse_square_root_covariance_matrix
+from gaiaxpy.core.satellite import BANDS
+from gaiaxpy.fitter.fitter import FIT_BLOCK_PAIRS, FIT_BLOCK_SIZE, _get_fit_block_size
+from gaiaxpy.input_reader.input_reader import InputReader
+from tests.files.paths import with_missing_bp_csv_file
+
+parsed_input_data, _ = InputReader(with_missing_bp_csv_file, fit_templates).read()
+inverse_square_root_covariances = get_inverse_square_root_covariance_matrix(with_missing_bp_csv_file,
+                                                                            output_array=True)
+# Scaled and perturbed copies of the first source
+rng = np.random.default_rng(0)
+n_templates = 50
+templates = {band: parsed_input_data[f'{band}_coefficients'].iloc[0] * rng.uniform(0.5, 2, (n_templates, 1)) +
+             rng.normal(scale=0.05, size=(n_templates, 55)) for band in BANDS}
+
+
+def get_chi2_brute_force(source_index, template_index, scale, bands=BANDS, grid=templates):
+    chi2 = 0.0
+    for band in bands:
+        matrix = inverse_square_root_covariances[f'{band}_inverse_square_root_covariance_matrix'][source_index]
+        if not np.isnan(matrix).all():
+            residuals = parsed_input_data[f'{band}_coefficients'].iloc[source_index] - scale * \
+                grid[band][template_index]
+            chi2 += get_chi2(matrix, residuals)
+    return chi2
+
+
+def get_best_scale(source_index, template_index, grid=templates):
+    cross_term, template_term = 0.0, 0.0
+    for band in BANDS:
+        matrix = inverse_square_root_covariances[f'{band}_inverse_square_root_covariance_matrix'][source_index]
+        if not np.isnan(matrix).all():
+            whitened_template = matrix @ grid[band][template_index]
+            cross_term += whitened_template @ (matrix @ parsed_input_data[f'{band}_coefficients'].iloc[source_index])
+            template_term += whitened_template @ whitened_template
+    return cross_term / template_term
+
+
+class TestFitter(unittest.TestCase):
+
+    def test_best_templates(self):
+        output_df = fit_templates(with_missing_bp_csv_file, templates, n_best=3)
+        self.assertEqual(list(output_df.columns), ['source_id', 'template_index', 'scale', 'chi2'])
+        for source_index, row in output_df.iterrows():
+            scales = np.array([get_best_scale(source_index, index) for index in range(n_templates)])
+            chi2 = np.array([get_chi2_brute_force(source_index, index, scale) for index, scale in enumerate(scales)])
+            expected_indices = np.argsort(chi2)[:3]
+            npt.assert_array_equal(row['template_index'], expected_indices)
+            npt.assert_allclose(row['scale'], scales[expected_indices], rtol=1e-8)
+            npt.assert_allclose(row['chi2'], chi2[expected_indices], rtol=1e-8)
+
+    def test_fixed_scale(self):
+        output_df = fit_templates(parsed_input_data, templates, fit_scale=False)
+        for source_index, row in output_df.iterrows():
+            chi2 = [get_chi2_brute_force(source_index, index, 1.0) for index in range(n_templates)]
+            self.assertEqual(row['template_index'], np.argmin(chi2))
+            self.assertEqual(row['scale'], 1.0)
+            self.assertAlmostEqual(row['chi2'] / min(chi2), 1.0, places=8)
+
+    def test_missing_band(self):
+        output_df = fit_templates(parsed_input_data, {'bp': templates['bp']})
+        self.assertEqual(output_df['template_index'].iloc[1], -1)
+        self.assertTrue(np.isnan(output_df['scale'].iloc[1]))
+        self.assertTrue(np.isnan(output_df['chi2'].iloc[1]))
+        template_index, scale, chi2 = [output_df[column].iloc[0] for column in ['template_index', 'scale', 'chi2']]
+        self.assertAlmostEqual(chi2 / get_chi2_brute_force(0, template_index, scale, bands=['bp']), 1.0, places=8)
+
+    def test_truncation(self):
+        output_df = fit_templates(parsed_input_data, templates, n_best=n_templates, truncation=True)
+        for source_index, row in output_df.iterrows():
+            for template_index, scale, chi2 in zip(row['template_index'], row['scale'], row['chi2']):
+                expected_chi2 = 0.0
+                for band in BANDS:
+                    matrix = inverse_square_root_covariances[f'{band}_inverse_square_root_covariance_matrix'][
+                        source_index]
+                    n_bases = parsed_input_data[f'{band}_n_relevant_bases'].iloc[source_index]
+                    if not np.isnan(matrix).all():
+                        x = matrix[:n_bases, :n_bases] @ (parsed_input_data[f'{band}_coefficients'].iloc[source_index] -
+                                                          scale * templates[band][template_index])[:n_bases]
+                        expected_chi2 += x @ x
+                self.assertAlmostEqual(chi2 / expected_chi2, 1.0, places=8)
+
+    def test_chunks_and_workers(self):
+        output_df = fit_templates(parsed_input_data, templates, n_best=2)
+        for kwargs in [{'chunk_size': 1}, {'n_workers': 2}]:
+            chunked_df = fit_templates(parsed_input_data, templates, n_best=2, **kwargs)
+            npt.assert_array_equal(chunked_df['source_id'], output_df['source_id'])
+            npt.assert_array_equal(np.stack(chunked_df['template_index']), np.stack(output_df['template_index']))
+            # The BLAS products depend on the number of sources fitted together
+            for column in ['scale', 'chi2']:
+                npt.assert_allclose(np.stack(chunked_df[column]), np.stack(output_df[column]), rtol=1e-12)
+
+    def test_near_ties(self):
+        # Templates fitting the first source almost perfectly, so the terms of their expanded chi-squared cancel
+        near_templates = {band: parsed_input_data[f'{band}_coefficients'].iloc[0] *
+                          (1 + np.random.default_rng(1).normal(scale=1e-9, size=(20, 55))) for band in BANDS}
+        for fit_scale in [True, False]:
+            output_df = fit_templates(parsed_input_data.iloc[:1], near_templates, fit_scale=fit_scale)
+            scales = [get_best_scale(0, index, near_templates) if fit_scale else 1.0 for index in range(20)]
+            chi2 = [get_chi2_brute_force(0, index, scale, grid=near_templates) for index, scale in enumerate(scales)]
+            self.assertEqual(output_df['template_index'].iloc[0], np.argmin(chi2))
+
+    def test_fit_block_size(self):
+        self.assertEqual(_get_fit_block_size(1), FIT_BLOCK_SIZE)
+        self.assertEqual(_get_fit_block_size(100000), FIT_BLOCK_PAIRS // 100000)
+        self.assertEqual(_get_fit_block_size(10 * FIT_BLOCK_PAIRS), 1)
+
+    def test_invalid_templates(self):
+        with self.assertRaises(ValueError):
+            fit_templates(parsed_input_data, templates['bp'])
+        with self.assertRaises(ValueError):
+            fit_templates(parsed_input_data, {'bp': templates['bp'], 'rp': templates['rp'][:10]})
+        with self.assertRaises(ValueError):
+            fit_templates(parsed_input_data, {'bp': templates['bp'][:, :54]})
+        with self.assertRaises(ValueError):
+            fit_templates(parsed_input_data, templates, n_best=n_templates + 1)
@@ -5,6 +5,7 @@ import pandas as pd
 import pandas.testing as pdt
 
 from gaiaxpy import generate, PhotometricSystem
+from gaiaxpy.spectrum.batched_spectra import BLOCK_SIZE
 from tests.files.paths import missing_bp_csv_file, mean_spectrum_fits_file, gen_missing_band_sol_path
 
 _ertol, _eatol = 1e-23, 1e-23
@@ -54,3 +55,12 @@ class TestGenerator(unittest.TestCase):
         photometry = generate(mean_spectrum_fits_file, photometric_system=system, error_correction=True,
                               save_file=False)
         self.assertIsInstance(photometry, pd.DataFrame)
+
+    def test_parallel(self):
+        systems = [PhotometricSystem.Gaia_2, PhotometricSystem.JKC_Std, PhotometricSystem.SDSS]
+        # Enough sources to be split into several partitions
+        input_df = pd.concat([pd.read_csv(missing_bp_csv_file)] * (BLOCK_SIZE + 1), ignore_index=True)
+        expected_photometry = generate(input_df, photometric_system=systems, error_correction=True, save_file=False)
+        photometry = generate(input_df, photometric_system=systems, error_correction=True, save_file=False,
+                              n_workers=2)
+        pdt.assert_frame_equal(photometry, expected_photometry, check_exact=True)
@@ -1,11 +1,18 @@
 import unittest
 
+import numpy.testing as npt
 import pandas as pd
 import pandas.testing as pdt
 
+from gaiaxpy.core.satellite import BANDS
+from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
 from gaiaxpy.generator.generator import generate
+from gaiaxpy.generator.multi_synthetic_photometry_generator import MultiSyntheticPhotometryGenerator
 from gaiaxpy.generator.photometric_system import PhotometricSystem
-from tests.files.paths import mean_spectrum_csv_file, mean_spectrum_fits_file, mean_spectrum_xml_file
+from gaiaxpy.generator.synthetic_photometry_generator import _generate_synthetic_photometry
+from gaiaxpy.spectrum.sampled_basis_functions import SampledBasisFunctions
+from tests.files.paths import mean_spectrum_csv_file, mean_spectrum_fits_file, mean_spectrum_xml_file, \
+    with_missing_bp_csv_file
 
 _rtol, _atol = 1e-24, 1e-24
 
@@ -46,3 +53,24 @@ class TestMultiSyntheticPhotometryGenerator(unittest.TestCase):
             generate(mean_spectrum_csv_file, photometric_system=[])
         with self.assertRaises(ValueError):
             generate(mean_spectrum_csv_file, photometric_system='')
+
+    def test_generate_matches_single_photometry(self):
+        phot_list = [PhotometricSystem.JKC_Std, PhotometricSystem.SDSS, PhotometricSystem.Gaia_DR3_Vega]
+        parsed_input_data, _ = InternalContinuousParser()._parse(with_missing_bp_csv_file)
+        generator = MultiSyntheticPhotometryGenerator(phot_list, bp_model='v375wi', rp_model='v142r')
+        multi_synthetic_photometry = generator.generate(parsed_input_data, 'csv', output_file=None, output_format=None,
+                                                        save_file=False)
+        for phot_system in phot_list:
+            internal_system = phot_system.value
+            sampling_grid, merge = internal_system.load_xpmerge_from_xml()
+            design_matrices = internal_system.load_xpsampling_from_xml()
+            sampled_basis_func = {band: SampledBasisFunctions.from_design_matrix(sampling_grid, design_matrices[band])
+                                  for band in BANDS}
+            for index, row in parsed_input_data.iterrows():
+                photometry = _generate_synthetic_photometry(row, sampled_basis_func, merge, phot_system)
+                for name, values in zip(['mag', 'flux', 'flux_error'],
+                                        [photometry.mag, photometry.flux, photometry.error]):
+                    columns = [f'{phot_system.get_system_label()}_{name}_{band}' for band in
+                               internal_system.get_bands()]
+                    npt.assert_allclose(multi_synthetic_photometry.loc[index, columns].to_numpy(dtype=float), values,
+                                        rtol=1e-14)
@@ -1,6 +1,8 @@
+import subprocess
+import sys
 import unittest
 from os import path
-from os.path import join
+from os.path import dirname, join
 
 import numpy as np
 import numpy.testing as npt
@@ -9,7 +11,8 @@ from numpy import ndarray
 
 from gaiaxpy import generate
 from gaiaxpy.core.generic_functions import _get_built_in_systems
-from gaiaxpy.generator.photometric_system import PhotometricSystem, load_additional_systems, remove_additional_systems
+from gaiaxpy.generator.photometric_system import PhotometricSystem, create_system, load_additional_systems, \
+    remove_additional_systems
 from tests.files.paths import files_path, with_missing_bp_ecsv_file
 from tests.test_generator.test_internal_photometric_system import phot_systems_specs
 
@@ -84,6 +87,27 @@ class TestPhotometricSystem(unittest.TestCase):
         del self.phot_systems
 
 
+class TestLazyPhotometricSystem(unittest.TestCase):
+
+    def test_import_does_not_parse_filters(self):
+        script = ('import gaiaxpy\n'
+                  'from gaiaxpy import PhotometricSystem\n'
+                  'systems = [system.value for system in PhotometricSystem]\n'
+                  'print(any(system._filter_file or system._zero_points is not None or system._offsets is not None '
+                  'for system in systems))')
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                cwd=dirname(dirname(files_path)))
+        self.assertEqual(output.stdout.split()[-1], 'False')
+
+    def test_lazy_loading(self):
+        system = create_system('JKC_Std')
+        self.assertIsNone(system._zero_points)
+        npt.assert_array_equal(system.get_zero_points(), [-25.8489, -25.471, -26.0861, -26.6268, -27.3212])
+        self.assertEqual(system.get_bands(), ['U', 'B', 'V', 'R', 'I'])
+        self.assertEqual(len(system.get_offsets()), 5)
+        self.assertTrue(system.filter_file.endswith('.xml'))
+
+
 class TestAdditionalSystems(unittest.TestCase):
 
     def test_user_interaction(self):
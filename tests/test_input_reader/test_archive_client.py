@@ -0,0 +1,190 @@
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from threading import Lock, Thread
+from unittest.mock import patch
+from urllib.parse import parse_qs
+from zipfile import ZipFile
+
+import pandas.testing as pdt
+import requests
+
+from gaiaxpy import calibrate
+from gaiaxpy.input_reader.archive_client import ArchiveClient
+from gaiaxpy.input_reader.input_reader import InputReader
+from tests.files.paths import mean_spectrum_csv_file
+
+with open(mean_spectrum_csv_file) as f:
+    header, *rows = f.read().splitlines()
+source_rows = {row.split(',', 1)[0]: row for row in rows}
+source_ids = list(source_rows.keys())
+
+
+class StandInArchive(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the login, asynchronous TAP and DataLink services of the Gaia Archive.
+    """
+    lock = Lock()
+    users = {'user': 'password'}
+    failures = 0  # Number of data requests to fail with a transient error
+    failure_headers = dict()
+    job_failures = 0  # Number of job creation requests to fail with a transient error
+    job_phase = 'COMPLETED'
+    job_requests = 0
+    data_requests = []
+    cookies = []
+
+    def log_message(self, *args):
+        pass
+
+    def _read_form(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers if headers else dict()).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        form = self._read_form()
+        if self.path == '/tap-server/login':
+            if self.users.get(form.get('username')) == form.get('password'):
+                self._send(200, headers={'Set-Cookie': 'JSESSIONID=session; Path=/'})
+            else:
+                self._send(401)
+        elif self.path == '/tap-server/logout':
+            self._send(200)
+        elif self.path == '/tap-server/tap/async':
+            with StandInArchive.lock:
+                StandInArchive.job_requests += 1
+                if StandInArchive.job_failures:
+                    StandInArchive.job_failures -= 1
+                    self._send(503)
+                    return
+            self._send(303, headers={'Location': f'http://{self.headers["Host"]}/tap-server/tap/async/1'})
+        elif self.path == '/data-server/data':
+            with StandInArchive.lock:
+                StandInArchive.cookies.append(self.headers.get('Cookie'))
+                if StandInArchive.failures:
+                    StandInArchive.failures -= 1
+                    self._send(429 if StandInArchive.failure_headers else 503,
+                               headers=StandInArchive.failure_headers)
+                    return
+                StandInArchive.data_requests.append(form['ID'].split(','))
+            found = [source_rows[source_id] for source_id in form['ID'].split(',') if source_id in source_rows]
+            if not found:
+                self._send(200)
+                return
+            output = BytesIO()
+            with ZipFile(output, 'w') as zip_file:
+                zip_file.writestr('XP_CONTINUOUS_RAW.csv', '\n'.join([header] + found))
+            self._send(200, output.getvalue())
+        else:
+            self._send(404)
+
+    def do_GET(self):
+        if self.path == '/tap-server/tap/async/1/phase':
+            self._send(200, StandInArchive.job_phase.encode())
+        elif self.path == '/tap-server/tap/async/1/results/result':
+            self._send(200, '\n'.join(['source_id'] + source_ids[::-1]).encode())
+        else:
+            self._send(404)
+
+
+class TestArchiveClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInArchive)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInArchive.failures = 0
+        StandInArchive.failure_headers = dict()
+        StandInArchive.job_failures = 0
+        StandInArchive.job_phase = 'COMPLETED'
+        StandInArchive.job_requests = 0
+        StandInArchive.data_requests = []
+        StandInArchive.cookies = []
+        self.patcher = patch('gaiaxpy.input_reader.archive_client.gaia_server', self.url)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_list_input(self):
+        expected_df, _ = InputReader(mean_spectrum_csv_file, calibrate).read()
+        output_df, _ = InputReader(source_ids, calibrate).read()
+        pdt.assert_frame_equal(output_df[expected_df.columns], expected_df)
+
+    def test_query_input(self):
+        expected_df, _ = InputReader(mean_spectrum_csv_file, calibrate).read()
+        output_df, _ = InputReader('SELECT source_id FROM gaiadr3.gaia_source', calibrate).read()
+        pdt.assert_frame_equal(output_df[expected_df.columns], expected_df.iloc[::-1].reset_index(drop=True))
+
+    def test_batches(self):
+        with ArchiveClient(server=self.url, batch_size=1, max_concurrent_requests=2) as client:
+            batches = list(client.iter_batches(source_ids + ['1']))  # The last source is not in the Archive
+        self.assertEqual([list(batch['source_id'].astype(str)) for batch in batches],
+                         [[source_id] for source_id in source_ids])
+        self.assertEqual(sorted(StandInArchive.data_requests),
+                         sorted([[source_id] for source_id in source_ids + ['1']]))
+
+    def test_read_chunks(self):
+        chunks = list(InputReader(source_ids, calibrate).read_chunks(1))
+        self.assertEqual([list(chunk['source_id']) for chunk, _ in chunks],
+                         [[int(source_id)] for source_id in source_ids])
+        self.assertEqual([extension for _, extension in chunks], ['csv', 'csv'])
+
+    def test_retries(self):
+        StandInArchive.failures = 2
+        with ArchiveClient(server=self.url, retry_delay=0) as client:
+            self.assertEqual(len(client.load_batch(source_ids)), len(source_ids))
+        StandInArchive.failures = 2
+        with ArchiveClient(server=self.url, max_retries=1, retry_delay=0) as client:
+            with self.assertRaises(requests.HTTPError):
+                client.load_batch(source_ids)
+
+    def test_retry_after(self):
+        StandInArchive.failures = 1
+        StandInArchive.failure_headers = {'Retry-After': '7'}
+        with patch('gaiaxpy.input_reader.archive_client.sleep') as mock_sleep:
+            with ArchiveClient(server=self.url, retry_delay=0) as client:
+                self.assertEqual(len(client.load_batch(source_ids)), len(source_ids))
+        mock_sleep.assert_called_once_with(7.0)
+
+    def test_job_not_resubmitted(self):
+        StandInArchive.job_failures = 1
+        with ArchiveClient(server=self.url, retry_delay=0) as client:
+            with self.assertRaises(requests.HTTPError):
+                client.query_source_ids('SELECT source_id FROM gaiadr3.gaia_source')
+        self.assertEqual(StandInArchive.job_requests, 1)
+
+    def test_job_timeout(self):
+        StandInArchive.job_phase = 'EXECUTING'
+        with ArchiveClient(server=self.url, job_timeout=0) as client:
+            with self.assertRaises(TimeoutError):
+                client.query_source_ids('SELECT source_id FROM gaiadr3.gaia_source')
+
+    def test_login(self):
+        with ArchiveClient(user='user', password='password', server=self.url, batch_size=1) as client:
+            list(client.iter_batches(source_ids))
+            self.assertTrue(client.logged_in)
+        self.assertEqual(StandInArchive.cookies, ['JSESSIONID=session'] * len(source_ids))
+        with self.assertRaises(requests.HTTPError):
+            with ArchiveClient(user='user', password='wrong', server=self.url):
+                pass
+
+    def test_no_data(self):
+        with self.assertRaises(ValueError):
+            InputReader(['1', '2'], calibrate).read()
@@ -28,3 +28,18 @@ class TestGetMethods(unittest.TestCase):
     def test_empty_list(self):
         with self.assertRaises(ValueError):
             input_reader, _ = InputReader([], convert).read()
+
+    def test_read_chunks(self):
+        for content in [mean_spectrum_csv_file, dataframe_str]:
+            parsed_df, _ = InputReader(content, convert).read()
+            for chunk_size in [1, 3, 100]:
+                chunks = list(InputReader(content, convert).read_chunks(chunk_size))
+                self.assertTrue(all(len(chunk) <= chunk_size for chunk, _ in chunks))
+                chunks_df = pd.concat([chunk for chunk, _ in chunks], ignore_index=True)
+                pdt.assert_frame_equal(chunks_df, parsed_df, rtol=_rtol, atol=_atol)
+
+    def test_read_chunks_wrong_size(self):
+        for content in [mean_spectrum_csv_file, dataframe_str]:
+            for chunk_size in [0, -1, 2.5]:
+                with self.assertRaises(ValueError):
+                    list(InputReader(content, convert).read_chunks(chunk_size))
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+from astropy.io import fits
+
+from gaiaxpy.output.fits_writer import FitsTableWriter
+from gaiaxpy.output.sampled_spectra_data import SampledSpectraData
+from gaiaxpy.spectrum.xp_sampled_spectrum import XpSampledSpectrum
+
+rng = np.random.default_rng(5)
+n_rows, n_samples = 7, 4
+table_columns = {'source_id': np.arange(n_rows, dtype='int64'), 'xp': np.array(['BP', 'RP'] * 3 + ['BP'], dtype=object),
+                 'flux': rng.normal(size=(n_rows, n_samples)), 'flux_error': rng.uniform(size=(n_rows, n_samples))}
+formats = {'source_id': 'K', 'xp': '2A', 'flux': f'{n_samples}D', 'flux_error': f'{n_samples}E'}
+
+
+def get_fits_columns(with_data=False):
+    return [fits.Column(name=name, format=formats[name],
+                        array=(np.array(array.tolist()) if array.dtype == object else array) if with_data else None)
+            for name, array in table_columns.items()]
+
+
+def select_rows(rows):
+    return {name: array[rows] for name, array in table_columns.items()}
+
+
+class TestFitsTableWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_same_as_astropy(self):
+        header = fits.Header([('Sampling', str(tuple(range(n_samples))))])
+        path = join(self.temp_dir, 'table.fits')
+        with FitsTableWriter(path, get_fits_columns(), header=header) as writer:
+            writer.write(select_rows(slice(0, 3)))
+            writer.write(select_rows(slice(3, n_rows)))
+        expected_path = join(self.temp_dir, 'expected.fits')
+        fits.HDUList([fits.PrimaryHDU(), fits.BinTableHDU.from_columns(get_fits_columns(True), header=header)]).writeto(
+            expected_path)
+        with open(path, 'rb') as f, open(expected_path, 'rb') as expected_f:
+            self.assertEqual(f.read(), expected_f.read())
+
+    def test_append(self):
+        path = join(self.temp_dir, 'table.fits')
+        extra_hdus = [fits.BinTableHDU.from_columns([fits.Column(name='pos', format='D', array=np.arange(3.))],
+                                                    name='SAMPLING')]
+        with FitsTableWriter(path, get_fits_columns(), extra_hdus=extra_hdus) as writer:
+            writer.write(select_rows(slice(0, 2)))
+        with FitsTableWriter(path, get_fits_columns(), append=True) as writer:
+            writer.write(select_rows(slice(2, n_rows)))
+        with fits.open(path) as hdul:
+            self.assertEqual(len(hdul), 3)
+            npt.assert_array_equal(hdul[1].data['flux'], table_columns['flux'])
+            npt.assert_array_equal(hdul[1].data['xp'], table_columns['xp'].astype(str))
+            npt.assert_array_equal(hdul['SAMPLING'].data['pos'], np.arange(3.))
+
+    def test_append_different_columns(self):
+        path = join(self.temp_dir, 'table.fits')
+        with FitsTableWriter(path, get_fits_columns()) as writer:
+            writer.write(select_rows(slice(0, 2)))
+        with self.assertRaises(ValueError):
+            FitsTableWriter(path, get_fits_columns()[:2], append=True)
+
+
+class TestSampledSpectraDataFits(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.spectra_df = pd.DataFrame({name: list(array) if array.ndim > 1 else array
+                                        for name, array in table_columns.items()})
+        self.spectra_df.attrs['data_type'] = XpSampledSpectrum
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sampling_hdu(self):
+        positions = np.linspace(0, 60, n_samples)
+        SampledSpectraData(self.spectra_df, positions, sampling_hdu=True).save(True, self.temp_dir, 'spectra', 'fits',
+                                                                               'fits')
+        with fits.open(join(self.temp_dir, 'spectra.fits')) as hdul:
+            self.assertNotIn('Sampling', hdul[1].header)
+            npt.assert_array_equal(hdul['SAMPLING'].data['pos'], positions)
+            npt.assert_array_equal(hdul[1].data['source_id'], table_columns['source_id'])
+
+    def test_append(self):
+        positions = np.linspace(0, 60, n_samples)
+        for index, rows in enumerate([slice(0, 4), slice(4, n_rows)]):
+            SampledSpectraData(self.spectra_df[rows], positions).save(True, self.temp_dir, 'spectra', 'fits', 'fits',
+                                                                      append=index > 0)
+        with fits.open(join(self.temp_dir, 'spectra.fits')) as hdul:
+            self.assertEqual(hdul[1].header['Sampling'], str(tuple(positions)))
+            npt.assert_array_equal(hdul[1].data['flux'], table_columns['flux'])
+            npt.assert_array_equal(hdul[1].data['flux_error'], table_columns['flux_error'].astype(np.float32))
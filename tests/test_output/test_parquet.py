@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import unittest
+from importlib.util import find_spec
+from os.path import join
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pandas.testing as pdt
+
+from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
+from gaiaxpy.output.continuous_spectra_data import ContinuousSpectraData
+from gaiaxpy.output.photometry_data import PhotometryData
+from gaiaxpy.output.sampled_spectra_data import SampledSpectraData
+from gaiaxpy.spectrum.xp_continuous_spectrum import XpContinuousSpectrum
+from gaiaxpy.spectrum.xp_sampled_spectrum import XpSampledSpectrum
+from tests.files.paths import mean_spectrum_csv_file
+
+has_pyarrow = find_spec('pyarrow') is not None
+parser = InternalContinuousParser()
+covariance_columns = ['bp_covariance_matrix', 'rp_covariance_matrix']
+
+
+def get_continuous_df():
+    # Continuous spectra as written by ContinuousSpectraData, with the lower triangle of the correlation matrices
+    return parser._parse(mean_spectrum_csv_file)[0].drop(columns=covariance_columns)
+
+
+@unittest.skipUnless(has_pyarrow, 'pyarrow is not installed')
+class TestParquet(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def save_continuous(self, df):
+        df = df.copy()
+        df.attrs['data_type'] = XpContinuousSpectrum
+        ContinuousSpectraData(df).save(True, self.temp_dir, 'spectra', 'parquet', 'parquet')
+        return join(self.temp_dir, 'spectra.parquet')
+
+    def test_continuous_round_trip(self):
+        parsed_df = parser._parse(mean_spectrum_csv_file)[0].drop(columns=covariance_columns)
+        parquet_df, extension = parser._parse(self.save_continuous(get_continuous_df()))
+        self.assertEqual(extension, 'parquet')
+        pdt.assert_frame_equal(parquet_df.drop(columns=covariance_columns), parsed_df)
+
+    def test_missing_band_in_chunks(self):
+        df = get_continuous_df()
+        for column in df.columns:
+            if column.startswith('bp_'):
+                df[column] = df[column].astype(object)
+                df.at[1, column] = np.nan
+        chunks = list(parser._parse_chunks(self.save_continuous(df), 1))
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [1, 1])
+        first_chunk, second_chunk = chunks[0][0], chunks[1][0]
+        self.assertEqual(first_chunk['bp_coefficients'].iloc[0].shape, (55,))
+        self.assertTrue(pd.isna(second_chunk['bp_coefficients'].iloc[0]))
+        self.assertIsNone(second_chunk['bp_covariance_matrix'].iloc[0])
+        self.assertEqual(second_chunk['rp_coefficients'].iloc[0].shape, (55,))
+
+    def test_missing_column(self):
+        path = self.save_continuous(get_continuous_df().drop(columns=['rp_coefficients']))
+        with self.assertRaises(KeyError):
+            parser._parse(path)
+
+    def test_sampled_spectra(self):
+        import pyarrow.parquet as pq
+        positions = np.linspace(0, 60, 4)
+        df = pd.DataFrame({'source_id': [1, 1], 'xp': ['BP', 'RP'], 'flux': [np.arange(4.), np.arange(4.) + 1],
+                           'flux_error': [np.ones(4), np.ones(4) / 3]})
+        df.attrs['data_type'] = XpSampledSpectrum
+        SampledSpectraData(df, positions).save(True, self.temp_dir, 'spectra', 'parquet', 'parquet')
+        table = pq.read_table(join(self.temp_dir, 'spectra.parquet'))
+        self.assertEqual(table.schema.metadata[b'sampling'], str(tuple(positions)).encode())
+        self.assertEqual(table.schema.field('flux').type.list_size, 4)
+        npt.assert_array_equal(np.stack(table.column('flux').to_pylist()), np.stack(df['flux']))
+        npt.assert_array_equal(np.stack(table.column('flux_error').to_pylist()),
+                               np.stack(df['flux_error']).astype(np.float32))
+
+    def test_photometry(self):
+        df = pd.DataFrame({'source_id': np.array([1, 2], dtype='int64'), 'Jkc_mag_U': [10., np.nan]})
+        PhotometryData(df).save(True, self.temp_dir, 'photometry', 'parquet', 'parquet')
+        pdt.assert_frame_equal(pd.read_parquet(join(self.temp_dir, 'photometry.parquet')), df)
@@ -11,6 +11,7 @@ from astropy.table import Table
 
 from gaiaxpy import calibrate, convert, generate, PhotometricSystem
 from gaiaxpy.file_parser.parse_generic import GenericParser
+from gaiaxpy.output.sampled_spectra_data import SampledSpectraData
 from tests.files.paths import output_sol_path, mean_spectrum_csv_file
 
 _rtol, _atol = 1e-10, 1e-10
@@ -115,3 +116,37 @@ class TestSaveContRaw(unittest.TestCase):
 
     def test_save_output_xml_pristine(self):
         self.run_output_test(generate, 'photometry_pristine', 'xml', phot_systems=[PhotometricSystem.Pristine])
+
+
+class TestSaveInChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_save_output_in_chunks(self):
+        for function, filename in [(calibrate, 'calibrator'), (convert, 'converter')]:
+            for extension in ['csv', 'ecsv', 'fits', 'xml']:
+                output = function(mean_spectrum_csv_file, output_path=self.temp_dir, output_file=filename,
+                                  output_format=extension, chunk_size=1)
+                self.assertIsNone(output[0])
+                current_file = f'{filename}.{extension}'
+                compare_frames(join(self.temp_dir, current_file), join(output_sol_path, current_file),
+                               extension=extension, function_name=function.__name__)
+
+    def test_save_photometry_in_chunks(self):
+        for filename, extension, phot_systems in [('photometry_gaia_2', 'csv', PhotometricSystem.Gaia_2),
+                                                  ('photometry_sdss_std', 'ecsv', PhotometricSystem.SDSS_Std)]:
+            output = generate(mean_spectrum_csv_file, photometric_system=phot_systems, output_path=self.temp_dir,
+                              output_file=filename, output_format=extension, chunk_size=1)
+            self.assertIsNone(output)
+            current_file = f'{filename}.{extension}'
+            compare_frames(join(self.temp_dir, current_file), join(output_sol_path, current_file), extension=extension,
+                           function_name='generate')
+
+    def test_append_unsupported_format(self):
+        spectra_df, positions = calibrate(mean_spectrum_csv_file, save_file=False)
+        with self.assertRaises(ValueError):
+            SampledSpectraData(spectra_df, positions).save(True, self.temp_dir, 'calibrator', 'xml', 'csv', append=True)
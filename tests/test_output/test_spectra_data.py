@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pandas.testing as pdt
+from astropy.io.votable import parse_single_table
+from astropy.table import Table
+from fastavro import reader
+
+from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
+from gaiaxpy.output.continuous_spectra_data import ContinuousSpectraData
+from gaiaxpy.output.sampled_spectra_data import SampledSpectraData
+from gaiaxpy.spectrum.xp_continuous_spectrum import XpContinuousSpectrum
+from gaiaxpy.spectrum.xp_sampled_spectrum import XpSampledSpectrum
+
+rng = np.random.default_rng(3)
+n_spectra, n_samples = 6, 20
+positions = np.linspace(0, 60, n_samples)
+sampled_df = pd.DataFrame({'source_id': np.arange(n_spectra, dtype='int64'), 'xp': ['BP', 'RP'] * (n_spectra // 2),
+                           'flux': list(rng.normal(size=(n_spectra, n_samples))),
+                           'flux_error': list(rng.uniform(size=(n_spectra, n_samples)))})
+sampled_df.attrs['data_type'] = XpSampledSpectrum
+
+
+class TestSampledSpectraData(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_columns(self):
+        output_data = SampledSpectraData(sampled_df, positions)
+        self.assertEqual(len(output_data), n_spectra)
+        self.assertEqual(output_data.columns['flux'].shape, (n_spectra, n_samples))
+        self.assertTrue(output_data.columns['flux'].flags.c_contiguous)
+        npt.assert_array_equal(output_data.columns['source_id'], sampled_df['source_id'])
+
+    def test_data_view(self):
+        output_data = SampledSpectraData(sampled_df, positions)
+        data = output_data.data
+        pdt.assert_frame_equal(data, sampled_df)
+        self.assertEqual(data.attrs, sampled_df.attrs)
+        self.assertTrue(np.shares_memory(data['flux'].iloc[2], output_data.columns['flux']))
+        # The input data is copied
+        self.assertFalse(np.shares_memory(sampled_df['flux'].iloc[2], output_data.columns['flux']))
+
+    def test_from_columns(self):
+        columns = {'source_id': sampled_df['source_id'].to_numpy(), 'xp': sampled_df['xp'].to_numpy(),
+                   'flux': np.stack(sampled_df['flux']), 'flux_error': np.stack(sampled_df['flux_error'])}
+        output_data = SampledSpectraData(columns, positions, attrs=sampled_df.attrs)
+        # The columns are not copied
+        self.assertIs(output_data.columns['flux'], columns['flux'])
+        self.assertEqual(len(output_data), n_spectra)
+        pdt.assert_frame_equal(output_data.data, sampled_df)
+        self.assertEqual(output_data.data.attrs, sampled_df.attrs)
+
+    def test_data_cached(self):
+        output_data = SampledSpectraData(sampled_df, positions)
+        self.assertIs(output_data.data, output_data.data)
+        output_data.data = sampled_df
+        self.assertIsNot(output_data.data, sampled_df)
+        pdt.assert_frame_equal(output_data.data, sampled_df)
+
+    def test_data_assignment(self):
+        output_data = SampledSpectraData(sampled_df, positions)
+        data = output_data.data
+        data['source_id'] = data['source_id'] + 1
+        output_data.data = data
+        npt.assert_array_equal(output_data.columns['source_id'], sampled_df['source_id'] + 1)
+
+    def test_arrays_of_different_lengths(self):
+        df = sampled_df.copy()
+        df.at[1, 'flux'] = df.at[1, 'flux'][:5]
+        output_data = SampledSpectraData(df, positions)
+        self.assertEqual(output_data.columns['flux'].dtype, object)
+        self.assertEqual(output_data.columns['flux_error'].shape, (n_spectra, n_samples))
+        npt.assert_array_equal(output_data.data['flux'].iloc[1], df.at[1, 'flux'])
+
+    def test_save(self):
+        output_data = SampledSpectraData(sampled_df, positions)
+        for output_format in ['avro', 'csv', 'ecsv', 'fits', 'xml']:
+            output_data.save(True, self.temp_dir, 'spectra', output_format, output_format)
+        table = Table.read(join(self.temp_dir, 'spectra.fits'), format='fits')
+        npt.assert_array_equal(table['flux'], output_data.columns['flux'])
+        table = parse_single_table(join(self.temp_dir, 'spectra.xml')).to_table(use_names_over_ids=True)
+        npt.assert_array_equal(table['flux'], output_data.columns['flux'])
+        with open(join(self.temp_dir, 'spectra.avro'), 'rb') as f:
+            records = list(reader(f))
+        self.assertEqual([record['xp'] for record in records], sampled_df['xp'].tolist())
+        self.assertEqual(records[0]['flux'], str(tuple(sampled_df['flux'].iloc[0])))
+
+    def test_save_typed_avro(self):
+        output_data = SampledSpectraData(sampled_df, positions, typed_avro=True)
+        output_data.save(True, self.temp_dir, 'spectra', 'avro', 'avro')
+        output_data.save(True, self.temp_dir, 'spectra', 'avro', 'avro', append=True)
+        with open(join(self.temp_dir, 'spectra.avro'), 'rb') as f:
+            records = list(reader(f))
+        self.assertEqual(len(records), 2 * n_spectra)
+        npt.assert_array_equal([record['flux'] for record in records[:n_spectra]], output_data.columns['flux'])
+        npt.assert_array_equal([record['flux_error'] for record in records[n_spectra:]],
+                               output_data.columns['flux_error'].astype(np.float32))
+
+
+class TestContinuousSpectraData(unittest.TestCase):
+
+    def test_missing_band(self):
+        df = pd.DataFrame({'source_id': [1, 2], 'bp_coefficients': [np.arange(3.), np.arange(3.) + 1],
+                           'rp_coefficients': [np.arange(3.), np.nan]})
+        df.attrs['data_type'] = XpContinuousSpectrum
+        output_data = ContinuousSpectraData(df)
+        self.assertEqual(output_data.columns['bp_coefficients'].shape, (2, 3))
+        self.assertEqual(output_data.columns['rp_coefficients'].dtype, object)
+        pdt.assert_frame_equal(output_data.data, df)
+
+    def test_typed_avro_round_trip(self):
+        df = pd.DataFrame({'source_id': [1, 2], 'bp_standard_deviation': [1.5, np.nan],
+                           'bp_coefficients': [np.arange(3.), np.nan],
+                           'bp_coefficient_correlations': [np.array([0.1, 0.2, 0.3]), np.nan],
+                           'bp_coefficient_errors': [np.array([0.5, 0.25, 2.]), np.nan],
+                           'bp_n_parameters': [3, np.nan], 'bp_basis_function_id': [56, np.nan],
+                           'rp_standard_deviation': [2., 1.], 'rp_coefficients': [np.arange(3.), np.arange(3.) + 1],
+                           'rp_coefficient_correlations': [np.array([0.1, 0.2, 0.3]), np.array([0., 0., 0.])],
+                           'rp_coefficient_errors': [np.array([1., 0.5, 2.]), np.array([1., 1., 1.])],
+                           'rp_n_parameters': [3, 3], 'rp_basis_function_id': [57, 57]})
+        df.attrs['data_type'] = XpContinuousSpectrum
+        temp_dir = tempfile.mkdtemp()
+        try:
+            ContinuousSpectraData(df, typed_avro=True).save(True, temp_dir, 'spectra', 'avro', 'avro')
+            parsed_df, _ = InternalContinuousParser()._parse(join(temp_dir, 'spectra.avro'))
+        finally:
+            shutil.rmtree(temp_dir)
+        npt.assert_array_equal(parsed_df['source_id'], [1, 2])
+        npt.assert_array_equal(parsed_df['rp_coefficients'].iloc[1], np.arange(3.) + 1)
+        self.assertTrue(pd.isna(parsed_df['bp_coefficients'].iloc[1]))
+        self.assertIsNone(parsed_df['bp_covariance_matrix'].iloc[1])
+        expected_correlations = np.array([[1., 0.1, 0.2], [0.1, 1., 0.3], [0.2, 0.3, 1.]])
+        npt.assert_allclose(parsed_df['bp_coefficient_correlations'].iloc[0], expected_correlations)
+        expected_covariance = expected_correlations * np.outer([0.5, 0.25, 2.], [0.5, 0.25, 2.]) / 1.5 ** 2
+        npt.assert_allclose(np.asarray(parsed_df['bp_covariance_matrix'].iloc[0]), expected_covariance)
@@ -3,6 +3,7 @@ from configparser import ConfigParser
 
 from gaiaxpy.config.paths import config_ini_file
 from gaiaxpy.core.config import load_xpmerge_from_xml, load_xpsampling_from_xml
+from gaiaxpy.core.generic_functions import array_to_symmetric_matrix
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
 from gaiaxpy.spectrum.absolute_sampled_spectrum import AbsoluteSampledSpectrum
@@ -38,7 +39,9 @@ class TestAbsoluteSampledSpectrum(unittest.TestCase):
                 cont_dict = {}
                 # Split both bands
                 for _band in BANDS:
-                    covariance_matrix = _correlation_to_covariance_dr3int5(row[f'{_band}_coefficient_correlations'],
+                    correlation_matrix = array_to_symmetric_matrix(row[f'{_band}_coefficient_correlations'],
+                                                                   row[f'{_band}_n_parameters'])
+                    covariance_matrix = _correlation_to_covariance_dr3int5(correlation_matrix,
                                                                            row[f'{_band}_coefficient_errors'],
                                                                            row[f'{_band}_standard_deviation'])
                     continuous_object = XpContinuousSpectrum(source_id, _band, row[f'{_band}_coefficients'],
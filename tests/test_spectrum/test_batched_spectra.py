@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from gaiaxpy import convert
+from gaiaxpy.spectrum.batched_spectra import _iterate_blocks, _propagate_truncated_covariances, _sample_error
+from gaiaxpy.spectrum.sampled_spectrum import SampledSpectrum
+from tests.files.paths import mean_spectrum_avro_file, with_missing_bp_csv_file, with_missing_bp_fits_file
+
+rng = np.random.default_rng(42)
+n_sources, n_bases, n_samples = 5, 8, 20
+random_matrices = rng.normal(size=(n_sources, n_bases, n_bases))
+covariances = random_matrices @ random_matrices.transpose(0, 2, 1)
+design_matrix = rng.normal(size=(n_bases, n_samples))
+standard_deviations = rng.uniform(0.5, 2., n_sources)
+
+_rtol, _atol = 1e-10, 1e-10
+
+
+class TestBatchedSpectra(unittest.TestCase):
+
+    def test_sample_error(self):
+        errors = _sample_error(covariances, design_matrix, standard_deviations)
+        for covariance, stdev, error in zip(covariances, standard_deviations, errors):
+            npt.assert_allclose(error, SampledSpectrum._sample_error(covariance, design_matrix, stdev), rtol=_rtol)
+
+    def test_propagate_truncated_covariances(self):
+        mask = np.arange(n_bases) < np.array([8, 3, 5, 3, 1])[:, np.newaxis]
+        truncated_covariances = covariances * (mask[:, :, np.newaxis] & mask[:, np.newaxis, :])
+        propagated = _propagate_truncated_covariances(truncated_covariances, design_matrix, mask)
+        self.assertEqual(propagated.shape, (n_sources, n_samples, n_bases))
+        npt.assert_allclose(propagated @ propagated.transpose(0, 2, 1),
+                            design_matrix.T @ truncated_covariances @ design_matrix, rtol=_rtol, atol=_atol)
+
+    def test_iterate_blocks(self):
+        blocks = list(_iterate_blocks(10, 4))
+        self.assertEqual(blocks, [slice(0, 4), slice(4, 8), slice(8, 10)])
+
+
+class TestConvertBatch(unittest.TestCase):
+
+    def test_batch_matches_per_source(self):
+        sampling = np.linspace(0, 60, 90)
+        for file in [mean_spectrum_avro_file, with_missing_bp_csv_file, with_missing_bp_fits_file]:
+            for truncation in [False, True]:
+                expected_df, _ = convert(file, sampling=sampling, truncation=truncation, with_correlation=True,
+                                         save_file=False)
+                batch_df, _ = convert(file, sampling=sampling, truncation=truncation, with_correlation=True,
+                                      save_file=False, batch=True)
+                self.assertEqual(list(batch_df.columns), list(expected_df.columns))
+                npt.assert_array_equal(batch_df['source_id'], expected_df['source_id'])
+                npt.assert_array_equal(batch_df['xp'], expected_df['xp'])
+                npt.assert_allclose(batch_df['standard_deviation'], expected_df['standard_deviation'])
+                for column in ['flux', 'flux_error', 'correlation']:
+                    npt.assert_allclose(np.vstack(batch_df[column]), np.vstack(expected_df[column]), rtol=_rtol,
+                                        atol=_atol)
@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from gaiaxpy import calibrate, convert
+from gaiaxpy.config.paths import optimised_bases_file
+from gaiaxpy.converter.config import load_config
+from gaiaxpy.converter.converter import get_design_matrices
+from gaiaxpy.spectrum.design_matrix_cache import DesignMatrixCache, design_matrix_cache, hash_sampling
+from tests.files.paths import mean_spectrum_csv_file
+
+
+class CountingComputation(object):
+
+    def __init__(self, value=1.):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'design_matrix': np.full((2, 3), self.value), 'sampling_grid': np.arange(3.)}
+
+
+class TestDesignMatrixCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_hash_sampling(self):
+        sampling = np.linspace(0, 60, 600)
+        self.assertEqual(hash_sampling(sampling), hash_sampling(np.linspace(0, 60, 600)))
+        self.assertEqual(hash_sampling(sampling), hash_sampling(list(sampling)))
+        self.assertNotEqual(hash_sampling(sampling), hash_sampling(np.linspace(0, 60, 601)))
+        self.assertEqual(hash_sampling(None), 'default')
+
+    def test_memory_cache(self):
+        cache = DesignMatrixCache(max_size=2)
+        compute = CountingComputation()
+        first = cache.get(('converter', 56, 'a'), compute)
+        second = cache.get(('converter', 56, 'a'), compute)
+        self.assertEqual(compute.calls, 1)
+        self.assertIs(first['design_matrix'], second['design_matrix'])
+        self.assertFalse(first['design_matrix'].flags.writeable)
+
+    def test_lru_eviction(self):
+        cache = DesignMatrixCache(max_size=2)
+        compute = CountingComputation()
+        cache.get(('a',), compute)
+        cache.get(('b',), compute)
+        cache.get(('a',), compute)  # 'b' is now the least recently used entry
+        cache.get(('c',), compute)
+        self.assertIn(('a',), cache)
+        self.assertNotIn(('b',), cache)
+        self.assertIn(('c',), cache)
+        cache.configure(max_size=1)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(('c',), cache)
+        cache.evict(('c',))
+        self.assertEqual(len(cache), 0)
+        with self.assertRaises(ValueError):
+            cache.configure(max_size=-1)
+
+    def test_disk_cache(self):
+        compute = CountingComputation(value=3.)
+        DesignMatrixCache(cache_dir=self.temp_dir).get(('converter', 56, 'a'), compute)
+        arrays = DesignMatrixCache(cache_dir=self.temp_dir).get(('converter', 56, 'a'), compute)
+        self.assertEqual(compute.calls, 1)
+        npt.assert_array_equal(arrays['design_matrix'], np.full((2, 3), 3.))
+        cache = DesignMatrixCache(cache_dir=self.temp_dir)
+        cache.clear(disk=True)
+        cache.get(('converter', 56, 'a'), compute)
+        self.assertEqual(compute.calls, 2)
+
+    def test_converter_design_matrices(self):
+        config_df = load_config(optimised_bases_file)
+        sampling = np.linspace(0, 60, 123)
+        design_matrix_cache.clear()
+        first = get_design_matrices({56, 57}, sampling, config_df)
+        second = get_design_matrices({56, 57}, sampling, config_df)
+        for basis_id in [56, 57]:
+            self.assertIs(first[basis_id].get_design_matrix(), second[basis_id].get_design_matrix())
+            npt.assert_array_equal(first[basis_id].get_sampling_grid(), sampling)
+        design_matrix_cache.clear()
+        recomputed = get_design_matrices({56}, sampling, config_df)
+        self.assertIsNot(recomputed[56].get_design_matrix(), first[56].get_design_matrix())
+        npt.assert_array_equal(recomputed[56].get_design_matrix(), first[56].get_design_matrix())
+
+    def test_caller_sampling_writeable(self):
+        sampling = np.arange(3.)
+        arrays = DesignMatrixCache().get(('a',), lambda: {'sampling_grid': sampling})
+        self.assertFalse(arrays['sampling_grid'].flags.writeable)
+        self.assertTrue(sampling.flags.writeable)
+        calibrator_sampling, converter_sampling = np.linspace(400, 800, 41), np.linspace(0, 60, 61)
+        calibrate(mean_spectrum_csv_file, sampling=calibrator_sampling, save_file=False)
+        convert(mean_spectrum_csv_file, sampling=converter_sampling, save_file=False)
+        # The cached copies are read-only, the arrays of the caller are not
+        self.assertTrue(calibrator_sampling.flags.writeable)
+        self.assertTrue(converter_sampling.flags.writeable)
+        calibrator_sampling[0] = converter_sampling[0] = 1.
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from gaiaxpy.spectrum.error_propagation import _correlations_from_propagated, _errors_from_propagated, \
+    _get_square_root_factors, _propagate_covariances
+
+rng = np.random.default_rng(7)
+n_sources, n_bases, n_samples = 5, 8, 30
+
+factors = rng.normal(size=(n_sources, n_bases, n_bases + 2))
+covariances = factors @ factors.transpose(0, 2, 1)
+design_matrix = rng.normal(size=(n_bases, n_samples))
+standard_deviations = rng.uniform(0.5, 2, n_sources)
+
+
+def expected_outputs(covariance_matrices):
+    sampled_covariances = design_matrix.T @ covariance_matrices @ design_matrix
+    variances = np.diagonal(sampled_covariances, axis1=1, axis2=2)
+    rows, columns = np.tril_indices(n_samples, k=-1)
+    correlations = sampled_covariances[:, rows, columns] / np.sqrt(variances[:, rows] * variances[:, columns])
+    return np.sqrt(variances) * standard_deviations[:, np.newaxis], correlations
+
+
+class TestErrorPropagation(unittest.TestCase):
+
+    def test_errors_and_correlations(self):
+        expected_errors, expected_correlations = expected_outputs(covariances)
+        propagated = _propagate_covariances(covariances, design_matrix)
+        self.assertEqual(propagated.shape, (n_sources, n_samples, n_bases))
+        npt.assert_allclose(_errors_from_propagated(propagated, standard_deviations), expected_errors, rtol=1e-12)
+        npt.assert_allclose(_correlations_from_propagated(propagated), expected_correlations, rtol=0, atol=1e-12)
+
+    def test_merged_covariances(self):
+        # Covariance matrices of merged spectra are sums of sampled covariances with their columns weighted
+        weights = rng.uniform(0, 1, n_samples)
+        propagated = _propagate_covariances(covariances, design_matrix)
+        merged_covariances = design_matrix.T @ covariances @ design_matrix * weights
+        variances = np.diagonal(merged_covariances, axis1=1, axis2=2)
+        rows, columns = np.tril_indices(n_samples, k=-1)
+        expected_correlations = merged_covariances[:, rows, columns] / np.sqrt(variances[:, rows] *
+                                                                               variances[:, columns])
+        correlations = _correlations_from_propagated(propagated, row_block_size=7,
+                                                     right_propagated=propagated * weights[:, np.newaxis])
+        npt.assert_allclose(correlations, expected_correlations, rtol=0, atol=1e-12)
+
+    def test_row_blocks(self):
+        propagated = _propagate_covariances(covariances, design_matrix)
+        full = _correlations_from_propagated(propagated, row_block_size=n_samples)
+        for row_block_size in [1, 7, 64]:
+            npt.assert_allclose(_correlations_from_propagated(propagated, row_block_size=row_block_size), full,
+                                rtol=0, atol=1e-14)
+
+    def test_singular_covariances(self):
+        # Covariance matrices of truncated spectra have rows and columns of zeros
+        singular_covariances = covariances.copy()
+        singular_covariances[:, -3:] = 0
+        singular_covariances[:, :, -3:] = 0
+        square_root_factors = _get_square_root_factors(singular_covariances)
+        npt.assert_allclose(square_root_factors @ square_root_factors.transpose(0, 2, 1), singular_covariances,
+                            atol=1e-12)
+        expected_errors, expected_correlations = expected_outputs(singular_covariances)
+        propagated = _propagate_covariances(singular_covariances, design_matrix)
+        npt.assert_allclose(_errors_from_propagated(propagated, standard_deviations), expected_errors, rtol=1e-10)
+        npt.assert_allclose(_correlations_from_propagated(propagated), expected_correlations, rtol=0, atol=1e-10)
+
+    def test_zero_variance(self):
+        zero_design_matrix = design_matrix.copy()
+        zero_design_matrix[:, 3] = 0
+        propagated = _propagate_covariances(covariances, zero_design_matrix)
+        npt.assert_array_equal(_errors_from_propagated(propagated, standard_deviations)[:, 3], 0)
+        rows, columns = np.tril_indices(n_samples, k=-1)
+        correlations = _correlations_from_propagated(propagated)
+        npt.assert_array_equal(correlations[:, (rows == 3) | (columns == 3)], 0)
+        self.assertFalse(np.isnan(correlations).any())
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+from gaiaxpy.spectrum.packed_covariance import PackedCovariance, as_covariance_matrix, pack_covariances, \
+    stack_covariance_matrices, truncate_covariance
+from gaiaxpy.spectrum.utils import _correlation_to_covariance_dr3int5, get_covariance_matrices
+
+rng = np.random.default_rng(42)
+n_sources, n_parameters = 4, 6
+
+
+def random_correlation_matrices(n, size):
+    matrices = rng.uniform(-1, 1, (n, size, size))
+    matrices = (matrices + matrices.transpose(0, 2, 1)) / 2
+    diagonal = np.arange(size)
+    matrices[:, diagonal, diagonal] = 1.
+    return matrices
+
+
+correlation_matrices = random_correlation_matrices(n_sources, n_parameters)
+errors = rng.uniform(0.1, 2, (n_sources, n_parameters))
+standard_deviations = rng.uniform(0.5, 1.5, n_sources)
+
+
+class TestPackedCovariance(unittest.TestCase):
+
+    def test_to_matrix(self):
+        for dtype in [np.float64, np.float32]:
+            packed = pack_covariances(correlation_matrices, errors.astype(dtype), standard_deviations)
+            for covariance, correlation_matrix, source_errors, standard_deviation in zip(
+                    packed, correlation_matrices, errors.astype(dtype), standard_deviations):
+                self.assertIsInstance(covariance, PackedCovariance)
+                self.assertEqual(covariance.shape, (n_parameters, n_parameters))
+                npt.assert_array_equal(as_covariance_matrix(covariance), _correlation_to_covariance_dr3int5(
+                    correlation_matrix, source_errors, standard_deviation))
+
+    def test_size(self):
+        covariance = pack_covariances(correlation_matrices, errors, standard_deviations)[0]
+        self.assertLess(covariance.nbytes, covariance.to_matrix().nbytes * 0.6)
+
+    def test_truncate(self):
+        covariance = pack_covariances(correlation_matrices, errors, standard_deviations)[0]
+        full_matrix = covariance.to_matrix()
+        for n in [1, 3, n_parameters, n_parameters + 1]:
+            npt.assert_array_equal(truncate_covariance(covariance, n).to_matrix(), full_matrix[:n, :n])
+            npt.assert_array_equal(truncate_covariance(full_matrix, n), full_matrix[:n, :n])
+
+    def test_stack(self):
+        packed = pack_covariances(correlation_matrices, errors, standard_deviations)
+        expected = np.stack([covariance.to_matrix() for covariance in packed])
+        npt.assert_array_equal(stack_covariance_matrices(packed), expected)
+        npt.assert_array_equal(stack_covariance_matrices(packed, 4), expected[:, :4, :4])
+        # Packed and full matrices mixed
+        npt.assert_array_equal(stack_covariance_matrices(packed[:2] + list(expected[2:]), 4), expected[:, :4, :4])
+        self.assertEqual(stack_covariance_matrices([], 4).shape, (0, 4, 4))
+
+
+class TestGetCovarianceMatrices(unittest.TestCase):
+
+    def test_non_symmetric_correlations(self):
+        matrices = correlation_matrices.copy()
+        matrices[1, 0, 1] += 0.1
+        df = pd.DataFrame({'bp_coefficient_correlations': list(matrices), 'bp_coefficient_errors': list(errors),
+                           'bp_standard_deviation': standard_deviations})
+        covariances = get_covariance_matrices(df, 'bp')
+        self.assertIsInstance(covariances[0], PackedCovariance)
+        self.assertIsInstance(covariances[1], np.ndarray)
+        for covariance, matrix, source_errors, standard_deviation in zip(covariances, matrices, errors,
+                                                                         standard_deviations):
+            npt.assert_array_equal(as_covariance_matrix(covariance),
+                                   _correlation_to_covariance_dr3int5(matrix, source_errors, standard_deviation))
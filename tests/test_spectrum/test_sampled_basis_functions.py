@@ -0,0 +1,55 @@
+import math
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+from scipy.special import eval_hermite
+
+from gaiaxpy.config.paths import optimised_bases_file
+from gaiaxpy.converter.config import get_config, load_config
+from gaiaxpy.spectrum.sampled_basis_functions import SampledBasisFunctions, _evaluate_hermite_functions
+
+positions = np.linspace(-12, 12, 97)
+n_functions = 55
+
+
+def psi(n, x):
+    return 1.0 / np.sqrt(math.pow(2, n) * math.factorial(n) * np.sqrt(np.pi)) * np.exp(-x ** 2 / 2.0) * \
+        eval_hermite(n, x)
+
+
+class TestSampledBasisFunctions(unittest.TestCase):
+
+    def test_hermite_functions(self):
+        hermite_functions = _evaluate_hermite_functions(n_functions, positions)
+        self.assertEqual(hermite_functions.shape, (n_functions, len(positions)))
+        expected = np.array([psi(n, positions) for n in range(n_functions)])
+        npt.assert_allclose(hermite_functions, expected, rtol=1e-10, atol=1e-14)
+
+    def test_hermite_functions_weights(self):
+        weights = np.where(np.abs(positions) < 5, 1., 0.)
+        hermite_functions = _evaluate_hermite_functions(n_functions, positions, weights)
+        npt.assert_array_equal(hermite_functions[:, weights == 0], 0.)
+        npt.assert_array_equal(hermite_functions[:, weights > 0],
+                               _evaluate_hermite_functions(n_functions, positions[weights > 0]))
+
+    def test_hermite_functions_few_functions(self):
+        self.assertEqual(_evaluate_hermite_functions(0, positions).shape, (0, len(positions)))
+        npt.assert_array_equal(_evaluate_hermite_functions(1, positions),
+                               _evaluate_hermite_functions(2, positions)[:1])
+
+    def test_from_config(self):
+        config_df = load_config(optimised_bases_file)
+        sampling = np.linspace(0, 60, 600)
+        for basis_id in config_df['uniqueId']:
+            config = get_config(config_df, basis_id)
+            sampled_bases = SampledBasisFunctions.from_config(sampling, config)
+            dimension = int(config['dimension'].iloc[0])
+            scale = (config['normalizedRange'].iloc[0][1] - config['normalizedRange'].iloc[0][0]) / \
+                    (config['range'].iloc[0][1] - config['range'].iloc[0][0])
+            offset = config['normalizedRange'].iloc[0][0] - config['range'].iloc[0][0] * scale
+            rescaled_pwl = sampling * scale + offset
+            transformation = config['transformationMatrix'].iloc[0].reshape(
+                dimension, int(config['transformedSetDimension'].iloc[0]))
+            expected = transformation @ np.array([psi(n, rescaled_pwl) for n in range(dimension)])
+            npt.assert_allclose(sampled_bases.get_design_matrix(), expected, rtol=1e-10, atol=1e-12)
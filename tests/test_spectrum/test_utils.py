@@ -2,9 +2,11 @@ import unittest
 
 import numpy as np
 
+from gaiaxpy.core.generic_functions import array_to_symmetric_matrix
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
-from gaiaxpy.spectrum.utils import _correlation_to_covariance_dr3int5
+from gaiaxpy.spectrum.packed_covariance import PackedCovariance
+from gaiaxpy.spectrum.utils import _correlation_to_covariance_dr3int5, get_covariance_matrices, get_covariance_matrix
 from tests.files.paths import mean_spectrum_avro_file, mean_spectrum_csv_file
 
 # Parsers
@@ -22,7 +24,8 @@ class TestUtils(unittest.TestCase):
 
     def test_correlation_to_covariance(self):
         for band in BANDS:
-            correlation_matrix = parsed_correlation[f'{band}_coefficient_correlations'][0]
+            correlation_matrix = array_to_symmetric_matrix(parsed_correlation[f'{band}_coefficient_correlations'][0],
+                                                           parsed_correlation[f'{band}_n_parameters'][0])
             formal_errors = parsed_correlation[f'{band}_coefficient_errors'][0]
             standard_deviation = parsed_correlation[f'{band}_standard_deviation'][0]
             reconstructed_covariance = _correlation_to_covariance_dr3int5(correlation_matrix, formal_errors,
@@ -30,3 +33,33 @@ class TestUtils(unittest.TestCase):
             covariance_matrix = parsed_covariance[f'{band}_coefficient_covariances'][0]
             self.assertTrue(np.allclose(reconstructed_covariance, covariance_matrix, rel_tol, abs_tol),
                             'The reconstructed covariance is different from the expected matrix.')
+
+    def test_get_covariance_matrices(self):
+        df = parsed_correlation.drop(columns=[f'{band}_covariance_matrix' for band in BANDS])
+        # Remove one band of one source
+        df.loc[1, ['bp_coefficient_correlations', 'bp_standard_deviation']] = [np.nan, np.nan]
+        for band in BANDS:
+            covariance_matrices = get_covariance_matrices(df, band)
+            for index, row in df.iterrows():
+                expected = get_covariance_matrix(row, band)
+                if expected is None:
+                    self.assertIsNone(covariance_matrices[index])
+                else:
+                    np.testing.assert_array_equal(covariance_matrices[index], expected)
+
+    def test_get_covariance_matrices_lower_triangle(self):
+        # The covariances are built from the correlations in the file, without copying them
+        for band in BANDS:
+            for covariance, correlations in zip(parsed_correlation[f'{band}_covariance_matrix'],
+                                                parsed_correlation[f'{band}_coefficient_correlations']):
+                self.assertIsInstance(covariance, PackedCovariance)
+                self.assertIs(covariance.correlations, correlations)
+
+    def test_get_covariance_matrices_covariance_columns(self):
+        for band in BANDS:
+            self.assertIs(get_covariance_matrices(parsed_covariance, band),
+                          parsed_covariance[f'{band}_covariance_matrix'])
+
+    def test_get_covariance_matrices_missing_columns(self):
+        with self.assertRaises(ValueError):
+            get_covariance_matrices(parsed_correlation[['source_id']], 'bp')
@@ -7,6 +7,7 @@ import numpy as np
 from gaiaxpy.config.paths import optimised_bases_file
 from gaiaxpy.converter.config import load_config
 from gaiaxpy.converter.converter import get_design_matrices, get_unique_basis_ids
+from gaiaxpy.core.generic_functions import array_to_symmetric_matrix
 from gaiaxpy.core.satellite import BANDS
 from gaiaxpy.file_parser.parse_internal_continuous import InternalContinuousParser
 from gaiaxpy.spectrum.generic_spectrum import Spectrum
@@ -36,7 +37,8 @@ class TestXpContinuousSpectrum(unittest.TestCase):
         # Create single BP and single RP spectrum
         row = correlation_parsed_file.head(1)
         for band in BANDS:
-            correlation_matrix = row[f'{band}_coefficient_correlations'][0]
+            correlation_matrix = array_to_symmetric_matrix(row[f'{band}_coefficient_correlations'][0],
+                                                           row[f'{band}_n_parameters'][0])
             parameters = row[f'{band}_coefficients'][0]
             standard_deviation = row[f'{band}_standard_deviation'][0]
             covariance_matrix = _correlation_to_covariance_dr3int4(correlation_matrix,